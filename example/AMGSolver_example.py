@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+#
+
+import argparse
+from timeit import default_timer as timer
+
+import numpy as np
+from scipy.sparse.linalg import spsolve
+
+from fealpy.mesh import MeshFactory as MF
+from fealpy.functionspace import LagrangeFiniteElementSpace
+from fealpy.boundarycondition import DirichletBC
+from fealpy.solver import AMGSolver
+
+
+## 参数解析
+parser = argparse.ArgumentParser(description=
+        """
+        在 boxmesh2d/boxmesh3d 网格上用 Lagrange 有限元离散 Poisson 方程, 比较
+        spsolve 和 AMG 预条件共轭梯度法的计算时间. 加大 --ns 和 --maxit 可以把
+        规模加到千万量级的自由度 (此时建议加 --nodirect 跳过 spsolve).
+        """)
+
+parser.add_argument('--dim',
+        default=2, type=int,
+        help='问题的维数, 默认 2 维.')
+
+parser.add_argument('--degree',
+        default=1, type=int,
+        help='Lagrange 有限元空间的次数, 默认 1 次.')
+
+parser.add_argument('--ns',
+        default=64, type=int,
+        help='初始网格每个方向的剖分段数, 默认 64 段.')
+
+parser.add_argument('--maxit',
+        default=3, type=int,
+        help='网格一致加密的次数, 默认 3 次.')
+
+parser.add_argument('--ctype',
+        default='RS', type=str,
+        help="AMG 的粗化方式, 'RS' 或 'SA', 默认 'RS'.")
+
+parser.add_argument('--cycle',
+        default='V', type=str,
+        help="多重网格循环的类型, 'V', 'W' 或 'F', 默认 'V'.")
+
+parser.add_argument('--smoother',
+        default='GS', type=str,
+        help="光滑子, 'GS' 或 'Jacobi', 默认 'GS'.")
+
+parser.add_argument('--nodirect',
+        action='store_true',
+        help='不用 spsolve 求解, 只测试 AMG.')
+
+args = parser.parse_args()
+
+dim = args.dim
+degree = args.degree
+ns = args.ns
+maxit = args.maxit
+
+if dim == 2:
+    from fealpy.pde.poisson_2d import CosCosData as PDE
+    pde = PDE()
+    mesh = MF.boxmesh2d(pde.domain(), nx=ns, ny=ns, meshtype='tri')
+else:
+    from fealpy.pde.poisson_3d import CosCosCosData as PDE
+    pde = PDE()
+    mesh = MF.boxmesh3d(pde.domain(), nx=ns, ny=ns, nz=ns, meshtype='tet')
+
+print("{:>10} {:>10} {:>10} {:>10} {:>6} {:>10}".format(
+    'gdof', 'spsolve', 'setup', 'solve', 'iter', 'error'))
+for i in range(maxit):
+    space = LagrangeFiniteElementSpace(mesh, p=degree)
+    gdof = space.number_of_global_dofs()
+
+    A = space.stiff_matrix()
+    F = space.source_vector(pde.source)
+    bc = DirichletBC(space, pde.dirichlet)
+    A, F = bc.apply(A, F)
+
+    if args.nodirect:
+        t0 = np.nan
+    else:
+        start = timer()
+        x0 = spsolve(A, F)
+        t0 = timer() - start
+
+    solver = AMGSolver(ctype=args.ctype, cycle=args.cycle,
+            smoother=args.smoother)
+    start = timer()
+    solver.setup(A)
+    t1 = timer() - start
+
+    start = timer()
+    x = solver.solve(F, tol=1e-8)
+    t2 = timer() - start
+
+    uh = space.function()
+    uh[:] = x
+    error = space.integralalg.error(pde.solution, uh.value)
+    print("{:>10d} {:>10.3f} {:>10.3f} {:>10.3f} {:>6d} {:>10.3e}".format(
+        gdof, t0, t1, t2, solver.niter, error))
+
+    if i < maxit - 1:
+        mesh.uniform_refine()
+
+solver.print()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+#
+
+import argparse
+from timeit import default_timer as timer
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from fealpy.mesh import MeshFactory as MF
+from fealpy.mesh import TriangleMesh
+from fealpy.mesh.adaptive_tools import refine_closure
+
+
+## 参数解析
+parser = argparse.ArgumentParser(description=
+        """
+        比较二分加密的协调闭包按层循环求解和用 refine_closure 一次图搜索求解
+        的时间. graded 是在原点附近反复加密的分级网格; strip 是一条三角形带,
+        每个单元的加密边都和下一个单元共享, 标记第一个单元时闭包是整条带.
+        """)
+
+parser.add_argument('--mesh',
+        default='graded', type=str,
+        help='网格类型, graded 或者 strip, 默认 graded.')
+
+parser.add_argument('--ns',
+        default=100, type=int,
+        help='初始网格每个方向的剖分段数, 默认 100 段.')
+
+parser.add_argument('--nrefine',
+        default=20, type=int,
+        help='在原点附近加密的次数, 默认 20 次.')
+
+parser.add_argument('--nmark',
+        default=10, type=int,
+        help='每次标记的单元个数, 默认 10 个.')
+
+args = parser.parse_args()
+meshname = args.mesh
+ns = args.ns
+nrefine = args.nrefine
+nmark = args.nmark
+
+
+def loop_closure(cell2edge, cell2cell, isMarkedCell):
+    """
+    原来 TriangleMesh.bisect 中的循环, 每次沿加密边向外扩展一层
+    """
+    NE = cell2edge.max() + 1
+    isCutEdge = np.zeros(NE, dtype=np.bool_)
+    markedCell, = np.nonzero(isMarkedCell)
+    n = 0
+    while len(markedCell) > 0:
+        n += 1
+        isCutEdge[cell2edge[markedCell, 0]] = True
+        refineNeighbor = cell2cell[markedCell, 0]
+        markedCell = refineNeighbor[~isCutEdge[cell2edge[refineNeighbor, 0]]]
+    return isCutEdge, n
+
+
+def graph_closure(cell2edge, cell2cell, isMarkedCell):
+    NC = len(cell2cell)
+    NE = cell2edge.max() + 1
+    dependency = csr_matrix((np.ones(NC, dtype=np.bool_),
+        (np.arange(NC), cell2cell[:, 0])), shape=(NC, NC))
+    isRefineCell = refine_closure(dependency, isMarkedCell)
+    isCutEdge = np.zeros(NE, dtype=np.bool_)
+    isCutEdge[cell2edge[isRefineCell, 0]] = True
+    return isCutEdge
+
+
+def closure_time(mesh, isMarkedCell):
+    cell2edge = mesh.ds.cell_to_edge()
+    cell2cell = mesh.ds.cell_to_cell()
+
+    start = timer()
+    isCutEdge0, n = loop_closure(cell2edge, cell2cell, isMarkedCell)
+    t0 = timer() - start
+
+    start = timer()
+    isCutEdge1 = graph_closure(cell2edge, cell2cell, isMarkedCell)
+    t1 = timer() - start
+    assert np.all(isCutEdge0 == isCutEdge1)
+
+    NC = mesh.number_of_cells()
+    print('NC: {}, 加密边: {}, 循环层数: {}'.format(NC, isCutEdge0.sum(), n))
+    return t0, t1
+
+
+if meshname == 'graded':
+    mesh = MF.boxmesh2d([-1, 1, -1, 1], nx=ns, ny=ns, meshtype='tri')
+    options = mesh.bisect_options(disp=False)
+    t0 = 0.0
+    t1 = 0.0
+    for i in range(nrefine):
+        NC = mesh.number_of_cells()
+        bc = mesh.entity_barycenter('cell')
+        d = np.sum(bc**2, axis=-1)
+        isMarkedCell = np.zeros(NC, dtype=np.bool_)
+        isMarkedCell[np.argsort(d)[:nmark]] = True # 奇点附近的单元
+        s0, s1 = closure_time(mesh, isMarkedCell)
+        t0 += s0
+        t1 += s1
+        mesh.bisect(isMarkedCell, options=options)
+elif meshname == 'strip':
+    n = ns*ns
+    x = np.arange(n+1, dtype=np.float64)
+    node = np.r_['0', np.c_[x, np.zeros(n+1)], np.c_[x, np.ones(n+1)]]
+    b = np.arange(n)
+    t = b + n + 1
+    cell = np.zeros((2*n, 3), dtype=np.int_)
+    cell[0::2] = np.c_[b, b+1, t]
+    cell[1::2] = np.c_[t, b+1, t+1]
+    mesh = TriangleMesh(node, cell)
+    isMarkedCell = np.zeros(2*n, dtype=np.bool_)
+    isMarkedCell[0] = True
+    t0, t1 = closure_time(mesh, isMarkedCell)
+else:
+    raise ValueError("Unknown mesh {}!".format(meshname))
+
+print('按层循环: {:.3f}s, refine_closure: {:.3f}s'.format(t0, t1))
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+#
+# 运行方式: mpirun -n 4 python3 DistributedPoisson_example.py --ns 100
+
+import argparse
+from timeit import default_timer as timer
+
+import numpy as np
+from mpi4py import MPI
+
+from fealpy.mesh import MeshFactory as MF
+from fealpy.pde.poisson_2d import CosCosData
+from fealpy.pde.poisson_3d import CosCosCosData
+from fealpy.parallel import DistributedMesh, DistributedLagrangeFiniteElementSpace
+from fealpy.parallel import cg
+
+
+## 参数解析
+parser = argparse.ArgumentParser(description=
+        """
+        在分布式网格上用拉格朗日有限元求解 Poisson 方程. 根进程生成并划分
+        网格, 每个进程只组装自己子网格上的矩阵, 用带 ghost 自由度通信的
+        Jacobi 预条件共轭梯度法求解.
+        """)
+
+parser.add_argument('--dim',
+        default=2, type=int,
+        help='问题的维数, 默认为 2 维.')
+
+parser.add_argument('--degree',
+        default=1, type=int,
+        help='拉格朗日有限元空间的次数, 默认为 1 次.')
+
+parser.add_argument('--ns',
+        default=100, type=int,
+        help='网格每个方向的剖分段数, 默认 100 段.')
+
+parser.add_argument('--partition',
+        default='metis', type=str,
+        help='网格划分方法, metis 或 coordinate (按单元重心的 x 坐标等分), 默认为 metis.')
+
+args = parser.parse_args()
+p = args.degree
+ns = args.ns
+
+comm = MPI.COMM_WORLD
+rank = comm.Get_rank()
+size = comm.Get_size()
+
+pde = CosCosData() if args.dim == 2 else CosCosCosData()
+
+start = timer()
+mesh = None
+parts = None
+if rank == 0:
+    if args.dim == 2:
+        mesh = MF.boxmesh2d(pde.domain(), nx=ns, ny=ns, meshtype='tri')
+    else:
+        mesh = MF.boxmesh3d(pde.domain(), nx=ns, ny=ns, nz=ns, meshtype='tet')
+    if args.partition == 'coordinate':
+        bc = mesh.entity_barycenter('cell')
+        index = np.argsort(bc[:, 0], kind='stable')
+        parts = np.zeros(len(index), dtype=np.int_)
+        for i, idx in enumerate(np.array_split(index, size)):
+            parts[idx] = i
+dmesh = DistributedMesh.from_mesh(comm, mesh, parts=parts, p=p)
+space = DistributedLagrangeFiniteElementSpace(dmesh, p=p)
+t0 = timer() - start
+
+start = timer()
+A = space.stiff_matrix()
+F = space.source_vector(pde.source)
+A, F, uh = space.set_dirichlet_bc(pde.dirichlet, A, F)
+t1 = timer() - start
+
+start = timer()
+uh, niter = cg(A, F, space.component, x=uh, tol=1e-10)
+t2 = timer() - start
+
+e = space.error(pde.solution, uh)
+nown = comm.gather(space.number_of_owned_dofs(), root=0)
+nghost = comm.gather(space.number_of_local_dofs() - space.number_of_owned_dofs(), root=0)
+if rank == 0:
+    print('gdof: {}, 每个进程拥有的自由度: {}, ghost 自由度: {}'.format(
+        space.number_of_global_dofs(), nown, nghost))
+    print('L2 误差: {:.3e}, CG 迭代次数: {}'.format(e, niter))
+    print('划分和分发: {:.3f}s, 组装: {:.3f}s, 求解: {:.3f}s'.format(t0, t1, t2))
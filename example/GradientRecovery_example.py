@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+#
+
+import argparse
+from timeit import default_timer as timer
+
+import numpy as np
+
+from fealpy.mesh import MeshFactory as MF
+from fealpy.functionspace import LagrangeFiniteElementSpace
+
+
+## 参数解析
+parser = argparse.ArgumentParser(description=
+        """
+        在同一个网格上多次做梯度恢复, 比较每次逐单元累加 (np.add.at) 和
+        预先组装恢复矩阵的 GradientRecoveryOperator 的时间.
+        """)
+
+parser.add_argument('--ns',
+        default=300, type=int,
+        help='网格每个方向的剖分段数, 默认 300 段.')
+
+parser.add_argument('--p',
+        default=1, type=int,
+        help='Lagrange 有限元空间的次数, 默认 1 次.')
+
+parser.add_argument('--method',
+        default='area', type=str,
+        help='恢复方法, 可以是 simple, area, area_harmonic, distance, '
+        'distance_harmonic, SPR 或者 PPR, 默认 area.')
+
+parser.add_argument('--N',
+        default=10, type=int,
+        help='恢复的次数, 默认 10 次.')
+
+args = parser.parse_args()
+ns = args.ns
+p = args.p
+method = args.method
+N = args.N
+
+mesh = MF.boxmesh2d([0, 1, 0, 1], nx=ns, ny=ns, meshtype='tri')
+space = LagrangeFiniteElementSpace(mesh, p=p)
+uh = space.interpolation(lambda x: np.sin(np.pi*x[..., 0])*np.sin(np.pi*x[..., 1]))
+print('NC:', mesh.number_of_cells(), 'gdof:', space.number_of_global_dofs())
+
+
+def add_at_recovery(uh):
+    """
+    每次都重新计算梯度和权重, 用 np.add.at 累加
+    """
+    cell2dof = space.cell_to_dof()
+    gdof = space.number_of_global_dofs()
+    bc = space.dof.multiIndex/p
+    guh = uh.grad_value(bc).swapaxes(0, 1)
+    measure = mesh.entity_measure('cell')
+    rguh = np.zeros((gdof, 2), dtype=mesh.ftype)
+    deg = np.zeros(gdof, dtype=mesh.ftype)
+    np.add.at(rguh, cell2dof, guh*measure[:, None, None])
+    np.add.at(deg, cell2dof, np.broadcast_to(measure[:, None], cell2dof.shape))
+    return rguh/deg[:, None]
+
+
+if method == 'area':
+    start = timer()
+    for i in range(N):
+        rguh0 = add_at_recovery(uh)
+    t0 = timer() - start
+    print('np.add.at: {:.3f}s/次'.format(t0/N))
+
+start = timer()
+op = space.recovery_operator(method)
+t1 = timer() - start
+
+start = timer()
+for i in range(N):
+    rguh1 = space.grad_recovery(uh, method=method)
+t2 = timer() - start
+print('GradientRecoveryOperator: 构造 {:.3f}s, {:.4f}s/次'.format(t1, t2/N))
+
+if method == 'area':
+    assert np.allclose(rguh0, rguh1)
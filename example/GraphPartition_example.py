@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+#
+
+import argparse
+from timeit import default_timer as timer
+
+import numpy as np
+
+from fealpy.mesh import MeshFactory as MF
+from fealpy.graph import metis
+from fealpy.graph import partition
+
+
+## 参数解析
+parser = argparse.ArgumentParser(description=
+        """
+        比较不依赖 METIS 的递归二分图划分 (rcb, inertial, greedy, spectral)
+        与 METIS 划分网格单元的切边数, 不平衡度和时间. 没有 libmetis 时只
+        比较前者.
+        """)
+
+parser.add_argument('--dim',
+        default=2, type=int,
+        help='网格的维数, 2 为三角形网格, 3 为四面体网格, 默认为 2.')
+
+parser.add_argument('--ns',
+        default=200, type=int,
+        help='网格每个方向的剖分段数, 默认 200 段.')
+
+parser.add_argument('--nparts',
+        default=[4, 16, 64], nargs='+', type=int,
+        help='划分的组数, 默认为 4 16 64.')
+
+args = parser.parse_args()
+ns = args.ns
+
+if args.dim == 2:
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=ns, ny=ns, meshtype='tri')
+else:
+    mesh = MF.boxmesh3d([0, 1, 0, 1, 0, 1], nx=ns, ny=ns, nz=ns, meshtype='tet')
+NC = mesh.number_of_cells()
+print('NC: {}'.format(NC))
+
+methods = ['rcb', 'inertial', 'greedy', 'spectral']
+if metis._dll is not None:
+    methods.append('metis')
+
+for nparts in args.nparts:
+    for method in methods:
+        start = timer()
+        if method == 'metis':
+            edgecut, parts = metis.part_mesh(mesh, nparts=nparts)
+            parts = np.asarray(parts)
+        else:
+            edgecut, parts = partition.part_mesh(mesh, nparts=nparts, method=method)
+        t = timer() - start
+        print('nparts: {:4d}, {:9s} 切边数: {:7d}, 不平衡度: {:.3f}, 时间: {:.3f}s'.format(
+            nparts, method, edgecut, partition.imbalance(parts, nparts), t))
@@ -89,6 +89,10 @@ uh0 = space.interpolation(pde.init_value)
 # 下一层时间步的有限元解
 uh1 = space.function()
 
+# Dirichlet 边界条件, 迭代矩阵不变, 只消去一次
+bc = DirichletBC(space, pde.dirichlet)
+GD = bc.apply_on_matrix(G)
+
 for i in range(0, nt): 
     
     # 下一个的时间层 t1
@@ -108,8 +112,7 @@ for i in range(0, nt):
     @cartesian
     def dirichlet(p):
         return pde.dirichlet(p, t1)
-    bc = DirichletBC(space, dirichlet)
-    GD, F = bc.apply(G, F)
+    F = bc.apply_on_vector(G, F, gD=dirichlet)
     
     # 代数系统求解
     uh1[:] = spsolve(GD, F).reshape(-1)
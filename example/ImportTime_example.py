@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+#
+
+import os
+import sys
+import argparse
+import subprocess
+
+import numpy as np
+
+
+## 参数解析
+parser = argparse.ArgumentParser(description=
+        """
+        在新的 Python 进程中测量导入 fealpy 各个包的时间 (取多次的中位数),
+        以及导入以后是否加载了 matplotlib, vtk 和 scipy. `import fealpy.mesh`
+        的时间超过预算时以非零状态退出, 可以放到持续集成中使用.
+        """)
+
+parser.add_argument('--modules',
+        default=['fealpy.mesh', 'fealpy.functionspace', 'fealpy.solver',
+            'fealpy.plotter', 'fealpy.mesh.TriangleMesh'],
+        nargs='+', type=str,
+        help='要测量的模块, 默认为 fealpy.mesh, fealpy.functionspace, fealpy.solver, '
+        'fealpy.plotter 和 fealpy.mesh.TriangleMesh.')
+
+parser.add_argument('--nrepeat',
+        default=5, type=int,
+        help='每个模块重复测量的次数, 默认 5 次.')
+
+parser.add_argument('--budget',
+        default=0.1, type=float,
+        help='import fealpy.mesh 的时间预算 (秒), 默认 0.1 秒.')
+
+args = parser.parse_args()
+
+code = """
+import sys
+from timeit import default_timer as timer
+start = timer()
+import {}
+t = timer() - start
+print(t, *[m in sys.modules for m in ('matplotlib', 'vtk', 'scipy')])
+"""
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+env = dict(os.environ, PYTHONPATH=root)
+
+times = {}
+for m in args.modules:
+    t = []
+    for i in range(args.nrepeat):
+        out = subprocess.run([sys.executable, '-c', code.format(m)], env=env,
+                capture_output=True, text=True, check=True).stdout.split()
+        t.append(float(out[0]))
+    times[m] = np.median(t)
+    print('{:30s} {:.4f}s  matplotlib: {:5s} vtk: {:5s} scipy: {:5s}'.format(
+        m, times[m], *out[1:]))
+
+if 'fealpy.mesh' in times:
+    if times['fealpy.mesh'] > args.budget:
+        print('import fealpy.mesh 用时 {:.4f}s, 超过预算 {:.4f}s!'.format(
+            times['fealpy.mesh'], args.budget))
+        sys.exit(1)
+    print('import fealpy.mesh 用时 {:.4f}s, 预算 {:.4f}s.'.format(
+        times['fealpy.mesh'], args.budget))
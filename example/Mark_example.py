@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+#
+
+import argparse
+from timeit import default_timer as timer
+
+import numpy as np
+
+from fealpy.mesh.adaptive_tools import mark
+
+
+## 参数解析
+parser = argparse.ArgumentParser(description=
+        """
+        比较按排序实现的 Dörfler 标记和 adaptive_tools.mark 中 O(N) 的
+        Dörfler 标记的时间.
+        """)
+
+parser.add_argument('--theta',
+        default=0.3, type=float,
+        help='Dörfler 标记参数, 默认 0.3.')
+
+parser.add_argument('--N',
+        default=[10**4, 10**5, 10**6, 10**7], type=int, nargs='+',
+        help='误差指示子的个数, 默认 10^4, 10^5, 10^6, 10^7.')
+
+args = parser.parse_args()
+theta = args.theta
+
+
+def sort_mark(eta, theta):
+    isMarked = np.zeros(len(eta), dtype=np.bool_)
+    eta = eta**2
+    idx = np.argsort(eta)[-1::-1]
+    x = np.cumsum(eta[idx])
+    isMarked[idx[x < theta*x[-1]]] = True
+    isMarked[idx[0]] = True
+    return isMarked
+
+
+rng = np.random.default_rng(0)
+for N in args.N:
+    eta = rng.random(N)**4
+
+    start = timer()
+    isMarked0 = sort_mark(eta, theta)
+    t0 = timer() - start
+
+    start = timer()
+    isMarked1 = mark(eta, theta, method='L2')
+    t1 = timer() - start
+    assert np.all(isMarked0 == isMarked1)
+
+    print('N: {}, 标记: {}, 排序: {:.4f}s, mark: {:.4f}s, 加速比: {:.1f}'.format(
+        N, isMarked1.sum(), t0, t1, t0/t1))
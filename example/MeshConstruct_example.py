@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+#
+
+import argparse
+from timeit import default_timer as timer
+
+import numpy as np
+
+from fealpy.mesh import MeshFactory as MF
+from fealpy.mesh.mesh_tools import unique_row_index
+
+
+## 参数解析
+parser = argparse.ArgumentParser(description=
+        """
+        比较网格拓扑构造中按行字典序去重 np.unique(axis=0) 和整数编码去重
+        unique_row_index 的时间, 并给出 ds.construct 和 uniform_refine 的时间.
+        """)
+
+parser.add_argument('--meshtype',
+        default='tet', type=str,
+        help='网格类型, 可以是 tri, quad, tet 或 hex, 默认 tet.')
+
+parser.add_argument('--ns',
+        default=40, type=int,
+        help='网格每个方向的剖分段数, 默认 40 段.')
+
+args = parser.parse_args()
+meshtype = args.meshtype
+ns = args.ns
+
+if meshtype in {'tri', 'quad'}:
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=ns, ny=ns, meshtype=meshtype)
+else:
+    mesh = MF.boxmesh3d([0, 1, 0, 1, 0, 1], nx=ns, ny=ns, nz=ns, meshtype=meshtype)
+print('NN:', mesh.number_of_nodes(), 'NC:', mesh.number_of_cells())
+
+ds = mesh.ds
+if mesh.top_dimension() == 3:
+    total = np.sort(ds.total_face(), axis=1)
+else:
+    total = np.sort(ds.total_edge(), axis=1)
+
+start = timer()
+_, i0, j = np.unique(total, return_index=True, return_inverse=True, axis=0)
+t0 = timer() - start
+
+start = timer()
+k0, k = unique_row_index(total)
+t1 = timer() - start
+assert np.all(i0 == k0) and np.all(j == k)
+print('np.unique(axis=0): {:.3f}s, unique_row_index: {:.3f}s, 加速比: {:.1f}'.format(
+    t0, t1, t0/t1))
+
+start = timer()
+ds.construct()
+print('construct: {:.3f}s'.format(timer() - start))
+
+mesh.uniform_refine()
+print('refined NC:', mesh.number_of_cells())
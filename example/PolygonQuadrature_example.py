@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+#
+
+import argparse
+from timeit import default_timer as timer
+
+import numpy as np
+
+from fealpy.mesh import MeshFactory as MF
+from fealpy.functionspace import ScaledMonomialSpace2d
+
+
+## 参数解析
+parser = argparse.ArgumentParser(description=
+        """
+        比较多边形网格上每次积分都重新剖分子三角形, 分两侧调用两次被积函数,
+        用 np.add.at 累加的积分, 与缓存复合求积公式 (PolygonMeshQuadrature)
+        以后一次调用加一次 np.add.reduceat 的积分的时间.
+        """)
+
+parser.add_argument('--degree',
+        default=2, type=int,
+        help='缩放单项式空间的次数, 默认为 2 次.')
+
+parser.add_argument('--ns',
+        default=200, type=int,
+        help='多边形网格每个方向的剖分段数, 默认 200 段.')
+
+parser.add_argument('--nrepeat',
+        default=5, type=int,
+        help='重复积分的次数, 默认 5 次.')
+
+args = parser.parse_args()
+p = args.degree
+ns = args.ns
+nrepeat = args.nrepeat
+
+
+def edge_integral(mesh, u, qf, bc):
+    """
+    原来 PolygonMeshIntegralAlg.integral 的实现
+    """
+    node = mesh.entity('node')
+    edge = mesh.entity('edge')
+    edge2cell = mesh.ds.edge_to_cell()
+    NC = mesh.number_of_cells()
+    bcs, ws = qf.quadpts, qf.weights
+
+    def measure(tri):
+        return np.cross(tri[1] - tri[0], tri[2] - tri[0])/2
+
+    tri = [bc[edge2cell[:, 0]], node[edge[:, 0]], node[edge[:, 1]]]
+    pp = np.einsum('ij, jkm->ikm', bcs, tri)
+    val = u(pp, edge2cell[:, 0])
+    e = np.zeros((NC, ) + val.shape[2:], dtype=np.float64)
+    np.add.at(e, edge2cell[:, 0], np.einsum('i, ij..., j->j...', ws, val, measure(tri)))
+
+    isInEdge = (edge2cell[:, 0] != edge2cell[:, 1])
+    tri = [bc[edge2cell[isInEdge, 1]], node[edge[isInEdge, 1]], node[edge[isInEdge, 0]]]
+    pp = np.einsum('ij, jkm->ikm', bcs, tri)
+    val = u(pp, edge2cell[isInEdge, 1])
+    np.add.at(e, edge2cell[isInEdge, 1], np.einsum('i, ij..., j->j...', ws, val, measure(tri)))
+    return e
+
+
+mesh = MF.boxmesh2d([0, 1, 0, 1], nx=ns, ny=ns, meshtype='poly')
+space = ScaledMonomialSpace2d(mesh, p)
+integralalg = space.integralalg
+print('NC: {}, NE: {}'.format(mesh.number_of_cells(), mesh.number_of_edges()))
+
+
+def g(x, index):
+    return np.sin(x[..., 0])*np.cos(x[..., 1])
+
+
+def f(x, index):
+    gphi = space.grad_basis(x, index=index)
+    return np.einsum('ijkm, ijpm->ijkp', gphi, gphi)
+
+
+for name, u in [('标量函数', g), ('单元刚度矩阵', f)]:
+    start = timer()
+    for i in range(nrepeat):
+        e0 = edge_integral(mesh, u, integralalg.cellintegrator, space.cellbarycenter)
+    t0 = timer() - start
+
+    start = timer()
+    for i in range(nrepeat):
+        e1 = integralalg.integral(u, celltype=True)
+    t1 = timer() - start
+
+    print('{}: 误差 {:.3e}, 原来的积分: {:.3f}s, 缓存求积公式: {:.3f}s'.format(
+        name, np.abs(e0 - e1).max(), t0, t1))
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+#
+
+import argparse
+from timeit import default_timer as timer
+
+import numpy as np
+
+from fealpy.mesh import MeshFactory as MF
+from fealpy.functionspace import LagrangeFiniteElementSpace
+from fealpy.decorator import cartesian
+
+
+## 参数解析
+parser = argparse.ArgumentParser(description=
+        """
+        比较逐个组装多个载荷工况的右端向量和用 source_vector_batch 一次组装的时间.
+        """)
+
+parser.add_argument('--degree',
+        default=2, type=int,
+        help='Lagrange 有限元空间的次数, 默认为 2 次.')
+
+parser.add_argument('--ns',
+        default=200, type=int,
+        help='初始网格每个方向的剖分段数, 默认 200 段.')
+
+parser.add_argument('--nrhs',
+        default=100, type=int,
+        help='载荷工况的个数, 默认 100 个.')
+
+args = parser.parse_args()
+p = args.degree
+ns = args.ns
+nrhs = args.nrhs
+
+mesh = MF.boxmesh2d([0, 1, 0, 1], nx=ns, ny=ns, meshtype='tri')
+space = LagrangeFiniteElementSpace(mesh, p=p)
+k = np.arange(1, nrhs+1)
+
+@cartesian
+def sources(p):
+    x = p[..., 0]
+    y = p[..., 1]
+    return np.sin(k[:, None, None]*np.pi*x)*np.sin(np.pi*y)
+
+def source(i):
+    @cartesian
+    def f(p):
+        x = p[..., 0]
+        y = p[..., 1]
+        return np.sin(k[i]*np.pi*x)*np.sin(np.pi*y)
+    return f
+
+start = timer()
+b0 = np.stack([space.source_vector(source(i)) for i in range(nrhs)], axis=-1)
+t0 = timer() - start
+
+start = timer()
+b1 = space.source_vector_batch(sources)
+t1 = timer() - start
+
+print('gdof: {}, nrhs: {}, 误差: {:.3e}'.format(
+    space.number_of_global_dofs(), nrhs, np.abs(b0 - b1).max()))
+print('逐个组装: {:.3f}s, 一次组装: {:.3f}s'.format(t0, t1))
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+#
+
+import argparse
+import os
+import tempfile
+from timeit import default_timer as timer
+
+import numpy as np
+
+from fealpy.mesh import MeshFactory as MF
+from fealpy.functionspace import LagrangeFiniteElementSpace
+from fealpy.writer import VTKMeshWriter, TimeSeriesWriter
+
+
+## 参数解析
+parser = argparse.ArgumentParser(description=
+        """
+        用显式格式求解热方程, 比较每步用 VTKMeshWriter 输出一个 vtu 文件和用
+        TimeSeriesWriter 输出 XDMF 时间序列的时间开销.
+        """)
+
+parser.add_argument('--ns',
+        default=200, type=int,
+        help='网格每个方向的剖分段数, 默认 200 段.')
+
+parser.add_argument('--NT',
+        default=50, type=int,
+        help='时间步数, 默认 50 步.')
+
+parser.add_argument('--nsub',
+        default=10, type=int,
+        help='每两次输出之间的时间步数, 默认 10 步.')
+
+args = parser.parse_args()
+ns = args.ns
+NT = args.NT
+nsub = args.nsub
+
+mesh = MF.boxmesh2d([0, 1, 0, 1], nx=ns, ny=ns, meshtype='tri')
+space = LagrangeFiniteElementSpace(mesh, p=1)
+A = space.stiff_matrix()
+M = space.mass_matrix()
+m = np.asarray(M.sum(axis=1)).reshape(-1) # 集中质量
+dt = 0.1*m.min()/A.diagonal().max()
+
+node = mesh.entity('node')
+uh0 = np.exp(-100*np.sum((node - 0.5)**2, axis=-1))
+print('NN:', mesh.number_of_nodes(), 'NC:', mesh.number_of_cells())
+
+path = tempfile.mkdtemp()
+
+def simulate(output):
+    uh = uh0.copy()
+    tsim = 0.0
+    tout = 0.0
+    for i in range(NT):
+        start = timer()
+        for j in range(nsub):
+            uh -= dt*(A@uh)/m
+        tsim += timer() - start
+
+        start = timer()
+        output(i, uh)
+        tout += timer() - start
+    return tsim, tout
+
+vtkwriter = VTKMeshWriter()
+def vtk_output(i, uh):
+    mesh.nodedata['uh'] = uh
+    vtkwriter(os.path.join(path, 'heat_{:05d}.vtu'.format(i)), mesh)
+
+start = timer()
+tsim, tout = simulate(vtk_output)
+print('VTKMeshWriter: 计算 {:.3f}s, 输出 {:.3f}s ({:.1f}%)'.format(
+    tsim, tout, 100*tout/tsim))
+mesh.nodedata.pop('uh')
+
+writer = TimeSeriesWriter(mesh, os.path.join(path, 'heat.xmf'))
+def xdmf_output(i, uh):
+    writer.write(i*nsub*dt, nodedata={'uh': uh})
+
+tsim, tout = simulate(xdmf_output)
+start = timer()
+writer.close()
+tout += timer() - start
+print('TimeSeriesWriter: 计算 {:.3f}s, 输出 {:.3f}s ({:.1f}%)'.format(
+    tsim, tout, 100*tout/tsim))
+print('输出目录:', path)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+#
+
+import argparse
+from timeit import default_timer as timer
+
+import numpy as np
+from numpy.linalg import inv
+from scipy.sparse import csr_matrix
+
+from fealpy.mesh import MeshFactory as MF
+from fealpy.functionspace import ConformingVirtualElementSpace2d
+
+
+## 参数解析
+parser = argparse.ArgumentParser(description=
+        """
+        比较协调虚单元空间逐单元 (map/hsplit) 计算投影矩阵并组装刚度矩阵和
+        质量矩阵, 与按单元边数分组批量计算的时间.
+        """)
+
+parser.add_argument('--degree',
+        default=2, type=int,
+        help='虚单元空间的次数, 默认为 2 次.')
+
+parser.add_argument('--ns',
+        default=100, type=int,
+        help='多边形网格每个方向的剖分段数, 默认 100 段.')
+
+args = parser.parse_args()
+p = args.degree
+ns = args.ns
+
+
+def loop_matrix(space):
+    """
+    原来的逐单元实现
+    """
+    cell2dof, cell2dofLocation = space.cell_to_dof()
+    cd = np.hsplit(cell2dof, cell2dofLocation[1:-1])
+    DD = np.vsplit(space.D, cell2dofLocation[1:-1])
+    BB = np.hsplit(space.B, cell2dofLocation[1:-1])
+    area = space.smspace.cellmeasure
+    NV = space.mesh.number_of_vertices_of_cells()
+    idof = (p-1)*p//2
+
+    if p == 1:
+        G = [np.eye(3)]*len(cd)
+        PI1 = BB
+    else:
+        G = list(map(lambda x: x[0]@x[1], zip(BB, DD)))
+        PI1 = list(map(lambda x: inv(x[0])@x[1], zip(G, BB)))
+    C = list(map(lambda x: x[0]@x[1], zip(space.H, PI1)))
+    l = lambda x: np.r_[
+            '0',
+            np.r_['1', np.zeros((idof, p*x[0])), x[1]*np.eye(idof)],
+            x[2][idof:, :]]
+    if p > 1:
+        C = list(map(l, zip(NV, area, C)))
+    PI0 = list(map(lambda x: inv(x[0])@x[1], zip(space.H, C)))
+
+    def f(x):
+        tG = x[2].copy()
+        tG[0, :] = 0
+        n = x[1].shape[1]
+        M = np.eye(n) - x[0]@x[1]
+        if p == 1: # 相邻顶点差的平方和
+            S = 2*np.eye(n) - np.roll(np.eye(n), 1, axis=1) - np.roll(np.eye(n), -1, axis=1)
+            return x[1].T@tG@x[1] + M.T@S@M
+        return x[1].T@tG@x[1] + M.T@M
+    A = list(map(f, zip(DD, PI1, G)))
+
+    def f(x):
+        M = np.eye(x[1].shape[1]) - x[0]@x[1]
+        return x[1].T@x[2]@x[1] + x[3]*M.T@M
+    M = list(map(f, zip(DD, PI0, space.H, area)))
+
+    I = np.concatenate(list(map(lambda x: np.repeat(x, x.shape[0]), cd)))
+    J = np.concatenate(list(map(lambda x: np.tile(x, x.shape[0]), cd)))
+    gdof = space.number_of_global_dofs()
+    A = csr_matrix((np.concatenate([a.flat for a in A]), (I, J)), shape=(gdof, gdof))
+    M = csr_matrix((np.concatenate([m.flat for m in M]), (I, J)), shape=(gdof, gdof))
+    return A, M
+
+
+mesh = MF.boxmesh2d([0, 1, 0, 1], nx=ns, ny=ns, meshtype='poly')
+NV = mesh.number_of_vertices_of_cells()
+print('NC: {}, 单元边数: {}'.format(mesh.number_of_cells(), np.unique(NV)))
+
+space = ConformingVirtualElementSpace2d(mesh, p=p)
+
+start = timer()
+space.G = space.matrix_G(space.B, space.D)
+space.PI1 = space.matrix_PI_1(space.G, space.B)
+space.C = space.matrix_C(space.H, space.PI1)
+space.PI0 = space.matrix_PI_0(space.H, space.C)
+A1 = space.stiff_matrix()
+M1 = space.mass_matrix()
+t1 = timer() - start
+
+# 稀疏模式在第一次组装时计算, 以后的组装直接使用
+start = timer()
+A1 = space.stiff_matrix()
+M1 = space.mass_matrix()
+t2 = timer() - start
+
+start = timer()
+A0, M0 = loop_matrix(space)
+t0 = timer() - start
+print('刚度矩阵误差: {:.3e}, 质量矩阵误差: {:.3e}'.format(
+    abs(A0 - A1).max(), abs(M0 - M1).max()))
+print('逐单元: {:.3f}s, 分组批量: {:.3f}s, 再次组装: {:.3f}s'.format(t0, t1, t2))
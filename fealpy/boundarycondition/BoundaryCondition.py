@@ -3,46 +3,192 @@ from scipy.sparse import coo_matrix, csc_matrix
 from scipy.sparse import csr_matrix, spdiags, eye, bmat
 
 
+class DirichletElimination():
+    """
+    @brief 在 CSR 矩阵上消去 Dirichlet 自由度
+
+    Notes
+    -----
+    构造时分析一次矩阵的稀疏结构, 记下
+
+    * 边界自由度所在的行和列在 `data` 中的位置, 消去时直接置零;
+    * 边界行的对角元在 `data` 中的位置, 消去时置为 1;
+    * 内部行, 边界列的元素 A[~isDDof, isDDof] 的位置, 它们组成把边界值移到
+      右端的矩阵 `self.lift`.
+
+    对同样稀疏结构的矩阵 (如时间相关问题每一步的矩阵) 消去时只要复制一次
+    `data`, 不再需要两次稀疏矩阵乘法; 处理新的边界值只需要做一次 `self.lift`
+    的乘法, 运算量为边界列上的非零元个数.
+    """
+    def __init__(self, A, isDDof):
+        A = A.tocsr()
+        if not A.has_canonical_format:
+            A = A.copy()
+            A.sum_duplicates()
+        N = A.shape[0]
+        if isDDof.dtype != np.bool_:
+            flag = np.zeros(N, dtype=np.bool_)
+            flag[isDDof] = True
+            isDDof = flag
+        self.isDDof = isDDof
+        self.bdof, = np.nonzero(isDDof)
+        self.shape = A.shape
+        # 保存稀疏结构的副本, 调用者原地修改 A 的稀疏结构不会影响这个对象
+        self.pattern = (A.indptr.copy(), A.indices.copy())
+
+        indptr = A.indptr
+        indices = A.indices
+        row = np.repeat(np.arange(N), np.diff(indptr))
+        hasDiag = np.zeros(N, dtype=np.bool_)
+        hasDiag[row[row == indices]] = True
+        miss = self.bdof[~hasDiag[self.bdof]]
+        if len(miss) > 0: # 边界行没有对角元时, 在稀疏结构中加入显式的零
+            data = np.r_[np.arange(1, A.nnz+1), np.zeros(len(miss), dtype=np.int_)]
+            B = coo_matrix((data, (np.r_[row, miss], np.r_[indices, miss])),
+                    shape=A.shape).tocsr()
+            self.pos, = np.nonzero(B.data) # A.data 在新的稀疏结构中的位置
+            indptr = B.indptr
+            indices = B.indices
+            row = np.repeat(np.arange(N), np.diff(indptr))
+        else:
+            self.pos = None
+        self.indptr = indptr if self.pos is not None else self.pattern[0]
+        self.indices = indices if self.pos is not None else self.pattern[1]
+
+        isBdRow = isDDof[row]
+        isBdCol = isDDof[indices]
+        self.zero, = np.nonzero(isBdRow | isBdCol)
+        self.diag, = np.nonzero(isBdRow & (row == indices))
+
+        self.liftidx, = np.nonzero(isBdCol & ~isBdRow)
+        colmap = np.zeros(N, dtype=np.int_)
+        colmap[self.bdof] = np.arange(len(self.bdof))
+        NR = np.bincount(row[self.liftidx], minlength=N)
+        liftptr = np.zeros(N+1, dtype=np.int_)
+        np.cumsum(NR, out=liftptr[1:])
+        self.lift = csr_matrix((self.data(A)[self.liftidx],
+            colmap[indices[self.liftidx]], liftptr), shape=(N, len(self.bdof)))
+
+    def match(self, A, isDDof):
+        """
+        @brief 判断 A 和 isDDof 是否可以用这个对象消去
+        """
+        if A.shape != self.shape or len(isDDof) != len(self.isDDof):
+            return False
+        if A.format != 'csr' or A.nnz != len(self.pattern[1]):
+            return False
+        if not (np.array_equal(A.indptr, self.pattern[0]) and
+                np.array_equal(A.indices, self.pattern[1])):
+            return False
+        return np.array_equal(isDDof, self.isDDof)
+
+    def data(self, A, copy=False):
+        """
+        @brief A 的非零元按消去后的稀疏结构排列
+        """
+        A = A.tocsr()
+        if not A.has_canonical_format:
+            A = A.copy()
+            A.sum_duplicates()
+            copy = False
+        if self.pos is None:
+            return A.data.copy() if copy else A.data
+        data = np.zeros(len(self.indices), dtype=A.dtype)
+        data[self.pos] = A.data
+        return data
+
+    def apply_on_matrix(self, A, copy=True):
+        """
+        @brief 消去矩阵的边界行和列, 对角元置 1
+
+        Notes
+        -----
+        同时用 A 的值更新 `self.lift`. copy 为 False 并且不需要加入对角元时,
+        直接修改 A.data. 返回的矩阵总是使用稀疏结构的副本, 它含有显式的零,
+        对它调用 `eliminate_zeros` 不会影响 A 和这个对象.
+        """
+        data = self.data(A, copy=copy)
+        self.lift.data = data[self.liftidx]
+        data[self.zero] = 0
+        data[self.diag] = 1
+        return csr_matrix((data, self.indices.copy(), self.indptr.copy()),
+                shape=self.shape)
+
+    def apply_on_vector(self, F, g, A=None):
+        """
+        @brief 把边界值 g 移到右端 F 中, 并把 F 的边界分量置为 g
+
+        Parameters
+        ----------
+        F : (N, ) 或者 (N, nrhs), 原地修改
+        g : (NB, ) 或者 (NB, nrhs), 边界自由度 self.bdof 上的值
+        A : 默认用构造 (或者最近一次 `apply_on_matrix`) 时矩阵的值, 给定时
+            先用 A 的值更新 `self.lift`
+        """
+        if A is not None:
+            self.lift.data = self.data(A)[self.liftidx]
+        F -= self.lift@g
+        F[self.bdof] = g
+        return F
+
+
 class DirichletBC():
     """
 
     Note:
 
+    消去边界条件用的 `DirichletElimination` 缓存在对象中, 矩阵的稀疏结构和
+    边界自由度不变时反复调用 `apply` 不再重新分析. 时间相关问题中可以只创建一
+    个对象, 每一步用 `gD` 参数给出当前时刻的边界条件, 或者先用
+    `apply_on_matrix` 消去一次矩阵, 每一步只调用 `apply_on_vector`.
     """
     def __init__(self, space, gD, threshold=None):
         self.space = space
         self.gD = gD
         self.threshold = threshold
         self.bctype = 'Dirichlet'
+        self._elimination = None
 
-    def apply(self, A, F, uh=None, threshold=None):
+    def elimination(self, A, isDDof):
         """
-
-        Notes
-        -----
-
-        注意调用这个函数，外界的 F 最后被修改了， 外界的 A 没有修改！
+        @brief 消去 isDDof 的 `DirichletElimination`, 能重用时不重新构造
         """
-        space = self.space
-        gD = self.gD
+        E = self._elimination
+        if (E is None) or (not E.match(A, isDDof)):
+            E = DirichletElimination(A, isDDof)
+            self._elimination = E
+        return E
+
+    def boundary_value(self, A, F, uh=None, threshold=None, gD=None):
+        gD = self.gD if gD is None else gD
         threshold = self.threshold if threshold is None else threshold
 
-        gdof = space.number_of_global_dofs()
+        gdof = self.space.number_of_global_dofs()
         GD = A.shape[0]//gdof
         if uh is None:
             uh = self.space.function(dim=GD) # (gdof, GD) 其元素默认为 0 
-        isDDof = space.set_dirichlet_bc(gD, uh, threshold=threshold)
+        isDDof = self.space.set_dirichlet_bc(gD, uh, threshold=threshold)
         if GD > 1:
             isDDof = np.tile(isDDof, GD)
-            F = F.T.flat # (gdof, GD) --> (GD*gdof, ) 把 F 按列展平
-        x = uh.T.flat # 把 uh 按列展平
-        F -= A@x
-        bdIdx = np.zeros(A.shape[0], dtype=np.int_)
-        bdIdx[isDDof] = 1
-        Tbd = spdiags(bdIdx, 0, A.shape[0], A.shape[0])
-        T = spdiags(1-bdIdx, 0, A.shape[0], A.shape[0])
-        A = T@A@T + Tbd
-        F[isDDof] = x[isDDof]
+            F = F.T.reshape(-1) # (gdof, GD) --> (GD*gdof, ) 把 F 按列展平
+        x = uh.T.reshape(-1) # 把 uh 按列展平
+        return isDDof, F, x
+
+    def apply(self, A, F, uh=None, threshold=None, gD=None):
+        """
+
+        Notes
+        -----
+
+        注意调用这个函数，外界的 F 最后被修改了， 外界的 A 没有修改！
+
+        gD 默认为 self.gD.
+        """
+        A = A.tocsr()
+        isDDof, F, x = self.boundary_value(A, F, uh=uh, threshold=threshold, gD=gD)
+        E = self.elimination(A, isDDof)
+        A = E.apply_on_matrix(A)
+        F = E.apply_on_vector(F, x[E.bdof])
         return A, F 
 
     def apply_on_matrix(self, A, threshold=None):
@@ -55,35 +201,23 @@ class DirichletBC():
         if dim > 1:
             isDDof = np.tile(isDDof, dim)
 
-        bdIdx = np.zeros((A.shape[0], ), np.int)
-        bdIdx[isDDof] = 1
-        Tbd = spdiags(bdIdx, 0, A.shape[0], A.shape[0])
-        T = spdiags(1-bdIdx, 0, A.shape[0], A.shape[0])
-        A = T@A@T + Tbd
-        return A
+        A = A.tocsr()
+        return self.elimination(A, isDDof).apply_on_matrix(A)
 
-    def apply_on_vector(self, A, F):
+    def apply_on_vector(self, A, F, uh=None, threshold=None, gD=None):
         """
 
         Notes
         -----
 
         注意调用这个函数，外界的 F 最后被修改了， 外界的 A 没有修改！
-        """
-        space = self.space
-        threshold = self.threshold
 
-        gdof = space.number_of_global_dofs()
-        dim = A.shape[0]//gdof
-        uh = space.function(dim=dim)
-        isDDof = space.set_dirichlet_bc(uh, gD, threshold=threshold)
-        if dim > 1:
-            isDDof = np.tile(isDDof, dim)
-            F = F.T.flat
-        x = uh.T.flat # 把 uh 按列展平
-        F -= A@x
-        F[isBdDof] = x[isBdDof] 
-        return F 
+        A 是消去边界条件之前的矩阵.
+        """
+        A = A.tocsr()
+        isDDof, F, x = self.boundary_value(A, F, uh=uh, threshold=threshold, gD=gD)
+        E = self.elimination(A, isDDof)
+        return E.apply_on_vector(F, x[E.bdof], A=A)
 
 class NeumannBC():
     def __init__(self, space, gN, threshold=None):
@@ -151,6 +285,7 @@ class BoundaryCondition():
         self.dirichlet = dirichlet
         self.neumann = neumann
         self.robin = robin
+        self._elimination = None
 
     def apply_robin_bc(self, A, b, is_robin_boundary=None):
         """
@@ -290,16 +425,15 @@ class BoundaryCondition():
             dim = 1 if len(uh.shape) == 1 else uh.shape[1]
             if dim > 1:
                 isDDof = np.tile(isDDof, dim)
-                b = b.T.flat
-            gdof = self.space.number_of_global_dofs()
-            x = uh.T.flat # 把 uh 按列展平
-            b -= A@x
-            bdIdx = np.zeros(dim*gdof, dtype=np.int)
-            bdIdx[isDDof] = 1
-            Tbd = spdiags(bdIdx, 0, dim*gdof, dim*gdof)
-            T = spdiags(1-bdIdx, 0, dim*gdof, dim*gdof)
-            A = T@A@T + Tbd
-            b[isDDof] = x[isDDof]
+                b = b.T.reshape(-1)
+            x = uh.T.reshape(-1) # 把 uh 按列展平
+            A = A.tocsr()
+            E = self._elimination
+            if (E is None) or (not E.match(A, isDDof)):
+                E = DirichletElimination(A, isDDof)
+                self._elimination = E
+            A = E.apply_on_matrix(A)
+            b = E.apply_on_vector(b, x[E.bdof])
             return A, b
 
 
@@ -0,0 +1,65 @@
+import sys
+import importlib
+from types import ModuleType
+
+
+class LazyModule(ModuleType):
+    """
+    @brief 懒加载的包
+
+    Notes
+    -----
+    导入子模块 `pkg.TriangleMesh` 时, Python 的导入系统会把包的属性
+    `TriangleMesh` 设为这个子模块, 这会覆盖同名的类. 这里把这种赋值换成子模块
+    中的同名对象, 与原来在 `__init__.py` 中直接导入所有类的效果一致.
+    """
+    def __setattr__(self, name, value):
+        names = self.__dict__.get('__lazy_names__', {})
+        if isinstance(value, ModuleType) and (name in names) and \
+                value.__name__ == self.__name__ + '.' + names[name]:
+            value = getattr(value, name)
+        super().__setattr__(name, value)
+
+
+def attach(name, structure):
+    """
+    @brief 按 PEP 562 为包 name 设置懒加载, 包中的对象在第一次访问时才导入
+        它所在的子模块
+
+    Parameters
+    ----------
+    name : 包的名字, 一般为 `__name__`
+    structure : dict, 子模块的名字到其中导出的对象名字列表的映射
+
+    Returns
+    -------
+    __getattr__, __dir__, __all__ : 放到包的 `__init__.py` 中
+
+    Examples
+    --------
+    >>> __getattr__, __dir__, __all__ = attach(__name__, {
+    ...     'TriangleMesh': ['TriangleMesh', 'TriangleMeshWithInfinityNode'],
+    ... })
+    """
+    names = {n: m for m, ns in structure.items() for n in ns}
+    module = sys.modules[name]
+
+    def __getattr__(attr):
+        if attr not in names: # 没有列出的子模块, 如 `fealpy.mesh.MeshFactory`
+            try:
+                return importlib.import_module('.' + attr, name)
+            except ModuleNotFoundError as e:
+                if e.name != name + '.' + attr:
+                    raise
+            raise AttributeError(
+                    "module {!r} has no attribute {!r}".format(name, attr))
+        value = getattr(importlib.import_module('.' + names[attr], name), attr)
+        setattr(module, attr, value)
+        return value
+
+    def __dir__():
+        return sorted(set(module.__dict__) | set(names))
+
+    module.__lazy_names__ = names
+    module.__class__ = LazyModule
+    return __getattr__, __dir__, sorted(names)
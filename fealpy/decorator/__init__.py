@@ -1,3 +1,4 @@
 from .coordinates import *
 from .timer import *
 from .return_type import *
+from .cache import *
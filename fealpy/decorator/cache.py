@@ -0,0 +1,127 @@
+"""
+
+Notes
+-----
+在这个模块中, 我们引入了网格拓扑关系的缓存装饰子.
+
+网格数据结构的拓扑关系 (如 `cell_to_cell`, `node_to_cell`) 只依赖于单元数组
+和节点个数, 第一次调用时计算并保存在数据结构对象的 `_cache` 字典中, 以后的调用
+直接返回. 当数据结构的 `cell` 数组被替换, 或者节点个数 `NN` 改变时, 缓存自动
+失效; `reinit` 和 `construct` 也会显式地清空缓存.
+
+稀疏的邻接关系统一保存为 CSR 格式, `indptr` 和 `indices` 在规模允许时用 int32.
+每次调用返回缓存的只读视图, 调用者原地修改时会报错, 需要修改时先 `copy()`.
+"""
+
+from functools import wraps
+
+import numpy as np
+from scipy.sparse import issparse, csr_matrix
+
+
+def topology_cache(func):
+    """
+    Notes
+    -----
+    缓存拓扑关系函数的返回值, 缓存的键是函数名和参数. 参数不可哈希时 (如数组)
+    不缓存.
+    """
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        key = (func.__name__, args, tuple(sorted(kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:
+            return func(self, *args, **kwargs)
+        return cached_value(self, key, lambda: func(self, *args, **kwargs))
+    return wrapper
+
+
+def cached_value(ds, key, compute):
+    """
+    Notes
+    -----
+    返回数据结构 ds 的拓扑关系缓存中 key 对应的值, 没有时调用 compute() 计算并
+    保存. 用于缓存不是 ds 方法的, 只依赖于网格拓扑的量 (如边界标记).
+    """
+    cache = ds.__dict__.get('_cache')
+    if (cache is None) \
+            or (ds.__dict__.get('_cachecell') is not getattr(ds, 'cell', None)) \
+            or (ds.__dict__.get('_cacheNN') != getattr(ds, 'NN', None)):
+        cache = clear_cache(ds)
+
+    if key not in cache:
+        cache[key] = compact(compute())
+    return readonly(cache[key])
+
+
+def compact(val):
+    """
+    Notes
+    -----
+    把稀疏矩阵转化为排好序的 CSR 格式, 规模允许时 `indptr` 和 `indices` 用
+    int32. 其它的值不变.
+    """
+    if issparse(val):
+        val = val.tocsr()
+        val.sum_duplicates()
+        if max(val.shape[1], val.nnz) <= np.iinfo(np.int32).max:
+            val.indptr = val.indptr.astype(np.int32, copy=False)
+            val.indices = val.indices.astype(np.int32, copy=False)
+        return val
+    elif isinstance(val, tuple):
+        return tuple(compact(v) for v in val)
+    else:
+        return val
+
+
+def readonly(val):
+    """
+    Notes
+    -----
+    返回 val 的只读视图, 数组和稀疏矩阵的数据与缓存共享.
+    """
+    if isinstance(val, np.ndarray):
+        val = val.view()
+        val.flags.writeable = False
+        return val
+    elif issparse(val):
+        data, indices, indptr = (readonly(a) for a in (val.data, val.indices, val.indptr))
+        m = csr_matrix((data, indices, indptr), shape=val.shape, copy=False)
+        m.has_canonical_format = True
+        return m
+    elif isinstance(val, tuple):
+        return tuple(readonly(v) for v in val)
+    else:
+        return val
+
+
+def clear_cache(ds):
+    """
+    Notes
+    -----
+    清空数据结构 ds 的拓扑关系缓存, 返回新的空缓存.
+    """
+    ds._cache = {}
+    ds._cachecell = getattr(ds, 'cell', None)
+    ds._cacheNN = getattr(ds, 'NN', None)
+    return ds._cache
+
+
+def cache_nbytes(ds):
+    """
+    Notes
+    -----
+    数据结构 ds 的拓扑关系缓存占用的内存 (字节).
+    """
+    def nbytes(v):
+        if issparse(v):
+            v = v.tocsr() if v.format not in ('csr', 'csc') else v
+            return v.data.nbytes + v.indices.nbytes + v.indptr.nbytes
+        elif isinstance(v, np.ndarray):
+            return v.nbytes
+        elif isinstance(v, (tuple, list)):
+            return sum(nbytes(x) for x in v)
+        else:
+            return 0
+    return sum(nbytes(v) for v in ds.__dict__.get('_cache', {}).values())
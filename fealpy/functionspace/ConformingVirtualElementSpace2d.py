@@ -7,6 +7,7 @@ from ..quadrature import GaussLobattoQuadrature
 from ..quadrature import GaussLegendreQuadrature
 from ..quadrature import PolygonMeshIntegralAlg
 from .ScaledMonomialSpace2d import ScaledMonomialSpace2d
+from .VEMCellGroups import VEMCellGroups, CellGroupArray
 
 
 class CVEMDof2d():
@@ -129,6 +130,9 @@ class ConformingVirtualElementSpace2d():
         self.smspace = ScaledMonomialSpace2d(mesh, p, q=q, bc=bc)
         self.cellmeasure = self.smspace.cellmeasure
         self.dof = CVEMDof2d(mesh, p)
+        # 按局部自由度个数分组, 投影矩阵按组存成三维数组
+        self.cellgroups = VEMCellGroups(self.dof.cell2dof,
+                self.dof.cell2dofLocation, self.dof.number_of_global_dofs())
 
         self.H = self.smspace.matrix_H()
         self.D = self.matrix_D(self.H)
@@ -153,14 +157,15 @@ class ConformingVirtualElementSpace2d():
         p = self.p
         cell2dof, cell2dofLocation = self.dof.cell2dof, self.dof.cell2dofLocation
         if p == 1:
-            cd = np.hsplit(cell2dof, cell2dofLocation[1:-1])
-            f = lambda x: sum(uh[x[0]]*x[0, :])
-            val = sum(map(f, zip(cd, self.C)))
+            # C 的第 0 行是投影的积分
+            cd = self.cellgroups.cell_to_dof()
+            f = lambda x: np.sum(uh[x[0]]*x[1][:, 0, :])
+            val = sum(map(f, zip(cd, self.C.data)))
             return val
         else:
             NV = self.mesh.number_of_vertices_of_cells()
             idx =cell2dof[cell2dofLocation[0:-1]+NV*p]
-            val = np.sum(uh[idx]*self.area)
+            val = np.sum(uh[idx]*self.cellmeasure)
             return val
 
     def project_to_smspace(self, uh):
@@ -168,13 +173,11 @@ class ConformingVirtualElementSpace2d():
         Project a conforming vem function uh into polynomial space.
         """
         dim = len(uh.shape)
-        p = self.p
-        cell2dof = self.dof.cell2dof
-        cell2dofLocation = self.dof.cell2dofLocation
-        cd = np.hsplit(cell2dof, cell2dofLocation[1:-1])
-        g = lambda x: x[0]@uh[x[1]]
+        cellgroups = self.cellgroups
+        cd = cellgroups.cell_to_dof()
+        g = lambda x: np.einsum('ijk, ik...->ij...', x[0], uh[x[1]])
         S = self.smspace.function(dim=dim)
-        S[:] = np.concatenate(list(map(g, zip(self.PI1, cd))))
+        S[:] = cellgroups.cell_merge(list(map(g, zip(self.PI1.data, cd)))).reshape(S.shape)
         return S
 
     def grad_recovery(self, uh):
@@ -199,25 +202,20 @@ class ConformingVirtualElementSpace2d():
         sy /= h.reshape(-1, 1)
 
         cell2dof, cell2dofLocation = self.dof.cell2dof, self.dof.cell2dofLocation
-        NC = len(cell2dofLocation) - 1
-        cd = np.hsplit(cell2dof, cell2dofLocation[1:-1])
-        DD = np.vsplit(self.D, cell2dofLocation[1:-1])
-
-        f1 = lambda x: x[0]@x[1]
-        sx = np.concatenate(list(map(f1, zip(DD, sx))))
-        sy = np.concatenate(list(map(f1, zip(DD, sy))))
-
-
         ldof = self.number_of_local_dofs()
+        idx = np.repeat(range(NC), ldof) # D 的每一行所在的单元
+        sx = np.einsum('ij, ij->i', self.D, sx[idx])
+        sy = np.einsum('ij, ij->i', self.D, sy[idx])
+
         w = np.repeat(1/self.smspace.cellsize, ldof)
         sx *= w
         sy *= w
 
+        gdof = self.number_of_global_dofs()
         uh = self.function(dim=2)
-        ws = np.zeros(uh.shape[0], dtype=self.ftype)
-        np.add.at(uh[:, 0], cell2dof, sx)
-        np.add.at(uh[:, 1], cell2dof, sy)
-        np.add.at(ws, cell2dof, w)
+        ws = np.bincount(cell2dof, weights=w, minlength=gdof)
+        uh[:, 0] = np.bincount(cell2dof, weights=sx, minlength=gdof)
+        uh[:, 1] = np.bincount(cell2dof, weights=sy, minlength=gdof)
         uh /=ws.reshape(-1, 1)
         return uh
 
@@ -359,104 +357,59 @@ class ConformingVirtualElementSpace2d():
         return SS
 
     def stiff_matrix(self, cfun=None):
-        area = self.smspace.cellmeasure
-
-        def f(x):
-            x[0, :] = 0
-            return x
+        """
+        @brief 刚度矩阵, 在每组单元上批量计算单元矩阵
 
+        Notes
+        -----
+        p = 1 且 cfun 为 None 时, 稳定项用相邻顶点差的平方和 (循环三对角矩阵
+        S) 代替 dofi-dofi 的形式.
+        """
         p = self.p
-        G = self.G
-        D = self.D
-        PI1 = self.PI1
-
-        cell2dof, cell2dofLocation = self.cell_to_dof()
-        NC = len(cell2dofLocation) - 1
-        cd = np.hsplit(cell2dof, cell2dofLocation[1:-1])
-        DD = np.vsplit(D, cell2dofLocation[1:-1])
-
-        if p == 1:
-            tG = np.array([(0, 0, 0), (0, 1, 0), (0, 0, 1)])
-            if cfun is None:
-                def f1(x):
-                    M = np.eye(x[1].shape[1])
-                    M -= x[0]@x[1]
-                    N = x[1].shape[1]
-                    A = np.zeros((N, N))
-                    idx = np.arange(N)
-                    A[idx, idx] = 2
-                    A[idx[:-1], idx[1:]] = -1
-                    A[idx[1:], idx[:-1]] = -1
-                    A[0, -1] = -1
-                    A[-1, 0] = -1
-                    return x[1].T@tG@x[1] + M.T@A@M
-                #f1 = lambda x: x[1].T@tG@x[1] + (np.eye(x[1].shape[1]) - x[0]@x[1]).T@(np.eye(x[1].shape[1]) - x[0]@x[1])
-                K = list(map(f1, zip(DD, PI1)))
-            else:
-                cellbarycenter = self.smspace.cellbarycenter
-                k = cfun(cellbarycenter)
-                f1 = lambda x: (x[1].T@tG@x[1] + (np.eye(x[1].shape[1]) - x[0]@x[1]).T@(np.eye(x[1].shape[1]) - x[0]@x[1]))*x[2]
-                K = list(map(f1, zip(DD, PI1, k)))
-        else:
-            tG = list(map(f, G))
-            if cfun is None:
-                f1 = lambda x: x[1].T@x[2]@x[1] + (np.eye(x[1].shape[1]) - x[0]@x[1]).T@(np.eye(x[1].shape[1]) - x[0]@x[1])
-                K = list(map(f1, zip(DD, PI1, tG)))
+        cellgroups = self.cellgroups
+        DD = cellgroups.dof_split(self.D)
+        if cfun is not None:
+            cellbarycenter = self.smspace.cellbarycenter
+            k = cellgroups.cell_split(cfun(cellbarycenter))
+
+        K = []
+        for i, (D, PI1) in enumerate(zip(DD, self.PI1.data)):
+            # tG 为 G 把第 0 行置零, tG@PI1 的第 0 行为零, 直接去掉
+            tGPI1 = PI1[:, 1:, :] if p == 1 else self.G.data[i][:, 1:, :]@PI1
+            A = PI1[:, 1:, :].swapaxes(-1, -2)@tGPI1
+
+            n = PI1.shape[-1]
+            M = np.eye(n) - D@PI1
+            if (p == 1) and (cfun is None):
+                I = np.eye(n)
+                S = 2*I - np.roll(I, 1, axis=1) - np.roll(I, -1, axis=1)
+                A += M.swapaxes(-1, -2)@S@M
             else:
-                cellbarycenter = self.smspace.cellbarycenter
-                k = cfun(cellbarycenter)
-                f1 = lambda x: (x[1].T@x[2]@x[1] + (np.eye(x[1].shape[1]) - x[0]@x[1]).T@(np.eye(x[1].shape[1]) - x[0]@x[1]))*x[3]
-                K = list(map(f1, zip(DD, PI1, tG, k)))
-
-        f2 = lambda x: np.repeat(x, x.shape[0])
-        f3 = lambda x: np.tile(x, x.shape[0])
-        f4 = lambda x: x.flatten()
-
-        I = np.concatenate(list(map(f2, cd)))
-        J = np.concatenate(list(map(f3, cd)))
-        val = np.concatenate(list(map(f4, K)))
-        gdof = self.number_of_global_dofs()
-        A = csr_matrix((val, (I, J)), shape=(gdof, gdof), dtype=np.float)
-        return A
+                A += M.swapaxes(-1, -2)@M
+            if cfun is not None:
+                A *= k[i][:, None, None]
+            K.append(A)
+        return cellgroups.assemble(K)
 
     def mass_matrix(self, cfun=None):
-        area = self.smspace.cellmeasure
-        p = self.p
-
-        PI0 = self.PI0
-        D = self.D
-        H = self.H
-        C = self.C
+        cellgroups = self.cellgroups
+        DD = cellgroups.dof_split(self.D)
+        HH = cellgroups.cell_split(self.H)
+        area = cellgroups.cell_split(self.smspace.cellmeasure)
 
-        cell2dof, cell2dofLocation = self.cell_to_dof()
-        NC = len(cell2dofLocation) - 1
-        cd = np.hsplit(cell2dof, cell2dofLocation[1:-1])
-        DD = np.vsplit(D, cell2dofLocation[1:-1])
-
-        f1 = lambda x: x[0]@x[1]
-        PIS = list(map(f1, zip(DD, PI0)))
-
-        f1 = lambda x: x[0].T@x[1]@x[0] + x[3]*(np.eye(x[2].shape[1]) - x[2]).T@(np.eye(x[2].shape[1]) - x[2])
-        K = list(map(f1, zip(PI0, H, PIS, area)))
-
-        f2 = lambda x: np.repeat(x, x.shape[0])
-        f3 = lambda x: np.tile(x, x.shape[0])
-        f4 = lambda x: x.flatten()
-
-        I = np.concatenate(list(map(f2, cd)))
-        J = np.concatenate(list(map(f3, cd)))
-        val = np.concatenate(list(map(f4, K)))
-        gdof = self.number_of_global_dofs()
-        M = csr_matrix((val, (I, J)), shape=(gdof, gdof), dtype=np.float)
-        return M
+        def f1(x):
+            D, PI0, H, a = x
+            M = np.eye(PI0.shape[-1]) - D@PI0
+            K = PI0.swapaxes(-1, -2)@H@PI0
+            K += a[:, None, None]*(M.swapaxes(-1, -2)@M)
+            return K
+        K = list(map(f1, zip(DD, self.PI0.data, HH, area)))
+        return cellgroups.assemble(K)
 
     def cross_mass_matrix(self, wh):
         p = self.p
         mesh = self.mesh
 
-        area = self.smspace.cellmeasure
-        PI0 = self.PI0
-
         phi = self.smspace.basis
         def u(x, index):
             val = phi(x, index=index)
@@ -464,75 +417,39 @@ class ConformingVirtualElementSpace2d():
             return np.einsum('ij, ijm, ijn->ijmn', wval, val, val)
         H = self.integralalg.integral(u, celltype=True)
 
-        cell2dof, cell2dofLocation = self.cell_to_dof()
-        NC = len(cell2dofLocation) - 1
-        cd = np.hsplit(cell2dof, cell2dofLocation[1:-1])
-
-        f1 = lambda x: x[0].T@x[1]@x[0]
-        K = list(map(f1, zip(PI0, H)))
-
-        f2 = lambda x: np.repeat(x, x.shape[0])
-        f3 = lambda x: np.tile(x, x.shape[0])
-        f4 = lambda x: x.flatten()
-
-        I = np.concatenate(list(map(f2, cd)))
-        J = np.concatenate(list(map(f3, cd)))
-        val = np.concatenate(list(map(f4, K)))
-        gdof = self.number_of_global_dofs()
-        M = csr_matrix((val, (I, J)), shape=(gdof, gdof), dtype=np.float)
-        return M
+        cellgroups = self.cellgroups
+        HH = cellgroups.cell_split(H)
+        f1 = lambda x: x[0].swapaxes(-1, -2)@x[1]@x[0]
+        K = list(map(f1, zip(self.PI0.data, HH)))
+        return cellgroups.assemble(K)
 
     def source_vector(self, f):
-        PI0 = self.PI0
         phi = self.smspace.basis
         def u(x, index):
             return np.einsum('ij, ijm->ijm', f(x), phi(x, index=index))
         bb = self.integralalg.integral(u, celltype=True)
-        g = lambda x: x[0].T@x[1]
-        bb = np.concatenate(list(map(g, zip(PI0, bb))))
-        gdof = self.number_of_global_dofs()
-        b = np.bincount(self.dof.cell2dof, weights=bb, minlength=gdof)
-        return b
 
-    def chen_stability_term(self):
-        area = self.smspace.cellmeasure
-
-        p = self.p
-        G = self.G
-        D = self.D
-        PI1 = self.PI1
+        cellgroups = self.cellgroups
+        bb = cellgroups.cell_split(bb)
+        g = lambda x: np.einsum('ijk, ij->ik', x[0], x[1])
+        bb = list(map(g, zip(self.PI0.data, bb)))
+        return cellgroups.assemble_vector(bb)
 
-        cell2dof, cell2dofLocation = self.cell_to_dof()
-        NC = len(cell2dofLocation) - 1
-        cd = np.hsplit(cell2dof, cell2dofLocation[1:-1])
-        DD = np.vsplit(D, cell2dofLocation[1:-1])
-
-        tG = np.array([(0, 0, 0), (0, 1, 0), (0, 0, 1)])
-        def f1(x):
-            M = np.eye(x[1].shape[1])
-            M -= x[0]@x[1]
-            N = x[1].shape[1]
-            A = np.zeros((N, N))
-            idx = np.arange(N)
-            A[idx, idx] = 2
-            A[idx[:-1], idx[1:]] = -1
-            A[idx[1:], idx[:-1]] = -1
-            A[0, -1] = -1
-            A[-1, 0] = -1
-            return x[1].T@tG@x[1],  M.T@A@M
-        K = list(map(f1, zip(DD, PI1)))
-        f2 = lambda x: np.repeat(x, x.shape[0])
-        f3 = lambda x: np.tile(x, x.shape[0])
-        f4 = lambda x: x[0].flatten()
-        f5 = lambda x: x[1].flatten()
-
-        I = np.concatenate(list(map(f2, cd)))
-        J = np.concatenate(list(map(f3, cd)))
-        val0 = np.concatenate(list(map(f4, K)))
-        val1 = np.concatenate(list(map(f5, K)))
-        gdof = self.number_of_global_dofs()
-        A = csr_matrix((val0, (I, J)), shape=(gdof, gdof), dtype=np.float)
-        S = csr_matrix((val1, (I, J)), shape=(gdof, gdof), dtype=np.float)
+    def chen_stability_term(self):
+        cellgroups = self.cellgroups
+        DD = cellgroups.dof_split(self.D)
+
+        K0 = []
+        K1 = []
+        for D, PI1 in zip(DD, self.PI1.data):
+            n = PI1.shape[-1]
+            M = np.eye(n) - D@PI1
+            I = np.eye(n)
+            S = 2*I - np.roll(I, 1, axis=1) - np.roll(I, -1, axis=1)
+            K0.append(PI1[:, 1:, :].swapaxes(-1, -2)@PI1[:, 1:, :])
+            K1.append(M.swapaxes(-1, -2)@S@M)
+        A = cellgroups.assemble(K0)
+        S = cellgroups.assemble(K1)
         return A, S
 
     def cell_to_dof(self):
@@ -611,21 +528,19 @@ class ConformingVirtualElementSpace2d():
 
             cell2dof, cell2dofLocation = self.cell_to_dof()
             NC = len(cell2dofLocation) - 1
-            cd = np.hsplit(cell2dof, cell2dofLocation[1:-1])
-            DD = np.vsplit(self.D, cell2dofLocation[1:-1])
 
             smldof = self.smspace.number_of_local_dofs()
-            f1 = lambda x: x[0]@x[1]
-            uh = np.concatenate(list(map(f1, zip(DD, uh.reshape(-1, smldof)))))
-
             ldof = self.number_of_local_dofs()
+            idx = np.repeat(range(NC), ldof) # D 的每一行所在的单元
+            uh = np.einsum('ij, ij->i', self.D, uh.reshape(-1, smldof)[idx])
+
             w = np.repeat(1/self.smspace.cellmeasure, ldof)
             uh *= w
 
+            gdof = self.number_of_global_dofs()
             uI = self.function()
-            ws = np.zeros(uI.shape[0], dtype=self.ftype)
-            np.add.at(uI, cell2dof, uh)
-            np.add.at(ws, cell2dof, w)
+            ws = np.bincount(cell2dof, weights=w, minlength=gdof)
+            uI[:] = np.bincount(cell2dof, weights=uh, minlength=gdof)
             uI /=ws
             return uI
 
@@ -752,11 +667,10 @@ class ConformingVirtualElementSpace2d():
         if p == 1:
             G = np.array([(1, 0, 0), (0, 1, 0), (0, 0, 1)])
         else:
-            cell2dof, cell2dofLocation = self.cell_to_dof()
-            BB = np.hsplit(B, cell2dofLocation[1:-1])
-            DD = np.vsplit(D, cell2dofLocation[1:-1])
-            g = lambda x: x[0]@x[1]
-            G = list(map(g, zip(BB, DD)))
+            cellgroups = self.cellgroups
+            BB = cellgroups.dof_split(B, axis=1)
+            DD = cellgroups.dof_split(D)
+            G = CellGroupArray(cellgroups, [b@d for b, d in zip(BB, DD)])
         return G
 
     def matrix_C(self, H, PI1):
@@ -765,31 +679,29 @@ class ConformingVirtualElementSpace2d():
         smldof = self.smspace.number_of_local_dofs()
         idof = (p-1)*p//2
 
-        mesh = self.mesh
-        NV = mesh.number_of_vertices_of_cells()
-        d = lambda x: x[0]@x[1]
-        C = list(map(d, zip(H, PI1)))
-        if p == 1:
-            return C
-        else:
-            l = lambda x: np.r_[
-                    '0',
-                    np.r_['1', np.zeros((idof, p*x[0])), x[1]*np.eye(idof)],
-                    x[2][idof:, :]]
-            return list(map(l, zip(NV, self.smspace.cellmeasure, C)))
+        cellgroups = self.cellgroups
+        HH = cellgroups.cell_split(H)
+        C = [h@pi1 for h, pi1 in zip(HH, PI1.data)]
+        if p > 1:
+            # 前 idof 行换成内部自由度的矩
+            area = cellgroups.cell_split(self.smspace.cellmeasure)
+            for c, a, n in zip(C, area, cellgroups.ldof):
+                c[:, :idof, :] = 0
+                c[:, :idof, n-idof:] = a[:, None, None]*np.eye(idof)
+        return CellGroupArray(cellgroups, C)
 
     def matrix_PI_0(self, H, C):
-        cell2dof, cell2dofLocation = self.cell_to_dof()
-        pi0 = lambda x: inv(x[0])@x[1]
-        return list(map(pi0, zip(H, C)))
+        cellgroups = self.cellgroups
+        HH = cellgroups.cell_split(H)
+        PI0 = [np.linalg.solve(h, c) for h, c in zip(HH, C.data)]
+        return CellGroupArray(cellgroups, PI0)
 
     def matrix_PI_1(self, G, B):
         p = self.p
-        cell2dof, cell2dofLocation = self.cell_to_dof()
+        cellgroups = self.cellgroups
+        BB = cellgroups.dof_split(B, axis=1)
         if p == 1:
-            return np.hsplit(B, cell2dofLocation[1:-1])
+            return CellGroupArray(cellgroups, BB)
         else:
-            BB = np.hsplit(B, cell2dofLocation[1:-1])
-            g = lambda x: inv(x[0])@x[1]
-            return list(map(g, zip(G, BB)))
-
+            PI1 = [np.linalg.solve(g, b) for g, b in zip(G.data, BB)]
+            return CellGroupArray(cellgroups, PI1)
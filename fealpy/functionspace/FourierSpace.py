@@ -3,32 +3,6 @@ from numpy.linalg import inv
 
 import scipy.fftpack as spfft
 
-try:
-    import pyfftw
-except ImportError:
-    print("请先认真读下面的英文信息！！！")
-    print('I do not find  pyfftw installed on this system!, so you can not use it.')
-    print("""
-    If your system is Ubuntu, you can run 
-
-    ```
-    $ pip3 install pyfftw
-    ```
-
-    If your system is MacOS, you also can run
-
-    ```
-    $ pip install pyfftw 
-    ```
-
-    If your system is Windows, there are several methods to install `pyamg`
-
-    1. install from conda 
-    ```
-    conda install -c conda-forge pyfftw
-    ```
-    """)
-    
 
 class FourierSpace:
     def __init__(self, box, N, dft=None):
@@ -40,6 +14,13 @@ class FourierSpace:
         self.itype = np.int32
 
         if dft is None:
+            # pyfftw 只在用到时才导入, 没有安装时导入本模块不再打印安装说明
+            try:
+                import pyfftw
+            except ImportError:
+                raise ImportError("I do not find pyfftw installed on this system! "
+                        "Install it by `pip install pyfftw` or "
+                        "`conda install -c conda-forge pyfftw`, or use dft='scipy'.")
             ncpt = np.array([N,N])
             a = pyfftw.empty_aligned(ncpt, dtype=np.complex128)
             self.fftn = pyfftw.builders.fftn(a)
@@ -1,3 +1,6 @@
+from collections import OrderedDict
+import zlib
+
 import numpy as np
 from scipy.sparse import coo_matrix, csr_matrix, csc_matrix, spdiags, bmat
 from scipy.sparse.linalg import spsolve
@@ -16,6 +19,10 @@ from .femdof import CPLFEMDof1d, CPLFEMDof2d, CPLFEMDof3d
 from .femdof import DPLFEMDof1d, DPLFEMDof2d, DPLFEMDof3d
 
 from ..quadrature import FEMeshIntegralAlg
+from ..quadrature import AssemblyPlan
+from ..quadrature.AssemblyPlan import scatter_vector
+from ..recovery.GradientRecoveryOperator import GradientRecoveryOperator
+from ..boundarycondition.BoundaryCondition import DirichletElimination
 from ..decorator import timer
 
 
@@ -91,6 +98,10 @@ class LagrangeFiniteElementSpace():
 
         self.multi_index_matrix = multi_index_matrix 
         self.stype = 'lagrange'
+        self.plans = {}
+
+        self.cache = OrderedDict() # 参考单元上基函数值表的缓存
+        self.cachesize = 32
 
     def __str__(self):
         return "Lagrange finite element space!"
@@ -242,69 +253,32 @@ class LagrangeFiniteElementSpace():
         uh 是线性有限元函数，该程序把 uh 的梯度(分片常数）恢复到分片线性连续空间
         中。
 
+        恢复算子在同一个网格上只构造一次, 见 `recovery_operator`.
         """
-        GD = self.GD
-        cell2dof = self.cell_to_dof()
-        gdof = self.number_of_global_dofs()
-        ldof = self.number_of_local_dofs()
-        p = self.p
-        bc = self.dof.multiIndex/p
-        guh = uh.grad_value(bc)
-        guh = guh.swapaxes(0, 1)
-        rguh = self.function(dim=GD)
-
-        if method == 'simple':
-            deg = np.bincount(cell2dof.flat, minlength = gdof)
-            if GD > 1:
-                np.add.at(rguh, (cell2dof, np.s_[:]), guh)
-            else:
-                np.add.at(rguh, cell2dof, guh)
-
-        elif method == 'area':
-            measure = self.mesh.entity_measure('cell')
-            ws = np.einsum('i, j->ij', measure,np.ones(ldof))
-            deg = np.bincount(cell2dof.flat,weights = ws.flat, minlength = gdof)
-            guh = np.einsum('ij..., i->ij...', guh, measure)
-            if GD > 1:
-                np.add.at(rguh, (cell2dof, np.s_[:]), guh)
-            else:
-                np.add.at(rguh, cell2dof, guh)
-
-        elif method == 'distance':
-            ipoints = self.interpolation_points()
-            bp = self.mesh.entity_barycenter('cell')
-            v = bp[:, np.newaxis, :] - ipoints[cell2dof, :]
-            d = np.sqrt(np.sum(v**2, axis=-1))
-            deg = np.bincount(cell2dof.flat,weights = d.flat, minlength = gdof)
-            guh = np.einsum('ij..., ij->ij...', guh, d)
-            if GD > 1:
-                np.add.at(rguh, (cell2dof, np.s_[:]), guh)
-            else:
-                np.add.at(rguh, cell2dof, guh)
-
-        elif method == 'area_harmonic':
-            measure = 1/self.mesh.entity_measure('cell')
-            ws = np.einsum('i, j->ij', measure,np.ones(ldof))
-            deg = np.bincount(cell2dof.flat,weights = ws.flat, minlength = gdof)
-            guh = np.einsum('ij..., i->ij...', guh, measure)
-            if GD > 1:
-                np.add.at(rguh, (cell2dof, np.s_[:]), guh)
-            else:
-                np.add.at(rguh, cell2dof, guh)
-
-        elif method == 'distance_harmonic':
-            ipoints = self.interpolation_points()
-            bp = self.mesh.entity_barycenter('cell')
-            v = bp[:, np.newaxis, :] - ipoints[cell2dof, :]
-            d = 1/np.sqrt(np.sum(v**2, axis=-1))
-            deg = np.bincount(cell2dof.flat,weights = d.flat, minlength = gdof)
-            guh = np.einsum('ij..., ij->ij...',guh,d)
-            if GD > 1:
-                np.add.at(rguh, (cell2dof, np.s_[:]), guh)
-            else:
-                np.add.at(rguh, cell2dof, guh)
-        rguh /= deg.reshape(-1, 1)
-        return rguh
+        return self.recovery_operator(method=method)(uh)
+
+    def recovery_operator(self, method='simple'):
+        """
+        @brief 梯度恢复算子 `GradientRecoveryOperator`, 缓存在空间中, 网格改变
+            以后重新构造
+
+        Notes
+        -----
+        算子中保存了单元面积, 基函数梯度等几何量, 所以除了单元数组被替换, 节点
+        数组被替换或者原地修改 (如移动网格) 时也要重新构造. 原地修改用节点坐标
+        的 crc32 校验和判断, 它的计算量远小于构造算子.
+        """
+        cell = self.mesh.entity('cell')
+        node = self.mesh.entity('node')
+        checksum = zlib.crc32(np.ascontiguousarray(node))
+        key = getattr(self, '_recoverymesh', None)
+        if (key is None) or (key[0] is not cell) or (key[1] is not node) \
+                or (key[2] != checksum):
+            self._recovery = {}
+            self._recoverymesh = (cell, node, checksum)
+        if method not in self._recovery:
+            self._recovery[method] = GradientRecoveryOperator(self, method=method)
+        return self._recovery[method]
 
     @barycentric
     def edge_basis(self, bc, index, lidx, direction=True):
@@ -419,8 +393,8 @@ class LagrangeFiniteElementSpace():
             idx.remove(i)
             R[..., i] = M[..., i]*np.prod(Q[..., idx], axis=-1)
 
-        Dlambda = self.mesh.grad_lambda()
-        gphi = np.einsum('k...ij, kjm->k...im', R, Dlambda[index, :, :])
+        Dlambda = self.mesh.grad_lambda(index=index)
+        gphi = np.einsum('k...ij, kjm->k...im', R, Dlambda)
         return gphi
 
     @barycentric
@@ -445,6 +419,82 @@ class LagrangeFiniteElementSpace():
         return phi[..., np.newaxis, :] # (..., 1, ldof)
 
 
+    def _tabulate(self, name, bc, p, func):
+        """
+        @brief 在参考单元上计算并缓存基函数 (或其关于重心坐标的导数) 的值表
+
+        Notes
+        -----
+        积分算法对同一个积分公式的积分点会反复计算基函数的值, 这些值只与次数
+        p 和重心坐标 bc 有关, 与具体网格单元无关. 这里以 (name, p, bc 的形状和
+        数据) 为键缓存结果, 最多缓存 `self.cachesize` 个值表, 超出时删除最早
+        使用的值表.
+
+        只缓存积分点形式 `(TD+1, )` 或 `(NQ, TD+1)` 的 bc.
+        """
+        if len(bc.shape) > 2:
+            return func(bc, p)
+
+        key = (name, p, bc.shape, bc.tobytes())
+        cache = self.cache
+        if key in cache:
+            cache.move_to_end(key)
+        else:
+            cache[key] = func(bc, p)
+            if len(cache) > self.cachesize:
+                cache.popitem(last=False)
+        return cache[key]
+
+    def _basis_table(self, bc, p):
+        TD = bc.shape[-1] - 1 
+        multiIndex = self.multi_index_matrix[TD](p)
+
+        c = np.arange(1, p+1, dtype=np.int_)
+        P = 1.0/np.multiply.accumulate(c)
+        t = np.arange(0, p)
+        shape = bc.shape[:-1]+(p+1, TD+1)
+        A = np.ones(shape, dtype=self.ftype)
+        A[..., 1:, :] = p*bc[..., np.newaxis, :] - t.reshape(-1, 1)
+        np.cumprod(A, axis=-2, out=A)
+        A[..., 1:, :] *= P.reshape(-1, 1)
+        idx = np.arange(TD+1)
+        phi = np.prod(A[..., multiIndex, idx], axis=-1)
+        return phi # (..., ldof)
+
+    def _grad_basis_table(self, bc, p):
+        TD = self.TD
+
+        multiIndex = self.multi_index_matrix[TD](p)
+
+        c = np.arange(1, p+1, dtype=self.itype)
+        P = 1.0/np.multiply.accumulate(c)
+
+        t = np.arange(0, p)
+        shape = bc.shape[:-1]+(p+1, TD+1)
+        A = np.ones(shape, dtype=self.ftype)
+        A[..., 1:, :] = p*bc[..., np.newaxis, :] - t.reshape(-1, 1)
+
+        FF = np.einsum('...jk, m->...kjm', A[..., 1:, :], np.ones(p))
+        FF[..., range(p), range(p)] = p
+        np.cumprod(FF, axis=-2, out=FF)
+        F = np.zeros(shape, dtype=self.ftype)
+        F[..., 1:, :] = np.sum(np.tril(FF), axis=-1).swapaxes(-1, -2)
+        F[..., 1:, :] *= P.reshape(-1, 1)
+
+        np.cumprod(A, axis=-2, out=A)
+        A[..., 1:, :] *= P.reshape(-1, 1)
+
+        Q = A[..., multiIndex, range(TD+1)]
+        M = F[..., multiIndex, range(TD+1)]
+        ldof = len(multiIndex) 
+        shape = bc.shape[:-1]+(ldof, TD+1)
+        R = np.zeros(shape, dtype=self.ftype)
+        for i in range(TD+1):
+            idx = list(range(TD+1))
+            idx.remove(i)
+            R[..., i] = M[..., i]*np.prod(Q[..., idx], axis=-1)
+        return R # (..., ldof, TD+1)
+
     @barycentric
     def basis(self, bc, index=np.s_[:], p=None):
         """
@@ -464,6 +514,7 @@ class LagrangeFiniteElementSpace():
 
         Notes
         -----
+        The values on the reference element are cached, see `_tabulate`.
 
         """
         if p is None:
@@ -474,19 +525,7 @@ class LagrangeFiniteElementSpace():
             print('shape:', shape)
             phi = np.ones(shape, dtype=self.ftype)
 
-        TD = bc.shape[-1] - 1 
-        multiIndex = self.multi_index_matrix[TD](p)
-
-        c = np.arange(1, p+1, dtype=np.int_)
-        P = 1.0/np.multiply.accumulate(c)
-        t = np.arange(0, p)
-        shape = bc.shape[:-1]+(p+1, TD+1)
-        A = np.ones(shape, dtype=self.ftype)
-        A[..., 1:, :] = p*bc[..., np.newaxis, :] - t.reshape(-1, 1)
-        np.cumprod(A, axis=-2, out=A)
-        A[..., 1:, :] *= P.reshape(-1, 1)
-        idx = np.arange(TD+1)
-        phi = np.prod(A[..., multiIndex, idx], axis=-1)
+        phi = self._tabulate('basis', bc, p, self._basis_table).copy()
         return phi[..., np.newaxis, :] # (..., 1, ldof)
 
     @barycentric
@@ -510,45 +549,18 @@ class LagrangeFiniteElementSpace():
 
         Notes
         -----
+        The derivatives with respect to the barycentric coordinates are
+        cached, so only the contraction with `mesh.grad_lambda(index)` is
+        done on every call.
 
         """
 
         if p is None:
             p= self.p
-        TD = self.TD
 
-        multiIndex = self.multi_index_matrix[TD](p)
-
-        c = np.arange(1, p+1, dtype=self.itype)
-        P = 1.0/np.multiply.accumulate(c)
-
-        t = np.arange(0, p)
-        shape = bc.shape[:-1]+(p+1, TD+1)
-        A = np.ones(shape, dtype=self.ftype)
-        A[..., 1:, :] = p*bc[..., np.newaxis, :] - t.reshape(-1, 1)
-
-        FF = np.einsum('...jk, m->...kjm', A[..., 1:, :], np.ones(p))
-        FF[..., range(p), range(p)] = p
-        np.cumprod(FF, axis=-2, out=FF)
-        F = np.zeros(shape, dtype=self.ftype)
-        F[..., 1:, :] = np.sum(np.tril(FF), axis=-1).swapaxes(-1, -2)
-        F[..., 1:, :] *= P.reshape(-1, 1)
-
-        np.cumprod(A, axis=-2, out=A)
-        A[..., 1:, :] *= P.reshape(-1, 1)
-
-        Q = A[..., multiIndex, range(TD+1)]
-        M = F[..., multiIndex, range(TD+1)]
-        ldof = self.number_of_local_dofs()
-        shape = bc.shape[:-1]+(ldof, TD+1)
-        R = np.zeros(shape, dtype=self.ftype)
-        for i in range(TD+1):
-            idx = list(range(TD+1))
-            idx.remove(i)
-            R[..., i] = M[..., i]*np.prod(Q[..., idx], axis=-1)
-
-        Dlambda = self.mesh.grad_lambda()
-        gphi = np.einsum('...ij, kjm->...kim', R, Dlambda[index,:,:])
+        R = self._tabulate('grad_basis', bc, p, self._grad_basis_table)
+        Dlambda = self.mesh.grad_lambda(index=index)
+        gphi = np.einsum('...ij, kjm->...kim', R, Dlambda)
         return gphi #(..., NC, ldof, GD)
 
     @barycentric
@@ -954,34 +966,35 @@ class LagrangeFiniteElementSpace():
         elif format == 'list':
             return C
 
-    def parallel_stiff_matrix(self, c=None, q=None):
+    def parallel_stiff_matrix(self, c=None, q=None, nproc=None,
+            partition=None, memory=1024):
         """
 
         Notes
         -----
-        并行组装刚度矩阵
+        并行组装刚度矩阵, 参数见 `FEMeshIntegralAlg.parallel_construct_matrix`
 
         """
         gdof = self.number_of_global_dofs()
         cell2dof = self.cell_to_dof()
         b0 = (self.grad_basis, cell2dof, gdof)
-        M = self.integralalg.parallel_construct_matrix(b0, c=c, q=q)
+        M = self.integralalg.parallel_construct_matrix(b0, c=c, q=q,
+                nproc=nproc, partition=partition, memory=memory)
         return M
 
-    def parallel_mass_matrix(self, c=None, q=None):
+    def parallel_mass_matrix(self, c=None, q=None, nproc=None,
+            partition=None, memory=1024):
         """
 
         Notes
         -----
-        并行组装质量矩阵 
-
-        TODO:
-        1. parallel_construct_matrix just work for stiff matrix
+        并行组装质量矩阵, 参数见 `FEMeshIntegralAlg.parallel_construct_matrix`
         """
         gdof = self.number_of_global_dofs()
         cell2dof = self.cell_to_dof()
         b0 = (self.basis, cell2dof, gdof)
-        M = self.integralalg.parallel_construct_matrix(b0, c=c, q=q)
+        M = self.integralalg.parallel_construct_matrix(b0, c=c, q=q,
+                nproc=nproc, partition=partition, memory=memory)
         return M
 
     def parallel_source_vector(self, f, dim=None):
@@ -1000,27 +1013,77 @@ class LagrangeFiniteElementSpace():
         b = self.integralalg.construct_vector_s_s(f, self.basis, cell2dof, gdof=gdof) 
         return b
 
-    def stiff_matrix(self, c=None, q=None, isDDof=None):
+    def assembly_plan(self, space=None):
+        """
+        @brief 返回本空间 (与空间 space) 之间矩阵的组装计划
+
+        Notes
+        -----
+        组装计划在第一次调用时生成并缓存在空间中, 网格不变时可在多次组装之间
+        重复使用, 见 `AssemblyPlan`. 网格的单元数组改变 (如加密) 以后重新生成,
+        所以这里由网格当前的单元重新计算 cell2dof, 而不用构造空间时保存的
+        `self.dof.cell2dof`.
+        """
+        cell = self.mesh.entity('cell')
+        if getattr(self, '_plancell', None) is not cell:
+            self.plans = {}
+            self._plancell = cell
+        if space not in self.plans:
+            cell2dof = self.dof.cell_to_dof()
+            gdof = self.number_of_global_dofs()
+            if space is None:
+                plan = AssemblyPlan(cell2dof, gdof)
+            else:
+                plan = AssemblyPlan(cell2dof, gdof, 
+                        space.dof.cell_to_dof(), space.number_of_global_dofs())
+            self.plans[space] = plan
+        return self.plans[space]
+
+    def stiff_matrix(self, c=None, q=None, isDDof=None, memory=None, plan=None):
+        """
+        @brief 组装刚度矩阵
+
+        Parameters
+        ----------
+        memory : 默认为 None, 一次组装所有单元矩阵; 否则按给定的内存大小 (MB)
+            分块组装, 见 `FEMeshIntegralAlg.chunk_construct_matrix`
+        plan : 默认为 None; 为 True 时使用 `self.assembly_plan()`, 也可以直接
+            给定 `AssemblyPlan` 对象, 用于网格不变时的反复组装. 与 `memory`
+            同时给定时, 分块组装复用这个计划的稀疏模式和位置数组
+        """
         gdof = self.number_of_global_dofs()
         cell2dof = self.cell_to_dof()
         b0 = (self.grad_basis, cell2dof, gdof)
-        A = self.integralalg.serial_construct_matrix(b0, c=c, q=q)
+        if plan is True:
+            plan = self.assembly_plan()
+
+        if memory is None:
+            A = self.integralalg.serial_construct_matrix(b0, c=c, q=q, plan=plan)
+        else:
+            A = self.integralalg.chunk_construct_matrix(b0, c=c, q=q,
+                    memory=memory, plan=plan)
 
         if isDDof is not None: # 处理 D 氏边界条件
-            bdIdx = np.zeros(A.shape[0], dtype=np.int_)
-            bdIdx[isDDof] = 1
-            Tbd = spdiags(bdIdx, 0, A.shape[0], A.shape[0])
-            T = spdiags(1-bdIdx, 0, A.shape[0], A.shape[0])
-            A = T@A@T + Tbd
+            A = DirichletElimination(A, isDDof).apply_on_matrix(A, copy=False)
 
         #A.eliminate_zeros()
         return A 
 
-    def mass_matrix(self, c=None, q=None):
+    def mass_matrix(self, c=None, q=None, memory=None, plan=None):
+        """
+        @brief 组装质量矩阵, `memory` 和 `plan` 的含义同 `stiff_matrix`
+        """
         gdof = self.number_of_global_dofs()
         cell2dof = self.cell_to_dof()
         b0 = (self.basis, cell2dof, gdof)
-        A = self.integralalg.serial_construct_matrix(b0, c=c, q=q)
+        if plan is True:
+            plan = self.assembly_plan()
+
+        if memory is None:
+            A = self.integralalg.serial_construct_matrix(b0, c=c, q=q, plan=plan)
+        else:
+            A = self.integralalg.chunk_construct_matrix(b0, c=c, q=q,
+                    memory=memory, plan=plan)
         #A.eliminate_zeros()
         return A 
 
@@ -1121,7 +1184,7 @@ class LagrangeFiniteElementSpace():
         return M
 
 
-    def convection_matrix(self, c=None, q=None):
+    def convection_matrix(self, c=None, q=None, plan=None):
         """
         (c \\cdot u, w)
         """
@@ -1129,7 +1192,9 @@ class LagrangeFiniteElementSpace():
         cell2dof = self.cell_to_dof()
         b0 = (self.grad_basis, cell2dof, gdof)
         b1 = (self.basis, cell2dof, gdof)
-        A = self.integralalg.serial_construct_matrix(b0, b1=b1, c=c, q=q)
+        if plan is True:
+            plan = self.assembly_plan()
+        A = self.integralalg.serial_construct_matrix(b0, b1=b1, c=c, q=q, plan=plan)
         return A 
 
     def source_vector(self, f, dim=None, q=None):
@@ -1186,18 +1251,55 @@ class LagrangeFiniteElementSpace():
                 bb = np.einsum('m, mi..., mik, i->ik...',
                         ws, fval, phi, self.cellmeasure)
             cell2dof = self.cell_to_dof() #(NC, ldof)
-
-            shape = gdof if dim is None else (gdof, dim)
-            b = np.zeros(shape, dtype=bb.dtype)
-            if dim is None:
-                np.add.at(b, cell2dof, bb)
-            else:
-                np.add.at(b, (cell2dof, np.s_[:]), bb)
+            b = scatter_vector(cell2dof, bb, gdof)
         else:
             b = np.einsum('i, ik..., k->k...', ws, fval, cellmeasure)
 
         return b
 
+    def source_vector_batch(self, f, q=None):
+        """
+        @brief 一次组装多个源项的右端向量
+
+        Parameters
+        ----------
+        f : 带 cartesian 或者 barycentric 装饰的函数, 一次返回所有源项在积分
+            点处的值, 形状为 (nrhs, NQ, NC) 或者 (nrhs, NQ, NC, dim); 也可以是这
+            样的函数组成的列表
+
+        Returns
+        -------
+        b : (gdof, nrhs) 或者 (gdof, dim, nrhs), 最后一个轴对应不同的源项
+
+        Notes
+        -----
+        用于参数扫描和多个载荷工况, 组装 nrhs 个右端的代价和组装一个右端相当.
+        """
+        mesh = self.mesh
+        qf = self.integrator if q is None else mesh.integrator(q, etype='cell')
+        bcs, ws = qf.get_quadrature_points_and_weights()
+
+        def value(f):
+            if f.coordtype == 'cartesian':
+                return f(mesh.bc_to_point(bcs))
+            elif f.coordtype == 'barycentric':
+                return f(bcs)
+
+        if isinstance(f, (list, tuple)):
+            fval = np.stack([value(fi) for fi in f], axis=0)
+        else:
+            fval = value(f)
+
+        # 基函数在所有单元上相同, 对积分点的求和是一次稠密矩阵乘法
+        phi = self.basis(bcs)[:, 0, :] # (NQ, ldof)
+        w = ws[:, None]*self.cellmeasure
+        w = w.reshape(w.shape + (1, )*(fval.ndim - 3))
+        bb = np.tensordot(fval*w, phi, axes=(1, 0)) # (nrhs, NC, ..., ldof)
+        bb = np.moveaxis(bb, (1, -1, 0), (0, 1, -1))
+        cell2dof = self.cell_to_dof()
+        gdof = self.number_of_global_dofs()
+        return scatter_vector(cell2dof, bb, gdof)
+
 
     def grad_component_matrix(self):
         """
@@ -1253,7 +1355,9 @@ class LagrangeFiniteElementSpace():
         mesh = self.mesh
         gdof = self.number_of_global_dofs()
        
-        if type(threshold) is np.ndarray:
+        if isinstance(threshold, str): # 边界标记的名字
+            index = self.mesh.boundary_marker(threshold)
+        elif type(threshold) is np.ndarray:
             index = threshold
         else:
             index = self.mesh.ds.boundary_face_index()
@@ -1284,10 +1388,7 @@ class LagrangeFiniteElementSpace():
 
 
         bb = np.einsum('m, mi..., mik, i->ik...', ws, val, phi, measure)
-        if dim == 1:
-            np.add.at(F, face2dof, bb)
-        else:
-            np.add.at(F, (face2dof, np.s_[:]), bb)
+        F += scatter_vector(face2dof, bb, gdof)
 
         return F
 
@@ -1306,7 +1407,9 @@ class LagrangeFiniteElementSpace():
         mesh = self.mesh
         gdof = self.number_of_global_dofs()
 
-        if type(threshold) is np.ndarray:
+        if isinstance(threshold, str): # 边界标记的名字
+            index = self.mesh.boundary_marker(threshold)
+        elif type(threshold) is np.ndarray:
             index = threshold
         else:
             index = self.mesh.ds.boundary_face_index()
@@ -1339,10 +1442,7 @@ class LagrangeFiniteElementSpace():
             if F is None:
                 F = np.zeros((gdof, dim), dtype=bb.dtype)
 
-        if dim == 1:
-            np.add.at(F, face2dof, bb)
-        else:
-            np.add.at(F, (face2dof, np.s_[:]), bb)
+        F += scatter_vector(face2dof, bb, gdof)
 
         FM = np.einsum('m, mi, mij, mik, i->ijk', ws, kappa, phi, phi, measure)
         I = np.broadcast_to(face2dof[:, :, None], shape=FM.shape)
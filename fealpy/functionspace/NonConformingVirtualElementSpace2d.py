@@ -6,6 +6,7 @@ from .Function import Function
 from ..quadrature import GaussLegendreQuadrature
 from ..quadrature import PolygonMeshIntegralAlg
 from .ScaledMonomialSpace2d import ScaledMonomialSpace2d
+from .VEMCellGroups import VEMCellGroups, CellGroupArray
 
 class NCVEMDof2d():
     """
@@ -121,6 +122,9 @@ class NonConformingVirtualElementSpace2d():
         self.smspace = ScaledMonomialSpace2d(mesh, p, q=q)
         self.mesh = mesh
         self.dof = NCVEMDof2d(mesh, p)
+        # 按局部自由度个数分组, 投影矩阵按组存成三维数组
+        self.cellgroups = VEMCellGroups(self.dof.cell2dof,
+                self.dof.cell2dofLocation, self.dof.number_of_global_dofs())
 
         self.integralalg = self.smspace.integralalg
 
@@ -138,101 +142,64 @@ class NonConformingVirtualElementSpace2d():
         """
         Project a non conforming vem function uh into polynomial space.
         """
-        p = self.p
-        cell2dof = self.dof.cell2dof
-        cell2dofLocation = self.dof.cell2dofLocation
-        cd = np.hsplit(cell2dof, cell2dofLocation[1:-1])
-        g = lambda x: x[0]@uh[x[1]]
+        cellgroups = self.cellgroups
+        cd = cellgroups.cell_to_dof()
+        g = lambda x: np.einsum('ijk, ik...->ij...', x[0], uh[x[1]])
         S = self.smspace.function()
-        S[:] = np.concatenate(list(map(g, zip(self.PI1, cd))))
+        S[:] = cellgroups.cell_merge(list(map(g, zip(self.PI1.data, cd)))).reshape(-1)
         return S
 
     def project_to_smspace_L2(self, uh):
         """
         Project a non conforming vem function uh into polynomial space.
         """
-        p = self.p
-        cell2dof = self.dof.cell2dof
-        cell2dofLocation = self.dof.cell2dofLocation
-        cd = np.hsplit(cell2dof, cell2dofLocation[1:-1])
-        g = lambda x: x[0]@uh[x[1]]
+        cellgroups = self.cellgroups
+        cd = cellgroups.cell_to_dof()
+        g = lambda x: np.einsum('ijk, ik...->ij...', x[0], uh[x[1]])
         S = self.smspace.function()
-        S[:] = np.concatenate(list(map(g, zip(self.PI0, cd))))
+        S[:] = cellgroups.cell_merge(list(map(g, zip(self.PI0.data, cd)))).reshape(-1)
         return S
 
     def stiff_matrix(self):
-        p = self.p
-        G = self.G
-        D = self.D
-        PI1 = self.PI1
-
-        cell2dof, cell2dofLocation = self.dof.cell2dof, self.dof.cell2dofLocation
-        cd = np.hsplit(cell2dof, cell2dofLocation[1:-1])
-
-        DD = np.vsplit(D, cell2dofLocation[1:-1])
-
-        def f(x):
-            x[0, :] = 0
-            return x
-
-        tG = list(map(f, G))
-
-        f1 = lambda x: x[1].T@x[2]@x[1] + (np.eye(x[1].shape[1]) - x[0]@x[1]).T@(np.eye(x[1].shape[1]) - x[0]@x[1])
-        K = list(map(f1, zip(DD, PI1, tG)))
-
-        f2 = lambda x: np.repeat(x, x.shape[0])
-        f3 = lambda x: np.tile(x, x.shape[0])
-        f4 = lambda x: x.flatten()
-
-        I = np.concatenate(list(map(f2, cd)))
-        J = np.concatenate(list(map(f3, cd)))
-        val = np.concatenate(list(map(f4, K)))
-        gdof = self.number_of_global_dofs()
-        A = csr_matrix((val, (I, J)), shape=(gdof, gdof), dtype=np.float)
-        return A
+        cellgroups = self.cellgroups
+        DD = cellgroups.dof_split(self.D)
+
+        def f1(x):
+            D, PI1, G = x
+            # tG 为 G 把第 0 行置零, tG@PI1 的第 0 行为零, 直接去掉
+            M = np.eye(PI1.shape[-1]) - D@PI1
+            K = PI1[:, 1:, :].swapaxes(-1, -2)@G[:, 1:, :]@PI1
+            K += M.swapaxes(-1, -2)@M
+            return K
+        K = list(map(f1, zip(DD, self.PI1.data, self.G.data)))
+        return cellgroups.assemble(K)
 
     def mass_matrix(self):
-        p = self.p
-
-        # the projector matrix
-        D = self.D
-        H = self.H
-        C = self.C
-
-        # the dof arrays
-        cell2dof, cell2dofLocation = self.dof.cell2dof, self.dof.cell2dofLocation
-        cd = np.hsplit(cell2dof, cell2dofLocation[1:-1])
-
-        f1 = lambda x: x[0]@x[1]
-        PI0 = self.PI0
-        DD = np.vsplit(D, cell2dofLocation[1:-1])
-        PIS = list(map(f1, zip(DD, PI0)))
-
-        f1 = lambda x: x[0].T@x[1]@x[0] + x[3]*(np.eye(x[2].shape[1]) - x[2]).T@(np.eye(x[2].shape[1]) - x[2])
-        K = list(map(f1, zip(PI0, H, PIS, self.smspace.cellmeasure)))
-
-        f2 = lambda x: np.repeat(x, x.shape[0])
-        f3 = lambda x: np.tile(x, x.shape[0])
-        f4 = lambda x: x.flatten()
-
-        I = np.concatenate(list(map(f2, cd)))
-        J = np.concatenate(list(map(f3, cd)))
-        val = np.concatenate(list(map(f4, K)))
-        gdof = self.number_of_global_dofs()
-        M = csr_matrix((val, (I, J)), shape=(gdof, gdof), dtype=np.float)
-        return M
-
+        cellgroups = self.cellgroups
+        DD = cellgroups.dof_split(self.D)
+        HH = cellgroups.cell_split(self.H)
+        area = cellgroups.cell_split(self.smspace.cellmeasure)
+
+        def f1(x):
+            D, PI0, H, a = x
+            M = np.eye(PI0.shape[-1]) - D@PI0
+            K = PI0.swapaxes(-1, -2)@H@PI0
+            K += a[:, None, None]*(M.swapaxes(-1, -2)@M)
+            return K
+        K = list(map(f1, zip(DD, self.PI0.data, HH, area)))
+        return cellgroups.assemble(K)
 
     def source_vector(self, f):
         phi = self.smspace.basis
         def u(x, index):
             return np.einsum('ij, ijm->ijm', f(x), phi(x, index=index))
         bb = self.integralalg.integral(u, celltype=True)
-        g = lambda x: x[0].T@x[1]
-        bb = np.concatenate(list(map(g, zip(self.PI0, bb))))
-        gdof = self.number_of_global_dofs()
-        b = np.bincount(self.dof.cell2dof, weights=bb, minlength=gdof)
-        return b
+
+        cellgroups = self.cellgroups
+        bb = cellgroups.cell_split(bb)
+        g = lambda x: np.einsum('ijk, ij->ik', x[0], x[1])
+        bb = list(map(g, zip(self.PI0.data, bb)))
+        return cellgroups.assemble_vector(bb)
 
     def set_dirichlet_bc(self, gD, uh, threshold=None):
         """
@@ -456,12 +423,10 @@ class NonConformingVirtualElementSpace2d():
         return B
 
     def matrix_G(self, B, D):
-        p = self.p
-        cell2dof, cell2dofLocation = self.dof.cell2dof, self.dof.cell2dofLocation
-        BB = np.hsplit(B, cell2dofLocation[1:-1])
-        DD = np.vsplit(D, cell2dofLocation[1:-1])
-        g = lambda x: x[0]@x[1]
-        G = list(map(g, zip(BB, DD)))
+        cellgroups = self.cellgroups
+        BB = cellgroups.dof_split(B, axis=1)
+        DD = cellgroups.dof_split(D)
+        G = CellGroupArray(cellgroups, [b@d for b, d in zip(BB, DD)])
         return G
 
     def matrix_G_test(self, integralalg):
@@ -479,29 +444,25 @@ class NonConformingVirtualElementSpace2d():
         smldof = self.smspace.number_of_local_dofs()
         idof = (p-1)*p//2
 
-        mesh = self.mesh
-        cell2dof, cell2dofLocation = self.dof.cell2dof, self.dof.cell2dofLocation
-        d = lambda x: x[0]@x[1]
-        C = list(map(d, zip(H, PI1)))
-        if p == 1:
-            return C
-        else:
-            NV = mesh.number_of_vertices_of_cells()
-            l = lambda x: np.r_[
-                    '0',
-                    np.r_['1', np.zeros((idof, p*x[0])), x[1]*np.eye(idof)],
-                    x[2][idof:, :]]
-            return list(map(l, zip(NV, self.smspace.cellmeasure, C)))
+        cellgroups = self.cellgroups
+        HH = cellgroups.cell_split(H)
+        C = [h@pi1 for h, pi1 in zip(HH, PI1.data)]
+        if p > 1:
+            # 前 idof 行换成内部自由度的矩
+            area = cellgroups.cell_split(self.smspace.cellmeasure)
+            for c, a, n in zip(C, area, cellgroups.ldof):
+                c[:, :idof, :] = 0
+                c[:, :idof, n-idof:] = a[:, None, None]*np.eye(idof)
+        return CellGroupArray(cellgroups, C)
 
     def matrix_PI_0(self, H, C):
-        cell2dof, cell2dofLocation = self.dof.cell2dof, self.dof.cell2dofLocation
-        pi0 = lambda x: inv(x[0])@x[1]
-        return list(map(pi0, zip(H, C)))
+        cellgroups = self.cellgroups
+        HH = cellgroups.cell_split(H)
+        PI0 = [np.linalg.solve(h, c) for h, c in zip(HH, C.data)]
+        return CellGroupArray(cellgroups, PI0)
 
     def matrix_PI_1(self, G, B):
-        p = self.p
-        cell2dof, cell2dofLocation = self.dof.cell2dof, self.dof.cell2dofLocation
-        BB = np.hsplit(B, cell2dofLocation[1:-1])
-        g = lambda x: inv(x[0])@x[1]
-        return list(map(g, zip(G, BB)))
-
+        cellgroups = self.cellgroups
+        BB = cellgroups.dof_split(B, axis=1)
+        PI1 = [np.linalg.solve(g, b) for g, b in zip(G.data, BB)]
+        return CellGroupArray(cellgroups, PI1)
@@ -5,7 +5,8 @@ from .Function import Function
 from ..decorator import cartesian, barycentric
 from ..quadrature import GaussLobattoQuadrature
 from ..quadrature import GaussLegendreQuadrature
-from ..quadrature import PolygonMeshIntegralAlg
+from ..quadrature import PolygonMeshIntegralAlg, PolygonMeshQuadrature
+from ..quadrature import TriangleQuadrature
 from ..quadrature import FEMeshIntegralAlg
 from ..common import ranges
 
@@ -553,7 +554,7 @@ class ScaledMonomialSpace2d():
         @cartesian
         def f(x, index):
             gphi = self.grad_basis(x, index=index, p=p)
-            return np.einsum('ijkm, ijpm->ijkp', gphi, gphi)
+            return gphi@gphi.swapaxes(-1, -2)
 
         A = self.integralalg.cell_integral(f, q=p+3)
         cell2dof = self.cell_to_dof(p=p)
@@ -937,35 +938,33 @@ class ScaledMonomialSpace2d():
         return F 
 
     def matrix_H(self, p=None):
+        """
+        @brief 用散度定理把单元上的积分化为边界上的积分
+
+        Notes
+        -----
+        对齐次多项式 m, \\int_K m dx = 1/(k+2) \\int_{\\partial K} (x - x_K)\\cdot n m ds,
+        其中 k 是 m 的次数. 边 e 上 (x - x_K)\\cdot n 是常数, 乘以 |e| 等于
+        以 x_K 为顶点的子三角形面积的两倍, 所以直接使用复合求积公式中平铺的
+        子三角形的边, 基函数只计算一次.
+        """
         p = self.p if p is None else p
         mesh = self.mesh
         node = mesh.entity('node')
 
-        edge = mesh.entity('edge')
-        edge2cell = mesh.ds.edge_to_cell()
-
-        isInEdge = (edge2cell[:, 0] != edge2cell[:, 1])
-
-        NC = mesh.number_of_cells()
+        if isinstance(self.integralalg, PolygonMeshIntegralAlg):
+            pq = self.integralalg.quadrature()
+        else:
+            pq = PolygonMeshQuadrature(mesh, TriangleQuadrature(1),
+                    self.cellbarycenter)
 
         qf = GaussLegendreQuadrature(p + 1)
         bcs, ws = qf.quadpts, qf.weights
-        ps = np.einsum('ij, kjm->ikm', bcs, node[edge])
-        phi0 = self.basis(ps, index=edge2cell[:, 0], p=p)
-        phi1 = self.basis(ps[:, isInEdge, :], index=edge2cell[isInEdge, 1], p=p)
-        H0 = np.einsum('i, ijk, ijm->jkm', ws, phi0, phi0)
-        H1 = np.einsum('i, ijk, ijm->jkm', ws, phi1, phi1)
-
-        nm = mesh.edge_normal()
-        b = node[edge[:, 0]] - self.cellbarycenter[edge2cell[:, 0]]
-        H0 = np.einsum('ij, ij, ikm->ikm', b, nm, H0)
-        b = node[edge[isInEdge, 0]] - self.cellbarycenter[edge2cell[isInEdge, 1]]
-        H1 = np.einsum('ij, ij, ikm->ikm', b, -nm[isInEdge], H1)
-
-        ldof = self.number_of_local_dofs(p=p, doftype='cell')
-        H = np.zeros((NC, ldof, ldof), dtype=np.float)
-        np.add.at(H, edge2cell[:, 0], H0)
-        np.add.at(H, edge2cell[isInEdge, 1], H1)
+        ps = np.einsum('ij, kjm->ikm', bcs, node[pq.edge])
+        phi = self.basis(ps, index=pq.index, p=p)
+        H = np.einsum('i, ijk, ijm, j->jkm', ws, phi, phi, 2*pq.measure,
+                optimize=True)
+        H = pq.reduce(H)
 
         multiIndex = self.dof.multi_index_matrix(p=p)
         q = np.sum(multiIndex, axis=1)
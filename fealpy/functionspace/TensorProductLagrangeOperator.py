@@ -0,0 +1,404 @@
+import numpy as np
+from scipy.sparse.linalg import LinearOperator
+
+from ..quadrature import GaussLegendreQuadrature
+from ..mesh.core import multi_index_matrix
+from ..mesh.core import lagrange_shape_function
+from ..mesh.core import lagrange_grad_shape_function
+from ..mesh.mesh_tools import unique_row_index
+
+
+class TensorProductLagrangeOperator(LinearOperator):
+    """
+    @brief 四边形和六面体网格上 p 次 Lagrange 元的无矩阵算子
+
+    Notes
+    -----
+    单元上的基函数是一维 Lagrange 基函数的张量积, 积分公式是一维 Gauss-Legendre
+    公式的张量积. 算子作用时, 先把单元上的系数依次沿每个方向与一维基函数值表
+    (NQ, p+1) 缩并, 得到积分点上的值或参考梯度, 乘上预先算好的几何因子后,
+    再沿每个方向用转置的一维值表缩并回到单元自由度上 (和因子分解). 每个单元的
+    计算量为 O(p^{d+1}), 存储量为 O(q^d), 而组装单元刚度矩阵需要 O(p^{2d}).
+
+    单元自由度按张量积顺序排列, 即单元上的局部编号 (i_0, ..., i_{d-1}) 展平
+    为 i_0 (p+1)^{d-1} + ... + i_{d-1}, 其中 i_k 是沿第 k 个参考坐标方向的编号.
+
+    支持的算子 (`operator` 参数):
+        'stiff': (c grad u, grad v)
+        'mass': (c u, v)
+        'elasticity': (2 mu eps(u), eps(v)) + (lam div u, div v), 向量按分量
+        排列, 即长度为 GD*gdof 的数组, 与 `linear_elasticity_matrix` 一致
+    """
+    def __init__(self, mesh, p, q=None, operator='stiff', c=None,
+            lam=1.0, mu=1.0, isDDof=None):
+        """
+        Parameters
+        ----------
+        mesh : QuadrangleMesh, HexahedronMesh, LagrangeQuadrangleMesh 或者
+            LagrangeHexahedronMesh
+        p : 空间的次数
+        q : 一维 Gauss-Legendre 积分公式的积分点个数, 默认为 p+1
+        c : 系数, 常数或者 cartesian 函数
+        isDDof : Dirichlet 边界自由度的标记, 算子在这些自由度上为单位算子
+        """
+        self.mesh = mesh
+        self.p = p
+        self.operator = operator
+        self.lam = lam
+        self.mu = mu
+
+        self.TD = mesh.top_dimension()
+        self.GD = mesh.geo_dimension()
+        assert self.TD == self.GD
+
+        q = q if q is not None else p + 1
+        qf = GaussLegendreQuadrature(q)
+        bcs, ws = qf.get_quadrature_points_and_weights()
+        self.bcs = bcs
+        self.ws = ws
+
+        # 一维基函数及其导数在积分点上的值表, (NQ, p+1)
+        self.B = lagrange_shape_function(bcs, p)
+        R = lagrange_grad_shape_function(bcs, p)
+        self.D = R[..., 1] - R[..., 0]
+
+        self.cell2dof = self.cell_to_dof()
+        gdof = self.number_of_global_dofs()
+        self.isDDof = isDDof
+
+        self.geometry(c)
+
+        n = gdof*self.GD if operator == 'elasticity' else gdof
+        super().__init__(dtype=mesh.ftype, shape=(n, n))
+
+    def tensor_node(self):
+        """
+        @brief 按张量积顺序排列的单元几何节点 (NC, ldof), 以及几何次数
+        """
+        mesh = self.mesh
+        cell = mesh.entity('cell')
+        if mesh.meshtype in {'lquad', 'lhex'}:
+            return cell, mesh.p
+        elif mesh.meshtype == 'quad':
+            return cell[:, [0, 3, 1, 2]], 1
+        elif mesh.meshtype == 'hex':
+            return cell[:, [0, 4, 3, 7, 1, 5, 2, 6]], 1
+        else:
+            raise ValueError("The meshtype {} is not supported!".format(mesh.meshtype))
+
+    def interpolate(self, u, tables, transpose=False):
+        """
+        @brief 沿每个参考方向依次把 u 与一维值表缩并
+
+        Parameters
+        ----------
+        u : (NC, n, ..., n, ...), 前 TD 个单元轴之后可以有分量轴
+        tables : 长度为 TD 的列表, 第 k 个元素是第 k 个方向上的一维值表
+            (NQ, p+1)
+        transpose : 为 True 时用转置的值表, 即从积分点回到自由度
+        """
+        for k, T in enumerate(tables):
+            T = T.T if transpose else T
+            u = np.moveaxis(np.tensordot(T, u, axes=([1], [k+1])), 0, k+1)
+        return u
+
+    def grad_tables(self, a, B, D):
+        """
+        @brief 第 a 个参考方向导数对应的一维值表列表
+        """
+        return [D if k == a else B for k in range(self.TD)]
+
+    def geometry(self, c=None):
+        """
+        @brief 预先计算每个积分点上的几何因子
+        """
+        mesh = self.mesh
+        TD = self.TD
+        GD = self.GD
+        node = mesh.entity('node')
+        cell, pm = self.tensor_node()
+        NC = len(cell)
+
+        # 几何映射的一维值表
+        B = lagrange_shape_function(self.bcs, pm)
+        R = lagrange_grad_shape_function(self.bcs, pm)
+        D = R[..., 1] - R[..., 0]
+
+        shape = (NC, ) + TD*(pm+1, ) + (GD, )
+        x = node[cell].reshape(shape)
+
+        # J[..., j, a] = d x_j / d xi_a, (NC, NQ, ..., NQ, GD, TD)
+        J = np.stack([self.interpolate(x, self.grad_tables(a, B, D))
+            for a in range(TD)], axis=-1)
+        detJ = np.linalg.det(J)
+        Jinv = np.linalg.inv(J)
+
+        # 张量积分权重
+        w = self.ws
+        for k in range(1, TD):
+            w = np.multiply.outer(w, self.ws)
+        wdet = w*np.abs(detJ)
+
+        self.points = self.interpolate(x, TD*[B])
+        if c is not None:
+            if callable(c):
+                c = c(self.points)
+            wdet = wdet*c
+
+        self.wdet = wdet # (NC, NQ, ..., NQ)
+        if self.operator == 'stiff':
+            # G = w |det J| J^{-1} J^{-T}
+            self.G = np.einsum('...aj, ...bj, ...->...ab', Jinv, Jinv, wdet)
+        elif self.operator == 'elasticity':
+            self.Jinv = Jinv
+
+    def cell_to_dof(self):
+        """
+        @brief 张量积顺序的单元自由度数组 (NC, (p+1)^TD)
+
+        Notes
+        -----
+        对 Lagrange 四边形网格直接使用网格的自由度管理对象. 其它情形由网格的
+        拓扑得到整体编号: 局部编号为 (i_0, ..., i_{d-1}) 的自由度位于以 0 < i_k < p
+        的方向张成的子实体 (顶点, 边, 面或单元) 上, 它关于子实体角点的张量积
+        权重为 prod_k i_k 或 p - i_k, 都是整数. 以 (角点的整体编号, 权重) 对的
+        集合作为自由度的标识, 相邻单元在公共子实体上得到相同的标识, 与子实体
+        在单元中的方向无关. 先编号顶点上的自由度, 再依次是边, 面和单元内部的.
+        """
+        mesh = self.mesh
+        p = self.p
+        TD = self.TD
+        if mesh.meshtype == 'lquad':
+            return mesh.lagrange_dof(p).cell_to_dof()
+
+        cell, pm = self.tensor_node()
+        NC = len(cell)
+        corner = cell.reshape((NC, ) + TD*(pm+1, ))
+        for k in range(TD):
+            corner = np.take(corner, [0, pm], axis=k+1)
+        corner = corner.reshape(NC, -1) # (NC, 2^TD)
+
+        index = np.indices(TD*(p+1, )).reshape(TD, -1).T # (ldof, TD)
+        isInDof = (index > 0) & (index < p)
+        m = isInDof.sum(axis=-1) # 自由度所在子实体的维数
+
+        cell2dof = np.zeros((NC, len(index)), dtype=mesh.itype)
+        offset = 0
+        for d in range(TD+1):
+            ldof, = np.nonzero(m == d)
+            if len(ldof) == 0:
+                continue
+            if d == TD: # 单元内部的自由度
+                n = NC*len(ldof)
+                cell2dof[:, ldof] = offset + np.arange(n).reshape(NC, -1)
+                offset += n
+                continue
+
+            # 每个自由度所在子实体的 2^d 个角点及其权重
+            idx = index[ldof]
+            flag = isInDof[ldof]
+            lc = np.zeros((len(ldof), 2**d), dtype=np.int_)
+            w = np.ones((len(ldof), 2**d), dtype=np.int64)
+            choice = np.indices(d*(2, )).reshape(d, 2**d).T # (2^d, d)
+            for i in range(len(ldof)):
+                b = idx[i]//p
+                axes, = np.nonzero(flag[i])
+                b = np.repeat(b[None, :], 2**d, axis=0)
+                b[:, axes] = choice
+                lc[i] = np.ravel_multi_index(b.T, TD*(2, ))
+                w[i] = np.prod(np.where(choice == 1, idx[i, axes], p - idx[i, axes]), axis=-1)
+
+            key = corner[:, lc]*(p**d + 1) + w # (NC, nldof, 2^d)
+            key = np.sort(key, axis=-1).reshape(-1, 2**d)
+            i0, j = unique_row_index(key)
+            cell2dof[:, ldof] = offset + j.reshape(NC, -1)
+            offset += len(i0)
+        return cell2dof
+
+    def number_of_global_dofs(self):
+        return self.cell2dof.max() + 1
+
+    def number_of_local_dofs(self):
+        return (self.p+1)**self.TD
+
+    def interpolation_points(self):
+        node = self.mesh.entity('node')
+        cell, pm = self.tensor_node()
+        NC = len(cell)
+        TD = self.TD
+
+        bc = multi_index_matrix[1](self.p)/self.p
+        B = lagrange_shape_function(bc, pm)
+        shape = (NC, ) + TD*(pm+1, ) + (self.GD, )
+        ips = self.interpolate(node[cell].reshape(shape), TD*[B]).reshape(-1, self.GD)
+
+        gdof = self.number_of_global_dofs()
+        ipoints = np.zeros((gdof, self.GD), dtype=self.mesh.ftype)
+        ipoints[self.cell2dof.flat] = ips
+        return ipoints
+
+    def is_boundary_dof(self):
+        """
+        @brief 标记边界上的自由度
+
+        Notes
+        -----
+        单元的每个面是张量积数组的一个切片, 以面上角点的自由度编号作为面的标识,
+        只属于一个单元的面就是边界面.
+        """
+        p = self.p
+        TD = self.TD
+        NC = len(self.cell2dof)
+        c2d = self.cell2dof.reshape((NC, ) + TD*(p+1, ))
+
+        faces = []
+        corners = []
+        for a in range(TD):
+            for i in (0, p):
+                f = np.take(c2d, i, axis=a+1).reshape(NC, -1)
+                fc = np.take(c2d, i, axis=a+1)
+                for k in range(TD-1):
+                    fc = np.take(fc, [0, p], axis=k+1)
+                faces.append(f)
+                corners.append(np.sort(fc.reshape(NC, -1), axis=-1))
+        faces = np.concatenate(faces, axis=0)
+        corners = np.concatenate(corners, axis=0)
+        _, j, n = np.unique(corners, axis=0, return_inverse=True, return_counts=True)
+
+        gdof = self.number_of_global_dofs()
+        isBdDof = np.zeros(gdof, dtype=np.bool_)
+        isBdDof[faces[n[j] == 1]] = True
+        return isBdDof
+
+    def cell_vector(self, uh):
+        """
+        @brief 把整体系数数组转为单元上张量积形式的数组
+        """
+        NC = len(self.cell2dof)
+        TD = self.TD
+        p = self.p
+        val = uh[..., self.cell2dof] # (..., NC, ldof)
+        val = np.moveaxis(val, tuple(range(len(uh.shape)-1)),
+                tuple(range(-len(uh.shape)+1, 0)))
+        return val.reshape((NC, ) + TD*(p+1, ) + uh.shape[:-1])
+
+    def scatter(self, val):
+        """
+        @brief 把单元上张量积形式的数组累加到整体数组
+        """
+        NC = len(self.cell2dof)
+        gdof = self.number_of_global_dofs()
+        ldof = self.number_of_local_dofs()
+        val = val.reshape((NC, ldof, -1))
+        r = np.zeros((val.shape[-1], gdof), dtype=val.dtype)
+        for k in range(val.shape[-1]):
+            r[k] = np.bincount(self.cell2dof.flat, weights=val[..., k].flat, minlength=gdof)
+        return r
+
+    def _matvec(self, x):
+        gdof = self.number_of_global_dofs()
+        TD = self.TD
+        B = self.B
+        D = self.D
+        shape = x.shape
+        x = x.reshape(-1, gdof) # (ncomp, gdof)
+
+        if self.isDDof is not None:
+            x0 = x[:, self.isDDof].copy()
+            x = x.copy()
+            x[:, self.isDDof] = 0.0
+
+        u = self.cell_vector(x) # (NC, p+1, ..., p+1, ncomp)
+        if self.operator == 'mass':
+            val = self.interpolate(u, TD*[B])
+            val = val*self.wdet[..., None]
+            y = self.interpolate(val, TD*[B], transpose=True)
+        else:
+            # 参考梯度 (NC, NQ, ..., NQ, ncomp, TD)
+            R = np.stack([self.interpolate(u, self.grad_tables(a, B, D))
+                for a in range(TD)], axis=-1)
+            if self.operator == 'stiff':
+                R = np.einsum('...ab, ...kb->...ka', self.G, R)
+            elif self.operator == 'elasticity':
+                Jinv = self.Jinv
+                gu = np.einsum('...aj, ...ka->...kj', Jinv, R)
+                s = self.mu*(gu + gu.swapaxes(-1, -2))
+                t = self.lam*np.trace(gu, axis1=-2, axis2=-1)
+                s[..., range(TD), range(TD)] += t[..., None]
+                R = np.einsum('...kj, ...aj, ...->...ka', s, Jinv, self.wdet)
+            y = sum(self.interpolate(R[..., a], self.grad_tables(a, B, D),
+                transpose=True) for a in range(TD))
+
+        y = self.scatter(y)
+        if self.isDDof is not None:
+            y[:, self.isDDof] = x0
+        return y.reshape(shape)
+
+    def _rmatvec(self, x):
+        return self._matvec(x)
+
+    def diagonal(self):
+        """
+        @brief 算子的对角线, 用于 Jacobi 或 Chebyshev 光滑
+
+        Notes
+        -----
+        对角元 A_ii 也有张量积结构, 只需用一维值表的平方做缩并.
+        """
+        TD = self.TD
+        B2 = self.B**2
+        DB = self.D*self.B
+        D2 = self.D**2
+        NC = len(self.cell2dof)
+
+        def tables(a, b):
+            # 第 a, b 个参考方向导数乘积对应的一维值表
+            T = []
+            for k in range(TD):
+                if (k == a) and (k == b):
+                    T.append(D2)
+                elif (k == a) or (k == b):
+                    T.append(DB)
+                else:
+                    T.append(B2)
+            return T
+
+        if self.operator == 'mass':
+            d = self.interpolate(self.wdet, TD*[B2], transpose=True)[..., None]
+        elif self.operator == 'stiff':
+            d = sum(self.interpolate(self.G[..., a, b], tables(a, b), transpose=True)
+                    for a in range(TD) for b in range(TD))[..., None]
+        elif self.operator == 'elasticity':
+            # 第 k 个分量的对角元 \int mu |grad phi|^2 + (mu + lam) (d_k phi)^2
+            Jinv = self.Jinv
+            M = np.einsum('...aj, ...bj, ...->...ab', Jinv, Jinv, self.wdet)
+            d0 = sum(self.interpolate(M[..., a, b], tables(a, b), transpose=True)
+                    for a in range(TD) for b in range(TD))
+            d = []
+            for k in range(TD):
+                M = np.einsum('...a, ...b, ...->...ab', Jinv[..., k], Jinv[..., k], self.wdet)
+                dk = sum(self.interpolate(M[..., a, b], tables(a, b), transpose=True)
+                        for a in range(TD) for b in range(TD))
+                d.append(self.mu*d0 + (self.mu + self.lam)*dk)
+            d = np.stack(d, axis=-1)
+
+        d = self.scatter(d)
+        if self.isDDof is not None:
+            d[:, self.isDDof] = 1.0
+        return d.reshape(-1)
+
+    def source_vector(self, f, dim=None):
+        """
+        @brief 组装载荷向量 (f, v), f 为 cartesian 函数
+
+        Returns
+        -------
+        b : (gdof, ) 或者 (GD*gdof, ), 后者按分量排列
+        """
+        TD = self.TD
+        val = f(self.points) # (NC, NQ, ..., NQ, ...)
+        if len(val.shape) == TD + 1:
+            val = val[..., None]
+        val = val*self.wdet[..., None]
+        b = self.interpolate(val, TD*[self.B], transpose=True)
+        return self.scatter(b).reshape(-1)
@@ -0,0 +1,163 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from ..quadrature.AssemblyPlan import bincount, incidence_matrix, csr_pattern
+
+
+class VEMCellGroups():
+    """
+    @brief 把多边形单元按局部自由度个数分组, 批量计算和组装虚单元的单元矩阵
+
+    Notes
+    -----
+    虚单元空间的 cell2dof 是按单元依次排列的一维数组, 第 i 个单元的自由度为
+    cell2dof[cell2dofLocation[i]:cell2dofLocation[i+1]]. 局部自由度个数只与
+    单元的边数有关, 边数相同的单元的投影矩阵大小相同, 可以存成 (nc, m, n) 的
+    三维数组, 用 `np.matmul` 和 `np.linalg.solve` 批量计算. 组的个数很少
+    (Voronoi 网格通常不超过 10 组), Python 循环只在组上进行.
+
+    整体矩阵的 CSR 稀疏模式和每组单元矩阵元素在 `data` 数组中的位置只在第一次
+    组装时计算, 以后的组装只需一次 `np.bincount`.
+    """
+    def __init__(self, cell2dof, cell2dofLocation, gdof):
+        self.cell2dof = cell2dof
+        self.cell2dofLocation = cell2dofLocation
+        self.gdof = gdof
+        self.NC = len(cell2dofLocation) - 1
+
+        ldof = np.diff(cell2dofLocation)
+        self.ldof = [] # 每组单元的局部自由度个数
+        self.index = [] # 每组单元的编号
+        self.location = [] # (nc, ldof), 每组单元的自由度在 cell2dof 中的位置
+        self.group = np.zeros(self.NC, dtype=np.int_) # 单元所在的组
+        self.offset = np.zeros(self.NC, dtype=np.int_) # 单元在组中的位置
+        for i, n in enumerate(np.unique(ldof)):
+            index, = np.nonzero(ldof == n)
+            self.ldof.append(n)
+            self.index.append(index)
+            self.location.append(cell2dofLocation[index, None] + np.arange(n))
+            self.group[index] = i
+            self.offset[index] = np.arange(len(index))
+
+        self.indptr = None
+        self.indices = None
+        self.pos = None
+
+    def __len__(self):
+        return len(self.index)
+
+    def cell_to_dof(self):
+        """
+        @brief 每组单元的自由度, [(nc, ldof), ...]
+        """
+        return [self.cell2dof[loc] for loc in self.location]
+
+    def cell_split(self, a):
+        """
+        @brief 把 (NC, ...) 的单元数组分组
+        """
+        return [a[index] for index in self.index]
+
+    def cell_merge(self, arrays):
+        """
+        @brief cell_split 的逆, 把每组的数组合并成 (NC, ...) 的单元数组
+        """
+        out = np.zeros((self.NC, ) + arrays[0].shape[1:], dtype=arrays[0].dtype)
+        for index, a in zip(self.index, arrays):
+            out[index] = a
+        return out
+
+    def dof_split(self, a, axis=0):
+        """
+        @brief 把第 axis 维按 cell2dof 的顺序排列的数组 (如矩阵 D 和 B) 分组
+
+        Returns
+        -------
+        [(nc, ...), ...], 第 axis 维换成了长度为 ldof 的维数, 组内单元的维数
+            放在最前面. 例如 B 的形状为 (smldof, N), dof_split(B, axis=1) 的每一
+            组的形状为 (nc, smldof, ldof).
+        """
+        return [np.moveaxis(np.take(a, loc, axis=axis), axis, 0)
+                for loc in self.location]
+
+    def dof_merge(self, arrays):
+        """
+        @brief 把每组 (nc, ldof, ...) 的数组合并成按 cell2dof 顺序排列的
+            (N, ...) 数组
+        """
+        N = len(self.cell2dof)
+        out = np.zeros((N, ) + arrays[0].shape[2:], dtype=arrays[0].dtype)
+        for loc, a in zip(self.location, arrays):
+            out[loc] = a
+        return out
+
+    def pattern(self):
+        """
+        @brief 计算整体矩阵的 CSR 稀疏模式和所有单元矩阵元素在 `data` 数组中
+            的位置
+
+        Notes
+        -----
+        把 cell2dof 看成 (NC, gdof) 的关联矩阵 C, 它的 CSR 格式就是
+        (1, cell2dof, cell2dofLocation), 稀疏模式是 C^T C 的非零元结构.
+        """
+        if self.pos is not None:
+            return
+
+        gdof = self.gdof
+        C = incidence_matrix(self.cell2dof, gdof, location=self.cell2dofLocation)
+        self.indptr, self.indices = csr_pattern(C)
+
+        row = np.repeat(np.arange(gdof, dtype=np.int64), np.diff(self.indptr))
+        key = row*gdof + self.indices
+        pos = []
+        for cd in self.cell_to_dof():
+            I = cd[:, :, None].astype(np.int64)*gdof + cd[:, None, :]
+            pos.append(np.searchsorted(key, I).reshape(-1))
+        self.pos = np.concatenate(pos)
+        if len(key) < 2**31:
+            self.pos = self.pos.astype(np.int32)
+
+    def assemble(self, K):
+        """
+        @brief 由每组的单元矩阵 [(nc, ldof, ldof), ...] 组装整体矩阵
+
+        Notes
+        -----
+        每个矩阵使用 `indices` 和 `indptr` 的副本, 对其中一个做
+        `eliminate_zeros` 不会影响其它矩阵和以后的组装.
+        """
+        self.pattern()
+        val = np.concatenate([k.reshape(-1) for k in K])
+        data = bincount(self.pos, val, len(self.indices))
+        return csr_matrix((data, self.indices.copy(), self.indptr.copy()),
+                shape=(self.gdof, self.gdof))
+
+    def assemble_vector(self, bb):
+        """
+        @brief 由每组的单元向量 [(nc, ldof), ...] 组装整体向量
+        """
+        return bincount(self.cell2dof, self.dof_merge(bb), self.gdof)
+
+
+class CellGroupArray():
+    """
+    @brief 按组存储的单元矩阵, 第 i 组是 (nc, m, n) 的三维数组 data[i]
+
+    Notes
+    -----
+    可以像单元矩阵的列表一样按单元编号访问和迭代, 得到的是组数组的视图.
+    """
+    def __init__(self, groups, data):
+        self.groups = groups
+        self.data = data
+
+    def __len__(self):
+        return self.groups.NC
+
+    def __getitem__(self, i):
+        return self.data[self.groups.group[i]][self.groups.offset[i]]
+
+    def __iter__(self):
+        for g, j in zip(self.groups.group, self.groups.offset):
+            yield self.data[g][j]
@@ -48,7 +48,9 @@ class CPLFEMDof1d():
         self.cell2dof = self.cell_to_dof()
 
     def boundary_dof(self, threshold=None):
-        if type(threshold) is np.ndarray:
+        if isinstance(threshold, str): # 边界标记的名字
+            index = self.mesh.boundary_marker(threshold)
+        elif type(threshold) is np.ndarray:
             index = threshold
         else:
             index = self.mesh.ds.boundary_node_index()
@@ -63,7 +65,9 @@ class CPLFEMDof1d():
         return isBdDof
 
     def is_boundary_dof(self, threshold=None):
-        if type(threshold) is np.ndarray:
+        if isinstance(threshold, str): # 边界标记的名字
+            index = self.mesh.boundary_marker(threshold)
+        elif type(threshold) is np.ndarray:
             index = threshold
         else:
             index = self.mesh.ds.boundary_node_index()
@@ -157,7 +161,9 @@ class CPLFEMDof2d():
 
     def boundary_dof(self, threshold=None):
 
-        if type(threshold) is np.ndarray:
+        if isinstance(threshold, str): # 边界标记的名字
+            index = self.mesh.boundary_marker(threshold)
+        elif type(threshold) is np.ndarray:
             index = threshold
         else:
             index = self.mesh.ds.boundary_edge_index()
@@ -174,7 +180,9 @@ class CPLFEMDof2d():
 
     def is_boundary_dof(self, threshold=None):
 
-        if type(threshold) is np.ndarray:
+        if isinstance(threshold, str): # 边界标记的名字
+            index = self.mesh.boundary_marker(threshold)
+        elif type(threshold) is np.ndarray:
             index = threshold
         else:
             index = self.mesh.ds.boundary_edge_index()
@@ -408,7 +416,9 @@ class CPLFEMDof3d():
 
     def boundary_dof(self, threshold=None):
 
-        if type(threshold) is np.ndarray:
+        if isinstance(threshold, str): # 边界标记的名字
+            index = self.mesh.boundary_marker(threshold)
+        elif type(threshold) is np.ndarray:
             index = threshold
         else:
             index = self.mesh.ds.boundary_face_index()
@@ -425,7 +435,9 @@ class CPLFEMDof3d():
 
     def is_boundary_dof(self, threshold=None):
 
-        if type(threshold) is np.ndarray:
+        if isinstance(threshold, str): # 边界标记的名字
+            index = self.mesh.boundary_marker(threshold)
+        elif type(threshold) is np.ndarray:
             index = threshold
         else:
             index = self.mesh.ds.boundary_face_index()
@@ -882,7 +894,9 @@ class CPPFEMDof3d():
 
     def boundary_dof(self, threshold=None):
 
-        if type(threshold) is np.ndarray:
+        if isinstance(threshold, str): # 边界标记的名字
+            index = self.mesh.boundary_marker(threshold)
+        elif type(threshold) is np.ndarray:
             index = threshold
         else:
             index = self.mesh.ds.boundary_face_index()
@@ -428,11 +428,11 @@ elif _dll_filename:
     except:
         raise RuntimeError('Could not load METIS dll: %s' % _dll_filename)
 else:
-    if os.environ.get('READTHEDOCS', None) == 'True':
-        # Don't care if we can load the DLL on RTD.
-        _dll = None
-    else:
-        raise RuntimeError('Could not locate METIS dll. Please set the METIS_DLL environment variable to its full path.')
+    # No METIS dll found: `part_mesh` falls back to the pure NumPy/SciPy
+    # partitioner in `fealpy.graph.partition`, `part_graph` does not work.
+    # Set the METIS_DLL environment variable to the full path of the dll
+    # to use METIS.
+    _dll = None
 
 # Wrapping conveniences
 
@@ -473,7 +473,7 @@ def _wrapdll(*argtypes, **kw):
             f.call = wrapped_func
         else:
             def nodll(*args, **kw):
-                raise NotImplemented("No METIS DLL")
+                raise RuntimeError("No METIS DLL")
             f.call = nodll
         return f
     return dowrap
@@ -741,11 +741,22 @@ def part_mesh(mesh, entity='cell', nparts=2,
         tpwgts=None, ubvec=None, recursive=False, **opts):
     """ Perform graph partitioning using k-way or recursive methods
 
-    Return ....
+    Returns a 2-tuple `(objval, parts)`, where `objval` is the edge cut and
+    `parts` is the part of each cell (or node).
 
     :param mesh: a mesh 
-    
+
+    Without the METIS dll, the mesh is partitioned by
+    `fealpy.graph.partition.part_mesh`. `ubvec[0]` is then used as the
+    imbalance tolerance, `recursive` and the METIS options are ignored.
     """
+    if _dll is None:
+        from .partition import part_mesh as native_part_mesh
+        if tpwgts:
+            raise ValueError("`tpwgts` is not supported without the METIS dll")
+        ubfactor = ubvec[0] if ubvec else 1.03
+        return native_part_mesh(mesh, entity=entity, nparts=nparts, ubfactor=ubfactor)
+
     if entity == 'cell':
         adj, adjLocation = mesh.ds.cell_to_cell(return_array=True)
     elif entity == 'node':
@@ -754,14 +765,12 @@ def part_mesh(mesh, entity='cell', nparts=2,
     graph = array_to_metis(adj, adjLocation)
 
     options = METIS_Options(**opts)
-    print(options)
-    print(options.keys());
     if tpwgts and not isinstance(tpwgts, ctypes.Array):
         if isinstance(tpwgts[0], (tuple, list)):
             tpwgts = reduce(op.add, tpwgts)
         tpwgts = (real_t*len(tpwgts))(*tpwgts)
     if ubvec and not isinstance(ubvec, ctypes.Array):
-        ubvec = (real_t*len(ubvect))(*ubvec)
+        ubvec = (real_t*len(ubvec))(*ubvec)
 
     if tpwgts: assert len(tpwgts) == nparts * graph.ncon
     if ubvec: assert len(ubvec) == graph.ncon
@@ -873,7 +882,7 @@ def part_graph(graph, nparts=2,
             tpwgts = reduce(op.add, tpwgts)
         tpwgts = (real_t*len(tpwgts))(*tpwgts)
     if ubvec and not isinstance(ubvec, ctypes.Array):
-        ubvec = (real_t*len(ubvect))(*ubvec)
+        ubvec = (real_t*len(ubvec))(*ubvec)
 
     if tpwgts: assert len(tpwgts) == nparts * graph.ncon
     if ubvec: assert len(ubvec) == graph.ncon
@@ -0,0 +1,222 @@
+"""
+不依赖 METIS 的图划分
+=====================
+
+用递归二分把图的顶点分成 nparts 组. 每次二分先由坐标 (rcb, inertial) 或图
+(greedy, spectral) 给出初始的两部分, 再用 Kernighan-Lin/Fiduccia-Mattheyses
+式的边界细化减少被切断的边数. 只依赖 NumPy 和 SciPy, 在没有 libmetis 的机器上
+`metis.part_mesh` 会自动使用这里的 `part_mesh`.
+"""
+
+import warnings
+
+import numpy as np
+from scipy.sparse import csr_matrix, spdiags
+from scipy.sparse.csgraph import dijkstra
+from scipy.sparse.linalg import lobpcg
+
+
+def adjacency_matrix(adj, adjLocation):
+    """
+    @brief 由邻接数组 (adj, adjLocation) 生成 CSR 格式的邻接矩阵
+    """
+    N = len(adjLocation) - 1
+    val = np.ones(len(adj), dtype=np.int_)
+    return csr_matrix((val, adj, adjLocation), shape=(N, N))
+
+
+def edge_cut(adj, adjLocation, parts):
+    """
+    @brief 两个端点不在同一组中的边的个数
+    """
+    N = len(adjLocation) - 1
+    row = np.repeat(np.arange(N), np.diff(adjLocation))
+    return np.sum(parts[row] != parts[adj])//2
+
+
+def imbalance(parts, nparts):
+    """
+    @brief 最大一组的顶点个数与平均个数之比, 1 表示完全平衡
+    """
+    num = np.bincount(parts, minlength=nparts)
+    return num.max()*nparts/len(parts)
+
+
+def bfs_level(G):
+    """
+    @brief 从伪外围顶点出发的广度优先层数, 不连通的顶点排在最后
+    """
+    d = dijkstra(G, unweighted=True, indices=0)
+    d[np.isinf(d)] = -1
+    d = dijkstra(G, unweighted=True, indices=np.argmax(d))
+    isInf = np.isinf(d)
+    d[isInf] = d[~isInf].max() + 1
+    return d
+
+
+def fiedler_vector(G):
+    """
+    @brief 图的 Laplace 矩阵的第二小特征值对应的特征向量
+    """
+    n = G.shape[0]
+    if n < 2:
+        return np.zeros(n, dtype=np.float64)
+    deg = np.asarray(G.sum(axis=1), dtype=np.float64).reshape(-1)
+    L = spdiags(deg, 0, n, n) - G.astype(np.float64)
+    if n < 20:
+        return np.linalg.eigh(L.toarray())[1][:, 1]
+
+    x = bfs_level(G)[:, None]
+    x -= x.mean()
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        _, v = lobpcg(L, x, Y=np.ones((n, 1)), largest=False, tol=1e-4, maxiter=100)
+    return v[:, 0]
+
+
+def initial_bisection(G, points, n0, method):
+    """
+    @brief 初始二分, 按某个顶点上的值排序, 前 n0 个顶点为第一部分
+
+    Returns
+    -------
+    side : (n, ) 的逻辑数组, 第二部分的顶点为真
+    """
+    if method == 'rcb': # 沿最长的坐标方向
+        axis = np.argmax(np.ptp(points, axis=0))
+        value = points[:, axis]
+    elif method == 'inertial': # 沿惯性主轴方向
+        x = points - points.mean(axis=0)
+        _, v = np.linalg.eigh(x.T@x)
+        value = x@v[:, -1]
+    elif method == 'greedy': # 图的广度优先生长
+        value = bfs_level(G)
+    elif method == 'spectral':
+        value = fiedler_vector(G)
+    else:
+        raise ValueError("Unsupported partition method {}!".format(method))
+
+    side = np.ones(G.shape[0], dtype=np.bool_)
+    side[np.argsort(value, kind='stable')[:n0]] = False
+    return side
+
+
+def refine_bisection(G, side, n0, ubfactor=1.01, maxit=20, nmin=None, nmax=None):
+    """
+    @brief Kernighan-Lin 式的边界细化
+
+    Parameters
+    ----------
+    n0 : 第一部分的目标顶点个数
+    nmin, nmax : (2, ), 两边顶点个数的下界和上界. nmax 默认为目标个数的
+        ubfactor 倍 (向下取整), nmin 默认由另一边的上界得到, 且目标不为空的
+        一边至少有一个顶点
+
+    Notes
+    -----
+    顶点的增益是移到另一边以后被切断的边减少的个数. 每次只从一边把增益为正
+    的顶点同时移到另一边, 这时被切断的边减少的个数不小于这些增益之和, 所以
+    切边数单调下降. 两边交替进行, 每边的顶点个数保持在 [nmin, nmax] 中;
+    某一边超出范围时, 把增益最大的顶点移走直到满足平衡条件. 与 KL 不同, 这里
+    不接受负增益的移动.
+    """
+    n = len(side)
+    deg = np.asarray(G.sum(axis=1)).reshape(-1)
+    target = np.array([n0, n - n0])
+    if nmax is None:
+        nmax = np.maximum(np.floor(target*ubfactor), target)
+    if nmin is None:
+        nmin = np.maximum(n - nmax[::-1], np.minimum(target, 1))
+    for it in range(maxit):
+        moved = 0
+        for f in (0, 1):
+            d1 = G@side.astype(np.int_) # 第二部分中的邻居个数
+            ext = np.where(side, deg - d1, d1)
+            gain = 2*ext - deg
+
+            n1 = np.sum(side)
+            size = [n - n1, n1]
+            index, = np.nonzero(side == f)
+            index = index[np.argsort(-gain[index], kind='stable')]
+            lo = max(size[f] - nmax[f], nmin[1-f] - size[1-f])
+            hi = min(size[f] - nmin[f], nmax[1-f] - size[1-f], len(index))
+            k = int(min(max(np.sum(gain[index] > 0), lo), hi))
+            if k > 0:
+                side[index[:k]] = (f == 0)
+                moved += k
+        if moved == 0:
+            break
+    return side
+
+
+def part_graph(adj, adjLocation, nparts=2, points=None, method='rcb',
+        ubfactor=1.03, maxit=20):
+    """
+    @brief 用递归二分把图划分成 nparts 组
+
+    Parameters
+    ----------
+    adj, adjLocation : 邻接数组, 如 `mesh.ds.cell_to_cell(return_array=True)`
+    nparts : 组数
+    points : (N, GD), 顶点的坐标, method 为 'rcb' 或 'inertial' 时需要
+    method : 初始二分的方法
+        'rcb': 递归坐标二分
+        'inertial': 递归惯性二分
+        'greedy': 广度优先的图生长
+        'spectral': 谱二分
+    ubfactor : 最大一组的顶点个数与平均个数之比的上界
+    maxit : 每次二分的最大细化次数
+
+    Returns
+    -------
+    edgecut, parts : 切边数和每个顶点所在的组, 与 `metis.part_mesh` 一致
+    """
+    N = len(adjLocation) - 1
+    G = adjacency_matrix(adj, adjLocation)
+    if method in {'rcb', 'inertial'} and points is None:
+        raise ValueError("The method {} needs the coordinates `points`!".format(method))
+
+    # 每组顶点个数的上界. 二分时包含 k 组的一边最多有 k*c 个顶点, 这样最后
+    # 每组都不超过 c, 不平衡度不超过 ubfactor (除非 ubfactor 本身无法满足)
+    c = max(np.floor(N/nparts*ubfactor), np.ceil(N/nparts))
+
+    parts = np.zeros(N, dtype=np.int_)
+    stack = [(np.arange(N), 0, nparts)]
+    while stack:
+        index, start, k = stack.pop()
+        n = len(index)
+        if k == 1:
+            parts[index] = start
+            continue
+        if n <= k: # 顶点不够分, 每个顶点单独一组
+            parts[index] = start + np.arange(n)
+            continue
+        k0 = k//2
+        k1 = k - k0
+        nmax = np.array([k0*c, k1*c])
+        nmin = np.maximum(n - nmax[::-1], [k0, k1]) # 每组至少一个顶点
+        n0 = int(np.clip(round(n*k0/k), nmin[0], n - nmin[1]))
+        g = G[index][:, index]
+        p = None if points is None else points[index]
+        side = initial_bisection(g, p, n0, method)
+        side = refine_bisection(g, side, n0, maxit=maxit, nmin=nmin, nmax=nmax)
+        stack.append((index[~side], start, k0))
+        stack.append((index[side], start + k0, k1))
+    return edge_cut(adj, adjLocation, parts), parts
+
+
+def part_mesh(mesh, entity='cell', nparts=2, method='rcb', ubfactor=1.03, maxit=20):
+    """
+    @brief 划分网格的单元或节点, 参数和返回值与 `metis.part_mesh` 一致, 其它
+        参数见 `part_graph`
+    """
+    if entity == 'cell':
+        adj, adjLocation = mesh.ds.cell_to_cell(return_array=True)
+        points = mesh.entity_barycenter('cell')
+    elif entity == 'node':
+        adj, adjLocation = mesh.ds.node_to_node(return_array=True)
+        points = mesh.entity('node')
+    else:
+        raise ValueError("Unsupported entity {}!".format(entity))
+    return part_graph(adj, adjLocation, nparts=nparts, points=points,
+            method=method, ubfactor=ubfactor, maxit=maxit)
@@ -3,7 +3,6 @@ from scipy.spatial import KDTree
 import pdb
 from scipy.spatial import Voronoi
 from .PolygonMesh import PolygonMesh
-import matplotlib.pyplot as plt
 from fealpy.mesh import TriangleMesh
 
 class CVTPMesher:
@@ -308,6 +307,8 @@ class CVTPMesher:
         ------
         该函数对进行了边界重构的网格利用波前法思想对内部点进行布点
         """
+        import matplotlib.pyplot as plt
+
         mesh = self.mesh
         node = self.mesh.node
         halfedge = self.mesh.entity('halfedge')
@@ -417,6 +418,8 @@ class CVTPMesher:
         '''
         利用背景网格方法对网格进行初始均匀布点
         '''
+        import matplotlib.pyplot as plt
+
         halfedge = self.mesh.entity('halfedge')
         bnode = self.bnode
         bnode2subdomain = self.bnode2subdomain
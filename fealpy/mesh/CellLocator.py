@@ -0,0 +1,209 @@
+import numpy as np
+
+
+class CellLocator():
+    """
+    @brief 单纯形网格上点定位的空间索引
+
+    Notes
+    -----
+    把网格的包围盒剖分成均匀的桶 (bucket), 每个单元登记到与它的包围盒相交的
+    所有桶中, 桶到单元的对应关系按桶编号排序后用 CSR 格式存储. 同时预先计算每
+    个单元仿射变换的逆, 查询时只需:
+
+    1. 算出每个点所在的桶;
+    2. 取出桶中登记的候选单元, 用逆仿射变换计算点在候选单元中的重心坐标;
+    3. 重心坐标最小分量最大的候选单元就是点所在的单元.
+
+    所有步骤都是批量向量化的, 不需要沿 `cell_to_cell` 行走, 所以对非凸区域和有
+    洞的区域同样适用, 不在网格中的点返回 -1.
+
+    索引在网格的节点数组或单元数组被替换 (如加密, 粗化) 时失效, 由
+    `is_valid` 检查. 原地移动节点后, 可以用 `update(index)` 只更新受影响的
+    单元.
+    """
+    def __init__(self, mesh, eps=1e-10):
+        self.mesh = mesh
+        self.eps = eps
+        self.build()
+
+    def build(self):
+        """
+        @brief 重新生成整个索引
+        """
+        mesh = self.mesh
+        self.node = mesh.entity('node')
+        self.cell = mesh.entity('cell')
+        NC = self.cell.shape[0]
+        GD = self.node.shape[1]
+        assert self.cell.shape[1] == GD + 1, "只支持与空间同维的单纯形网格"
+
+        self.geometry()
+        cmin, cmax = self.cell_box()
+
+        # 桶的边长取单元包围盒平均边长的一半, 每个桶中的候选单元很少, 同时限制
+        # 桶的个数不超过单元个数的 4 倍
+        self.origin = cmin.min(axis=0)
+        L = cmax.max(axis=0) - self.origin
+        h = np.mean(cmax - cmin)/2
+        h = max(h, np.max(L)/(4*NC)**(1/GD), np.finfo(self.node.dtype).tiny)
+        self.h = h
+        self.shape = np.maximum(np.ceil(L/h).astype(np.int_), 1)
+
+        self.key, self.cells = self.register(np.arange(NC), cmin, cmax)
+        self.finish()
+
+    def is_valid(self):
+        """
+        @brief 索引对应的节点和单元数组是否仍是网格当前的数组
+        """
+        mesh = self.mesh
+        node = mesh.entity('node')
+        cell = mesh.entity('cell')
+        return (node is self.node) and (cell is self.cell) and \
+                (node.shape == self.node.shape) and (cell.shape == self.cell.shape)
+
+    def geometry(self, index=np.s_[:]):
+        """
+        @brief 计算单元第 0 个顶点和仿射变换的逆
+        """
+        node = self.node
+        cell = self.cell
+        if isinstance(index, slice):
+            NC = cell.shape[0]
+            GD = node.shape[1]
+            self.x0 = np.zeros((NC, GD), dtype=node.dtype)
+            self.invJ = np.zeros((NC, GD, GD), dtype=node.dtype)
+        x0 = node[cell[index, 0]]
+        J = node[cell[index, 1:]] - x0[:, None, :] # (nc, TD, GD), 每行一个边向量
+        self.x0[index] = x0
+        self.invJ[index] = np.linalg.inv(np.swapaxes(J, -1, -2))
+
+    def cell_box(self, index=np.s_[:]):
+        p = self.node[self.cell[index]]
+        return p.min(axis=1), p.max(axis=1)
+
+    def bucket(self, p):
+        """
+        @brief 点 p 所在桶的多重编号, 区域外的点归到最近的桶
+        """
+        i = np.floor((p - self.origin)/self.h).astype(np.int_)
+        return np.clip(i, 0, self.shape - 1)
+
+    def register(self, index, cmin, cmax):
+        """
+        @brief 把单元 index 登记到与它的包围盒相交的桶中
+
+        Returns
+        -------
+        key : 桶的编号
+        cells : 对应的单元编号
+        """
+        lo = self.bucket(cmin)
+        hi = self.bucket(cmax)
+        cnt = hi - lo + 1
+        n = np.prod(cnt, axis=-1)
+
+        c = np.repeat(np.arange(len(index)), n)
+        local = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+        key = np.zeros(len(c), dtype=np.int_)
+        for d in range(lo.shape[1]):
+            key = key*self.shape[d] + lo[c, d] + local % cnt[c, d]
+            local //= cnt[c, d]
+        return key, index[c]
+
+    def finish(self):
+        """
+        @brief 按桶编号排序, 生成 CSR 格式的桶到单元的关系
+        """
+        idx = np.argsort(self.key, kind='stable')
+        self.key = self.key[idx]
+        self.cells = self.cells[idx]
+        NB = np.prod(self.shape)
+        self.indptr = np.zeros(NB + 1, dtype=np.int_)
+        self.indptr[1:] = np.cumsum(np.bincount(self.key, minlength=NB))
+
+    def update(self, index=None):
+        """
+        @brief 节点被原地移动以后, 更新单元 index 的几何量和登记的桶
+
+        Notes
+        -----
+        index 为 None 或单元个数改变时重新生成整个索引. 移动一个节点时, index
+        取包含该节点的所有单元.
+        """
+        mesh = self.mesh
+        if (index is None) or (mesh.entity('cell').shape != self.cell.shape):
+            self.build()
+            return
+
+        self.node = mesh.entity('node')
+        self.cell = mesh.entity('cell')
+        index = np.asarray(index)
+        if index.dtype == np.bool_:
+            index, = np.nonzero(index)
+
+        self.geometry(index)
+        cmin, cmax = self.cell_box(index)
+        isUpdated = np.zeros(self.cell.shape[0], dtype=np.bool_)
+        isUpdated[index] = True
+        flag = ~isUpdated[self.cells]
+        key, cells = self.register(index, cmin, cmax)
+        self.key = np.r_[self.key[flag], key]
+        self.cells = np.r_[self.cells[flag], cells]
+        self.finish()
+
+    def bc(self, p, index):
+        """
+        @brief 点 p 在单元 index 中的重心坐标
+        """
+        l = np.sum(self.invJ[index]*(p - self.x0[index])[:, None, :], axis=-1)
+        return np.c_[1 - l.sum(axis=-1), l]
+
+    def query(self, points, chunk=100000):
+        """
+        @brief 批量查询点所在的单元
+
+        Parameters
+        ----------
+        points : (NP, GD)
+        chunk : 每批处理的点数, 控制候选单元数组的内存
+
+        Returns
+        -------
+        cidx : (NP, ), 点所在的单元编号, 不在网格中的点为 -1
+        bcs : (NP, GD+1), 点在所在单元中的重心坐标
+        """
+        NP, GD = points.shape
+        cidx = np.full(NP, -1, dtype=np.int_)
+        bcs = np.zeros((NP, GD+1), dtype=points.dtype)
+        for start in range(0, NP, chunk):
+            index = np.s_[start:start+chunk]
+            cidx[index], bcs[index] = self._query(points[index])
+        return cidx, bcs
+
+    def _query(self, points):
+        NP, GD = points.shape
+        cidx = np.full(NP, -1, dtype=np.int_)
+        bcs = np.zeros((NP, GD+1), dtype=points.dtype)
+
+        b = np.ravel_multi_index(self.bucket(points).T, self.shape)
+        n = self.indptr[b+1] - self.indptr[b]
+        p = np.repeat(np.arange(NP), n)
+        local = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+        c = self.cells[self.indptr[b][p] + local]
+
+        bc = self.bc(points[p], c)
+        m = bc.min(axis=-1)
+        if len(m) == 0:
+            return cidx, bcs
+
+        # p 是有序的, 每个点取重心坐标最小分量最大的第一个候选单元
+        flag = n > 0
+        mmax = np.full(NP, -np.inf)
+        mmax[flag] = np.maximum.reduceat(m, (np.cumsum(n) - n)[flag])
+        idx, = np.nonzero((m == mmax[p]) & (m >= -self.eps))
+        idx = idx[np.r_[True, p[idx[1:]] != p[idx[:-1]]]] if len(idx) > 0 else idx
+        cidx[p[idx]] = c[idx]
+        bcs[p[idx]] = bc[idx]
+        return cidx, bcs
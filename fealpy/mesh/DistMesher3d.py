@@ -1,6 +1,5 @@
 import numpy as np
 from scipy.spatial import Delaunay
-import matplotlib.pyplot as plt
 
 from .TetrahedronMesh import TetrahedronMesh 
 
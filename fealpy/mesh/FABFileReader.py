@@ -3,8 +3,6 @@ import sys
 import numpy as np
 import scipy.io as sio
 
-import matplotlib.pyplot as plt
-
 from .TriangleMesh import TriangleMesh
 
 class FABFileReader:
@@ -11,7 +11,6 @@ Authors
 
 import time
 import numpy as np
-import matplotlib.pyplot as plt
 from scipy.sparse import coo_matrix, csc_matrix, csr_matrix, spdiags, eye, tril, triu
 from scipy.sparse.csgraph import minimum_spanning_tree
 
@@ -2213,7 +2212,7 @@ class HalfEdgeMesh2d(Mesh2d):
                     nodedata=nodedata,
                     celldata=celldata)
 
-    def grad_lambda(self):
+    def grad_lambda(self, index=np.s_[:]):
         """
 
         Notes
@@ -2225,8 +2224,8 @@ class HalfEdgeMesh2d(Mesh2d):
         assert self.ds.NV == 3 # 必须是三角形网格
 
         node = self.entity('node')
-        cell = self.entity('cell')
-        NC = self.number_of_cells()
+        cell = self.entity('cell')[index]
+        NC = len(cell)
 
         v0 = node[cell[:, 2], :] - node[cell[:, 1], :]
         v1 = node[cell[:, 0], :] - node[cell[:, 2], :]
@@ -1,15 +1,119 @@
 import numpy as np
+import re
 
 
 class InpFileReader():
+    """
+    读取 Abaqus 的 inp 网格文件.
 
+    Notes
+    -----
+    只读取 *Node, *Element 和 *Nset 三种关键字. 节点集合转化为网格的边界标记:
+    所有顶点都在集合中的边界面标记为集合的名字, 以后可以把这个名字作为边界
+    条件的 threshold.
+    """
     def __init__(self, fname):
         with open(fname, 'r') as f:
-            contents = f.read() 
-        contents = re.sub('**.*\n', '', contents) 
+            contents = f.read()
+        contents = re.sub(r'\*\*.*\n', '', contents) # 注释
         contents = contents.split('\n')
         self.contents = contents
         self.cline = 0
+        self.data = {'node': None, 'element': None, 'etype': None, 'nset': {}}
+
+    def read(self):
+        nodes = []
+        elements = []
+        while self.cline < len(self.contents):
+            line = self.contents[self.cline].strip()
+            self.cline += 1
+            if not line.startswith('*'):
+                continue
+            keyword, options = self.parse_keyword(line)
+            if keyword == 'node':
+                nodes.append(self.read_data(np.float64))
+            elif keyword == 'element':
+                self.data['etype'] = options.get('type')
+                elements.append(self.read_data(np.int_))
+            elif keyword == 'nset':
+                data = self.read_data(np.int_).reshape(-1)
+                if 'generate' in options:
+                    data = np.arange(data[0], data[1]+1, data[2] if len(data) > 2 else 1)
+                name = options['nset']
+                nset = self.data['nset']
+                nset[name] = np.r_[nset[name], data] if name in nset else data
+
+        node = np.concatenate(nodes, axis=0)
+        element = np.concatenate(elements, axis=0)
+
+        # 把节点的标签映射为从 0 开始的编号
+        label = node[:, 0].astype(np.int_)
+        idxmap = np.zeros(label.max()+1, dtype=np.int_)
+        idxmap[label] = np.arange(len(label))
+        self.data['node'] = node[:, 1:]
+        self.data['element'] = idxmap[element[:, 1:]]
+        for name, data in self.data['nset'].items():
+            self.data['nset'][name] = idxmap[data]
+        self.contents = None
+
+    def parse_keyword(self, line):
+        items = [s.strip() for s in line[1:].split(',')]
+        options = {}
+        for item in items[1:]:
+            key, _, val = item.partition('=')
+            options[key.lower()] = val
+        return items[0].lower(), options
+
+    def read_data(self, dtype):
+        """
+        @brief 读到下一个关键字为止的数据, 各行长度相同时返回二维数组, 否则
+            展平为一维数组 (如节点集合)
+        """
+        data = []
+        while self.cline < len(self.contents):
+            line = self.contents[self.cline].strip()
+            if line.startswith('*'):
+                break
+            self.cline += 1
+            if line:
+                data.append([float(s) for s in line.split(',') if s.strip()])
+        if len(set(map(len, data))) > 1:
+            data = [v for row in data for v in row]
+        return np.array(data, dtype=dtype)
+
+    def mesh(self):
+        """
+        @brief 由读入的数据生成网格, 节点集合设置为边界标记
+        """
+        from .TriangleMesh import TriangleMesh
+        from .QuadrangleMesh import QuadrangleMesh
+        from .TetrahedronMesh import TetrahedronMesh
+        from .HexahedronMesh import HexahedronMesh
+
+        node = self.data['node']
+        cell = self.data['element']
+        etype = (self.data['etype'] or '').upper()
+        NV = cell.shape[1]
+        if NV == 3:
+            mesh = TriangleMesh(node[:, :2] if etype.startswith('CP') else node, cell)
+        elif NV == 4 and etype.startswith('C3D'):
+            mesh = TetrahedronMesh(node, cell)
+        elif NV == 4:
+            mesh = QuadrangleMesh(node[:, :2] if etype.startswith('CP') else node, cell)
+        elif NV == 8:
+            mesh = HexahedronMesh(node, cell)
+        else:
+            raise ValueError("Unsupported element type {}!".format(etype))
+
+        NN = mesh.number_of_nodes()
+        index = mesh.ds.boundary_face_index()
+        face = mesh.entity('face')[index]
+        for name, nset in self.data['nset'].items():
+            isSetNode = np.zeros(NN, dtype=np.bool_)
+            isSetNode[nset] = True
+            mesh.set_boundary_marker(name, index[np.all(isSetNode[face], axis=-1)])
+        return mesh
+
 
 if __name__ == '__main__':
     import sys
@@ -17,3 +121,5 @@ if __name__ == '__main__':
     fname = sys.argv[1]
     reader = InpFileReader(fname)
     reader.read()
+    mesh = reader.mesh()
+    print(mesh.number_of_nodes(), mesh.number_of_cells(), list(mesh.boundarymarkers))
@@ -1,5 +1,6 @@
 import numpy as np
 from .mesh_tools import unique_row, find_node, find_entity, show_mesh_1d
+from .mesh_tools import threshold_face_index, set_boundary_marker, boundary_marker
 from scipy.sparse import csr_matrix
 from types import ModuleType
 
@@ -113,13 +114,13 @@ class IntervalMesh():
                     nodedata=self.nodedata,
                     celldata=self.celldata)
 
-    def grad_lambda(self):
+    def grad_lambda(self, index=np.s_[:]):
         """
-        @brief 计算所有单元上重心坐标函数的导数
+        @brief 计算单元 index 上重心坐标函数的导数
         """
         node = self.entity('node')
-        cell = self.entity('cell')
-        NC = self.number_of_cells()
+        cell = self.entity('cell')[index]
+        NC = len(cell)
         v = node[cell[:, 1]] - node[cell[:, 0]]
         GD = self.geo_dimension()
         Dlambda = np.zeros((NC, 2, GD), dtype=np.float)
@@ -267,6 +268,24 @@ class IntervalMesh():
             self.ds.reinit(NN+N, newCell)
 
 
+    def set_boundary_marker(self, name, threshold=None):
+        """
+        @brief 给满足 threshold 的边界面起名字 name, 见 `mesh_tools.set_boundary_marker`
+        """
+        set_boundary_marker(self, name, threshold=threshold)
+
+    def boundary_marker(self, name):
+        """
+        @brief 名字为 name 的边界面的编号
+        """
+        return boundary_marker(self, name)
+
+    def boundary_face_index(self, threshold=None):
+        """
+        @brief 满足 threshold 的边界面的编号, 见 `mesh_tools.threshold_face_index`
+        """
+        return threshold_face_index(self, threshold)
+
     def add_plot(self, plot,
             nodecolor='k', cellcolor='k',
             aspect='equal', linewidths=1, markersize=20,
@@ -400,4 +419,7 @@ class IntervalMeshDataStructure():
     def boundary_cell_index(self):
         isBdCell = self.boundary_cell_flag()
         idx, = np.nonzero(isBdCell)
-        return idx 
+        return idx
+
+    def boundary_face_index(self):
+        return self.boundary_node_index() 
@@ -183,8 +183,7 @@ class LagrangeQuadrangleMesh(Mesh2d):
 
             # Find the cutted edge  
             cell = self.entity('cell')
-            cell2edge = self.ds.cell_to_edge()
-            cell2edge += NCN
+            cell2edge = self.ds.cell_to_edge() + NCN
             edgeCenter = self.entity_barycenter('edge')
             cellCenter = self.entity_barycenter('cell')
 
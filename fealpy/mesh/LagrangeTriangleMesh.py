@@ -142,8 +142,7 @@ class LagrangeTriangleMesh(Mesh2d):
             NE = self.number_of_edges()
             node = self.entity('node')
             cell = self.entity('cell')
-            cell2edge = self.ds.cell_to_edge()
-            cell2edge += NCN
+            cell2edge = self.ds.cell_to_edge() + NCN
             edgeCenter = self.entity_barycenter('edge')
 
             if self.surface is not None:
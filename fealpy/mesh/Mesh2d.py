@@ -1,7 +1,10 @@
 import numpy as np
 from scipy.sparse import coo_matrix, csc_matrix, csr_matrix, spdiags, eye, tril, triu
-from .mesh_tools import unique_row, find_node, find_entity, show_mesh_2d
+from .mesh_tools import unique_row, unique_row_index, find_node, find_entity, show_mesh_2d
+from .mesh_tools import changed_cell_flag, update_entity_to_cell
+from .mesh_tools import threshold_face_index, set_boundary_marker, boundary_marker
 from ..common import ranges
+from ..decorator.cache import topology_cache, clear_cache, cache_nbytes
 from types import ModuleType
 
 class Mesh2d(object):
@@ -168,6 +171,24 @@ class Mesh2d(object):
         v = node[edge[index, 1],:] - node[edge[index, 0],:]
         return v
 
+    def set_boundary_marker(self, name, threshold=None):
+        """
+        @brief 给满足 threshold 的边界面起名字 name, 见 `mesh_tools.set_boundary_marker`
+        """
+        set_boundary_marker(self, name, threshold=threshold)
+
+    def boundary_marker(self, name):
+        """
+        @brief 名字为 name 的边界面的编号
+        """
+        return boundary_marker(self, name)
+
+    def boundary_face_index(self, threshold=None):
+        """
+        @brief 满足 threshold 的边界面的编号, 见 `mesh_tools.threshold_face_index`
+        """
+        return threshold_face_index(self, threshold)
+
     def add_plot(
             self, plot,
             nodecolor='w', edgecolor='k',
@@ -256,9 +277,49 @@ class Mesh2dDataStructure():
         self.cell = cell
         self.construct()
 
+    def update(self, NN, cell, cellmap=None, nodemap=None, changed=None):
+        """
+        @brief 网格局部修改 (加密或粗化) 以后, 增量地更新边和 edge2cell
+
+        Parameters
+        ----------
+        NN : 新的节点个数
+        cell : 新的单元数组
+        cellmap : 旧单元到新单元编号的映射, 删除的单元为 -1, 默认旧单元编号不变
+        nodemap : 旧节点到新节点编号的映射, 删除的节点为 -1, 默认旧节点编号不变
+        changed : 可能改变了的旧单元的编号, 默认逐个比较所有的旧单元
+
+        Notes
+        -----
+        只有改变了的单元和它们周围的边需要重新排序, 两侧单元都没有改变的边只改变
+        编号. 得到的边集合和 `construct` 相同, 但边的编号顺序可能不同.
+        """
+        isKeepCell0, isKeepCell = changed_cell_flag(self.cell, cell, cellmap, nodemap,
+                changed=changed)
+        self.edge, self.edge2cell = update_entity_to_cell(cell, self.localEdge,
+                self.edge, self.edge2cell, cellmap, nodemap, isKeepCell0, isKeepCell)
+        self.NN = NN
+        self.NC = cell.shape[0]
+        self.NE = self.edge.shape[0]
+        self.cell = cell
+        self.clear_cache()
+
     def clear(self):
         self.edge = None
         self.edge2cell = None
+        self.clear_cache()
+
+    def clear_cache(self):
+        """
+        @brief 清空缓存的拓扑关系, 网格被修改以后调用
+        """
+        clear_cache(self)
+
+    def cache_nbytes(self):
+        """
+        @brief 缓存的拓扑关系占用的内存 (字节)
+        """
+        return cache_nbytes(self)
 
     def number_of_nodes_of_cells(self):
         return self.NVC
@@ -287,21 +348,19 @@ class Mesh2dDataStructure():
     def construct(self):
         """ Construct edge and edge2cell from cell
         """
+        self.clear_cache()
         NC = self.NC
         NEC = self.NEC
 
         totalEdge = self.total_edge()
-        _, i0, j = np.unique(np.sort(totalEdge, axis=-1),
-                return_index=True,
-                return_inverse=True,
-                axis=0)
+        i0, j = unique_row_index(np.sort(totalEdge, axis=-1))
         NE = i0.shape[0]
         self.NE = NE
 
         self.edge2cell = np.zeros((NE, 4), dtype=self.itype)
 
         i1 = np.zeros(NE, dtype=self.itype)
-        i1[j] = range(NEC*NC)
+        i1[j] = np.arange(NEC*NC)
 
         self.edge2cell[:, 0] = i0//NEC
         self.edge2cell[:, 1] = i1//NEC
@@ -327,6 +386,7 @@ class Mesh2dDataStructure():
         else:
             return cell
 
+    @topology_cache
     def cell_to_edge(self, return_sparse=False):
         """ The neighbor information of cell to edge
         """
@@ -350,6 +410,7 @@ class Mesh2dDataStructure():
                     shape=(NC, NE), dtype=np.bool_)
             return cell2edge 
 
+    @topology_cache
     def cell_to_edge_sign(self):
         NE = self.NE
         NC = self.NC
@@ -365,6 +426,7 @@ class Mesh2dDataStructure():
     def cell_to_face_sign(self):
         return self.cell_to_edge_sign()
 
+    @topology_cache
     def cell_to_face(self, return_sparse=False):
         """ The neighbor information of cell to edge
         """
@@ -389,6 +451,7 @@ class Mesh2dDataStructure():
             return cell2edge 
 
 
+    @topology_cache
     def cell_to_cell(self, return_sparse=False, return_boundary=True, return_array=False):
         """ Consctruct the neighbor information of cells
         """
@@ -447,10 +510,12 @@ class Mesh2dDataStructure():
             edge2node = csr_matrix((val, (I, J)), shape=(NE, NN))
             return edge2node
 
+    @topology_cache
     def edge_to_edge(self):
         edge2node = self.edge_to_node(return_sparse=True)
         return edge2node*edge2node.T
 
+    @topology_cache
     def edge_to_cell(self, return_sparse=False):
         if return_sparse==False:
             return self.edge2cell
@@ -466,6 +531,7 @@ class Mesh2dDataStructure():
     def face_to_cell(self, return_sparse=False):
         return self.edge_to_cell(return_sparse=return_sparse)
 
+    @topology_cache
     def node_to_node(self, return_array=False):
 
         """ 
@@ -507,6 +573,7 @@ class Mesh2dDataStructure():
         node2node = csr_matrix((val, (I, J)), shape=(NN, NN), dtype=np.bool_)
         return node2node
 
+    @topology_cache
     def node_to_edge(self):
         """
         """
@@ -519,6 +586,7 @@ class Mesh2dDataStructure():
         node2edge = csr_matrix((val, (I, J)), shape=(NN, NE))
         return node2edge
 
+    @topology_cache
     def node_to_cell(self, return_localidx=False):
         """
         """
@@ -584,21 +652,25 @@ class Mesh2dDataStructure():
         isBdCell[edge2cell[isBdEdge,0]] = True
         return isBdCell 
 
+    @topology_cache
     def boundary_node_index(self):
         isBdPoint = self.boundary_node_flag()
         idx, = np.nonzero(isBdPoint)
         return idx 
 
+    @topology_cache
     def boundary_edge_index(self):
         isBdEdge = self.boundary_edge_flag()
         idx, = np.nonzero(isBdEdge)
         return idx 
 
+    @topology_cache
     def boundary_face_index(self):
         isBdEdge = self.boundary_edge_flag()
         idx, = np.nonzero(isBdEdge)
         return idx 
 
+    @topology_cache
     def boundary_cell_index(self):
         isBdCell = self.boundary_cell_flag()
         idx, = np.nonzero(isBdCell)
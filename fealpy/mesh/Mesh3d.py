@@ -2,8 +2,11 @@ import numpy as np
 
 from types import ModuleType
 from scipy.sparse import coo_matrix, csc_matrix, csr_matrix, spdiags, eye, tril, triu
-from .mesh_tools import unique_row, find_entity, show_mesh_3d, find_node
+from .mesh_tools import unique_row, unique_row_index, find_entity, show_mesh_3d, find_node
+from .mesh_tools import changed_cell_flag, update_entity_to_cell, update_cell_to_entity
+from .mesh_tools import threshold_face_index, set_boundary_marker, boundary_marker
 from ..common import ranges
+from ..decorator.cache import topology_cache, clear_cache, cache_nbytes
 
 
 class Mesh3d():
@@ -92,6 +95,24 @@ class Mesh3d():
         length = np.sqrt(np.square(v).sum(axis=1))
         return v/length.reshape(-1, 1)
 
+    def set_boundary_marker(self, name, threshold=None):
+        """
+        @brief 给满足 threshold 的边界面起名字 name, 见 `mesh_tools.set_boundary_marker`
+        """
+        set_boundary_marker(self, name, threshold=threshold)
+
+    def boundary_marker(self, name):
+        """
+        @brief 名字为 name 的边界面的编号
+        """
+        return boundary_marker(self, name)
+
+    def boundary_face_index(self, threshold=None):
+        """
+        @brief 满足 threshold 的边界面的编号, 见 `mesh_tools.threshold_face_index`
+        """
+        return threshold_face_index(self, threshold)
+
     def add_plot(
             self, plot,
             nodecolor='k', edgecolor='k', facecolor='w', cellcolor='w',
@@ -186,11 +207,55 @@ class Mesh3dDataStructure():
         self.cell = cell
         self.construct()
 
+    def update(self, NN, cell, cellmap=None, nodemap=None, changed=None):
+        """
+        @brief 网格局部修改 (加密或粗化) 以后, 增量地更新面, 边, face2cell 和
+            cell2edge
+
+        Parameters
+        ----------
+        NN : 新的节点个数
+        cell : 新的单元数组
+        cellmap : 旧单元到新单元编号的映射, 删除的单元为 -1, 默认旧单元编号不变
+        nodemap : 旧节点到新节点编号的映射, 删除的节点为 -1, 默认旧节点编号不变
+        changed : 可能改变了的旧单元的编号, 默认逐个比较所有的旧单元
+
+        Notes
+        -----
+        只有改变了的单元和它们周围的面与边需要重新排序. 得到的面和边的集合与
+        `construct` 相同, 但编号顺序可能不同.
+        """
+        isKeepCell0, isKeepCell = changed_cell_flag(self.cell, cell, cellmap, nodemap,
+                changed=changed)
+        self.face, self.face2cell = update_entity_to_cell(cell, self.localFace,
+                self.face, self.face2cell, cellmap, nodemap, isKeepCell0, isKeepCell)
+        self.edge, self.cell2edge = update_cell_to_entity(cell, self.localEdge,
+                self.edge, self.cell2edge, cellmap, nodemap, isKeepCell0, isKeepCell)
+        self.NN = NN
+        self.NC = cell.shape[0]
+        self.NF = self.face.shape[0]
+        self.NE = self.edge.shape[0]
+        self.cell = cell
+        self.clear_cache()
+
     def clear(self):
         self.face = None
         self.edge = None
         self.face2cell = None
         self.cell2edge = None
+        self.clear_cache()
+
+    def clear_cache(self):
+        """
+        @brief 清空缓存的拓扑关系, 网格被修改以后调用
+        """
+        clear_cache(self)
+
+    def cache_nbytes(self):
+        """
+        @brief 缓存的拓扑关系占用的内存 (字节)
+        """
+        return cache_nbytes(self)
 
     def number_of_nodes_of_cells(self):
         return self.NVC
@@ -214,15 +279,12 @@ class Mesh3dDataStructure():
         return totalFace
 
     def construct(self):
+        self.clear_cache()
         NC = self.NC
 
         totalFace = self.total_face()
 
-        _, i0, j = np.unique(
-                np.sort(totalFace, axis=1),
-                return_index=True,
-                return_inverse=True,
-                axis=0)
+        i0, j = unique_row_index(np.sort(totalFace, axis=1))
 
         self.face = totalFace[i0]
 
@@ -241,11 +303,9 @@ class Mesh3dDataStructure():
         self.face2cell[:, 3] = i1 % NFC
 
         totalEdge = self.total_edge()
-        self.edge, i2, j = np.unique(
-                np.sort(totalEdge, axis=1),
-                return_index=True,
-                return_inverse=True,
-                axis=0)
+        totalEdge = np.sort(totalEdge, axis=1)
+        i2, j = unique_row_index(totalEdge)
+        self.edge = totalEdge[i2]
         NEC = self.NEC
         self.cell2edge = np.reshape(j, (NC, NEC))
         self.NE = self.edge.shape[0]
@@ -272,6 +332,7 @@ class Mesh3dDataStructure():
                     ), shape=(NC, NN))
         return cell2node
 
+    @topology_cache
     def cell_to_edge(self, return_sparse=False):
         """ The neighbor information of cell to edge
         """
@@ -319,6 +380,7 @@ class Mesh3dDataStructure():
         cell2facesign[face2cell[:, 0], face2cell[:, 2]] = True 
         return cell2facesign
 
+    @topology_cache
     def cell_to_face(self, return_sparse=False):
         NC = self.NC
         NF = self.NF
@@ -340,6 +402,7 @@ class Mesh3dDataStructure():
                     ), shape=(NC, NF))
             return cell2face
 
+    @topology_cache
     def cell_to_cell(
             self, return_sparse=False,
             return_boundary=True, return_array=False):
@@ -410,6 +473,7 @@ class Mesh3dDataStructure():
                     ), shape=(NF, NN), dtype=np.bool_)
             return face2node
 
+    @topology_cache
     def face_to_edge(self, return_sparse=False):
         cell2edge = self.cell2edge
         face2cell = self.face2cell
@@ -434,10 +498,12 @@ class Mesh3dDataStructure():
                     ), shape=(NF, NE))
             return f2e
 
+    @topology_cache
     def face_to_face(self):
         face2edge = self.face_to_edge(return_sparse=True)
         return face2edge*face2edge.T
 
+    @topology_cache
     def face_to_cell(self, return_sparse=False):
         if return_sparse is False:
             return self.face2cell
@@ -472,10 +538,12 @@ class Mesh3dDataStructure():
                     ), shape=(NE, NN), dtype=np.bool_)
             return edge2node
 
+    @topology_cache
     def edge_to_edge(self):
         edge2node = self.edge_to_node(return_sparse=True)
         return edge2node*edge2node.T
 
+    @topology_cache
     def edge_to_face(self):
         NF = self.NF
         NE = self.NE
@@ -491,6 +559,7 @@ class Mesh3dDataStructure():
                 ), shape=(NE, NF))
         return edge2face
 
+    @topology_cache
     def edge_to_cell(self, return_localidx=False):
         NC = self.NC
         NE = self.NE
@@ -511,6 +580,7 @@ class Mesh3dDataStructure():
 
         return edge2cell
 
+    @topology_cache
     def node_to_node(self):
         """ The neighbor information of nodes
         """
@@ -527,6 +597,7 @@ class Mesh3dDataStructure():
                 ), shape=(NN, NN), dtype=np.bool_)
         return node2node
 
+    @topology_cache
     def node_to_edge(self):
         NN = self.NN
         NE = self.NE
@@ -541,6 +612,7 @@ class Mesh3dDataStructure():
                 ), shape=(NN, NE))
         return node2edge
 
+    @topology_cache
     def node_to_face(self):
         NN = self.NN
         NF = self.NF
@@ -557,6 +629,7 @@ class Mesh3dDataStructure():
                 ), shape=(NN, NF))
         return node2face
 
+    @topology_cache
     def node_to_cell(self, return_localidx=False):
         """
         """
@@ -614,21 +687,25 @@ class Mesh3dDataStructure():
         isBdCell[face2cell[isBdFace, 0]] = True
         return isBdCell
 
+    @topology_cache
     def boundary_node_index(self):
         isBdNode = self.boundary_node_flag()
         idx, = np.nonzero(isBdNode)
         return idx
 
+    @topology_cache
     def boundary_edge_index(self):
         isBdEdge = self.boundary_edge_flag()
         idx, = np.nonzero(isBdEdge)
         return idx
 
+    @topology_cache
     def boundary_face_index(self):
         isBdFace = self.boundary_face_flag()
         idx, = np.nonzero(isBdFace)
         return idx
 
+    @topology_cache
     def boundary_cell_index(self):
         isBdCell = self.boundary_cell_flag()
         idx, = np.nonzero(isBdCell)
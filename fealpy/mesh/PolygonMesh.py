@@ -1,7 +1,7 @@
 import numpy as np
 from scipy.sparse import coo_matrix, csc_matrix, csr_matrix, spdiags, eye, tril, triu
 from ..common import ranges
-from .mesh_tools import unique_row, find_entity, show_mesh_2d
+from .mesh_tools import unique_row, unique_row_index, find_entity, show_mesh_2d
 from ..quadrature import TriangleQuadrature
 from .Mesh2d import Mesh2d
 
@@ -321,10 +321,7 @@ class PolygonMeshDataStructure():
         NV = self.number_of_vertices_of_cells()
 
         totalEdge = self.total_edge()
-        _, i0, j = np.unique(np.sort(totalEdge, axis=1),
-                return_index=True,
-                return_inverse=True,
-                axis=0)
+        i0, j = unique_row_index(np.sort(totalEdge, axis=1))
         NE = i0.shape[0]
         self.NE = NE
         self.edge2cell = np.zeros((NE, 4), dtype=np.int)
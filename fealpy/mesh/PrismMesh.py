@@ -3,6 +3,7 @@ import numpy as np
 from numpy.linalg import det
 
 from .Mesh3d import Mesh3d, Mesh3dDataStructure
+from .mesh_tools import unique_row_index
 from ..quadrature import PrismQuadrature
 
 
@@ -136,11 +137,7 @@ class PrismMesh(Mesh3d):
             cell = self.entity('cell')
             ps = np.einsum('im, km->ikm', cell + (NN + NC), w)
             ps.sort()
-            _, i0, j = np.unique(
-                    ps.reshape(-1, 6),
-                    return_index=True,
-                    return_inverse=True,
-                    axis=0)
+            i0, j = unique_row_index(ps.reshape(-1, 6))
             ps = np.einsum('km, imd->ikd', w/p/p, node[cell]).reshape(-1, 3)
             self.node = ps[i0]
 
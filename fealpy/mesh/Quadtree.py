@@ -443,7 +443,15 @@ class Quadtree(QuadrangleMesh):
         isMarkedCell[leafCellIdx[isMarked]] = True
         return isMarkedCell
 
-    def refine(self, isMarkedCell=None, data=None):
+    def refine(self, isMarkedCell=None, data=None, returnim=False):
+        """
+        @brief 加密标记的叶子单元
+
+        @param[in] returnim 是否返回节点插值矩阵, 新的边中点取边两端点的平均,
+            新的单元中心取单元四个顶点的平均
+        """
+        N = self.number_of_nodes()
+        IM = None
         if isMarkedCell is None:
             idx = self.leaf_cell_index()
         else:
@@ -513,6 +521,16 @@ class Quadtree(QuadrangleMesh):
             NEC = len(edgeCenter)
             NCC = len(cellCenter)
 
+            if returnim:
+                e = edge[isNeedCutEdge]
+                c = cell[isNeedCutCell]
+                I = np.r_[np.arange(N), np.repeat(np.arange(N, N+NEC), 2),
+                        np.repeat(np.arange(N+NEC, N+NEC+NCC), 4)]
+                J = np.r_[np.arange(N), e.flat, c.flat]
+                val = np.r_[np.ones(N), np.full(2*NEC, 0.5), np.full(4*NCC, 0.25)]
+                IM = coo_matrix((val, (I, J)), shape=(N+NEC+NCC, N),
+                        dtype=node.dtype).tocsr()
+
             edge2center[isNeedCutEdge] = np.arange(N, N+NEC)
 
             cp = [cell[isNeedCutCell, i].reshape(-1, 1) for i in range(4)]
@@ -538,7 +556,13 @@ class Quadtree(QuadrangleMesh):
             self.node = np.concatenate((node, edgeCenter, cellCenter), axis=0)
             self.parent = np.concatenate((parent, newParent), axis=0)
             self.child = np.concatenate((child, newChild), axis=0)
-            self.ds.reinit(N + NEC + NCC, cell)
+            self.ds.update(N + NEC + NCC, cell, # 旧单元都没有改变
+                    changed=np.zeros(0, dtype=self.itype))
+
+        if returnim:
+            if IM is None: # 没有加密的单元
+                IM = coo_matrix((np.ones(N), (range(N), range(N))), shape=(N, N)).tocsr()
+            return IM
 
     def adaptive_coarsen(self, estimator, data=None):
         i = 0
@@ -620,7 +644,7 @@ class Quadtree(QuadrangleMesh):
                 ) == 0
             child[childIdx[isNewLeafCell], :] = -1
 
-            cellIdxMap = np.zeros(NC, dtype=self.itype)
+            cellIdxMap = np.full(NC, -1, dtype=self.itype)
             NNC = isRemainCell.sum()
             cellIdxMap[isRemainCell] = np.arange(NNC)
             child[child > -1] = cellIdxMap[child[child > -1]]
@@ -628,12 +652,13 @@ class Quadtree(QuadrangleMesh):
             self.child = child
             self.parent = parent
 
-            nodeIdxMap = np.zeros(NN, dtype=self.itype)
+            nodeIdxMap = np.full(NN, -1, dtype=self.itype)
             N = isRemainNode.sum()
             nodeIdxMap[isRemainNode] = np.arange(N)
             cell = nodeIdxMap[cell]
             self.node = node[isRemainNode]
-            self.ds.reinit(N, cell)
+            self.ds.update(N, cell, cellmap=cellIdxMap, nodemap=nodeIdxMap,
+                    changed=np.zeros(0, dtype=self.itype)) # 保留的单元没有改变
 
             if cell.shape[0] == NC:
                 return False
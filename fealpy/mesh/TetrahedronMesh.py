@@ -1,9 +1,10 @@
 import numpy as np
 from scipy.sparse import coo_matrix, csc_matrix, csr_matrix
 from scipy.sparse import spdiags, eye, tril, triu, bmat
-from scipy.spatial import KDTree
 from .mesh_tools import unique_row
 from .Mesh3d import Mesh3d, Mesh3dDataStructure
+from .CellLocator import CellLocator
+from .adaptive_tools import mark, refine_closure
 from ..quadrature import TetrahedronQuadrature, TriangleQuadrature, GaussLegendreQuadrature
 from ..decorator import timer
 
@@ -439,73 +440,35 @@ class TetrahedronMesh(Mesh3d):
                     nodedata=self.nodedata,
                     celldata=celldata)
 
-    def location(self, points):
+    def locator(self):
         """
-        @brief 计算给定点所在的四面体单元
-
-        这里假设：
-
-        1. 网格中没有洞
-        2. 区域还要是凸的
+        @brief 网格上的点定位索引, 第一次调用时生成, 网格改变后自动重新生成
 
+        Notes
+        -----
+        原地修改节点坐标后, 需要调用 `self.locator().update(index)` 更新.
         """
+        if (getattr(self, '_locator', None) is None) or (not self._locator.is_valid()):
+            self._locator = CellLocator(self)
+        return self._locator
 
+    def location(self, points, returnbc=False):
+        """
+        @brief 给定一组点 points, 找到这些点所在的单元
 
-        NN = self.number_of_nodes()
-        NC = self.number_of_cells()
-        NP = points.shape[0]
-
-        self.celldata['cell'] = np.zeros(NC)
-
-        node = self.entity('node')
-        cell = self.entity('cell')
-        cell2cell = self.ds.cell_to_cell()
-
-        start = np.zeros(NN, dtype=self.itype)
-        start[cell[:, 0]] = range(NC)
-        start[cell[:, 1]] = range(NC)
-        start[cell[:, 2]] = range(NC)
-        start[cell[:, 3]] = range(NC)
-
-        tree = KDTree(node)
-        _, loc = tree.query(points)
-        start = start[loc] # 设置一个初始单元位置
-
-        print("start:", start)
-
-        self.celldata['cell'][start] = 1
-
-        localFace = self.ds.localFace
-        isNotOK = np.ones(NP, dtype=np.bool)
-        while np.any(isNotOK):
-            idx = start[isNotOK] # 试探的单元编号
-            pp = points[isNotOK] # 还没有找到所在单元的点的坐标
-
-            v = node[cell[idx, :]] - pp[:, None, :] # (NP, 4, 3) - (NP, 1, 3)
-            # 计算点和当前四面体四个面形成四面体的体积
-            a = np.zeros((len(idx), 4), dtype=self.ftype)
-            for i in range(4):
-                vv = np.cross(v[:, localFace[i, 0]], v[:, localFace[i, 1]])
-                a[:, i] = np.sum(vv*v[:, localFace[i, 2]], axis=-1) 
-            lidx = np.argmin(a, axis=-1) 
-
-            # 最小体积小于 0, 说明点在单元外
-            isOutCell = a[range(a.shape[0]), lidx] < 0.0 
-
-            idx0, = np.nonzero(isNotOK)
-            flag = (idx[isOutCell] == cell2cell[idx[isOutCell],
-                lidx[isOutCell]])
-
-            start[idx0[isOutCell][~flag]] = cell2cell[idx[isOutCell][~flag],
-                    lidx[isOutCell][~flag]]
-            start[idx0[isOutCell][flag]] = -1 
-
-            self.celldata['cell'][start[start > -1]] = 1
-
-            isNotOK[idx0[isOutCell][flag]] = False
-            isNotOK[idx0[~isOutCell]] = False
+        @param[in] points (NP, GD)
+        @param[in] returnbc 是否同时返回点在所在单元中的重心坐标
 
-        return start 
+        Notes
+        -----
+        基于 `CellLocator` 的桶索引, 区域可以是非凸的或有洞的. 不在网格中的点的
+        单元编号为 -1.
+        """
+        cidx, bcs = self.locator().query(points)
+        if returnbc:
+            return cidx, bcs
+        else:
+            return cidx
 
     def direction(self, i):
         """ Compute the direction on every node of
@@ -683,13 +646,16 @@ class TetrahedronMesh(Mesh3d):
 
         return grad/wgt.reshape(-1, 1)
 
-    def grad_lambda(self):
+    def grad_lambda(self, index=np.s_[:]):
+        """
+        @brief 计算单元 index 上重心坐标函数的梯度
+        """
         localFace = self.ds.localFace
         node = self.node
-        cell = self.ds.cell
-        NC = self.number_of_cells()
+        cell = self.ds.cell[index]
+        NC = len(cell)
         Dlambda = np.zeros((NC, 4, 3), dtype=self.ftype)
-        volume = self.cell_volume()
+        volume = self.cell_volume(index=index)
         for i in range(4):
             j,k,m = localFace[i]
             vjk = node[cell[:,k],:] - node[cell[:,j],:]
@@ -753,7 +719,22 @@ class TetrahedronMesh(Mesh3d):
         for i in range(n):
             self.bisect()
 
+    def refine_marker(self, eta, theta, method="L2"):
+        """
+        @brief 由单元上的误差指示子 eta 标记要加密的单元, 用于 bisect
+
+        @param[in] method 标记策略, 见 `adaptive_tools.mark`
+        """
+        return mark(eta, theta, method=method)
+
     def bisect(self, isMarkedCell=None, data=None, returnim=False):
+        """
+        @brief 最长边二分加密
+
+        @param[in] data 节点上的数据, 字典, 值的形状为 (NN, ...), 新节点上的值
+            取二分边两个端点的平均
+        @param[in] returnim 是否返回节点插值矩阵
+        """
 
         NN = self.number_of_nodes()
         NC = self.number_of_cells()
@@ -761,7 +742,19 @@ class TetrahedronMesh(Mesh3d):
         if isMarkedCell is None: # 加密所有的单元
             markedCell = np.arange(NC, dtype=self.itype)
         else:
-            markedCell, = np.nonzero(isMarkedCell)
+            # 一次求出第一代的协调闭包: 二分单元的最长边时, 包含这条边的
+            # 单元都要二分. 闭包中的单元在第一轮中一起二分, 下面的循环只需
+            # 处理新单元之间的不协调. 新单元的编号顺序因此与逐层扩展闭包时
+            # 不同, 但加密后的网格 (单元集合) 是一样的
+            node = self.entity('node')
+            cell = self.entity('cell')
+            localEdge = self.ds.localEdge
+            v = node[cell[:, localEdge[:, 1]]] - node[cell[:, localEdge[:, 0]]]
+            lidx = np.argmax(np.sum(v**2, axis=-1), axis=-1) # 和 label 一致
+            refineEdge = self.ds.cell_to_edge()[np.arange(NC), lidx]
+            dependency = self.ds.edge_to_cell()[refineEdge]
+            isRefineCell = refine_closure(dependency, isMarkedCell)
+            markedCell, = np.nonzero(isRefineCell)
 
         # allocate new memory for node and cell
         node = np.zeros((9*NN, 3), dtype=self.ftype)
@@ -770,10 +763,16 @@ class TetrahedronMesh(Mesh3d):
         node[:NN] = self.entity('node')
         cell[:NC] = self.entity('cell')
 
-        for key in self.celldata:
-            data = np.zeros(4*NC, dtype=self.itype)
-            data[:NC] = self.celldata[key]
-            self.celldata[key] = data.copy()
+        for key, value in self.celldata.items():
+            val = np.zeros((4*NC, ) + value.shape[1:], dtype=value.dtype)
+            val[:NC] = value
+            self.celldata[key] = val
+
+        if data is not None:
+            for key, value in data.items():
+                val = np.zeros((9*NN, ) + value.shape[1:], dtype=value.dtype)
+                val[:NN] = value
+                data[key] = val
 
         # 用于存储网格节点的代数，初始所有节点都为第 0 代
         generation = np.zeros(NN + 6*NC, dtype=np.uint8)
@@ -787,7 +786,10 @@ class TetrahedronMesh(Mesh3d):
         # 非协调边的标记数组 
         nonConforming = np.ones(8*NN, dtype=np.bool)
         IM = eye(NN)
+        NC0 = NC
+        changed = [np.zeros(0, dtype=self.itype)] # 二分了的旧单元
         while len(markedCell) != 0:
+            changed.append(markedCell[markedCell < NC0])
             # 标记最长边
             self.label(node, cell, markedCell)
 
@@ -838,6 +840,9 @@ class TetrahedronMesh(Mesh3d):
                 cutEdge[newCutEdge, 1] = j
                 cutEdge[newCutEdge, 2] = range(NN, NN+nNew)
                 node[NN:NN+nNew, :] = (node[i, :] + node[j, :])/2.0
+                if data is not None:
+                    for value in data.values():
+                        value[NN:NN+nNew] = (value[i] + value[j])/2.0
                 if returnim is True:
                     val = np.full(nNew, 0.5)
                     I = coo_matrix(
@@ -878,9 +883,8 @@ class TetrahedronMesh(Mesh3d):
             cell[NC:NC+nMarked, 2] = p3
             cell[NC:NC+nMarked, 3] = p4
 
-            for key in self.celldata:
-                data = self.celldata[key]
-                data[NC:NC+nMarked] = data[markedCell]
+            for value in self.celldata.values():
+                value[NC:NC+nMarked] = value[markedCell]
 
             NC = NC + nMarked
             del cellGeneration, p0, p1, p2, p3, p4
@@ -909,16 +913,27 @@ class TetrahedronMesh(Mesh3d):
 
         self.node = node[:NN]
         cell = cell[:NC]
-        self.ds.reinit(NN, cell)
+        self.ds.update(NN, cell, changed=np.concatenate(changed))
 
         for key in self.celldata:
             self.celldata[key] = self.celldata[key][:NC]
 
+        if data is not None:
+            for key in data:
+                data[key] = data[key][:NN]
+
         if returnim is True:
             return IM
 
     @timer
-    def uniform_refine(self, n=1):
+    def uniform_refine(self, n=1, returnim=False):
+        """
+        @brief 一致加密四面体网格
+
+        @param[in] returnim 是否返回每次加密的节点插值矩阵列表
+        """
+        if returnim:
+            nodeIMatrix = []
         for i in range(n):
             N = self.number_of_nodes()
             NC = self.number_of_cells()
@@ -932,6 +947,13 @@ class TetrahedronMesh(Mesh3d):
             edge2newNode = np.arange(N, N+NE)
             newNode = (node[edge[:,0],:]+node[edge[:,1],:])/2.0
 
+            if returnim:
+                val = np.full(NE, 0.5)
+                A = coo_matrix((np.ones(N), (range(N), range(N))), shape=(N+NE, N), dtype=self.ftype)
+                A += coo_matrix((val, (range(N, N+NE), edge[:, 0])), shape=(N+NE, N), dtype=self.ftype)
+                A += coo_matrix((val, (range(N, N+NE), edge[:, 1])), shape=(N+NE, N), dtype=self.ftype)
+                nodeIMatrix.append(A.tocsr())
+
             self.node = np.concatenate((node, newNode), axis=0)
 
             p = edge2newNode[cell2edge]
@@ -980,6 +1002,9 @@ class TetrahedronMesh(Mesh3d):
             N = self.number_of_nodes()
             self.ds.reinit(N, newCell)
 
+        if returnim:
+            return nodeIMatrix
+
     def is_valid(self):
         vol = self.volume()
         return np.all(vol > 1e-15)
@@ -34,15 +34,32 @@ def meshpy2d(points, facets, h, hole_points=None, refine_function=None):
     return TriangleMesh(node, cell)
 
 def gmsh_to_TriangleMesh():
+    """
+    @brief 把 gmsh 当前模型中的三角形网格转化为 TriangleMesh
+
+    Notes
+    -----
+    一维的物理组 (physical group) 转化为网格的边界标记, 名字为物理组的名字,
+    没有名字时为它的编号.
+    """
     import gmsh
     ntags, vxyz, _ = gmsh.model.mesh.getNodes()
     node = vxyz.reshape((-1,3))
     node = node[:,:2]
-    vmap = dict({j:i for i,j in enumerate(ntags)})
+    vmap = np.zeros(ntags.max()+1, dtype=np.int_)
+    vmap[ntags] = np.arange(len(ntags))
     tris_tags,evtags = gmsh.model.mesh.getElementsByType(2)
-    evid = np.array([vmap[j] for j in evtags])
+    evid = vmap[evtags]
     cell = evid.reshape((tris_tags.shape[-1],-1))
-    return TriangleMesh(node,cell)
+    mesh = TriangleMesh(node,cell)
+
+    for dim, tag in gmsh.model.getPhysicalGroups(dim=1):
+        name = gmsh.model.getPhysicalName(dim, tag) or str(tag)
+        edge = [gmsh.model.mesh.getElementsByType(1, tag=e)[1]
+                for e in gmsh.model.getEntitiesForPhysicalGroup(dim, tag)]
+        edge = vmap[np.concatenate(edge)].reshape(-1, 2)
+        mesh.set_boundary_marker(name, edge)
+    return mesh
 
 def smoothing(self, mesh, stype='laplace'):
     pass
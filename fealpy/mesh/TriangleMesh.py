@@ -1,7 +1,8 @@
 import numpy as np
 from scipy.sparse import coo_matrix, csc_matrix, csr_matrix, spdiags, bmat, eye
-from scipy.spatial import KDTree
 from .Mesh2d import Mesh2d, Mesh2dDataStructure
+from .CellLocator import CellLocator
+from .adaptive_tools import mark, refine_closure
 from ..quadrature import TriangleQuadrature
 from ..quadrature import GaussLegendreQuadrature
 from fealpy.mesh.TriangleMeshData import gphigphiphi,phiphi,gphigphi,gphiphi,phigphiphi,phiphiphi
@@ -149,14 +150,17 @@ class TriangleMesh(Mesh2d):
             idx.remove(i)
             R[..., i] = M[..., i]*np.prod(Q[..., idx], axis=-1)
 
-        Dlambda = self.grad_lambda()
-        gphi = np.einsum('...ij, kjm->...kim', R, Dlambda[index])
+        Dlambda = self.grad_lambda(index=index)
+        gphi = np.einsum('...ij, kjm->...kim', R, Dlambda)
         return gphi #(..., NC, ldof, GD)
 
-    def grad_lambda(self):
+    def grad_lambda(self, index=np.s_[:]):
+        """
+        @brief 计算单元 index 上重心坐标函数的梯度
+        """
         node = self.node
-        cell = self.ds.cell
-        NC = self.number_of_cells()
+        cell = self.ds.cell[index]
+        NC = len(cell)
         v0 = node[cell[:, 2]] - node[cell[:, 1]]
         v1 = node[cell[:, 0]] - node[cell[:, 2]]
         v2 = node[cell[:, 1]] - node[cell[:, 0]]
@@ -175,7 +179,8 @@ class TriangleMesh(Mesh2d):
             Dlambda[:, 0] = np.cross(n, v0)/length[:, None]
             Dlambda[:, 1] = np.cross(n, v1)/length[:, None]
             Dlambda[:, 2] = np.cross(n, v2)/length[:, None]
-        self.glambda = Dlambda
+        if isinstance(index, slice) and index == np.s_[:]:
+            self.glambda = Dlambda
         return Dlambda
 
     def rot_lambda(self):
@@ -578,57 +583,35 @@ class TriangleMesh(Mesh2d):
 
         return isCrossedCell
 
-    def location(self, points):
+    def locator(self):
         """
+        @brief 网格上的点定位索引, 第一次调用时生成, 网格改变后自动重新生成
+
         Notes
         -----
-        给定一组点 p ， 找到这些点所在的单元
-
-        这里假设：
-
-        1. 所有点在网格内部，
-        2. 网格中没有洞
-        3. 区域还要是凸的
+        原地修改节点坐标后, 需要调用 `self.locator().update(index)` 更新.
         """
+        if (getattr(self, '_locator', None) is None) or (not self._locator.is_valid()):
+            self._locator = CellLocator(self)
+        return self._locator
 
-        NN = self.number_of_nodes()
-        NC = self.number_of_cells()
-        NP = points.shape[0]
-        node = self.entity('node')
-        cell = self.entity('cell')
-        cell2cell = self.ds.cell_to_cell()
-
-        start = np.zeros(NN, dtype=self.itype)
-        start[cell[:, 0]] = range(NC)
-        start[cell[:, 1]] = range(NC)
-        start[cell[:, 2]] = range(NC)
-        tree = KDTree(node)
-        _, loc = tree.query(points)
-        start = start[loc] # 设置一个初始单元位置
-
-        isNotOK = np.ones(NP, dtype=np.bool)
-        while np.any(isNotOK):
-            idx = start[isNotOK]
-            pp = points[isNotOK]
-
-            v0 = node[cell[idx, 0]] - pp # 所在单元的三个顶点
-            v1 = node[cell[idx, 1]] - pp 
-            v2 = node[cell[idx, 2]] - pp
-
-            a = np.zeros((len(idx), 3), dtype=self.ftype)
-            a[:, 0] = np.cross(v1, v2)
-            a[:, 1] = np.cross(v2, v0)
-            a[:, 2] = np.cross(v0, v1)
-            lidx = np.argmin(a, axis=-1) 
-
-            # 最小面积小于 0, 说明点在单元外
-            isOutCell = a[range(a.shape[0]), lidx] < 0.0 
+    def location(self, points, returnbc=False):
+        """
+        @brief 给定一组点 points, 找到这些点所在的单元
 
-            idx0, = np.nonzero(isNotOK)
-            start[idx0[isOutCell]] = cell2cell[idx[isOutCell], lidx[isOutCell]]
-            isNotOK[idx0[~isOutCell]] = False
+        @param[in] points (NP, GD)
+        @param[in] returnbc 是否同时返回点在所在单元中的重心坐标
 
-        return start 
+        Notes
+        -----
+        基于 `CellLocator` 的桶索引, 区域可以是非凸的或有洞的. 不在网格中的点的
+        单元编号为 -1.
+        """
+        cidx, bcs = self.locator().query(points)
+        if returnbc:
+            return cidx, bcs
+        else:
+            return cidx
 
     def circumcenter(self, index=np.s_[:], returnradius=False):
         """
@@ -729,18 +712,41 @@ class TriangleMesh(Mesh2d):
         for i in range(n):
             self.bisect()
 
+    def refine_marker(self, eta, theta, method="L2"):
+        """
+        @brief 由单元上的误差指示子 eta 标记要加密的单元, 用于 bisect
+
+        @param[in] method 标记策略, 见 `adaptive_tools.mark`
+        """
+        return mark(eta, theta, method=method)
+
     def bisect_options(
             self,
             HB=None,
             IM=None,
             data=None,
+            nodedata=None,
             disp=True,
             ):
+        """
+        @brief bisect 和 coarsen 的选项
+
+        Parameters
+        ----------
+        HB : 新单元到旧单元的映射
+        IM : 节点插值矩阵 (加密) 或者限制矩阵 (粗化), 形状为 (新节点个数,
+            旧节点个数), 新网格上的节点值为 IM@u
+        data : 单元上的数据, 字典, 值为分片常数 (NC, ) 或者单元上的 p 次
+            Lagrange 多项式的自由度 (NC, ldof)
+        nodedata : 节点上的数据, 字典, 值的形状为 (NN, ...), 按线性插值 (加密)
+            或者直接限制 (粗化) 到新的节点上
+        """
 
         options = {
                 'HB': HB,
                 'IM': IM,
                 'data': data,
+                'nodedata': nodedata,
                 'disp': disp
             }
         return options
@@ -773,11 +779,12 @@ class TriangleMesh(Mesh2d):
         if options['disp']:
             print('The initial number of marked elements:', isMarkedCell.sum())
 
-        markedCell, = np.nonzero(isMarkedCell)
-        while len(markedCell)>0:
-            isCutEdge[cell2edge[markedCell, 0]]=True
-            refineNeighbor = cell2cell[markedCell, 0]
-            markedCell = refineNeighbor[~isCutEdge[cell2edge[refineNeighbor,0]]]
+        # 二分单元的加密边时, 必须同时二分这条边另一侧的单元. 在依赖图上
+        # 一次求出协调闭包, 不再逐层循环
+        dependency = csr_matrix((np.ones(NC, dtype=np.bool_),
+            (np.arange(NC), cell2cell[:, 0])), shape=(NC, NC))
+        isRefineCell = refine_closure(dependency, isMarkedCell)
+        isCutEdge[cell2edge[isRefineCell, 0]] = True
 
         if options['disp']:
             print('The number of markedg edges: ', isCutEdge.sum())
@@ -790,10 +797,8 @@ class TriangleMesh(Mesh2d):
         self.node = np.concatenate((node, newNode), axis=0)
         cell2edge0 = cell2edge[:, 0]
 
-        if 'data' in options:
-            pass
-
-        if 'IM' in options:
+        if ('IM' in options) or \
+                (('nodedata' in options) and (options['nodedata'] is not None)):
             nn = len(newNode)
             IM = coo_matrix((np.ones(NN), (np.arange(NN), np.arange(NN))),
                     shape=(NN+nn, NN), dtype=self.ftype)
@@ -814,16 +819,26 @@ class TriangleMesh(Mesh2d):
                             edge[isCutEdge, 1]
                         )
                     ), shape=(NN+nn, NN), dtype=self.ftype)
-            options['IM'] = IM.tocsr()
+            IM = IM.tocsr()
+            if 'IM' in options:
+                options['IM'] = IM
+            if ('nodedata' in options) and (options['nodedata'] is not None):
+                for key, value in options['nodedata'].items():
+                    shape = value.shape
+                    value = IM@value.reshape(shape[0], -1)
+                    options['nodedata'][key] = value.reshape((-1, ) + shape[1:])
 
         if 'HB' in options:
             options['HB'] = np.arange(NC)
 
+        NC0 = NC
+        changed = [] # 二分了的旧单元
         for k in range(2):
             idx, = np.nonzero(edge2newNode[cell2edge0]>0)
             nc = len(idx)
             if nc == 0:
                 break
+            changed.append(idx[idx < NC0])
 
             if 'HB' in options:
                 HB = options['HB']
@@ -836,7 +851,7 @@ class TriangleMesh(Mesh2d):
                 for key, value in options['data'].items():
                     if len(value.shape) == 1: # 分片常数
                         value = np.r_[value, value[idx]]
-                        options[key] = value
+                        options['data'][key] = value
                     else:
                         ldof = value.shape[-1]
                         p = int((np.sqrt(1+8*ldof)-3)//2)
@@ -883,7 +898,8 @@ class TriangleMesh(Mesh2d):
             NC = NC+nc
 
         NN = self.node.shape[0]
-        self.ds.reinit(NN, cell)
+        changed = np.concatenate(changed) if changed else np.zeros(0, dtype=self.itype)
+        self.ds.update(NN, cell, changed=changed)
 
     def coarsen(self, isMarkedCell=None, options={}):
         """
@@ -899,7 +915,7 @@ class TriangleMesh(Mesh2d):
         NN = self.number_of_nodes()
         NC = self.number_of_cells()
 
-        cell = self.entity('cell')
+        cell = self.entity('cell').copy() # 下面会原地修改单元
         node = self.entity('node')
 
         valence = np.zeros(NN, dtype=self.itype)
@@ -987,14 +1003,28 @@ class TriangleMesh(Mesh2d):
         cell = cell[isKeepCell]
         isGoodNode = (isIGoodNode | isBGoodNode)
 
-        idxMap = np.zeros(NN, dtype=self.itype)
+        cellMap = np.full(NC, -1, dtype=self.itype)
+        cellMap[isKeepCell] = range(cell.shape[0])
+
+        idxMap = np.full(NN, -1, dtype=self.itype)
         self.node = node[~isGoodNode]
 
+        NN0 = NN
         NN = self.node.shape[0]
         idxMap[~isGoodNode] = range(NN)
         cell = idxMap[cell]
 
-        self.ds = TriangleMeshDataStructure(NN, cell)
+        if 'IM' in options:
+            # 粗化的节点限制矩阵, 删除的节点上的值直接丢掉
+            options['IM'] = csr_matrix((np.ones(NN, dtype=self.ftype),
+                (np.arange(NN), np.nonzero(~isGoodNode)[0])), shape=(NN, NN0))
+
+        if ('nodedata' in options) and (options['nodedata'] is not None):
+            for key, value in options['nodedata'].items():
+                options['nodedata'][key] = value[~isGoodNode]
+
+        self.ds.update(NN, cell, cellmap=cellMap, nodemap=idxMap,
+                changed=np.r_[t0, t2, t4])
 
 
     def label(self, node=None, cell=None, cellidx=None):
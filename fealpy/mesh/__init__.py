@@ -2,57 +2,71 @@
 mesh
 ====
 
-This module provide mesh 
+This module provide mesh
 
+Notes
+-----
+所有的网格类, 网格生成器和网格读入器都按 PEP 562 懒加载, `import fealpy.mesh`
+时不导入任何子模块, 第一次访问 `fealpy.mesh.TriangleMesh` 时才导入它所在的
+子模块.
 '''
 
-# 结构化网格
-from .UniformMesh1d import UniformMesh1d
-from .UniformMesh2d import UniformMesh2d,UniformMesh2dFunction
-from .UniformMesh3d import UniformMesh3d,UniformMesh3dFunction
-from .StructureIntervalMesh import StructureIntervalMesh
-from .StructureQuadMesh import StructureQuadMesh
-from .StructureHexMesh import StructureHexMesh
+from ..core.lazy import attach
 
-from .TriangleMesh import TriangleMesh, TriangleMeshWithInfinityNode
-from .PolygonMesh import PolygonMesh
-from .QuadrangleMesh import QuadrangleMesh
-from .TetrahedronMesh import TetrahedronMesh
-from .IntervalMesh import IntervalMesh
-from .HexahedronMesh import HexahedronMesh
-from .TrussMesh import TrussMesh
+__getattr__, __dir__, __all__ = attach(__name__, {
+    # 结构化网格
+    'UniformMesh1d': ['UniformMesh1d'],
+    'UniformMesh2d': ['UniformMesh2d', 'UniformMesh2dFunction'],
+    'UniformMesh3d': ['UniformMesh3d', 'UniformMesh3dFunction'],
+    'StructureIntervalMesh': ['StructureIntervalMesh'],
+    'StructureQuadMesh': ['StructureQuadMesh'],
+    'StructureHexMesh': ['StructureHexMesh'],
 
-from .SurfaceTriangleMesh import SurfaceTriangleMesh
-from .PrismMesh import PrismMesh
+    'TriangleMesh': ['TriangleMesh', 'TriangleMeshWithInfinityNode'],
+    'PolygonMesh': ['PolygonMesh'],
+    'QuadrangleMesh': ['QuadrangleMesh'],
+    'TetrahedronMesh': ['TetrahedronMesh'],
+    'IntervalMesh': ['IntervalMesh'],
+    'HexahedronMesh': ['HexahedronMesh'],
+    'TrussMesh': ['TrussMesh'],
+    'CellLocator': ['CellLocator'],
 
-from .LagrangeTriangleMesh import LagrangeTriangleMesh
-from .LagrangeQuadrangleMesh import LagrangeQuadrangleMesh
-from .LagrangeHexahedronMesh import LagrangeHexahedronMesh
-from .LagrangeWedgeMesh import LagrangeWedgeMesh
+    'SurfaceTriangleMesh': ['SurfaceTriangleMesh'],
+    'PrismMesh': ['PrismMesh'],
 
-from .Tritree import Tritree
-from .Quadtree import Quadtree
-from .Octree import Octree
+    'LagrangeTriangleMesh': ['LagrangeTriangleMesh'],
+    'LagrangeQuadrangleMesh': ['LagrangeQuadrangleMesh'],
+    'LagrangeHexahedronMesh': ['LagrangeHexahedronMesh'],
+    'LagrangeWedgeMesh': ['LagrangeWedgeMesh'],
 
-from .QuadtreeForest import QuadtreeMesh, QuadtreeForest
+    'Tritree': ['Tritree'],
+    'Quadtree': ['Quadtree'],
+    'Octree': ['Octree'],
 
+    'QuadtreeForest': ['QuadtreeMesh', 'QuadtreeForest'],
 
-from .distmesh import DistMesh2d
-from .mesh_tools import *
+    'distmesh': ['DistMesh2d'],
+    'mesh_tools': [
+        'find_node', 'find_entity', 'show_halfedge_mesh',
+        'show_mesh_1d', 'show_mesh_2d', 'show_mesh_3d',
+        'unique_row', 'unique_row_index', 'match_row_index',
+        'changed_cell_flag', 'update_entity_to_cell', 'update_cell_to_entity',
+        'threshold_face_index', 'set_boundary_marker', 'boundary_marker',
+        'show_point', 'show_mesh_quality', 'show_mesh_angle', 'show_solution'],
 
+    'HalfEdgeDomain': ['HalfEdgeDomain'],
+    'HalfEdgeMesh2d': ['HalfEdgeMesh2d'],
+    'DartMesh3d': ['DartMesh3d'],
 
-from .HalfEdgeDomain import HalfEdgeDomain
-from .HalfEdgeMesh2d import HalfEdgeMesh2d
-from .DartMesh3d import DartMesh3d
+    'PolyFileReader': ['PolyFileReader'],
+    'InpFileReader': ['InpFileReader'],
+    'CCGMeshReader': ['CCGMeshReader'],
+    'FABFileReader': ['FABFileReader'],
 
-from .PolyFileReader import PolyFileReader
-from .InpFileReader import InpFileReader
-from .CCGMeshReader import CCGMeshReader
-from .FABFileReader import FABFileReader
+    'meshio': ['load_mat_mesh'],
 
-from .meshio import load_mat_mesh
-
-# Mesher
-from .DistMesher2d import DistMesher2d
-from .DistMesher3d import DistMesher3d
-from .CVTPMesher import CVTPMesher, VoroAlgorithm
+    # Mesher
+    'DistMesher2d': ['DistMesher2d'],
+    'DistMesher3d': ['DistMesher3d'],
+    'CVTPMesher': ['CVTPMesher', 'VoroAlgorithm'],
+    })
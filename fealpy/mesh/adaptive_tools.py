@@ -1,21 +1,111 @@
 import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import breadth_first_order
 
 def mark(eta, theta, method='L2'):
-    isMarked = np.zeros(len(eta), dtype=np.bool)
+    """
+    @brief 根据误差指示子标记要加密 (或粗化) 的单元
+
+    Parameters
+    ----------
+    eta : 每个单元上的误差指示子
+    theta : 标记参数
+    method : 标记策略
+
+        * 'L2' : Dörfler (bulk) 标记, 标记误差最大的一组单元, 使它们的
+          eta**2 之和刚好不超过总和的 theta 倍, 至少标记一个单元; theta >= 1
+          时标记所有 eta 非零的单元;
+        * 'MAX' : 标记 eta > theta*max(eta) 的单元;
+        * 'EQUI' : 均匀分布策略, 标记 eta**2 > theta*mean(eta**2) 的单元;
+        * 'COARSEN' : 标记 eta < theta*max(eta) 的单元, 用于粗化.
+
+    Notes
+    -----
+    各种策略的计算量都是 O(N), Dörfler 标记不对 eta 整体排序, 而是用
+    `bulk_threshold` 求出要标记的单元个数, 再用 `np.argpartition` 选出
+    这些单元. theta >= 1 时的阈值就是总和本身, 部分和的舍入误差会让最后几个
+    单元落在阈值之外, 所以单独处理.
+    """
+    isMarked = np.zeros(len(eta), dtype=np.bool_)
     if method == 'MAX':
         isMarked[eta > theta*np.max(eta)] = True
     elif method == 'COARSEN':
         isMarked[eta < theta*np.max(eta)] = True
+    elif method == 'EQUI':
+        eta = eta**2
+        isMarked[eta > theta*np.mean(eta)] = True
+    elif method == 'L2' and theta >= 1:
+        isMarked[eta != 0] = True
+        isMarked[np.argmax(np.abs(eta))] = True
     elif method == 'L2':
         eta = eta**2
-        idx = np.argsort(eta)[-1::-1]
-        x = np.cumsum(eta[idx])
-        isMarked[idx[x < theta*x[-1]]] = True
-        isMarked[idx[0]] = True
+        NC = len(eta)
+        k = max(bulk_threshold(eta, theta*np.sum(eta)), 1)
+        idx = np.argpartition(eta, NC-k)[NC-k:]
+        isMarked[idx] = True
     else:
         raise ValueError("I have not code the method")
     return isMarked 
 
+def bulk_threshold(eta, target, nsort=1024):
+    """
+    @brief 非负数组 eta 中, 最大的 k 个数之和小于 target 的最大的 k
+
+    Notes
+    -----
+    每次用 `np.partition` 把候选的数分成大小相等的两半, 如果较大的一半加上
+    已经选定的数之和仍小于 target, 就全部选定, 在较小的一半中继续找; 否则在
+    较大的一半中继续找. 候选的数每次减半, 总的计算量是 O(N). 候选的数少于
+    nsort 个时直接排序.
+    """
+    k = 0
+    s = 0.0
+    while len(eta) > nsort:
+        m = len(eta)//2
+        eta = np.partition(eta, m)
+        upper = eta[m:]
+        t = np.sum(upper)
+        if s + t < target:
+            k += len(upper)
+            s += t
+            eta = eta[:m]
+        else:
+            eta = upper
+    x = s + np.cumsum(np.sort(eta)[::-1])
+    return k + np.sum(x < target)
+
+def refine_closure(dependency, isMarkedCell):
+    """
+    @brief 求加密的协调闭包: 从标记单元出发, 沿依赖关系能到达的所有单元
+
+    Parameters
+    ----------
+    dependency : (NC, NC) 的稀疏矩阵, (i, j) 非零表示加密单元 i 时必须同时
+        加密单元 j, 例如二分单元 i 的加密边时, j 包含这条边
+    isMarkedCell : 标记单元的逻辑数组
+
+    Returns
+    -------
+    isRefineCell : 需要加密的单元的逻辑数组
+
+    Notes
+    -----
+    在依赖图上增加一个虚拟节点, 它指向所有的标记单元, 再从虚拟节点做一次
+    广度优先搜索. 搜索在 scipy.sparse.csgraph 中完成, 不需要按层循环.
+    """
+    NC = dependency.shape[0]
+    markedCell, = np.nonzero(isMarkedCell)
+    dependency = dependency.tocoo()
+    I = np.r_[dependency.row, np.full(len(markedCell), NC)]
+    J = np.r_[dependency.col, markedCell]
+    val = np.ones(len(I), dtype=np.int8)
+    graph = csr_matrix((val, (I, J)), shape=(NC+1, NC+1))
+    idx = breadth_first_order(graph, NC, directed=True,
+            return_predecessors=False)
+    isRefineCell = np.zeros(NC+1, dtype=np.bool_)
+    isRefineCell[idx] = True
+    return isRefineCell[:NC]
+
 class AdaptiveMarker():
     def __init__(self, eta, theta=0.2, ctheta=0.1):
         self.eta = eta
@@ -1,4 +1,3 @@
-import matplotlib.pyplot as plt
 import numpy as np
 from scipy.spatial import Delaunay, delaunay_plot_2d
 from .TriangleMesh import TriangleMesh
@@ -1,20 +1,16 @@
 import numpy as np
 
-import matplotlib.pyplot as plt
-import mpl_toolkits.mplot3d as a3
-from mpl_toolkits.mplot3d.art3d import Line3DCollection
-import matplotlib.colors as colors
-from matplotlib.tri import Triangulation
+# matplotlib 只在画图函数里导入, 使 `import fealpy.mesh` 不必加载它
 
-from matplotlib.collections import PolyCollection, LineCollection, PatchCollection
-import matplotlib.cm as cm
-from matplotlib.patches import Polygon
+from ..decorator.cache import cached_value
 
 
 def find_node(
         axes, node, index=None,
         showindex=False, color='r',
         markersize=20, fontsize=24, fontcolor='k', multiindex=None):
+    import matplotlib.colors as colors
+    import matplotlib.cm as cm
 
     if len(node.shape) == 1:
         GD = 1
@@ -100,6 +96,10 @@ def find_entity(
         index=None, showindex=False,
         color='r', markersize=20,
         fontsize=24, fontcolor='k', multiindex=None):
+    import matplotlib.colors as colors
+    import matplotlib.cm as cm
+    from matplotlib.collections import LineCollection
+    from mpl_toolkits.mplot3d.art3d import Line3DCollection
 
     GD = mesh.geo_dimension()
     bc = mesh.entity_barycenter(entity).reshape(-1, GD)
@@ -285,6 +285,9 @@ def show_mesh_1d(
         aspect='equal',
         linewidths=1, markersize=20,
         showaxis=False):
+    from matplotlib.collections import LineCollection
+    from mpl_toolkits.mplot3d.art3d import Line3DCollection
+
     axes.set_aspect(aspect)
     if showaxis == False:
         axes.set_axis_off()
@@ -318,6 +321,11 @@ def show_mesh_2d(
         cellcolor='grey', aspect='equal',
         linewidths=1, markersize=20,
         showaxis=False, showcolorbar=False, cmax=None, cmin=None, colorbarshrink=None, cmap='jet', box=None):
+    import matplotlib.colors as colors
+    import matplotlib.cm as cm
+    import mpl_toolkits.mplot3d as a3
+    from matplotlib.collections import PolyCollection, PatchCollection
+    from matplotlib.patches import Polygon
 
     try:
         axes.set_aspect(aspect)
@@ -405,6 +413,9 @@ def show_mesh_3d(
         aspect='equal',
         linewidths=0.5, markersize=0,
         showaxis=False, alpha=0.8, shownode=False, showedge=False, threshold=None):
+    import matplotlib.colors as colors
+    import matplotlib.cm as cm
+    import mpl_toolkits.mplot3d as a3
 
     try:
         axes.set_aspect(aspect)
@@ -474,6 +485,297 @@ def unique_row(a):
     return (b, i, j)
 
 
+def unique_row_index(a):
+    """
+    @brief 非负整数数组 a 中不重复的行, 返回 (i0, j), 与
+
+        _, i0, j = np.unique(a, return_index=True, return_inverse=True, axis=0)
+
+    的结果完全相同, 即 a[i0] 按字典序排列且 a[i0][j] == a.
+
+    Notes
+    -----
+    把每一行看成 N = a.max() + 1 进制数, 编码为一个 int64 整数, 对一维的键
+    排序去重, 比按行的字典序排序快得多. 整行的编码会溢出时 (如节点很多的
+    网格的面), 把相邻的列分段编码为若干个 int64 键, 再用 np.lexsort 对这几个
+    键排序, 仍然不需要按行比较.
+    """
+    n, m = a.shape
+    N = int(a.max()) + 1 if n > 0 else 1
+    c = 1 # 每个键编码的列数
+    while (c < m) and (N**(c+1) < 2**63):
+        c += 1
+
+    keys = []
+    for s in range(0, m, c):
+        key = a[:, s].astype(np.int64)
+        for k in range(s+1, min(s+c, m)):
+            key *= N
+            key += a[:, k]
+        keys.append(key)
+
+    if len(keys) == 1:
+        _, i0, j = np.unique(keys[0], return_index=True, return_inverse=True)
+        return i0, j
+
+    # np.lexsort 是稳定的, 每组相同的行中第一个的编号最小, 与 np.unique 一致
+    order = np.lexsort(keys[::-1])
+    isFirst = np.zeros(n, dtype=np.bool_)
+    isFirst[:1] = True
+    for key in keys:
+        key = key[order]
+        isFirst[1:] |= (key[1:] != key[:-1])
+    i0 = order[isFirst]
+    j = np.zeros(n, dtype=np.intp)
+    j[order] = np.cumsum(isFirst) - 1
+    return i0, j
+
+
+def match_row_index(a, b):
+    """
+    @brief 对 a 的每一行, 找到 b 中与它相同的行的编号, 找不到的为 -1
+
+    Notes
+    -----
+    b 中的行互不相同.
+    """
+    n = a.shape[0]
+    i0, j = unique_row_index(np.r_['0', a, b])
+    pos = np.full(len(i0), -1, dtype=np.int_)
+    pos[j[n:]] = np.arange(b.shape[0])
+    return pos[j[:n]]
+
+
+def changed_cell_flag(cell0, cell, cellmap, nodemap, changed=None):
+    """
+    @brief 网格修改以后, 标记没有改变的旧单元和新单元
+
+    Parameters
+    ----------
+    cell0 : 旧的单元数组
+    cell : 新的单元数组
+    cellmap : 旧单元到新单元编号的映射, 删除的单元为 -1, None 表示旧单元编号
+        不变
+    nodemap : 旧节点到新节点编号的映射, None 表示旧节点编号不变
+    changed : 可能改变了的旧单元的编号, 其它保留下来的旧单元认为没有改变.
+        None 表示逐个比较所有保留下来的旧单元
+
+    Returns
+    -------
+    isKeepCell0 : 旧单元是否原样保留
+    isKeepCell : 新单元是否是原样保留的旧单元
+
+    Notes
+    -----
+    给出 changed 时, 只比较这些单元, 计算量只与修改的区域有关.
+    """
+    NC0 = cell0.shape[0]
+    NC = cell.shape[0]
+    if cellmap is None:
+        isKeepCell0 = np.ones(NC0, dtype=np.bool_)
+        index = np.arange(NC0) if changed is None else changed
+        c0 = cell0[index] if nodemap is None else nodemap[cell0[index]]
+        isKeepCell0[index] = np.all(cell[index] == c0, axis=-1)
+        isKeepCell = np.zeros(NC, dtype=np.bool_)
+        isKeepCell[:NC0] = isKeepCell0
+    else:
+        isKeepCell0 = cellmap >= 0
+        index, = np.nonzero(isKeepCell0) if changed is None else \
+                (changed[isKeepCell0[changed]], )
+        c0 = cell0[index] if nodemap is None else nodemap[cell0[index]]
+        isKeepCell0[index] = np.all(cell[cellmap[index]] == c0, axis=-1)
+        isKeepCell = np.zeros(NC, dtype=np.bool_)
+        isKeepCell[cellmap[isKeepCell0]] = True
+    return isKeepCell0, isKeepCell
+
+
+def update_entity_to_cell(cell, localEntity, entity, entity2cell,
+        cellmap, nodemap, isKeepCell0, isKeepCell):
+    """
+    @brief 网格局部修改以后, 增量地更新实体 (二维的边, 三维的面) 和它与单元的
+        邻接关系 entity2cell
+
+    Notes
+    -----
+    两侧单元都原样保留的内部实体不变, 只改变编号. 保留单元的边界实体 (只有一侧
+    单元的实体, 在有悬挂点的网格中也可能在区域内部) 只有当它的顶点都是改变了的
+    单元的顶点时才可能和新单元相邻, 其它的也不变. 剩下的实体由两部分重新生成:
+
+    * 改变了的单元和新单元的所有局部实体;
+    * 保留单元在这些实体上的一侧, 以及可能和新单元相邻的边界实体.
+
+    对这些实体的出现按顶点集合分组, 和 `construct` 一样, 第一次出现的单元记为
+    entity2cell[:, 0], 实体的顶点顺序取这个单元中的局部顺序, 最后一次出现的
+    单元记为 entity2cell[:, 1]. 排序和分组只在修改的区域和相邻的实体上进行,
+    其它的只是线性的标记和复制.
+
+    Returns
+    -------
+    entity, entity2cell : 新的实体数组和邻接关系, 保留的实体排在前面
+    """
+    c0 = entity2cell[:, 0]
+    c1 = entity2cell[:, 1]
+    k0 = isKeepCell0[c0]
+    k1 = isKeepCell0[c1]
+    isKeepEntity = k0 & k1
+
+    # 顶点都在改变了的单元上的保留边界实体, 需要重新分组
+    index, = np.nonzero(~isKeepCell)
+    isPatchNode = np.zeros(cell.max() + 1, dtype=np.bool_)
+    isPatchNode[cell[index]] = True
+    bdIndex, = np.nonzero(isKeepEntity & (c0 == c1))
+    bdEntity = entity[bdIndex] if nodemap is None else nodemap[entity[bdIndex]]
+    isKeepEntity[bdIndex[np.all(isPatchNode[bdEntity], axis=-1)]] = False
+
+    # 保留单元一侧的出现
+    flag = (k0 | k1) & ~isKeepEntity
+    ec = np.where(k0[flag], c0[flag], c1[flag])
+    el = np.where(k0[flag], entity2cell[flag, 2], entity2cell[flag, 3])
+
+    # 改变了的单元的所有局部实体
+    NEC = localEntity.shape[0]
+    if cellmap is not None:
+        ec = cellmap[ec]
+    cidx = np.r_[ec, np.repeat(index, NEC)]
+    lidx = np.r_[el, np.tile(np.arange(NEC), len(index))]
+    total = cell[cidx[:, None], localEntity[lidx]]
+
+    i0, j = unique_row_index(np.sort(total, axis=-1))
+    i1 = np.zeros(len(i0), dtype=np.int_)
+    i1[j] = np.arange(len(j))
+
+    e2c = np.zeros((len(i0), 4), dtype=entity2cell.dtype)
+    e2c[:, 0] = cidx[i0]
+    e2c[:, 1] = cidx[i1]
+    e2c[:, 2] = lidx[i0]
+    e2c[:, 3] = lidx[i1]
+
+    e2c0 = np.compress(isKeepEntity, entity2cell, axis=0)
+    entity = np.compress(isKeepEntity, entity, axis=0)
+    if cellmap is not None:
+        e2c0[:, 0:2] = cellmap[e2c0[:, 0:2]]
+    if nodemap is not None:
+        entity = nodemap[entity]
+    entity = np.r_['0', entity, total[i0]]
+    entity2cell = np.r_['0', e2c0, e2c]
+    return entity, entity2cell
+
+
+def update_cell_to_entity(cell, localEntity, entity, cell2entity,
+        cellmap, nodemap, isKeepCell0, isKeepCell):
+    """
+    @brief 网格局部修改以后, 增量地更新实体 (三维的边) 和单元与它的邻接关系
+        cell2entity, 实体的顶点按升序排列
+
+    Notes
+    -----
+    保留单元用到的实体不变, 只改变编号. 改变了的单元的局部实体先和保留的实体
+    匹配, 匹配不上的是新的实体, 排在后面.
+    """
+    NE = entity.shape[0]
+    NC = cell.shape[0]
+    isKeepEntity = np.zeros(NE, dtype=np.bool_)
+    isKeepEntity[cell2entity[isKeepCell0]] = True
+    entitymap = np.full(NE, -1, dtype=np.int_)
+    entitymap[isKeepEntity] = np.arange(isKeepEntity.sum())
+    entity = np.compress(isKeepEntity, entity, axis=0)
+    if nodemap is not None:
+        entity = np.sort(nodemap[entity], axis=-1)
+
+    index, = np.nonzero(~isKeepCell)
+    total = np.sort(cell[index][:, localEntity].reshape(-1, localEntity.shape[1]), axis=-1)
+    i0, j = unique_row_index(total)
+    pos = match_row_index(total[i0], entity)
+    isNew = pos < 0
+    pos[isNew] = len(entity) + np.arange(isNew.sum())
+
+    c2e = np.zeros((NC, localEntity.shape[0]), dtype=cell2entity.dtype)
+    c2e[isKeepCell] = entitymap[cell2entity[isKeepCell0]]
+    c2e[index] = pos[j].reshape(len(index), localEntity.shape[0])
+    entity = np.r_['0', entity, total[i0[isNew]]]
+    return entity, c2e
+
+
+def threshold_face_index(mesh, threshold=None):
+    """
+    @brief 把 threshold 转化为边界面的编号
+
+    Parameters
+    ----------
+    threshold : 可以是
+
+        * None, 所有的边界面;
+        * 边界标记的名字, 见 `set_boundary_marker`;
+        * 函数, 作用在边界面的重心上, 返回布尔数组;
+        * 长度为 NF 的布尔数组, 或者面的编号数组;
+        * 形状为 (n, NVF) 的整数数组, 每行是一个面的顶点编号 (如 gmsh 的边界
+          单元), 与网格中顶点相同的面匹配.
+    """
+    index = mesh.ds.boundary_face_index()
+    if threshold is None:
+        return index
+    elif isinstance(threshold, str):
+        return boundary_marker(mesh, threshold)
+    elif callable(threshold):
+        bc = mesh.entity_barycenter('face', index=index)
+        return index[threshold(bc)]
+
+    threshold = np.asarray(threshold)
+    if threshold.dtype == np.bool_:
+        index, = np.nonzero(threshold)
+        return index
+    elif threshold.ndim == 2:
+        face = mesh.entity('face')[index]
+        pos = match_row_index(np.sort(threshold, axis=-1), np.sort(face, axis=-1))
+        if np.any(pos < 0):
+            raise ValueError("Some faces in the threshold are not boundary faces of the mesh!")
+        return index[pos]
+    else:
+        return threshold
+
+
+def set_boundary_marker(mesh, name, threshold=None):
+    """
+    @brief 给一部分边界面起名字, 以后所有边界条件函数都可以用这个名字作为
+        threshold
+
+    Notes
+    -----
+    标记保存在 `mesh.boundarymarkers` 中. threshold 是函数或 None 时保存它本身,
+    边界面的编号第一次用到时计算, 缓存在网格数据结构中, 网格拓扑改变 (加密,
+    粗化) 以后重新计算; 其它形式的 threshold 立即转化为编号数组, 与当时的
+    单元数组和节点个数一起保存, 网格拓扑改变以后这些编号已经失效, 再用这个
+    名字会报错, 要重新设置.
+    """
+    if (threshold is not None) and (not callable(threshold)):
+        ds = mesh.ds
+        threshold = (threshold_face_index(mesh, threshold),
+                getattr(ds, 'cell', None), getattr(ds, 'NN', None))
+    if getattr(mesh, 'boundarymarkers', None) is None:
+        mesh.boundarymarkers = {}
+    mesh.boundarymarkers[name] = threshold
+
+
+def boundary_marker(mesh, name):
+    """
+    @brief 名字为 name 的边界面的编号
+    """
+    markers = getattr(mesh, 'boundarymarkers', None) or {}
+    if name not in markers:
+        raise ValueError("The mesh has no boundary marker `{}`!".format(name))
+    threshold = markers[name]
+    if isinstance(threshold, tuple):
+        index, cell, NN = threshold
+        ds = mesh.ds
+        if (getattr(ds, 'cell', None) is not cell) or (getattr(ds, 'NN', None) != NN):
+            raise ValueError("The boundary marker `{}` was set by face indices "
+                    "before the mesh topology changed, please set it "
+                    "again!".format(name))
+        return index
+    return cached_value(mesh.ds, ('boundary_marker', name, threshold),
+            lambda: threshold_face_index(mesh, threshold))
+
+
 def show_point(axes, point):
     axes.plot(point[:, 0], point[:, 1], 'ro')
 
@@ -521,6 +823,8 @@ def show_mesh_angle(axes, mesh, angle=None):
     return mina, maxa, meana
 
 def show_solution(axes, mesh, u):
+    from matplotlib.tri import Triangulation
+
     points = mesh.points
     cells = mesh.cells
     tri = Triangulation(points[:,0], points[:,1], cells)
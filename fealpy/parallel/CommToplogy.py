@@ -107,3 +107,41 @@ class CSRMatrixCommToplogy(CommToplogy):
     def get_local_idx(self):
         rank = self.comm.Get_rank()
         return np.arange(self.location[rank], self.location[rank+1], dtype='i')
+
+
+class EntityCommToplogy(CommToplogy):
+    """
+    @brief 分布式网格上节点或自由度等实体的通信拓扑
+
+    Note
+    ----
+    每个实体只属于一个进程, 在其它进程中的副本是 ghost. sds[r] 是本进程拥有
+    的, 需要发送给进程 r 的实体的局部编号, rds[r] 是本进程中属于进程 r 的
+    ghost 实体的局部编号, 两者都按全局编号从小到大排列, 所以发送方和接收方的
+    顺序是一致的. 数据由 `MeshPartition.entity_data` 生成.
+    """
+    def __init__(self, comm, rank, l2g, data):
+        """__init__
+
+        :param comm: 通信子, 可以为 None, 这时只能做局部计算
+        :param rank: 当前进程的编号
+        :param  l2g: 局部实体的全局编号
+        :param data: `MeshPartition.entity_data` 中当前进程的数据
+        """
+        super(EntityCommToplogy, self).__init__(comm)
+        self.rank = rank
+        self.l2g = l2g
+
+        index = data['index']
+        idx = np.argsort(l2g)
+        g2l = lambda g: idx[np.searchsorted(l2g, g, sorter=idx)]
+        self.owner = data['owner'][np.searchsorted(index, l2g)]
+        self.isOwned = (self.owner == rank)
+        self.owned, = np.nonzero(self.isOwned)
+
+        self.sds = {r: g2l(g) for r, g in data['send'].items()}
+        self.rds = {r: g2l(g) for r, g in data['recv'].items()}
+        self.neighbor = set(self.sds) | set(self.rds)
+
+    def number_of_owned_entities(self):
+        return len(self.owned)
@@ -0,0 +1,120 @@
+import numpy as np
+from scipy.sparse import csr_matrix, spdiags
+
+from ..functionspace import LagrangeFiniteElementSpace
+from .CommToplogy import EntityCommToplogy
+from .NumCompComponent import NumCompComponent
+
+
+class DistributedLagrangeFiniteElementSpace():
+    """
+    @brief 分布式网格上的拉格朗日有限元空间
+
+    Notes
+    -----
+    self.space 是子网格上普通的拉格朗日有限元空间, 局部自由度到全局自由度的
+    映射由子网格单元的全局 cell2dof 得到: l2g[cell2dof] = 全局 cell2dof.
+
+    局部向量的长度为子网格上的自由度个数 (包括 ghost 自由度), 矩阵和右端只
+    保留本进程拥有的自由度所在的行, 形状为 (nown, ldof) 和 (nown, ). 由于
+    ghost 单元覆盖了本进程拥有的自由度的支集, 这些行在子网格上组装就是完整的.
+    矩阵向量乘之前用 `self.component.communicating` 更新 ghost 自由度上的值.
+    """
+    def __init__(self, dmesh, p=1, q=None):
+        if p not in dmesh.dofdata:
+            raise ValueError("The dof data of p = {} is not in the distributed "
+                    "mesh, please give it in `DistributedMesh.from_mesh(..., p={})`".format(p, p))
+
+        self.dmesh = dmesh
+        self.p = p
+        self.space = LagrangeFiniteElementSpace(dmesh.mesh, p=p, q=q)
+
+        data = dmesh.dofdata[p]
+        cell2dof = self.space.cell_to_dof()
+        l2g = np.zeros(self.space.number_of_global_dofs(), dtype=np.int_)
+        l2g[cell2dof] = data['cell2entity']
+
+        self.gdof = data['gdof']
+        self.toplogy = EntityCommToplogy(dmesh.comm, dmesh.rank, l2g, data)
+        self.isBdDof = data['isBdDof'][np.searchsorted(data['index'], l2g)]
+        self.component = NumCompComponent(self.toplogy)
+
+    def number_of_global_dofs(self):
+        return self.gdof
+
+    def number_of_local_dofs(self):
+        """
+        @brief 子网格上的自由度个数, 包括 ghost 自由度
+        """
+        return len(self.toplogy.l2g)
+
+    def number_of_owned_dofs(self):
+        return self.toplogy.number_of_owned_entities()
+
+    def local_to_global(self):
+        return self.toplogy.l2g
+
+    def owned_dof_index(self):
+        return self.toplogy.owned
+
+    def interpolation_points(self):
+        return self.space.interpolation_points()
+
+    def interpolation(self, u):
+        return u(self.interpolation_points())
+
+    def stiff_matrix(self, c=None, q=None):
+        return self.space.stiff_matrix(c=c, q=q)[self.toplogy.owned]
+
+    def mass_matrix(self, c=None, q=None):
+        return self.space.mass_matrix(c=c, q=q)[self.toplogy.owned]
+
+    def source_vector(self, f, q=None):
+        return self.space.source_vector(f, q=q)[self.toplogy.owned]
+
+    def set_dirichlet_bc(self, gD, A, F):
+        """
+        @brief 处理 Dirichlet 边界条件
+
+        Returns
+        -------
+        A, F : 消去边界自由度以后的矩阵和右端, 边界自由度所在的行为单位行
+        uh : (ldof, ), 边界自由度上为 gD 的插值的局部向量
+
+        Notes
+        -----
+        ghost 边界自由度的值也可以在本进程上插值得到, 所以消去边界自由度所在的
+        列不需要通信, 消去以后的整体矩阵仍然是对称的.
+        """
+        ldof = self.number_of_local_dofs()
+        owned = self.toplogy.owned
+        isBdDof = self.isBdDof
+        ipoints = self.interpolation_points()
+
+        uh = np.zeros(ldof, dtype=np.float64)
+        uh[isBdDof] = gD(ipoints[isBdDof])
+        F = F - A@uh
+
+        nown = len(owned)
+        bdIdx = isBdDof.astype(np.float64)
+        A = spdiags(1 - bdIdx[owned], 0, nown, nown)@A@spdiags(1 - bdIdx, 0, ldof, ldof)
+        A += csr_matrix((bdIdx[owned], (np.arange(nown), owned)), shape=(nown, ldof))
+
+        isOwnedBdDof = isBdDof[owned]
+        F[isOwnedBdDof] = uh[owned][isOwnedBdDof]
+        return A.tocsr(), F, uh
+
+    def error(self, u, uh, q=None):
+        """
+        @brief 所有进程上 u 与有限元函数 uh 的 L2 误差
+
+        Parameters
+        ----------
+        uh : (ldof, ), ghost 自由度上的值必须已经更新
+        """
+        uh = self.space.function(array=uh)
+        e = self.space.integralalg.error(u, uh.value, celltype=True, q=q)
+        e = np.sum(e[self.dmesh.isOwnedCell]**2)
+        if self.dmesh.comm is not None:
+            e = self.dmesh.comm.allreduce(e)
+        return np.sqrt(e)
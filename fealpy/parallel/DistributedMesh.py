@@ -0,0 +1,180 @@
+import numpy as np
+
+from .MeshPartition import MeshPartition
+from .CommToplogy import EntityCommToplogy
+from .NumCompComponent import NumCompComponent
+
+
+class _ArraySpec():
+    """
+    @brief 数据结构中数组的占位符, 记录数组的形状和类型
+    """
+    def __init__(self, shape, dtype):
+        self.shape = shape
+        self.dtype = dtype
+
+
+def _split_arrays(data, arrays):
+    """
+    @brief 把 data 中的数组换成 `_ArraySpec`, 数组按遍历顺序放到 arrays 中
+    """
+    if isinstance(data, np.ndarray):
+        arrays.append(np.ascontiguousarray(data))
+        return _ArraySpec(data.shape, data.dtype.str)
+    elif isinstance(data, dict):
+        return {k: _split_arrays(v, arrays) for k, v in data.items()}
+    elif isinstance(data, (list, tuple)):
+        return type(data)(_split_arrays(v, arrays) for v in data)
+    else:
+        return data
+
+
+def _merge_arrays(data, fill):
+    """
+    @brief `_split_arrays` 的逆过程, 按同样的顺序用 fill(spec) 生成每个数组
+    """
+    if isinstance(data, _ArraySpec):
+        return fill(data)
+    elif isinstance(data, dict):
+        return {k: _merge_arrays(v, fill) for k, v in data.items()}
+    elif isinstance(data, (list, tuple)):
+        return type(data)(_merge_arrays(v, fill) for v in data)
+    else:
+        return data
+
+
+def _array_chunks(a, chunk):
+    """
+    @brief 数组 a 的内存按字节分成长度不超过 chunk 的若干块
+    """
+    buf = a.reshape(-1).view(np.uint8)
+    return [buf[i:i+chunk] for i in range(0, len(buf), chunk)]
+
+
+def _send_part(comm, data, dest, tag=0, chunk=2**30):
+    """
+    @brief 把一个子网格的数据发送到进程 dest
+
+    Notes
+    -----
+    只有去掉数组以后的数据结构用 pickle 发送, 数组按字节分块用基于缓冲区的
+    `Isend` 发送, 每块不超过 chunk 字节, 不受 pickle 消息 2GB 的限制.
+    返回所有的请求, 发送方需要在修改或释放 data 之前等待它们完成.
+    """
+    from mpi4py import MPI
+    arrays = []
+    head = _split_arrays(data, arrays)
+    reqs = [comm.isend(head, dest=dest, tag=tag)]
+    for a in arrays:
+        for buf in _array_chunks(a, chunk):
+            reqs.append(comm.Isend([buf, MPI.BYTE], dest=dest, tag=tag))
+    return reqs
+
+
+def _recv_part(comm, source, tag=0, chunk=2**30):
+    """
+    @brief 接收 `_send_part` 发送的数据, chunk 要与发送方相同
+    """
+    from mpi4py import MPI
+    head = comm.recv(source=source, tag=tag)
+
+    def fill(spec):
+        a = np.empty(spec.shape, dtype=spec.dtype)
+        for buf in _array_chunks(a, chunk):
+            comm.Recv([buf, MPI.BYTE], source=source, tag=tag)
+        return a
+
+    return _merge_arrays(head, fill)
+
+
+class DistributedMesh():
+    """
+    @brief 分布式网格, 每个进程只存储自己的子网格
+
+    Notes
+    -----
+    子网格由本进程拥有的单元和一层 ghost 单元组成, 见 `MeshPartition`.
+    self.mesh 是子网格上普通的网格对象 (如 TriangleMesh), 所有的局部计算都在
+    它上面进行; self.nodetop 记录节点的全局编号, 所有者和通信信息.
+
+    Examples
+    --------
+    >>> from mpi4py import MPI
+    >>> comm = MPI.COMM_WORLD
+    >>> mesh = MF.boxmesh2d(box, nx=100, ny=100) if comm.Get_rank() == 0 else None
+    >>> dmesh = DistributedMesh.from_mesh(comm, mesh, p=1)
+    """
+    def __init__(self, data, comm=None):
+        """
+        @brief
+
+        Parameters
+        ----------
+        data : `MeshPartition.split` 返回的当前进程的数据
+        comm : MPI 通信子, 为 None 时只能做局部计算
+        """
+        self.comm = comm
+        self.rank = data['rank']
+        self.nparts = data['nparts']
+        self.mesh = data['meshclass'](data['node'], data['cell'])
+
+        self.cellglobal = data['cellglobal']
+        self.cellowner = data['cellowner']
+        self.isOwnedCell = (self.cellowner == self.rank)
+        self.NN = data['NN']
+        self.NC = data['NC']
+
+        nodedata = data['nodedata']
+        self.nodetop = EntityCommToplogy(comm, self.rank, nodedata['index'], nodedata)
+        self.dofdata = data['dofdata']
+
+    @classmethod
+    def from_mesh(cls, comm, mesh=None, parts=None, p=None, root=0):
+        """
+        @brief 在根进程上划分网格, 并把子网格分发到所有进程
+
+        Parameters
+        ----------
+        comm : MPI 通信子
+        mesh : 全局网格, 只需要在根进程上给出
+        parts : (NC, ) 的整数数组, 每个单元所属的进程, 默认用 metis 划分
+        p : 以后要用到的拉格朗日有限元空间的次数, 整数或整数列表
+
+        Notes
+        -----
+        根进程逐个生成子网格的数据, 并用 `_send_part` 发送给对应的进程, 数组
+        按字节分块用缓冲区发送, 所以单个子网格的数据可以超过 2GB. 全局网格和
+        划分仍然只在根进程上构造, 它的内存仍然是瓶颈.
+        """
+        if comm.Get_rank() != root:
+            return cls(_recv_part(comm, root), comm=comm)
+
+        from mpi4py import MPI
+        partition = MeshPartition(mesh, comm.Get_size(), parts=parts)
+        for i, d in partition.iter_split(p=p):
+            if i == root:
+                data = d
+            else:
+                MPI.Request.Waitall(_send_part(comm, d, i))
+        return cls(data, comm=comm)
+
+    def number_of_global_nodes(self):
+        return self.NN
+
+    def number_of_global_cells(self):
+        return self.NC
+
+    def number_of_owned_cells(self):
+        return np.sum(self.isOwnedCell)
+
+    def owned_cell_index(self):
+        return np.nonzero(self.isOwnedCell)[0]
+
+    def number_of_owned_nodes(self):
+        return self.nodetop.number_of_owned_entities()
+
+    def node_component(self):
+        """
+        @brief 节点上的并行计算构件, 用于更新 ghost 节点上的值
+        """
+        return NumCompComponent(self.nodetop)
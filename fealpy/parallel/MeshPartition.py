@@ -0,0 +1,161 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+class MeshPartition():
+    """
+    @brief 在一个进程上把网格按单元划分成 nparts 个带一层 ghost 单元的子网格,
+        生成每个进程构造 `DistributedMesh` 所需的数据
+
+    Notes
+    -----
+    第 i 个子网格由划分到 i 的单元 (owned) 和与它们有公共顶点的其它单元
+    (ghost) 组成, 局部单元按先 owned 后 ghost 的顺序排列. 节点和自由度等实体
+    属于包含它的单元所在的子区域中编号最小的一个, 这个子区域一定包含所有与该
+    实体相关的单元, 所以在子网格上组装出的整体矩阵中, 本进程拥有的实体所在的
+    行是完整的, 不需要再和其它进程交换矩阵元素.
+
+    实体的通信信息用全局编号表示: recv[q] 是本进程中属于 q 的 ghost 实体,
+    send[q] 是本进程拥有的, 同时是 q 中 ghost 的实体, 都按全局编号从小到大排列,
+    所以 send 和 recv 的顺序在两个进程之间是一致的.
+    """
+    def __init__(self, mesh, nparts, parts=None):
+        """
+        @brief
+
+        Parameters
+        ----------
+        mesh : TriangleMesh 或 TetrahedronMesh 等单纯形网格
+        nparts : 子网格的个数, 一般为进程的个数
+        parts : (NC, ) 的整数数组, 每个单元所属的子区域, 默认用
+            `graph.metis.part_mesh` 划分
+        """
+        if parts is None:
+            from ..graph import metis
+            _, parts = metis.part_mesh(mesh, nparts=nparts)
+
+        self.mesh = mesh
+        self.nparts = nparts
+        self.parts = np.asarray(parts, dtype=np.int_)
+
+        NN = mesh.number_of_nodes()
+        NC = mesh.number_of_cells()
+        cell = mesh.entity('cell')
+        NVC = cell.shape[1]
+
+        # (nparts, NC) 的矩阵, 非零元是与子区域有公共顶点的单元
+        val = np.ones(NC*NVC, dtype=np.int_)
+        cell2node = csr_matrix((val, cell.reshape(-1), np.arange(0, NC*NVC+1, NVC)),
+                shape=(NC, NN))
+        part2cell = csr_matrix((np.ones(NC, dtype=np.int_), (self.parts, np.arange(NC))),
+                shape=(nparts, NC))
+        part2cell = (part2cell@cell2node@cell2node.T).tocsr()
+        part2cell.sort_indices()
+
+        self.cells = []
+        for i in range(nparts):
+            index = part2cell.indices[part2cell.indptr[i]:part2cell.indptr[i+1]]
+            isOwned = self.parts[index] == i
+            self.cells.append(np.r_[index[isOwned], index[~isOwned]])
+
+    def entity_owner(self, cell2entity, N):
+        """
+        @brief 实体所属的子区域, 即包含它的单元所在的子区域中编号最小的一个
+        """
+        owner = np.full(N, self.nparts, dtype=np.int_)
+        parts = np.broadcast_to(self.parts[:, None], cell2entity.shape)
+        np.minimum.at(owner, cell2entity, parts)
+        return owner
+
+    def entity_data(self, cell2entity, N):
+        """
+        @brief 每个子网格上实体 (节点或自由度) 的数据
+
+        Parameters
+        ----------
+        cell2entity : (NC, ldof), 单元到实体的全局编号
+        N : 实体的全局个数
+
+        Returns
+        -------
+        [dict, ...], 第 i 个 dict 中
+            'cell2entity': (nc, ldof), 子网格单元的全局实体编号
+            'index': 子网格中所有实体的全局编号, 从小到大排列
+            'owner': index 中实体所属的子区域
+            'send', 'recv': {q: 全局编号}, 与子区域 q 交换的实体
+        """
+        owner = self.entity_owner(cell2entity, N)
+        data = []
+        for i, cells in enumerate(self.cells):
+            index = np.unique(cell2entity[cells])
+            data.append({
+                'cell2entity': cell2entity[cells],
+                'index': index,
+                'owner': owner[index],
+                'send': {},
+                'recv': {}})
+
+        for i, d in enumerate(data):
+            for q in map(int, np.unique(d['owner'])):
+                if q != i:
+                    g = d['index'][d['owner'] == q]
+                    d['recv'][q] = g
+                    data[q]['send'][i] = g
+        return data
+
+    def split(self, p=None):
+        """
+        @brief 所有进程构造 `DistributedMesh` 所需的数据, 见 `iter_split`
+
+        Returns
+        -------
+        [dict, ...], 第 i 个 dict 是第 i 个子网格的数据
+        """
+        return [d for _, d in self.iter_split(p=p)]
+
+    def iter_split(self, p=None):
+        """
+        @brief 逐个生成每个进程构造 `DistributedMesh` 所需的数据, 根进程可以
+            生成一个就发送一个, 不必同时保存所有子网格的数据
+
+        Parameters
+        ----------
+        p : 拉格朗日有限元空间的次数, 可以是整数或整数列表, 在全局网格上计算
+            自由度的全局编号和边界自由度, 供 `DistributedLagrangeFiniteElementSpace`
+            使用
+
+        Returns
+        -------
+        生成 (i, dict), dict 是第 i 个子网格的数据
+        """
+        mesh = self.mesh
+        cell = mesh.entity('cell')
+        node = mesh.entity('node')
+        nodedata = self.entity_data(cell, mesh.number_of_nodes())
+
+        dofdata = {}
+        if p is not None:
+            from ..functionspace import LagrangeFiniteElementSpace
+            for k in np.atleast_1d(p):
+                space = LagrangeFiniteElementSpace(mesh, p=int(k))
+                gdof = space.number_of_global_dofs()
+                isBdDof = space.boundary_dof()
+                dofdata[int(k)] = self.entity_data(space.cell_to_dof(), gdof)
+                for d in dofdata[int(k)]:
+                    d['gdof'] = gdof
+                    d['isBdDof'] = isBdDof[d['index']]
+
+        for i, cells in enumerate(self.cells):
+            index = nodedata[i]['index']
+            yield i, {
+                'rank': i,
+                'nparts': self.nparts,
+                'meshclass': mesh.__class__,
+                'node': node[index],
+                'cell': np.searchsorted(index, cell[cells]),
+                'cellglobal': cells,
+                'cellowner': self.parts[cells],
+                'NN': mesh.number_of_nodes(),
+                'NC': mesh.number_of_cells(),
+                'nodedata': nodedata[i],
+                'dofdata': {k: d[i] for k, d in dofdata.items()}}
@@ -22,16 +22,32 @@ class NumCompComponent():
 
 
     def communicating(self, array):
+        """
+        把本进程拥有的实体上的值发送给邻居进程, 更新 array 中的 ghost 部分
+
+        Parameter
+        ---------
+        array: 第一维是局部实体的数组
+        """
         ct = self.commtop
         comm = ct.comm
         rank = comm.Get_rank()
-        for r in ct.neighbor: 
-            data = array[ct.sds[r]]
-            print("rank: ", rank, "data: ", len(ct.sds[r]), len(ct.rds[r]), "r: ", r)
-            comm.Isend(data, dest=r, tag=rank) 
-
-        for r in ct.neighbor:  
-            data = np.zeros(len(ct.rds[r]), dtype=array.dtype)
-            req = comm.Irecv(data, source=r, tag=r)
+        reqs = []
+        for r, idx in ct.sds.items():
+            data = np.ascontiguousarray(array[idx])
+            reqs.append((comm.Isend(data, dest=r, tag=rank), data))
+
+        for r, idx in ct.rds.items():
+            data = np.zeros((len(idx), ) + array.shape[1:], dtype=array.dtype)
+            comm.Recv(data, source=r, tag=r)
+            array[idx] = data
+
+        for req, data in reqs:
             req.Wait()
-            array[ct.rds[r]] = data
+        return array
+
+    def dot(self, a, b):
+        """
+        所有进程上 a 与 b 的内积, a 和 b 只包含本进程拥有的部分
+        """
+        return self.commtop.comm.allreduce(np.dot(a, b))
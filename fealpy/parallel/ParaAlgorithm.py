@@ -7,3 +7,58 @@ class ParaAlgorithm():
     """
     def __init__(self):
         pass
+
+
+def cg(A, b, component, x=None, tol=1e-8, maxit=None):
+    """
+    分布式的 Jacobi 预条件共轭梯度法
+
+    Parameter
+    ---------
+    A: (nown, ldof) 的 CSR 矩阵, 本进程拥有的实体所在的行
+    b: (nown, ) 右端中本进程拥有的部分
+    component: `NumCompComponent`, 其通信拓扑为 `EntityCommToplogy`
+    x: (ldof, ) 初值, 包括 ghost 部分, 默认为 0
+    tol: 残量相对于右端的 2 范数的容差
+
+    Return
+    ------
+    x: (ldof, ) 的解, ghost 部分已经更新
+    niter: 迭代次数
+    """
+    owned = component.commtop.owned
+    ldof = A.shape[1]
+    if maxit is None:
+        maxit = 10*component.commtop.comm.allreduce(len(owned))
+
+    x = np.zeros(ldof, dtype=np.float64) if x is None else x.copy()
+    D = A[np.arange(len(owned)), owned].A1 # 对角线
+
+    component.communicating(x)
+    r = b - A@x
+    z = r/D
+    p = np.zeros(ldof, dtype=np.float64)
+    p[owned] = z
+    rz = component.dot(r, z)
+    bnorm = np.sqrt(component.dot(b, b))
+    if bnorm == 0.0:
+        bnorm = 1.0
+
+    niter = 0
+    if np.sqrt(component.dot(r, r)) < tol*bnorm: # 初值已经是解 (如 b = 0)
+        maxit = 0
+
+    for niter in range(1, maxit+1):
+        component.communicating(p)
+        Ap = A@p
+        alpha = rz/component.dot(p[owned], Ap)
+        x[owned] += alpha*p[owned]
+        r -= alpha*Ap
+        if np.sqrt(component.dot(r, r)) < tol*bnorm:
+            break
+        z = r/D
+        rz0, rz = rz, component.dot(r, z)
+        p[owned] = z + rz/rz0*p[owned]
+
+    component.communicating(x)
+    return x, niter
@@ -1,5 +1,11 @@
 
 from .CommToplogy import CommToplogy
 from .CommToplogy import CSRMatrixCommToplogy
+from .CommToplogy import EntityCommToplogy
 
 from .NumCompComponent import NumCompComponent
+
+from .MeshPartition import MeshPartition
+from .DistributedMesh import DistributedMesh
+from .DistributedLagrangeFiniteElementSpace import DistributedLagrangeFiniteElementSpace
+from .ParaAlgorithm import cg
@@ -1,3 +1,7 @@
-from .VTKPlotter import VTKPlotter
-from .actors import Actor
-from .actors import meshactor
+# vtk 在第一次访问画图类时才导入, 见 `fealpy.core.lazy`
+from ..core.lazy import attach
+
+__getattr__, __dir__, __all__ = attach(__name__, {
+    'VTKPlotter': ['VTKPlotter'],
+    'actors': ['Actor', 'meshactor'],
+    })
@@ -0,0 +1,235 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+def bincount(pos, val, n):
+    """
+    @brief 带权重的 np.bincount, 支持复数权重
+    """
+    if np.iscomplexobj(val):
+        return np.bincount(pos, weights=val.real, minlength=n) + \
+                1j*np.bincount(pos, weights=val.imag, minlength=n)
+    else:
+        return np.bincount(pos, weights=val, minlength=n)
+
+
+def scatter_vector(cell2dof, bb, gdof):
+    """
+    @brief 把单元向量 bb 累加到整体向量中, 代替 np.add.at
+
+    Parameters
+    ----------
+    cell2dof : (NC, ldof) 单元到自由度的映射
+    bb : (NC, ldof, ...) 单元向量, 后面的维数可以是向量的分量或者多个右端
+    gdof : 自由度的个数
+
+    Returns
+    -------
+    b : (gdof, ...) 整体向量
+
+    Notes
+    -----
+    bb 是二维数组时用 np.bincount. 否则用 (gdof, NC*ldof) 的 0-1 稀疏矩阵乘
+    (NC*ldof, n) 的稠密矩阵, 一次完成所有列的累加. 这个矩阵的转置按行存储时
+    每行只有一个非零元, 可以直接写出 CSR 格式, 不需要排序.
+    """
+    NC, ldof = cell2dof.shape
+    if bb.ndim == 2:
+        return bincount(cell2dof.reshape(-1), bb.reshape(-1), gdof)
+
+    shape = bb.shape[2:]
+    n = NC*ldof
+    P = csr_matrix((np.ones(n, dtype=np.float64), cell2dof.reshape(-1),
+        np.arange(n+1)), shape=(n, gdof))
+    b = P.T@bb.reshape(n, -1)
+    return b.reshape((gdof, ) + shape)
+
+
+def incidence_matrix(cell2dof, gdof, location=None):
+    """
+    @brief 单元到自由度的 (NC, gdof) 关联矩阵, CSR 格式
+
+    Parameters
+    ----------
+    cell2dof : location 为 None 时是 (NC, ldof) 数组, 否则是所有单元的自由度
+        依次拼成的一维数组, 第 i 个单元的自由度为
+        cell2dof[location[i]:location[i+1]]
+    gdof : 自由度的个数
+    location : (NC+1, ), 默认为 None
+
+    Notes
+    -----
+    非零元的类型为 bool. 整数类型 (如 int8) 在计算 C^T C 时会溢出, 一个自由度
+    被 256 个单元共享时对角元回绕为 0, 从稀疏模式中消失.
+    """
+    if location is None:
+        NC, ldof = cell2dof.shape
+        location = np.arange(0, NC*ldof+1, ldof)
+    NC = len(location) - 1
+    val = np.ones(location[-1], dtype=np.bool_)
+    return csr_matrix((val, cell2dof.reshape(-1), location), shape=(NC, gdof))
+
+
+def csr_pattern(C0, C1=None):
+    """
+    @brief 由关联矩阵计算 C0^T C1 的 CSR 稀疏模式 indptr 和 indices (列指标有序)
+    """
+    if C1 is None:
+        C1 = C0
+    A = (C0.T@C1).tocsr()
+    A.sort_indices()
+    return A.indptr, A.indices
+
+
+class AssemblyPlan():
+    """
+    @brief 整体矩阵的组装计划
+
+    Notes
+    -----
+    对于网格和自由度不变的反复组装 (如时间推进, 非线性迭代), 整体矩阵的稀疏
+    模式也不变. 组装计划一次性计算 CSR 格式的 `indptr`, `indices`, 以及每个
+    单元矩阵元素在 CSR `data` 数组中的位置 `pos`, 以后的组装只需把单元矩阵
+    按 `pos` 累加到 `data` 中, 不再需要排序和合并重复元素.
+    """
+    def __init__(self, cell2dof0, gdof0, cell2dof1=None, gdof1=None,
+            scatter=True):
+        """
+        Parameters
+        ----------
+        cell2dof0 : (NC, ldof0), 行空间的单元自由度
+        gdof0 : 行空间的整体自由度个数
+        cell2dof1 : (NC, ldof1), 列空间的单元自由度, 默认与 cell2dof0 相同
+        gdof1 : 列空间的整体自由度个数
+        scatter : 是否预先计算所有单元的位置数组 `pos`, 它的长度为
+            NC*ldof0*ldof1. 如果为 False, 只能用 `add` 分块累加.
+        """
+        if cell2dof1 is None:
+            cell2dof1 = cell2dof0
+            gdof1 = gdof0
+
+        self.cell2dof0 = cell2dof0
+        self.cell2dof1 = cell2dof1
+        self.shape = (gdof0, gdof1)
+
+        self.indptr, self.indices = self.pattern(cell2dof0, gdof0, cell2dof1, gdof1)
+        self._key = None
+
+        if scatter:
+            self.pos = self.position()
+            self._key = None # 位置数组已经算好, 释放中间数据
+        else:
+            self.pos = None
+
+    @staticmethod
+    def pattern(cell2dof0, gdof0, cell2dof1, gdof1):
+        """
+        @brief 计算整体矩阵 CSR 稀疏模式的 indptr 和 indices (列指标有序)
+
+        Notes
+        -----
+        把 cell2dof 看成 (NC, gdof) 的关联矩阵 C, 稀疏模式就是 C0^T C1 的非零
+        元结构. 这里用稀疏矩阵乘法计算, 所需内存只与整体矩阵的非零元个数有关,
+        不需要生成长度为 NC*ldof0*ldof1 的 COO 三元组.
+        """
+        C0 = incidence_matrix(cell2dof0, gdof0)
+        C1 = incidence_matrix(cell2dof1, gdof1)
+        return csr_pattern(C0, C1)
+
+    def number_of_nonzeros(self):
+        return len(self.indices)
+
+    def key(self):
+        """
+        @brief 每个非零元的整体编号 i*gdof1 + j, 由于列指标有序, 它是单调递增的
+        """
+        if self._key is None:
+            gdof0, gdof1 = self.shape
+            row = np.repeat(np.arange(gdof0, dtype=np.int64), np.diff(self.indptr))
+            self._key = row*gdof1 + self.indices
+        return self._key
+
+    def position(self, index=np.s_[:]):
+        """
+        @brief 计算单元 index 的单元矩阵元素在 CSR `data` 数组中的位置
+
+        Returns
+        -------
+        pos : (nc, ldof0, ldof1), 当非零元个数小于 2^31 时类型为 int32
+        """
+        gdof1 = self.shape[1]
+        key = self.key()
+        I = self.cell2dof0[index, :, None].astype(np.int64)*gdof1
+        I = I + self.cell2dof1[index, None, :]
+        pos = np.searchsorted(key, I)
+        if len(key) < 2**31:
+            pos = pos.astype(np.int32)
+        return pos
+
+    def matrix(self, data=None):
+        """
+        @brief 用给定的 data 数组生成 CSR 矩阵, 默认所有非零元为 0
+
+        Notes
+        -----
+        返回的矩阵使用 `indices` 和 `indptr` 的副本, 对它做 `eliminate_zeros`
+        等原地修改稀疏结构的操作不会影响这个计划.
+        """
+        if data is None:
+            data = np.zeros(self.number_of_nonzeros(), dtype=np.float64)
+        return csr_matrix((data, self.indices.copy(), self.indptr.copy()),
+                shape=self.shape)
+
+    def add(self, data, M, index=np.s_[:]):
+        """
+        @brief 把单元 index 上的单元矩阵 M 累加到 CSR `data` 数组中
+
+        Parameters
+        ----------
+        data : (nnz, ), CSR 矩阵的 data 数组
+        M : (nc, ldof0, ldof1), 单元 index 上的单元矩阵
+        """
+        if isinstance(index, slice) and (index == np.s_[:]):
+            pos = self.pos if self.pos is not None else self.position()
+            data += bincount(pos.reshape(-1), M.reshape(-1), len(data))
+            return data
+
+        # 部分单元只在它们自己的位置上合并, 这些位置在 data 中的范围
+        # pos.min()..pos.max() 通常几乎覆盖整个 data 数组
+        pos = self.pos[index] if self.pos is not None else self.position(index=index)
+        upos, inv = np.unique(pos, return_inverse=True)
+        data[upos] += bincount(inv.reshape(-1), M.reshape(-1), len(upos))
+        return data
+
+    def assemble(self, M, out=None):
+        """
+        @brief 由所有单元的单元矩阵 M 组装整体矩阵
+
+        Parameters
+        ----------
+        M : (NC, ldof0, ldof1)
+        out : 默认为 None, 返回新的 CSR 矩阵; 否则为以前由本计划组装的 CSR 矩阵,
+            直接覆盖它的 data 数组
+
+        Notes
+        -----
+        只需一次 `np.bincount`, 没有排序.
+        """
+        pos = self.pos if self.pos is not None else self.position()
+        data = bincount(pos.reshape(-1), M.reshape(-1), self.number_of_nonzeros())
+        if out is None:
+            return self.matrix(data=data)
+        else:
+            out.data[:] = data
+            return out
+
+    def nbytes(self):
+        """
+        @brief 组装计划占用的内存 (字节)
+        """
+        n = self.indptr.nbytes + self.indices.nbytes
+        if self.pos is not None:
+            n += self.pos.nbytes
+        if self._key is not None:
+            n += self._key.nbytes
+        return n
@@ -1,8 +1,17 @@
+import os
 import numpy as np
 from scipy.sparse import csr_matrix, coo_matrix
 import multiprocessing as mp
-from multiprocessing.pool import ThreadPool as Pool
 from ..decorator import timer
+from .AssemblyPlan import AssemblyPlan, bincount, scatter_vector
+
+# 并行组装时子进程的任务, 在 fork 之前设置, 子进程直接继承
+_parallel_task = None
+
+def _parallel_part_matrix(index):
+    alg, plan, bcs, ws, basis0, basis1, c, nc = _parallel_task
+    return alg._part_matrix(plan, bcs, ws, basis0, basis1, c, index, nc)
+
 
 
 class FEMeshIntegralAlg():
@@ -228,8 +237,9 @@ class FEMeshIntegralAlg():
 
     @timer
     def parallel_construct_matrix(self, b0, 
-            b1=None, c=None, q=None):
+            b1=None, c=None, q=None, nproc=None, partition=None, memory=1024):
         """
+        @brief 多进程并行组装矩阵
 
         Parameters
         ----------
@@ -238,82 +248,76 @@ class FEMeshIntegralAlg():
             b0[1]: cell2dof
             b0[2]: number of global dofs
         b1: default is None, just like b0
+        c: 系数, 与 `chunk_construct_matrix` 相同
+        nproc: 进程个数, 默认为当前进程可用的 cpu 个数
+        partition: 单元的分组方式
+            None: 按单元编号均匀分成 nproc 组
+            'metis': 用 `graph.metis.part_mesh` 划分网格
+            (NC, ) 的整数数组: 每个单元所属的组号
+        memory: 所有进程计算单元矩阵时允许占用的总内存, 单位为 MB
 
         Notes
         -----
-        
-        把网格中的单元分组，再分组组装相应的矩阵。对于三维大规模问题，如果同时计
-        算所有单元的矩阵，占用内存会过多，效率过低。
+        把网格中的单元分组, 每个进程组装一组单元. 子进程以 fork 方式创建, 网格
+        和空间的数组在父子进程之间以写时复制的方式共享, 不需要序列化. 每个进程
+        在组内再按内存大小分块计算单元矩阵, 只返回它涉及的 CSR data 位置及对应
+        的值, 最后在父进程中按稀疏模式一次累加.
 
-
-        TODO
-        -----
-            1. 给定一个计算机内存的大小和 cpu 的个数，动态决定合理的问题分割策略
-            2. 考虑存在系数的情况
+        不支持 fork 的平台上退化为 `chunk_construct_matrix`.
         """
+        global _parallel_task
+
+        basis0, cell2dof0, gdof0 = b0
+        if b1 is None:
+            basis1, cell2dof1, gdof1 = basis0, cell2dof0, gdof0
+        else:
+            basis1, cell2dof1, gdof1 = b1
+
+        if 'fork' not in mp.get_all_start_methods():
+            return self.chunk_construct_matrix(b0, b1=b1, c=c, q=q, memory=memory)
 
         mesh = self.mesh
         NC = mesh.number_of_cells()
         qf = self.integrator if q is None else mesh.integrator(q, etype='cell')
         bcs, ws = qf.get_quadrature_points_and_weights()
 
-        basis0 = b0[0]
-        cell2dof0 = b0[1]
-        gdof0 = b0[2]
-
-        # 对问题进行分割
-        nc = mp.cpu_count()-2
-
-        block = NC//nc
-        r = NC%nc
-        index = np.full(nc+1, block)
-        index[0] = 0
-        index[1:r+1] += 1
-        np.cumsum(index, out=index)
+        if nproc is None:
+            nproc = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') \
+                    else os.cpu_count()
 
-        if b1 is None:
-            gdof1 = gdof0
+        if partition is None:
+            parts = np.array_split(np.arange(NC), nproc)
         else:
-            gdof1 = b1[2]
-
-        A = csr_matrix((gdof0, gdof1))
-        def f(i):
-            s = slice(index[i], index[i+1])
-            measure = self.cellmeasure[s]
-            c2d0 = cell2dof0[s]
-            if b1 is None:
-                c2d1 = c2d0
-            else:
-                c2d1 = b1[1][s]
-
-            shape = (len(measure), c2d0.shape[1], c2d1.shape[1])
-            M = np.zeros(shape, measure.dtype)
-            for bc, w in zip(bcs, ws): # 对所有积分点进行循环
-                phi0 = basis0(bc, index=s)
-                if b1 is None:
-                    phi1 = phi0
-                else:
-                    phi1 = b1[0](bc, index=s)
-                M += np.einsum('jkd, jmd, j->jkm', phi0, phi1, w*measure)
-
-            I = np.broadcast_to(c2d0[:, :, None], shape=M.shape)
-            J = np.broadcast_to(c2d1[:, None, :], shape=M.shape)
-
-            Bi = csr_matrix((M.flat, (I.flat, J.flat)), shape=(gdof0, gdof1))
-            return Bi 
-
-        # 并行组装总矩阵
-        with Pool(nc) as p:
-            B = p.map(f, range(nc))
-
-        for val in B:
-            A += val
-
-        return A
+            if isinstance(partition, str) and partition == 'metis':
+                from ..graph import metis
+                _, partition = metis.part_mesh(mesh, nparts=nproc)
+            index = np.argsort(partition, kind='stable')
+            num = np.bincount(partition, minlength=nproc)
+            parts = np.split(index, np.cumsum(num)[:-1])
+        parts = [part for part in parts if len(part) > 0]
+
+        nc = self._chunk_size(len(ws), cell2dof0.shape[1], cell2dof1.shape[1],
+                memory/len(parts))
+
+        plan = AssemblyPlan(cell2dof0, gdof0, cell2dof1, gdof1, scatter=False)
+        plan.key() # 在创建子进程前生成, 由所有子进程共享
+
+        _parallel_task = (self, plan, bcs, ws, basis0, basis1, c, nc)
+        try:
+            with mp.get_context('fork').Pool(len(parts)) as pool:
+                results = pool.map(_parallel_part_matrix, parts)
+        finally:
+            _parallel_task = None
+
+        dtype = np.result_type(*[val for _, val in results])
+        data = np.zeros(plan.number_of_nonzeros(), dtype=dtype)
+        for upos, val in results:
+            data[upos] += val
+        return plan.matrix(data=data)
 
     @timer
     def serial_construct_matrix(self, b0, 
-            b1=None, c=None, q=None):
+            b1=None, c=None, q=None, plan=None):
         """
 
         Parameters
@@ -323,6 +327,8 @@ class FEMeshIntegralAlg():
             b0[1]: cell2dof
             b0[2]: number of global dofs
         b1: default is None, just like b0
+        plan: default is None, `AssemblyPlan` object built from the same
+            cell2dof, which is used to assemble the matrix without sorting
 
         Notes
         -----
@@ -367,11 +373,6 @@ class FEMeshIntegralAlg():
 
             ''')
 
-        if len(phi0.shape) == 3:
-            GD = 1
-        else:
-            GD = phi0.shape[3]
-
         if b1 is not None:
             if b1[0].coordtype == 'barycentric':
                 phi1 = b1[0](bcs) # (NQ, NC, ldof, ...)
@@ -380,43 +381,20 @@ class FEMeshIntegralAlg():
         else:
             phi1 = phi0
 
-        if c is None:
-            M = np.einsum('i, ijk..., ijm..., j->jkm', ws, phi0, phi1,
-                    self.cellmeasure, optimize=True)
-        else: 
-            if callable(c):
-                if c.coordtype == 'barycentric':
-                    c = c(bcs)
-                elif c.coordtype == 'cartesian':
-                    c = c(ps)
+        if callable(c):
+            if c.coordtype == 'barycentric':
+                c = c(bcs)
+            elif c.coordtype == 'cartesian':
+                c = c(ps)
 
-            if isinstance(c, (int, float)):
-                M = np.einsum('i, ijk..., ijm..., j->jkm', c*ws, phi0, phi1,
-                        self.cellmeasure, optimize=True)
-            elif isinstance(c, np.ndarray): 
-                if c.shape == (GD, GD): # constant diffusion coefficient
-                    phi0 = np.einsum('mn, ijkn->ijkm', c, phi0)
-                    M = np.einsum('i, ijkl, ijml, j->jkm', ws, phi0, phi1,
-                            self.cellmeasure, optimize=True)
-                elif c.shape == (GD, ): # constant convection coefficient
-                    phi0 = np.einsum('m, ijkm->ijk', c, phi0)
-                    M = np.einsum('i, ijk, ijm, j->jkm', ws, phi0, phi1,
-                            self.cellmeasure, optimize=True)
-                elif len(c.shape) == 2: # (NQ, NC)
-                    M = np.einsum('i, ij, ijk..., ijm..., j->jkm', ws, c, phi0, phi1,
-                            self.cellmeasure, optimize=True)
-                elif len(c.shape) == 3: # (NQ, NC, GD)
-                    phi0 = np.einsum('ijm, ijkm->ijk', c, phi0)
-                    M = np.einsum('i, ijk, ijm, j->jkm', ws, phi0, phi1,
-                            self.cellmeasure, optimize=True)
-                elif len(c.shape) == 4: # (NQ, NC, GD, GD)
-                    phi0 = np.einsum('ijmn, ijkn->ijkm', c, phi0)
-                    M = np.einsum('i, ijkl, ijml, j->jkm', ws, phi0, phi1,
-                            self.cellmeasure, optimize=True)
+        M = self._cell_matrix(ws, phi0, phi1, self.cellmeasure, c=c)
 
         if cell2dof0 is None: # 仅组装单元矩阵 
             return M
 
+        if plan is not None:
+            return plan.assemble(M)
+
         if b1 is None:
             gdof1 = gdof0
             cell2dof1 = cell2dof0
@@ -431,6 +409,201 @@ class FEMeshIntegralAlg():
                 shape=(gdof0, gdof1))
         return M
 
+    def _cell_matrix(self, ws, phi0, phi1, cellmeasure, c=None):
+        """
+        @brief 由积分点处的基函数值计算单元矩阵, 其中系数 c 已在积分点处求值
+
+        Parameters
+        ----------
+        ws : (NQ, ) 积分权重
+        phi0 : (NQ, NC, ldof0, ...) 
+        phi1 : (NQ, NC, ldof1, ...) 
+        cellmeasure : (NC, )
+        c : None, 常数或者数组 (GD, GD), (GD, ), (NQ, NC), (NQ, NC, GD),
+            (NQ, NC, GD, GD)
+        """
+        if len(phi0.shape) == 3:
+            GD = 1
+        else:
+            GD = phi0.shape[3]
+
+        if c is None:
+            M = np.einsum('i, ijk..., ijm..., j->jkm', ws, phi0, phi1,
+                    cellmeasure, optimize=True)
+        elif isinstance(c, (int, float)):
+            M = np.einsum('i, ijk..., ijm..., j->jkm', c*ws, phi0, phi1,
+                    cellmeasure, optimize=True)
+        elif isinstance(c, np.ndarray): 
+            if c.shape == (GD, GD): # constant diffusion coefficient
+                phi0 = np.einsum('mn, ijkn->ijkm', c, phi0)
+                M = np.einsum('i, ijkl, ijml, j->jkm', ws, phi0, phi1,
+                        cellmeasure, optimize=True)
+            elif c.shape == (GD, ): # constant convection coefficient
+                phi0 = np.einsum('m, ijkm->ijk', c, phi0)
+                M = np.einsum('i, ijk, ijm, j->jkm', ws, phi0, phi1,
+                        cellmeasure, optimize=True)
+            elif len(c.shape) == 2: # (NQ, NC)
+                M = np.einsum('i, ij, ijk..., ijm..., j->jkm', ws, c, phi0, phi1,
+                        cellmeasure, optimize=True)
+            elif len(c.shape) == 3: # (NQ, NC, GD)
+                phi0 = np.einsum('ijm, ijkm->ijk', c, phi0)
+                M = np.einsum('i, ijk, ijm, j->jkm', ws, phi0, phi1,
+                        cellmeasure, optimize=True)
+            elif len(c.shape) == 4: # (NQ, NC, GD, GD)
+                phi0 = np.einsum('ijmn, ijkn->ijkm', c, phi0)
+                M = np.einsum('i, ijkl, ijml, j->jkm', ws, phi0, phi1,
+                        cellmeasure, optimize=True)
+        return M
+
+    def _value(self, f, bcs, index=np.s_[:]):
+        """
+        @brief 在部分单元 index 的积分点上计算函数 f 的值
+
+        Notes
+        -----
+        重心坐标函数需要接受 `index` 关键字参数, 空间的 `basis`, `grad_basis`
+        及 `Function` 都满足这个要求.
+        """
+        if not callable(f):
+            return f
+
+        if f.coordtype == 'barycentric':
+            return f(bcs, index=index)
+        elif f.coordtype == 'cartesian':
+            ps = self.mesh.bc_to_point(bcs, index=index)
+            return f(ps)
+        else:
+            raise ValueError('''
+            The coordtype must be `cartesian` or `barycentric`!
+
+            from fealpy.decorator import cartesian, barycentric
+
+            ''')
+
+    def matrix_pattern(self, cell2dof0, gdof0, cell2dof1=None, gdof1=None):
+        """
+        @brief 由单元自由度数组生成整体矩阵的 CSR 稀疏模式, 所有非零元的值为 0
+
+        Notes
+        -----
+        见 `AssemblyPlan.pattern`, 不需要生成 COO 三元组.
+        """
+        plan = AssemblyPlan(cell2dof0, gdof0, cell2dof1, gdof1, scatter=False)
+        return plan.matrix()
+
+    @timer
+    def chunk_construct_matrix(self, b0, b1=None, c=None, q=None, memory=1024,
+            plan=None):
+        """
+        @brief 分块组装矩阵, 用于内存受限的大规模问题
+
+        Parameters
+        ----------
+        b0: tuple, 
+            b0[0]: basis function
+            b0[1]: cell2dof
+            b0[2]: number of global dofs
+        b1: default is None, just like b0
+        c: 系数, 与 `serial_construct_matrix` 相同. 重心坐标形式的系数函数需要
+           接受 `index` 关键字参数.
+        memory: 每一块单元计算时允许占用的内存大小, 单位为 MB
+        plan: 默认为 None, 临时生成一个不保存位置数组的 `AssemblyPlan`; 否则
+           复用给定的组装计划, 它的位置数组已算好时直接按块切片使用
+
+        Notes
+        -----
+        先由 `AssemblyPlan` 生成整体矩阵的 CSR 稀疏模式, 再按给定的内存大小
+        把单元分成若干块, 逐块计算单元矩阵, 并直接累加到 CSR 矩阵的 data 数组
+        中. 整个过程不会生成 (NC, ldof0, ldof1) 的全部单元矩阵, 也不会生成 COO
+        三元组.
+        """
+        basis0, cell2dof0, gdof0 = b0
+        if b1 is None:
+            basis1, cell2dof1, gdof1 = basis0, cell2dof0, gdof0
+        else:
+            basis1, cell2dof1, gdof1 = b1
+
+        mesh = self.mesh
+        NC = mesh.number_of_cells()
+        qf = self.integrator if q is None else mesh.integrator(q, etype='cell')
+        bcs, ws = qf.get_quadrature_points_and_weights()
+        nc = self._chunk_size(len(ws), cell2dof0.shape[1], cell2dof1.shape[1], memory)
+
+        if plan is None:
+            plan = AssemblyPlan(cell2dof0, gdof0, cell2dof1, gdof1, scatter=False)
+        data = np.zeros(plan.number_of_nonzeros(), dtype=np.float64)
+
+        for start in range(0, NC, nc):
+            index = np.s_[start:min(start+nc, NC)]
+            M = self._block_cell_matrix(bcs, ws, basis0, basis1, c, index)
+            data = self._promote(data, M)
+            plan.add(data, M, index=index)
+
+        return plan.matrix(data=data)
+
+    @staticmethod
+    def _promote(data, M):
+        """
+        @brief 单元矩阵 M 为复数时把累加数组 data 转为复数
+        """
+        dtype = np.result_type(data, M)
+        return data if dtype == data.dtype else data.astype(dtype)
+
+    def _chunk_size(self, NQ, ldof0, ldof1, memory):
+        """
+        @brief 由内存大小 memory (MB) 估计每一块的单元个数
+        """
+        GD = self.mesh.geo_dimension()
+        # 每个单元需要的内存: 基函数值, 系数值, 单元矩阵及其在 data 中的位置
+        nbytes = 8*(NQ*(ldof0 + ldof1 + GD*GD)*GD + 3*ldof0*ldof1)
+        return max(1, int(memory*1024**2)//(2*nbytes))
+
+    def _block_cell_matrix(self, bcs, ws, basis0, basis1, c, index):
+        """
+        @brief 计算部分单元 index 上的单元矩阵
+        """
+        GD = self.mesh.geo_dimension()
+        phi0 = self._value(basis0, bcs, index=index)
+        phi1 = phi0 if basis1 is basis0 else self._value(basis1, bcs, index=index)
+
+        if callable(c):
+            val = self._value(c, bcs, index=index)
+        elif isinstance(c, np.ndarray) and (len(c.shape) > 1) and (c.shape != (GD, GD)):
+            val = c[:, index] # 在积分点处给定的系数数组 (NQ, NC, ...)
+        else:
+            val = c
+
+        return self._cell_matrix(ws, phi0, phi1, self.cellmeasure[index], c=val)
+
+    def _part_matrix(self, plan, bcs, ws, basis0, basis1, c, index, nc):
+        """
+        @brief 计算一组单元 index 对整体矩阵 data 数组的贡献
+
+        Returns
+        -------
+        upos : 这组单元涉及的 data 数组位置, 互不相同且有序
+        val : 对应位置上的值
+
+        Notes
+        -----
+        与 `chunk_construct_matrix` 一样, 位置数组只对每一块单元计算, 每块先
+        合并自己的重复位置, 最后再合并所有块的结果.
+        """
+        uposs = []
+        vals = []
+        for start in range(0, len(index), nc):
+            s = index[start:start+nc]
+            M = self._block_cell_matrix(bcs, ws, basis0, basis1, c, s)
+            pos = plan.position(index=s)
+            upos, inv = np.unique(pos, return_inverse=True)
+            uposs.append(upos)
+            vals.append(bincount(inv.reshape(-1), M.reshape(-1), len(upos)))
+            del pos, inv, M
+
+        upos, inv = np.unique(np.concatenate(uposs), return_inverse=True)
+        val = bincount(inv, np.concatenate(vals), len(upos))
+        return upos, val
+
     @timer
     def serial_construct_vector(self, f, b, celltype=False, q=None):
         """
@@ -480,19 +653,13 @@ class FEMeshIntegralAlg():
 
             if celltype:
                 return bb
-            shape = (gdof, )
-            F = np.zeros(shape, dtype=mesh.ftype)
-            np.add.at(F, cell2dof, bb)
-            return F 
+            return scatter_vector(cell2dof, bb, gdof)
         elif len(val.shape) == len(phi.shape): 
             # f 是向量函数 (NQ, NC, GD)， 基是标量函数 (NQ, NC, ldof)
             bb = np.einsum('i, ijn, ijk, j->jkn', ws, val, phi, self.cellmeasure)
             if celltype:
                 return bb
-            shape = (gdof, GD)
-            F = np.zeros(shape, dtype=mesh.ftype)
-            np.add.at(F, (cell2dof, np.s_[:]), bb)
-            return F
+            return scatter_vector(cell2dof, bb, gdof)
         else:
             print('Warning!, we can not deal with this f function!')
 
@@ -502,13 +669,14 @@ class FEMeshIntegralAlg():
             basis1=None,  c=None, 
             cell2dof0=None, gdof0=None, 
             cell2dof1=None, gdof1=None, 
-            q=None):
+            q=None, plan=None):
         """
 
         Parameters
         ---------
 
         c: 
+        plan: `AssemblyPlan` object, 如果给定, 直接用它组装整体矩阵
 
         Notes
         -----
@@ -565,6 +733,9 @@ class FEMeshIntegralAlg():
         if cell2dof0 is None: # just construct cell matrix
             return M
 
+        if plan is not None:
+            return plan.assemble(M)
+
         gdof0 = gdof0 or cell2dof0.max()
         if cell2dof1 is None:
             gdof1 = gdof0
@@ -609,11 +780,8 @@ class FEMeshIntegralAlg():
         #TODO: consider more case
         bb = np.einsum('i, ij, ijk, j->jk', ws, val, phi, self.cellmeasure)
 
-        gdof = gdof or cell2dof.max()
-        shape = (gdof, )
-        b = np.zeros(shape, dtype=phi.dtype)
-        np.add.at(b, cell2dof, bb)
-        return b
+        gdof = gdof or cell2dof.max() + 1
+        return scatter_vector(cell2dof, bb, gdof)
 
     def construct_vector_v_v(self, f, basis, cell2dof, gdof=None, q=None, dtype=None):
         """
@@ -629,7 +797,7 @@ class FEMeshIntegralAlg():
 
         if basis.coordtype == 'barycentric':
             phi = basis(bcs)
-        elif c.coordtype == 'cartesian':
+        elif basis.coordtype == 'cartesian':
             phi = basis(ps)
 
         if callable(f):
@@ -645,11 +813,9 @@ class FEMeshIntegralAlg():
 
         bb = np.einsum('i, ijm, ijkm, j->jk', ws, val, phi, self.cellmeasure)
 
-        gdof = gdof or cell2dof.max()
+        gdof = gdof or cell2dof.max() + 1
         dtype = phi.dtype if dtype is None else dtype
-        b = np.zeros(gdof, dtype=dtype)
-        np.add.at(b, cell2dof, bb)
-        return b
+        return scatter_vector(cell2dof, bb, gdof).astype(dtype, copy=False)
 
     def construct_vector_v_s(self, f, basis, cell2dof, gdof=None, q=None):
         """
@@ -666,7 +832,7 @@ class FEMeshIntegralAlg():
 
         if basis.coordtype == 'barycentric':
             phi = basis(bcs)
-        elif c.coordtype == 'cartesian':
+        elif basis.coordtype == 'cartesian':
             phi = basis(ps)
 
         if callable(f):
@@ -680,12 +846,64 @@ class FEMeshIntegralAlg():
             bb = np.einsum('m, mik, i->ik',
                     f*ws, phi, self.cellmeasure)
 
-        gdof = gdof or cell2dof.max()
-        shape = (gdof, val.shape[-1])
-        b = np.zeros(shape, dtype=phi.dtype)
-        np.add.at(b, (cell2dof, np.s_[:]), bb)
+        gdof = gdof or cell2dof.max() + 1
+        return scatter_vector(cell2dof, bb, gdof)
+
+    def construct_vector_batch(self, f, basis, cell2dof, gdof=None, q=None):
+        """
+        @brief 一次组装多个右端向量
+
+        Parameters
+        ----------
+        f : 多个源项, 可以是
+
+            * 一个函数, 一次返回所有源项在积分点处的值, 形状为
+              (nrhs, NQ, NC) (标量基函数) 或者 (nrhs, NQ, NC, GD) (向量基函数);
+            * 函数的列表, 逐个求值后叠在一起;
+            * 上面形状的数组.
+
+        basis : 基函数, 值的形状为 (NQ, NC, ldof) 或者 (NQ, NC, ldof, GD)
+        cell2dof : (NC, ldof)
+
+        Returns
+        -------
+        b : (gdof, nrhs), 每一列是一个右端向量
+
+        Notes
+        -----
+        所有右端的单元向量由一次 einsum 得到, 再由 `scatter_vector` 用一次稀疏
+        矩阵乘稠密矩阵累加到整体向量中, 多个右端的组装时间和一个右端相差不多.
+        """
+        mesh = self.mesh
+        qf = self.integrator if q is None else mesh.integrator(q, etype='cell')
+        bcs, ws = qf.get_quadrature_points_and_weights()
+        ps = mesh.bc_to_point(bcs)
+
+        if basis.coordtype == 'barycentric':
+            phi = basis(bcs)
+        elif basis.coordtype == 'cartesian':
+            phi = basis(ps)
+
+        def value(f):
+            if f.coordtype == 'barycentric':
+                return f(bcs)
+            elif f.coordtype == 'cartesian':
+                return f(ps)
+
+        if callable(f):
+            val = value(f)
+        elif isinstance(f, (list, tuple)):
+            val = np.stack([value(fi) for fi in f], axis=0)
+        else:
+            val = f
+
+        if val.ndim == phi.ndim: # 标量基函数
+            bb = np.einsum('i, rij, ijk, j->jkr', ws, val, phi, self.cellmeasure)
+        else: # 向量基函数
+            bb = np.einsum('i, rijm, ijkm, j->jkr', ws, val, phi, self.cellmeasure)
 
-        return b
+        gdof = gdof or cell2dof.max() + 1
+        return scatter_vector(cell2dof, bb, gdof)
 
 
 
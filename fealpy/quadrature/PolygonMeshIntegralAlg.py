@@ -2,10 +2,72 @@ import numpy as np
 from .GaussLobattoQuadrature import GaussLobattoQuadrature
 from .GaussLegendreQuadrature import GaussLegendreQuadrature
 
+
+class PolygonMeshQuadrature():
+    """
+    @brief 多边形网格上的复合求积公式
+
+    Notes
+    -----
+    以 cellbarycenter 为公共顶点把每个多边形单元剖分成子三角形, 每条边对应一个
+    子三角形 (内部边对应两个, 分别属于两侧的单元), 在子三角形上使用三角形求积
+    公式. 子三角形按所属单元排序, 单元上的积分是一段连续子三角形上的和, 可以用
+    一次 `np.add.reduceat` 得到.
+
+    下面的数组都是平铺的, NT 为子三角形的个数:
+
+    * index : (NT, ), 子三角形所属的单元
+    * edge : (NT, 2), 子三角形的边, 相对所属单元为逆时针方向
+    * measure : (NT, ), 子三角形的面积
+    * location : (NC, ), 每个单元的第一个子三角形的编号
+    * points : (NQ, NT, GD), 积分点
+    * weights : (NQ, NT), 积分点的权重乘以子三角形的面积
+    """
+    def __init__(self, mesh, qf, cellbarycenter):
+        node = mesh.entity('node')
+        edge = mesh.entity('edge')
+        edge2cell = mesh.ds.edge_to_cell()
+        isInEdge = (edge2cell[:, 0] != edge2cell[:, 1])
+        NC = mesh.number_of_cells()
+
+        index = np.r_[edge2cell[:, 0], edge2cell[isInEdge, 1]]
+        edge = np.r_['0', edge, edge[isInEdge, ::-1]]
+        order = np.argsort(index, kind='stable')
+        self.index = index[order]
+        self.edge = edge[order]
+        self.location = np.zeros(NC, dtype=mesh.itype)
+        self.location[1:] = np.cumsum(np.bincount(self.index, minlength=NC))[:-1]
+
+        tri = [cellbarycenter[self.index], node[self.edge[:, 0]], node[self.edge[:, 1]]]
+        v1 = tri[1] - tri[0]
+        v2 = tri[2] - tri[0]
+        self.measure = np.cross(v1, v2)/2
+
+        bcs, ws = qf.get_quadrature_points_and_weights()
+        self.points = np.einsum('ij, jkm->ikm', bcs, tri)
+        self.weights = ws[:, None]*self.measure
+
+    def number_of_quadrature_points(self):
+        return self.weights.shape[0]
+
+    def reduce(self, val):
+        """
+        @brief 把子三角形上的量 val (NT, ...) 按所属单元求和, 得到 (NC, ...)
+        """
+        return np.add.reduceat(val, self.location, axis=0)
+
+    def cell_integral(self, val):
+        """
+        @brief 由积分点上的函数值 val (NQ, NT, ...) 计算每个单元上的积分
+        """
+        return self.reduce(np.einsum('ij, ij...->j...', self.weights, val))
+
+
 class PolygonMeshIntegralAlg():
     def __init__(self, mesh, q, cellmeasure=None, cellbarycenter=None):
         self.mesh = mesh
 
+        self.q = q
         self.integrator = mesh.integrator(q)
         self.cellintegrator = self.integrator 
         self.cellbarycenter = cellbarycenter if cellbarycenter is not None \
@@ -21,6 +83,19 @@ class PolygonMeshIntegralAlg():
         self.facebarycenter = self.edgebarycenter
         self.faceintegrator = self.edgeintegrator
 
+        self._quadrature = {}
+
+    def quadrature(self, q=None):
+        """
+        @brief 积分阶为 q 的复合求积公式, 对每个 q 只生成一次
+        """
+        q = self.q if q is None else q
+        if q not in self._quadrature:
+            qf = self.cellintegrator if q == self.q else self.mesh.integrator(q)
+            self._quadrature[q] = PolygonMeshQuadrature(self.mesh, qf,
+                    self.cellbarycenter)
+        return self._quadrature[q]
+
     def triangle_measure(self, tri):
         v1 = tri[1] - tri[0]
         v2 = tri[2] - tri[0]
@@ -64,42 +139,13 @@ class PolygonMeshIntegralAlg():
         return self.integral(u, celltype=True, q=q)
 
     def integral(self, u, celltype=False, q=None):
-        mesh = self.mesh
-        node = mesh.node
-        bc = self.cellbarycenter
-
-        edge = mesh.entity('edge')
-        edge2cell = mesh.ds.edge_to_cell()
-
-        NC = mesh.number_of_cells()
-
-        qf = self.cellintegrator if q is None else self.mesh.integrator(q)
-        bcs, ws = qf.quadpts, qf.weights
-
-        tri = [bc[edge2cell[:, 0]], node[edge[:, 0]], node[edge[:, 1]]]
-        a = self.triangle_measure(tri)
-        pp = np.einsum('ij, jkm->ikm', bcs, tri)
-        val = u(pp, edge2cell[:, 0])
-
-        shape = (NC, ) + val.shape[2:]
-        e = np.zeros(shape, dtype=np.float64)
-
-        ee = np.einsum('i, ij..., j->j...', ws, val, a)
-        np.add.at(e, edge2cell[:, 0], ee)
-
-        isInEdge = (edge2cell[:, 0] != edge2cell[:, 1])
-        if np.sum(isInEdge) > 0:
-            tri = [
-                    bc[edge2cell[isInEdge, 1]],
-                    node[edge[isInEdge, 1]],
-                    node[edge[isInEdge, 0]]
-                    ]
-            a = self.triangle_measure(tri)
-            pp = np.einsum('ij, jkm->ikm', bcs, tri)
-            val = u(pp, edge2cell[isInEdge, 1])
-            ee = np.einsum('i, ij..., j->j...', ws, val, a)
-            np.add.at(e, edge2cell[isInEdge, 1], ee)
-
+        """
+        @brief 计算 u 在每个单元上的积分, u(x, index) 在所有子三角形的积分点
+            上只调用一次
+        """
+        qf = self.quadrature(q)
+        val = u(qf.points, qf.index)
+        e = qf.cell_integral(val)
         if celltype is True:
             return e
         else:
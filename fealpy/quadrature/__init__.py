@@ -7,7 +7,8 @@ from .QuadrangleQuadrature import QuadrangleQuadrature
 from .HexahedronQuadrature import HexahedronQuadrature
 from .PrismQuadrature import PrismQuadrature
 from .FEMeshIntegralAlg import FEMeshIntegralAlg
-from .PolygonMeshIntegralAlg import PolygonMeshIntegralAlg
+from .AssemblyPlan import AssemblyPlan
+from .PolygonMeshIntegralAlg import PolygonMeshIntegralAlg, PolygonMeshQuadrature
 from .PolyhedronMeshIntegralAlg import PolyhedronMeshIntegralAlg
 
 from .TensorProductQuadrature import TensorProductQuadrature
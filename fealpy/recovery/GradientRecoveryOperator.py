@@ -0,0 +1,367 @@
+import numpy as np
+from scipy.sparse import csr_matrix, coo_matrix, spdiags, eye, vstack
+
+
+class GradientRecoveryOperator():
+    """
+
+    Notes
+    -----
+    Lagrange 有限元函数的梯度恢复算子.
+
+    梯度恢复是有限元函数到连续分片多项式空间的线性映射, 只依赖于网格和空间.
+    构造对象时把求梯度和恢复的权重一起组装成一个 (GD*gdof, gdof) 的稀疏矩阵,
+    之后每次恢复只需要一次稀疏矩阵乘向量, 在自适应循环中, 同一个网格上多次
+    恢复时不再重复计算基函数的梯度和权重.
+
+    支持的方法有
+
+    * 'simple', 'area', 'area_harmonic', 'distance', 'distance_harmonic' :
+      把每个单元上插值点处的梯度加权平均到插值点上, 权重分别是 1, 单元面积,
+      单元面积的倒数, 插值点到单元重心的距离和距离的倒数;
+    * 'SPR' : Zienkiewicz-Zhu 超收敛块恢复, 在节点周围的单元块上用线性函数
+      拟合单元重心处的梯度 (只用于线性元);
+    * 'PPR' : 多项式保持恢复, 在节点周围的节点块上用二次函数拟合有限元函数
+      在节点处的值, 取拟合函数在节点处的梯度 (只用于二维线性元).
+
+    SPR 和 PPR 的局部最小二乘问题按块中点的个数分组, 每一组用一次批量的
+    `np.linalg.pinv` 求解.
+    """
+    def __init__(self, space, method='simple'):
+        self.space = space
+        self.mesh = space.mesh
+        self.method = method
+        self.GD = self.mesh.geo_dimension()
+
+        if method in {'simple', 'area', 'area_harmonic', 'distance',
+                'distance_harmonic'}:
+            # 插值点处的梯度加权平均
+            p = space.p
+            bc = space.dof.multiIndex/p
+            A = self.average_matrix(method)
+            self.matrix = self.grad_matrix(A, bc)
+        elif method in {'SPR', 'ZZ'}:
+            # 单元重心处的梯度做块拟合
+            if space.p != 1:
+                raise ValueError("SPR recovery only supports the linear element!")
+            TD = self.mesh.top_dimension()
+            bc = np.full((1, TD+1), 1/(TD+1))
+            A = self.spr_matrix()
+            self.matrix = self.grad_matrix(A, bc)
+        elif method == 'PPR':
+            self.matrix = self.ppr_matrix()
+        else:
+            raise ValueError("Unknown recovery method {}!".format(method))
+
+    def __call__(self, uh):
+        """
+        @brief 恢复有限元函数 uh 的梯度
+
+        Parameters
+        ----------
+        uh : 有限元函数, 形状为 (gdof, ...), 可以是向量值的
+
+        Returns
+        -------
+        rguh : 恢复的梯度, 形状为 (gdof, ..., GD), uh 是标量函数时返回空间
+            中 dim=GD 的有限元函数
+        """
+        GD = self.GD
+        gdof = uh.shape[0]
+        shape = uh.shape[1:]
+        val = self.matrix@np.asarray(uh).reshape(gdof, -1)
+        # (GD*gdof, n) -> (gdof, n, GD)
+        val = val.reshape(GD, gdof, -1).transpose(1, 2, 0)
+
+        if len(shape) == 0:
+            rguh = self.space.function(dim=GD)
+            rguh[:] = val.reshape(gdof, GD)
+            return rguh
+        else:
+            return val.reshape((gdof, ) + shape + (GD, ))
+
+    def grad_matrix(self, A, bc):
+        """
+        @brief 把每个单元上 bc 处求梯度的算子和 A 复合, 得到 (GD*gdof, gdof)
+            的恢复矩阵
+
+        Parameters
+        ----------
+        A : 稀疏矩阵, 形状为 (gdof, NC*NQ), 作用在每个单元 NQ 个点处的梯度上
+        bc : (NQ, TD+1) 的重心坐标
+        """
+        space = self.space
+        GD = self.GD
+        cell2dof = space.cell_to_dof()
+        gdof = space.number_of_global_dofs()
+        NC, ldof = cell2dof.shape
+        NQ = bc.shape[0]
+
+        gphi = space.grad_basis(bc) # (NQ, NC, ldof, GD)
+        I = np.broadcast_to(np.arange(NC*NQ).reshape(NC, NQ, 1), (NC, NQ, ldof))
+        J = np.broadcast_to(cell2dof[:, None, :], (NC, NQ, ldof))
+        R = []
+        for k in range(GD):
+            val = gphi[..., k].swapaxes(0, 1) # (NC, NQ, ldof)
+            G = csr_matrix((val.flat, (I.flat, J.flat)), shape=(NC*NQ, gdof))
+            R.append(A@G)
+        return vstack(R, format='csr')
+
+    def average_matrix(self, method):
+        """
+        @brief 加权平均的稀疏矩阵, 形状为 (gdof, NC*ldof)
+        """
+        space = self.space
+        mesh = self.mesh
+        cell2dof = space.cell_to_dof()
+        gdof = space.number_of_global_dofs()
+        NC, ldof = cell2dof.shape
+
+        if method == 'simple':
+            w = np.ones((NC, ldof), dtype=mesh.ftype)
+        elif method in {'area', 'area_harmonic'}:
+            measure = mesh.entity_measure('cell')
+            if method == 'area_harmonic':
+                measure = 1/measure
+            w = np.broadcast_to(measure[:, None], (NC, ldof))
+        else:
+            ipoints = space.interpolation_points()
+            bp = mesh.entity_barycenter('cell')
+            v = bp[:, np.newaxis, :] - ipoints[cell2dof, :]
+            w = np.sqrt(np.sum(v**2, axis=-1))
+            if method == 'distance_harmonic':
+                w = 1/w
+
+        deg = np.bincount(cell2dof.flat, weights=w.flat, minlength=gdof)
+        val = w/deg[cell2dof]
+        A = csr_matrix((val.flat, (cell2dof.flat, np.arange(NC*ldof))),
+                shape=(gdof, NC*ldof))
+        return A
+
+    def spr_matrix(self):
+        """
+        @brief SPR 拟合的稀疏矩阵, 形状为 (NN, NC), 作用在单元重心处的梯度上
+
+        Notes
+        -----
+        内部节点在它周围的单元块上拟合; 边界节点取相邻内部节点的拟合函数在
+        它上面的值的平均, 没有相邻的内部节点时取周围单元的平均.
+        """
+        mesh = self.mesh
+        NN = mesh.number_of_nodes()
+        NC = mesh.number_of_cells()
+        node = mesh.entity('node')
+        bp = mesh.entity_barycenter('cell')
+        isBdNode = mesh.ds.boundary_node_flag()
+        node2cell = csr_matrix(mesh.ds.node_to_cell(), dtype=np.int_)
+        node2node = csr_matrix(mesh.ds.node_to_node(), dtype=np.int_)
+
+        # 每个内部节点的线性拟合算子 P, 在点 x 处的值为 basis(x)@P
+        idx, = np.nonzero(~isBdNode)
+        patch = node2cell[idx]
+        fit = PatchFit(bp, patch, lambda x: monomial(x, 1))
+
+        # 内部节点在自身处取值
+        rows, cols, vals = fit.evaluate(np.arange(len(idx)), node[idx])
+        I, J, V = [idx[rows]], [cols], [vals]
+
+        # 边界节点取相邻内部节点的拟合在自身处的值的平均
+        nb = node2node[isBdNode]
+        nb = csr_matrix((nb.data*(~isBdNode[nb.indices]), nb.indices, nb.indptr),
+                shape=nb.shape)
+        nb.eliminate_zeros()
+        bdIdx, = np.nonzero(isBdNode)
+        nnb = np.diff(nb.indptr)
+        i = np.repeat(bdIdx, nnb)
+        j = nb.indices
+        imap = np.zeros(NN, dtype=np.int_)
+        imap[idx] = np.arange(len(idx))
+        rows, cols, vals = fit.evaluate(imap[j], node[i])
+        I.append(i[rows])
+        J.append(cols)
+        V.append(vals/np.repeat(nnb, nnb)[rows])
+
+        # 没有相邻内部节点的边界节点
+        flag = nnb == 0
+        patch = node2cell[bdIdx[flag]]
+        n = np.diff(patch.indptr)
+        I.append(np.repeat(bdIdx[flag], n))
+        J.append(patch.indices)
+        V.append(1/np.repeat(n, n))
+
+        A = coo_matrix((np.concatenate(V), (np.concatenate(I), np.concatenate(J))),
+                shape=(NN, NC)).tocsr()
+        return A
+
+    def ppr_matrix(self):
+        """
+        @brief PPR 恢复的稀疏矩阵, 形状为 (GD*NN, NN), 第 k 块给出梯度的第 k
+            个分量
+
+        Notes
+        -----
+        节点块的选取:
+
+        * 内部节点: 节点和它的相邻节点, 不足 6 个时, 取节点周围的单元和它们的
+          相邻单元的所有顶点;
+        * 边界节点: 节点和它的相邻节点, 再并上编号最小的相邻内部节点的相邻
+          节点, 不足 6 个或者没有相邻内部节点时, 取相邻节点的相邻节点.
+        """
+        mesh = self.mesh
+        GD = self.GD
+        if (GD != 2) or (self.space.p != 1):
+            raise ValueError("PPR recovery only supports the 2d linear element!")
+
+        NN = mesh.number_of_nodes()
+        NC = mesh.number_of_cells()
+        node = mesh.entity('node')
+        cell = mesh.entity('cell')
+        isBdNode = mesh.ds.boundary_node_flag()
+
+        I = eye(NN, dtype=np.int_, format='csr')
+        A = csr_matrix(mesh.ds.node_to_node(), dtype=np.int_) + I
+        A.sort_indices()
+        n1 = np.diff(A.indptr)
+        A2 = A@A
+
+        # 单元周围的单元 (包括自身)
+        cell2cell = mesh.ds.cell_to_cell()
+        C = csr_matrix((np.ones(4*NC, dtype=np.int_),
+            (np.repeat(np.arange(NC), 4), np.c_[np.arange(NC), cell2cell].flat)),
+            shape=(NC, NC))
+        node2cell = csr_matrix(mesh.ds.node_to_cell(), dtype=np.int_)
+        cell2node = csr_matrix((np.ones(3*NC, dtype=np.int_),
+            (np.repeat(np.arange(NC), 3), cell.flat)), shape=(NC, NN))
+
+        # 编号最小的相邻内部节点, A 的每一行按列号排序, 取第一个
+        nb = A.tocoo()
+        flag = ~isBdNode[nb.col] & isBdNode[nb.row]
+        row, i = np.unique(nb.row[flag], return_index=True)
+        hasInNode = np.zeros(NN, dtype=np.bool_)
+        hasInNode[row] = True
+        P = csr_matrix((np.ones(len(row), dtype=np.int_),
+            (row, nb.col[flag][i])), shape=(NN, NN))
+
+        isIn1 = ~isBdNode & (n1 >= 6)
+        isIn2 = ~isBdNode & (n1 < 6)
+        isBd1 = isBdNode & hasInNode & (n1 >= 6)
+        patch = spdiags(isIn1.astype(np.int_), 0, NN, NN)@A
+        patch += spdiags(isIn2.astype(np.int_), 0, NN, NN)@((node2cell@C)@cell2node)
+        patch += spdiags(isBd1.astype(np.int_), 0, NN, NN)@(A + P@A)
+        patch += spdiags((isBdNode & ~isBd1).astype(np.int_), 0, NN, NN)@A2
+        patch = csr_matrix(patch)
+        patch.sum_duplicates()
+        patch.sort_indices()
+
+        fit = PatchFit(node, patch, lambda x: monomial(x, 2))
+        rows, cols, vals = fit.evaluate(np.arange(NN), node, grad=True)
+        # vals 的形状为 (nnz, GD)
+        Is = np.concatenate([rows + k*NN for k in range(GD)])
+        Js = np.tile(cols, GD)
+        R = coo_matrix((vals.T.flat, (Is, Js)), shape=(GD*NN, NN)).tocsr()
+        return R
+
+
+def monomial(x, p):
+    """
+    @brief 次数不超过 p (p <= 2) 的单项式在点 x 处的值和梯度
+
+    Returns
+    -------
+    phi : (..., n), n 为单项式的个数
+    gphi : (..., n, GD)
+    """
+    GD = x.shape[-1]
+    shape = x.shape[:-1]
+    phi = [np.ones(shape, dtype=x.dtype)]
+    gphi = [np.zeros(shape + (GD, ), dtype=x.dtype)]
+    for i in range(GD):
+        phi.append(x[..., i])
+        g = np.zeros(shape + (GD, ), dtype=x.dtype)
+        g[..., i] = 1
+        gphi.append(g)
+    if p == 2:
+        for i in range(GD):
+            for j in range(i, GD):
+                phi.append(x[..., i]*x[..., j])
+                g = np.zeros(shape + (GD, ), dtype=x.dtype)
+                g[..., i] += x[..., j]
+                g[..., j] += x[..., i]
+                gphi.append(g)
+    return np.stack(phi, axis=-1), np.stack(gphi, axis=-2)
+
+
+class PatchFit():
+    """
+    @brief 一组点块上的最小二乘拟合, 按块中点的个数分组批量求解
+    """
+    def __init__(self, point, patch, basis):
+        """
+        Parameters
+        ----------
+        point : 拟合点的坐标 (N, GD)
+        patch : 稀疏矩阵, 第 i 行的非零列是第 i 个块中的点, 按列排序
+        basis : 基函数, basis(x) 返回 (phi, gphi)
+        """
+        self.patch = patch = csr_matrix(patch)
+        self.basis = basis
+        n = np.diff(patch.indptr)
+        self.size = n
+
+        # 块的中心和尺度, 在局部坐标下拟合以避免病态
+        NP = len(n)
+        GD = point.shape[-1]
+        x = point[patch.indices]
+        rows = np.repeat(np.arange(NP), n)
+        center = np.zeros((NP, GD), dtype=point.dtype)
+        for k in range(GD):
+            center[:, k] = np.bincount(rows, weights=x[:, k], minlength=NP)/n
+        d = np.sqrt(np.sum((x - center[rows])**2, axis=-1))
+        h = np.maximum.reduceat(d, patch.indptr[:-1]) # 每个块都不是空的
+        self.center = center
+        self.h = h
+
+        # 每个块的拟合算子 (nbasis, n), 块中点的个数相同的一起求解
+        self.op = {}
+        for m in np.unique(n):
+            idx, = np.nonzero(n == m)
+            cols = patch.indptr[idx, None] + np.arange(m)
+            xl = (point[patch.indices[cols]] - center[idx, None, :])/h[idx, None, None]
+            phi, _ = basis(xl) # (nb, m, nbasis)
+            self.op[m] = (idx, cols, np.linalg.pinv(phi))
+
+    def evaluate(self, pidx, x, grad=False):
+        """
+        @brief 第 pidx[i] 个块的拟合函数在点 x[i] 处的值 (或梯度) 关于块中的
+            数据的系数
+
+        Returns
+        -------
+        rows, cols, vals : 第 rows 个点的值是第 cols 个数据乘以 vals 之和,
+            grad 为 True 时 vals 的形状为 (nnz, GD)
+        """
+        patch = self.patch
+        R, C, V = [], [], []
+        for m, (idx, cols, op) in self.op.items():
+            imap = np.full(len(self.size), -1, dtype=np.int_)
+            imap[idx] = np.arange(len(idx))
+            i, = np.nonzero(imap[pidx] >= 0)
+            if len(i) == 0:
+                continue
+            k = imap[pidx[i]]
+            j = pidx[i]
+            xl = (x[i] - self.center[j])/self.h[j, None]
+            phi, gphi = self.basis(xl)
+            if grad:
+                # (n, nbasis, GD), (n, nbasis, m) -> (n, m, GD)
+                val = np.einsum('ibd, ibm->imd', gphi, op[k])/self.h[j, None, None]
+                V.append(val.reshape(-1, val.shape[-1]))
+            else:
+                val = np.einsum('ib, ibm->im', phi, op[k])
+                V.append(val.reshape(-1))
+            R.append(np.repeat(i, m))
+            C.append(patch.indices[cols[k]].reshape(-1))
+        if len(R) == 0:
+            shape = (0, x.shape[-1]) if grad else (0, )
+            return np.zeros(0, dtype=np.int_), np.zeros(0, dtype=np.int_), np.zeros(shape)
+        return np.concatenate(R), np.concatenate(C), np.concatenate(V)
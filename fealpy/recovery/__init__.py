@@ -1,2 +1,2 @@
 from .FEMFunctionRecoveryAlg import FEMFunctionRecoveryAlg 
-
+from .GradientRecoveryOperator import GradientRecoveryOperator
@@ -1,21 +1,20 @@
-import platform
+# 所有的求解器都按 PEP 562 懒加载, 见 `fealpy.core.lazy`. 依赖 pyamg,
+# matlab 等可选软件包的求解器在第一次访问时才导入
+from ..core.lazy import attach
 
-from .solve import solve, active_set_solver
-from .amg import AMGSolver
+__getattr__, __dir__, __all__ = attach(__name__, {
+    'solve': ['solve', 'active_set_solver'],
+    'amg': ['AMGSolver'],
+    'gmg': ['GMGSolver'],
 
-try:
-    from .matlab_solver import MatlabSolver
-except ImportError:
-    print('I do not find matlab installed on this system!, so you can not use it')
+    'matlab_solver': ['MatlabSolver'],
+    #'petsc_solver': ['PETScSolver'],
 
-#try:
-#    from .petsc_solver import PETScSolver
-#except ImportError:
-#    print('I do not find petsc and petsc4py installed on this system!, so you can not use it')
+    'fast_solver': [
+        'HighOrderLagrangeFEMFastSolver',
+        'SaddlePointFastSolver',
+        'LinearElasticityLFEMFastSolver',
+        'LevelSetFEMFastSolver'],
 
-from .fast_solver import HighOrderLagrangeFEMFastSolver
-from .fast_solver import SaddlePointFastSolver
-from .fast_solver import LinearElasticityLFEMFastSolver 
-from .fast_solver import LevelSetFEMFastSolver 
-
-from .LinearElasticityRLFEMFastSolver import LinearElasticityRLFEMFastSolver
+    'LinearElasticityRLFEMFastSolver': ['LinearElasticityRLFEMFastSolver'],
+    })
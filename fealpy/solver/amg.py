@@ -1,8 +1,25 @@
 import numpy as np
-from scipy.sparse.linalg import cg, inv, dsolve, spsolve
+from scipy.sparse.linalg import splu, LinearOperator
 from scipy.sparse import spdiags, csr_matrix
 from timeit import default_timer as timer
 
+from .mg import GaussSeidelSmoother, JacobiSmoother
+
+
+def row_max(G, val, fill=-np.inf):
+    """
+    @brief 对稀疏矩阵 G 的每一行, 计算 val 在该行非零元列上的最大值
+
+    Notes
+    -----
+    没有非零元的行返回 fill.
+    """
+    N = G.shape[0]
+    r = np.full(N, fill, dtype=np.float64)
+    flag = np.diff(G.indptr) > 0
+    if len(G.indices) > 0:
+        r[flag] = np.maximum.reduceat(val[G.indices], G.indptr[:-1][flag])
+    return r
 
 
 class AMGSolver():
@@ -12,54 +29,480 @@ class AMGSolver():
     Ax = b
 
     要从 A 图结构中生成一个抽象的网格。
+
+    Notes
+    -----
+    支持两种粗化方式:
+
+    * 'RS': 经典的 Ruge-Stuben 粗化, 选取粗点的过程按轮向量化且轮数有界, 再用经典插值
+      构造延拓算子
+    * 'SA': 光滑聚集, 以常数为近零空间
+
+    所有粗化和插值操作都是向量化的, 没有对自由度的 Python 循环. 粗网格算子为
+    Galerkin 算子 P^T A P, 在 `setup` 中一次算好并缓存, 最粗层的矩阵预先做 LU
+    分解. 同一个矩阵的多次求解直接复用层次结构; 稀疏模式不变而数值改变的矩阵
+    可以用 `update` 只重新计算粗网格算子.
+
+    Examples
+    --------
+    >>> solver = AMGSolver()
+    >>> solver.setup(A)
+    >>> x = solver.solve(b) # 以 AMG 为预条件子的共轭梯度法
     """
-    def __init__(self):
-        pass
+    def __init__(self, ctype='RS', theta=None, csize=50, maxlevel=20,
+            smoother='GS', cycle='V', nu=1, seed=0, maxround=10):
+        """
+        Parameters
+        ----------
+        ctype : 粗化方式, 'RS' 或 'SA'
+        theta : 强连接的阈值, 默认 'RS' 为 0.25, 'SA' 为 0.08
+        csize : 最粗层矩阵的最大规模
+        maxlevel : 最大层数
+        smoother : 'GS' (对称 Gauss-Seidel) 或者 'Jacobi' (加权 Jacobi)
+        cycle : 'V', 'W' 或者 'F'
+        nu : 前后光滑的次数
+        seed : 随机数种子
+        maxround : 'RS' 粗化中经典选点和第二遍的最大轮数
+        """
+        self.ctype = ctype
+        if theta is None:
+            theta = 0.25 if ctype == 'RS' else 0.08
+        self.theta = theta
+        self.csize = csize
+        self.maxlevel = maxlevel
+        self.smoother = smoother
+        self.cycletype = cycle
+        self.nu = nu
+        self.maxround = maxround
+        self.rng = np.random.default_rng(seed)
 
     def setup(self, A):
-        self.A = A
+        """
+        @brief 生成多重网格的层次结构
+
+        Notes
+        -----
+        A 需要是对称正定矩阵.
+        """
+        start = timer()
+        A = csr_matrix(A)
+        self.A = [A]
+        self.P = []
+        self.R = []
+        self.rounds = []
+        while (A.shape[0] > self.csize) and (len(self.A) < self.maxlevel):
+            if self.ctype == 'RS':
+                isC, strong = self.coarsen_rs(A)
+                P = self.interpolation_rs(A, isC, strong)
+            elif self.ctype == 'SA':
+                P = self.aggregation_sa(A)
+            else:
+                raise ValueError("The ctype {} is not supported!".format(self.ctype))
+
+            if (P.shape[1] == 0) or (P.shape[1] > 0.9*A.shape[0]): # 粗化停滞
+                break
+
+            R = P.T.tocsr()
+            A = (R@A@P).tocsr()
+            self.P.append(P)
+            self.R.append(R)
+            self.A.append(A)
+
+        self.setup_smoother()
+        self.setuptime = timer() - start
+
+    def update(self, A):
+        """
+        @brief 延拓算子不变, 只用新的矩阵 A 重新计算粗网格算子
+
+        Notes
+        -----
+        适用于网格不变而系数改变的情形, 例如时间推进或非线性迭代.
+        """
+        A = csr_matrix(A)
+        self.A = [A]
+        for P, R in zip(self.P, self.R):
+            A = (R@A@P).tocsr()
+            self.A.append(A)
+        self.setup_smoother()
+
+    def setup_smoother(self):
+        if self.smoother == 'GS':
+            self.smoothers = [GaussSeidelSmoother(A) for A in self.A[:-1]]
+        elif self.smoother == 'Jacobi':
+            self.smoothers = [JacobiSmoother(A, weight=2/3) for A in self.A[:-1]]
+        self.coarse = splu(self.A[-1].tocsc())
+
+    def strength(self, A):
+        """
+        @brief 经典的强连接: -a_ij >= theta max_{k != i} (-a_ik)
+
+        Returns
+        -------
+        strong : 与 A.data 对应的布尔数组, 标记强连接的非零元
+        """
+        N = A.shape[0]
+        i = np.repeat(np.arange(N), np.diff(A.indptr))
+        j = A.indices
+        neg = np.where(i != j, -A.data, 0.0)
+        m = np.zeros(N, dtype=np.float64)
+        flag = np.diff(A.indptr) > 0
+        m[flag] = np.maximum.reduceat(neg, A.indptr[:-1][flag])
+        strong = (neg > 0) & (neg >= self.theta*m[i])
+        return strong
+
+    def independent_set(self, G, w, isU):
+        """
+        @brief 在图 G 的未定点 isU 中逐轮选取权重 w 的局部极大点
+
+        Returns
+        -------
+        isC : 选中的点
+        isF : 与选中点相邻的点
+        nround : 轮数
+        """
+        N = G.shape[0]
+        isU = isU.copy()
+        isC = np.zeros(N, dtype=np.bool_)
+        isF = np.zeros(N, dtype=np.bool_)
+        nround = 0
+        while np.any(isU):
+            nround += 1
+            wu = np.where(isU, w, -np.inf)
+            flag = isU & (w > row_max(G, wu))
+            if not np.any(flag): # 图中有自环时不会再有新的极大点
+                isF[isU] = True
+                break
+            isC[flag] = True
+            isU[flag] = False
+            flag = isU & ((G@flag.astype(np.float64)) > 0)
+            isF[flag] = True
+            isU[flag] = False
+        return isC, isF, nround
+
+    def coarsen_rs(self, A):
+        """
+        @brief 选取粗点
+
+        Notes
+        -----
+        点 i 的权重为强依赖于 i 的未定点个数加上两倍的细点个数, 再加上一个
+        [0, 1) 中互不相同的数打破平局. 选点分三步, 每一步的轮数都有界, 每一轮
+        都是 O(N) 的向量运算:
+
+        1. 经典 RS 选点: 每一轮在 S + S^T 上同时选取未定点中权重的局部极大点为
+           粗点, 强依赖于新粗点的未定点为细点, 再更新权重. 权重的更新使得选点
+           像波前一样推进, 轮数随网格尺寸增长, 所以最多做 maxround 轮;
+        2. 剩下的未定点用固定的权重 (加随机数打破平局) 一次选出独立集 (PMIS),
+           轮数只随 log N 增长;
+        3. 第二遍: 两个互相强依赖的细点如果没有共同强依赖的粗点, 插值会变差.
+           在这样的点对组成的图上逐轮选取度数的局部极大点改为粗点, 最多
+           maxround 轮.
+
+        没有强连接的孤立点是细点. 最后把不强依赖任何粗点的细点改为粗点. 每一层
+        的总轮数记录在 self.rounds 中.
+        """
+        N = A.shape[0]
+        strong = self.strength(A)
+        i = np.repeat(np.arange(N), np.diff(A.indptr))
+        j = A.indices
+
+        S = csr_matrix((np.ones(strong.sum()), (i[strong], j[strong])), shape=(N, N))
+        ST = S.T.tocsr()
+        G = (S + ST).tocsr()
+        # 以编号模 8 打破平局: 比随机数给出更规则的粗点分布, 每轮又能同时选出
+        # 大量的粗点, 不会像按编号那样退化为逐个选取
+        r = (np.arange(N) % 8 + np.arange(N)/N)/9
+        isU = np.diff(G.indptr) > 0
+        isC = np.zeros(N, dtype=np.bool_)
+        isF = np.zeros(N, dtype=np.bool_)
+        nround = 0
+        while np.any(isU) and (nround < self.maxround):
+            nround += 1
+            # RS 的度量: 依赖于 i 的未定点个数加上两倍的细点个数
+            w = ST@(isU + 2.0*isF) + r
+            wu = np.where(isU, w, -np.inf)
+            flag = isU & (w > row_max(G, wu))
+            isC[flag] = True
+            isU[flag] = False
+            flag = isU & ((S@flag.astype(np.float64)) > 0)
+            isF[flag] = True
+            isU[flag] = False
+            flag = isU & ((ST@isU.astype(np.float64)) == 0) # 不影响任何未定点
+            isF[flag] = True
+            isU[flag] = False
+
+        if np.any(isU):
+            w = ST@(isU + 2.0*isF) + self.rng.random(N)
+            flag, _, n = self.independent_set(G, w, isU)
+            isC[flag] = True
+            nround += n
+
+        # 第二遍: 补上互相强依赖却没有共同粗点的细点对
+        i = i[strong]
+        j = j[strong]
+        for k in range(self.maxround):
+            flag = isC[j]
+            SC = csr_matrix((np.ones(flag.sum()), (i[flag], j[flag])), shape=(N, N))
+            flag = ~(isC[i] | isC[j])
+            fi = i[flag]
+            fj = j[flag]
+            flag = self.value(SC@SC.T, fi, fj) == 0
+            if not np.any(flag):
+                break
+            nround += 1
+            V = csr_matrix((np.ones(flag.sum()), (fi[flag], fj[flag])), shape=(N, N))
+            V = (V + V.T).tocsr()
+            d = np.diff(V.indptr)
+            w = d + r
+            isC[(d > 0) & (w > row_max(V, w))] = True
+        self.rounds.append(nround)
+
+        # 细点至少要强依赖一个粗点, 否则插值无法定义
+        hasC = np.bincount(i, weights=isC[j], minlength=N) > 0
+        isC[(~isC) & (~hasC) & (np.diff(S.indptr) > 0)] = True
+        return isC, strong
 
-    def solve(self, b):
-        pass
+    def interpolation_rs(self, A, isC, strong):
+        """
+        @brief 经典的 Ruge-Stuben 插值
 
-    def coarsen_rs(self, theta=0.025):
-        A = self.A
+        Notes
+        -----
+        记 C_i 为细点 i 强依赖的粗点, F_i 为 i 强依赖的细点, 其它的非零元为弱连接.
+        细点 k in F_i 的贡献按 a_km (m in C_i) 的比例分配到 C_i 上:
+
+            w_ij = - (a_ij + sum_{k in F_i} a_ik a_kj/sum_{m in C_i} a_km)/(a_ii + sum_{n weak} a_in)
+
+        其中只用 a_kj, a_km 中的负元素. 如果 k 与 C_i 没有负连接, 就把 a_ik 当作
+        弱连接. 所有的求和都用稀疏矩阵乘法
+        计算, 不需要对细点循环.
+        """
         N = A.shape[0]
+        i = np.repeat(np.arange(N), np.diff(A.indptr))
+        j = A.indices
+        v = A.data
+
+        NC = isC.sum()
+        cidx = np.cumsum(isC) - 1
+
+        isFi = ~isC[i]
+        fc = strong & isFi & isC[j] # 强依赖的粗点
+        ff = strong & isFi & ~isC[j] # 强依赖的细点
+
+        SC = csr_matrix((v[fc], (i[fc], j[fc])), shape=(N, N)) # 每行是 a_ij, j in C_i
+        MC = csr_matrix((np.ones(fc.sum()), (i[fc], j[fc])), shape=(N, N))
+        flag = isC[j] & (i != j) & (v < 0)
+        AC = csr_matrix((v[flag], (i[flag], j[flag])), shape=(N, N)) # 到粗点的负连接
+
+        # D[k, i] = sum_{m in C_i} a_km
+        D = (AC@MC.T).tocsr()
+        d = self.value(D, j[ff], i[ff])
+        has = d != 0
+        W = csr_matrix((v[ff][has]/d[has], (i[ff][has], j[ff][has])), shape=(N, N))
+        B = SC + (W@AC).multiply(MC)
+
+        # 弱连接加到对角线上
+        weak = (i == j) | ~(fc | ff)
+        dd = np.bincount(i[weak], weights=v[weak], minlength=N)
+        dd += np.bincount(i[ff][~has], weights=v[ff][~has], minlength=N)
+
+        B = B.tocoo()
+        I = np.r_[np.nonzero(isC)[0], B.row]
+        J = np.r_[np.arange(NC), cidx[B.col]]
+        val = np.r_[np.ones(NC), -B.data/dd[B.row]]
+        return csr_matrix((val, (I, J)), shape=(N, NC))
+
+    @staticmethod
+    def value(M, i, j):
+        """
+        @brief 取稀疏矩阵 M 在 (i, j) 处的值, 不在稀疏模式中的位置为 0
+        """
+        N = M.shape[1]
+        M = M.tocsr()
+        M.sort_indices()
+        key = np.repeat(np.arange(M.shape[0], dtype=np.int64), np.diff(M.indptr))*N + M.indices
+        k = i.astype(np.int64)*N + j
+        val = np.zeros(len(k), dtype=M.dtype)
+        if len(key) > 0:
+            pos = np.minimum(np.searchsorted(key, k), len(key)-1)
+            flag = key[pos] == k
+            val[flag] = M.data[pos[flag]]
+        return val
+
+    def aggregation_sa(self, A, omega=4/3):
+        """
+        @brief 光滑聚集的延拓算子
+
+        Notes
+        -----
+        1. 强连接: |a_ij| >= theta sqrt(|a_ii a_jj|)
+        2. 在强连接图的平方上选取独立点作为聚集的根, 根的邻点归入它的聚集, 剩下
+           的点归入相邻的聚集, 没有强连接的孤立点不属于任何聚集
+        3. 试探延拓算子 T 的每一列是一个聚集上归一化的常数
+        4. P = (I - omega/rho D^{-1} A) T, rho 是用幂迭代估计的 D^{-1} A 的谱半径
+        """
+        N = A.shape[0]
+        i = np.repeat(np.arange(N), np.diff(A.indptr))
+        j = A.indices
+        v = A.data
+        d = np.abs(A.diagonal())
+
+        strong = (i != j) & (np.abs(v) >= self.theta*np.sqrt(d[i]*d[j]))
+        S = csr_matrix((np.ones(strong.sum()), (i[strong], j[strong])), shape=(N, N))
+        S = ((S + S.T) > 0).astype(np.float64).tocsr()
+        G = ((S@S + S) > 0).tocoo()
+        flag = G.row != G.col
+        G = csr_matrix((np.ones(flag.sum()), (G.row[flag], G.col[flag])), shape=(N, N))
+
+        w = np.diff(S.indptr) + self.rng.random(N)
+        isU = np.diff(S.indptr) > 0
+        isRoot, _, _ = self.independent_set(G, w, isU)
+
+        agg = np.full(N, -1, dtype=np.int_)
+        agg[isRoot] = np.arange(isRoot.sum())
+        NA = isRoot.sum()
+
+        # 根的邻点归入根的聚集, 剩下的点逐轮归入相邻的聚集
+        while True:
+            flag = isU & (agg < 0)
+            if not np.any(flag):
+                break
+            a = row_max(S, agg.astype(np.float64), fill=-1)
+            flag = flag & (a >= 0)
+            if not np.any(flag):
+                break
+            agg[flag] = a[flag].astype(np.int_)
+
+        idx, = np.nonzero(agg >= 0)
+        num = np.bincount(agg[idx], minlength=NA)
+        val = 1/np.sqrt(num[agg[idx]])
+        T = csr_matrix((val, (idx, agg[idx])), shape=(N, NA))
+
+        Dinv = spdiags(1/A.diagonal(), 0, N, N)
+        DA = (Dinv@A).tocsr()
+        rho = self.spectral_radius(DA)
+        P = T - (omega/rho)*(DA@T)
+        return P.tocsr()
+
+    def spectral_radius(self, A, maxit=15):
+        """
+        @brief 用幂迭代估计 A 的谱半径, 结果不超过 Gershgorin 上界
+        """
+        x = self.rng.random(A.shape[0])
+        rho = 0.0
+        for i in range(maxit):
+            y = A@x
+            ny = np.linalg.norm(y)
+            if ny == 0.0:
+                break
+            rho = ny/np.linalg.norm(x)
+            x = y/ny
+        bound = np.max(np.asarray(abs(A).sum(axis=1)).reshape(-1))
+        return min(1.1*rho, bound)
+
+    def smooth(self, level, b, x, pre=True):
+        S = self.smoothers[level]
+        if self.smoother == 'GS':
+            S.smooth(b, x, lower=pre, maxit=self.nu)
+        else:
+            S.smooth(b, x0=x, maxit=self.nu)
+        return x
+
+    def cycle(self, b, x=None, level=0, cycle=None):
+        """
+        @brief 从第 level 层开始做一次多重网格循环
+
+        Parameters
+        ----------
+        cycle : 'V', 'W' 或者 'F', 默认为 `self.cycletype`
+        """
+        cycle = self.cycletype if cycle is None else cycle
+        if x is None:
+            x = np.zeros(b.shape, dtype=np.float64)
+
+        if level == len(self.A) - 1:
+            x[:] = self.coarse.solve(b)
+            return x
+
+        A = self.A[level]
+        self.smooth(level, b, x, pre=True)
+        r = self.R[level]@(b - A@x)
+        e = np.zeros(r.shape, dtype=np.float64)
+        if cycle == 'V':
+            self.cycle(r, e, level=level+1, cycle='V')
+        elif cycle == 'W':
+            self.cycle(r, e, level=level+1, cycle='W')
+            self.cycle(r, e, level=level+1, cycle='W')
+        elif cycle == 'F':
+            self.cycle(r, e, level=level+1, cycle='F')
+            self.cycle(r, e, level=level+1, cycle='V')
+        x += self.P[level]@e
+        self.smooth(level, b, x, pre=False)
+        return x
+
+    def preconditioner(self):
+        """
+        @brief 以一次多重网格循环 (零初值) 作为预条件子的线性算子
+        """
+        N = self.A[0].shape[0]
+        return LinearOperator((N, N), matvec=lambda r: self.cycle(r), dtype=np.float64)
+
+    def solve(self, b, x0=None, tol=1e-8, maxit=200, method='cg'):
+        """
+        @brief 求解 Ax = b
+
+        Parameters
+        ----------
+        method : 'cg' 用 AMG 预条件的共轭梯度法, 'mg' 用多重网格循环迭代
+
+        Notes
+        -----
+        迭代次数和相对残量分别保存在 `self.niter` 和 `self.residual` 中.
+        """
+        A = self.A[0]
+        x = np.zeros(b.shape, dtype=np.float64) if x0 is None else x0.copy()
+        nb = np.linalg.norm(b)
+        nb = 1.0 if nb == 0.0 else nb
+
+        r = b - A@x
+        niter = 0
+        if np.linalg.norm(r)/nb < tol: # 初值已经是解 (如 b = 0), 不再迭代
+            pass
+        elif method == 'mg':
+            for niter in range(1, maxit+1):
+                x += self.cycle(r)
+                r = b - A@x
+                if np.linalg.norm(r)/nb < tol:
+                    break
+        elif method == 'cg':
+            z = self.cycle(r)
+            p = z.copy()
+            rz = r@z
+            for niter in range(1, maxit+1):
+                Ap = A@p
+                alpha = rz/(p@Ap)
+                x += alpha*p
+                r -= alpha*Ap
+                if np.linalg.norm(r)/nb < tol:
+                    break
+                z = self.cycle(r)
+                rz0 = rz
+                rz = r@z
+                p = z + (rz/rz0)*p
+
+        self.niter = niter
+        self.residual = np.linalg.norm(r)/nb
+        return x
 
-        D = A.min(axis=1).toarray()# 最小的副对角线的值， 绝对值是是最大的
-        D = spdiags(1/D.reshape(-1), 0, N, N)
-        Am = D@A
-
-        # 删除弱连通关系
-        i, j = Am.nonzero()
-        val = np.asarray(Am[i, j]).reshape(-1)
-
-        idx = (-val > theta)
-        data = np.ones(idx.sum(), dtype=np.int)
-        As = csr_matrix( # 有向图的非对称矩阵
-                (data, (i[idx], j[idx])), shape=(N, N), dtype=np.int)
-        Am = csr_matrix(
-                (val[idx], (i[idx], j[idx])), shape=(N, N), dtype=A.dtype)
-        Ass = (As + As.T)/2 # 无向图的对称矩阵
-
-        # 把孤立点放到 F 集合
-        isF = np.zeros(N, dtype=np.bool) # 细点
-        dgIn = np.asarray(As.sum(axis=1)).reshape(-1) # 接入强联接顶点的数目
-        isF[digIn == 0] = True # 孤立点是细点
-
-        # 发现一个逼近的极大独立集做为粗点
-        isC = np.zeros(N, dtype=np.bool) # C: coarse node
-        U = np.arange(N)                 # U: undecided node 
-        degFin = np.zeros(N, dtype=np.int) # number of F nodes strong connected to
-
-        while isC.sum() < N/2 and U.shape[0] > 20:
-            # S: selected set, changing in the coarsening
-            isS = np.zeros(N, dtype=np.bool)
-            degInAll = digIn + degFin
-            flag = (np.randdom.rand(N) < 0.85*degInAll/degInAll.mean()) & \
-                    (degInAll > 0)
-            isS[flag] = True
-            S, = isS.nonzero()
-
-            
+    def operator_complexity(self):
+        """
+        @brief 所有层矩阵非零元个数之和与最细层非零元个数之比
+        """
+        return sum(A.nnz for A in self.A)/self.A[0].nnz
 
+    def print(self):
+        print("AMG levels:", len(self.A))
+        for i, A in enumerate(self.A):
+            print(i, ": ", A.shape[0], A.nnz)
+        print("operator complexity:", self.operator_complexity())
@@ -0,0 +1,138 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+from timeit import default_timer as timer
+
+from .amg import AMGSolver
+
+
+class GMGSolver(AMGSolver):
+    """
+    几何多重网格解法器类. 在网格加密的过程中记录相邻两层网格之间的插值矩阵,
+    用它们作为延拓算子求解最细网格上的
+
+    Ax = b
+
+    Notes
+    -----
+    插值矩阵来自网格加密函数本身:
+
+    * `TriangleMesh.uniform_refine(returnim=True)`
+    * `TetrahedronMesh.uniform_refine(returnim=True)`
+    * `TriangleMesh.bisect(options={'IM': None})`
+    * `TetrahedronMesh.bisect(returnim=True)`
+    * `Quadtree.refine(returnim=True)`
+
+    最细网格上的 p 次 Lagrange 空间再用 `linear_interpolation_matrix` 从线性元
+    空间延拓.
+
+    自适应加密时每次只加密少量单元, 相邻两层网格规模相近. `setup` 把连续的插值
+    矩阵相乘合并, 只保留规模至多是上一保留层 `ratio` 倍的网格, 这样各层的规模
+    按几何级数递减, 一次多重网格循环的计算量是 O(N) 的.
+
+    粗网格算子 P^T A P, 光滑子和最粗层的 LU 分解在 `setup` 中计算一次, 循环,
+    预条件子和求解都复用 `AMGSolver` 的实现.
+
+    Examples
+    --------
+    >>> solver = GMGSolver()
+    >>> for i in range(4):
+    ...     solver.refine(mesh, method='uniform')
+    >>> space = LagrangeFiniteElementSpace(mesh, p=2)
+    >>> solver.add_space(space)
+    >>> solver.setup(A)
+    >>> x = solver.solve(b)
+    """
+    def __init__(self, smoother='GS', cycle='V', nu=1, ratio=0.5):
+        """
+        Parameters
+        ----------
+        smoother : 'GS' (对称 Gauss-Seidel) 或者 'Jacobi' (加权 Jacobi)
+        cycle : 'V', 'W' 或者 'F'
+        nu : 前后光滑的次数
+        ratio : 保留的相邻两层网格规模之比的上界
+        """
+        self.smoother = smoother
+        self.cycletype = cycle
+        self.nu = nu
+        self.ratio = ratio
+        self.rng = np.random.default_rng(0)
+        self.IM = [] # 从粗到细的插值矩阵
+
+    def add(self, P):
+        """
+        @brief 记录一个从上一层到新一层的插值矩阵, 形状为 (NF, NC)
+        """
+        if len(self.IM) > 0:
+            assert P.shape[1] == self.IM[-1].shape[0]
+        self.IM.append(csr_matrix(P))
+
+    def refine(self, mesh, isMarkedCell=None, method='uniform'):
+        """
+        @brief 加密网格并记录节点插值矩阵
+
+        Parameters
+        ----------
+        mesh : TriangleMesh, TetrahedronMesh 或者 Quadtree
+        isMarkedCell : 标记要加密的单元, 只对 'bisect' 和 Quadtree 有效
+        method : 'uniform' 或者 'bisect'
+        """
+        if hasattr(mesh, 'child'): # Quadtree
+            self.add(mesh.refine(isMarkedCell=isMarkedCell, returnim=True))
+        elif method == 'uniform':
+            IM = mesh.uniform_refine(returnim=True)
+            if isinstance(IM, tuple): # TriangleMesh 同时返回单元插值矩阵
+                IM = IM[0]
+            for P in IM:
+                self.add(P)
+        elif method == 'bisect':
+            if mesh.top_dimension() == 3:
+                self.add(mesh.bisect(isMarkedCell=isMarkedCell, returnim=True))
+            else:
+                options = {'disp': False, 'IM': None}
+                mesh.bisect(isMarkedCell=isMarkedCell, options=options)
+                self.add(options['IM'])
+        else:
+            raise ValueError("The method {} is not supported!".format(method))
+
+    def add_space(self, space):
+        """
+        @brief 记录最细网格上从线性元空间到 space 的插值矩阵
+        """
+        if space.p > 1:
+            self.add(space.linear_interpolation_matrix())
+
+    def number_of_levels(self):
+        return len(self.IM) + 1
+
+    def setup(self, A):
+        """
+        @brief 由最细层的矩阵 A 生成多重网格的各层算子
+
+        Notes
+        -----
+        A 的规模要等于最后一个插值矩阵的行数.
+        """
+        start = timer()
+        A = csr_matrix(A)
+        assert (len(self.IM) == 0) or (A.shape[0] == self.IM[-1].shape[0])
+
+        # 从细到粗合并插值矩阵
+        self.P = []
+        P = None
+        N = A.shape[0]
+        for I in reversed(self.IM):
+            P = I if P is None else (P@I).tocsr()
+            if P.shape[1] <= self.ratio*N:
+                self.P.append(P)
+                N = P.shape[1]
+                P = None
+        if P is not None: # 最粗层总是保留
+            self.P.append(P)
+
+        self.R = [P.T.tocsr() for P in self.P]
+        self.A = [A]
+        for P, R in zip(self.P, self.R):
+            self.A.append((R@self.A[-1]@P).tocsr())
+
+        self.setup_smoother()
+        self.setuptime = timer() - start
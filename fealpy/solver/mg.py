@@ -1,7 +1,21 @@
 import numpy as np
 from numpy.linalg import norm
 from scipy.sparse import spdiags, tril, triu
-from scipy.sparse.linalg import cg, dsolve, spsolve
+from scipy.sparse.linalg import cg, dsolve, spsolve, splu
+
+
+def triangular_factor(T):
+    """
+    @brief 三角矩阵的 LU 分解对象
+
+    Notes
+    -----
+    三角矩阵在自然顺序下做 LU 分解时没有填充, 也不需要选主元, 分解一次以后每次
+    求解只需 O(nnz) 的回代, 比每次调用 `spsolve` 或 `spsolve_triangular` 快得多.
+    """
+    return splu(T.tocsc(), permc_spec='NATURAL', diag_pivot_thresh=0,
+            options=dict(SymmetricMode=True))
+
 
 class GaussSeidelSmoother():
     def __init__(self, A):
@@ -20,19 +34,20 @@ class GaussSeidelSmoother():
         self.U1 = self.L0.T.tocsr()
         self.L1 = self.U0.T.tocsr()
 
+        self.lu0 = triangular_factor(self.L0)
+        self.lu1 = triangular_factor(self.U1)
+
     def smooth(self, b, x0, lower=True, maxit=3):
         if lower:
             for i in range(maxit):
-                #x0[:] = spsolve_triangular(self.L0, b-self.U0@x0, lower=lower)
-                x0[:] = spsolve(self.L0, b-self.U0@x0, permc_spec="NATURAL")
+                x0[:] = self.lu0.solve(b-self.U0@x0)
         else:
             for i in range(maxit):
-                #x0[:] = spsolve_triangular(self.U1, b-self.L1@x0, lower=lower)
-                x0[:] = spsolve(self.U1, b-self.L1@x0, permc_spec="NATURAL")
+                x0[:] = self.lu1.solve(b-self.L1@x0)
 
 
 class JacobiSmoother():
-    def __init__(self, A, isDDof=None):
+    def __init__(self, A, isDDof=None, weight=1.0):
         if isDDof is not None:
             # 处理 D 氏 自由度条件
             gdof = len(isDDof)
@@ -45,12 +60,21 @@ class JacobiSmoother():
         self.D = A.diagonal() 
         self.L = tril(A, k=-1).tocsr()
         self.U = triu(A, k=1).tocsr()
+        self.weight = weight
 
-    def smooth(self, b, maxit=100):
-        r = b.copy()
+    def smooth(self, b, x0=None, maxit=100):
+        """
+        @brief 加权 Jacobi 光滑
+
+        Notes
+        -----
+        加权 Jacobi 迭代 x = x + w D^{-1} (b - A x), 默认以 b 为初值. 给定 x0 时
+        在 x0 上原地迭代.
+        """
+        r = b.copy() if x0 is None else x0
+        w = self.weight
         for i in range(maxit):
-            r[:] = b - self.L@r - self.U@r
-            r /= self.D
+            r[:] = (1 - w)*r + w*(b - self.L@r - self.U@r)/self.D
         return r
 
 
@@ -0,0 +1,245 @@
+"""
+
+Notes
+-----
+在这个模块中, 我们实现了数值模拟的检查点 (checkpoint) 的保存和恢复.
+
+检查点是一个目录, 其中:
+
+* 每次保存都新建一个子目录 `arrays.*`, 每个数组是其中的一个 `.npy` 文件,
+  恢复时用 `np.load(mmap_mode='c')` 映射到内存, 只有真正访问的页才从磁盘读入,
+  修改只发生在内存中, 不会改动检查点;
+* `checkpoint.json` 描述对象的结构和数组所在的子目录, 在所有数组写完以后最后
+  用 `os.replace` 替换, 然后才删除旧的子目录.
+
+所以写到一半中断的检查点仍然指向上一次完整的数组. 已经写好的 `.npy` 文件不会
+再被改写, 从检查点恢复 (映射到内存) 以后再保存到同一个目录也是安全的: 旧文件
+只被删除, 已经打开的映射仍然指向原来的数据.
+
+网格, 时间线等对象按它们的属性字典 (`__dict__`) 递归保存, 恢复时不调用构造
+函数, 直接还原属性. 所以网格的拓扑 (edge, edge2cell, face2cell, ...),
+`Quadtree`/`Octree` 的 parent/child 和 `HalfEdgeMesh2d` 的 halfedge 等数据都
+原样恢复, 不需要重新生成. 以 `_` 开头的属性是缓存, 不保存.
+
+有限元空间只保存构造参数 (如 p, spacetype), 恢复时在恢复的网格上重新生成.
+离散函数 `Function` 保存数组和它所在空间的编号.
+"""
+
+import os
+import json
+import shutil
+import tempfile
+import inspect
+import importlib
+import warnings
+
+import numpy as np
+
+from ..functionspace.Function import Function
+
+
+def save_checkpoint(path, mesh=None, functions=None, timeline=None, data=None):
+    """
+    @brief 保存检查点
+
+    Parameters
+    ----------
+    path : 检查点目录
+    mesh : 网格
+    functions : 字典 {name: Function}, 函数所在的空间要定义在 mesh 上
+    timeline : 时间线, 如 `UniformTimeLine`
+    data : 字典, 其它要保存的数组或者数值
+    """
+    os.makedirs(path, exist_ok=True)
+    directory = tempfile.mkdtemp(prefix='arrays.', dir=path)
+    saver = CheckpointSaver(directory)
+    meta = {'version': 2, 'directory': os.path.basename(directory)}
+    if mesh is not None:
+        meta['mesh'] = saver.value(mesh, 'mesh')
+    if timeline is not None:
+        meta['timeline'] = saver.value(timeline, 'timeline')
+    if data is not None:
+        meta['data'] = saver.value(dict(data), 'data')
+
+    if functions is not None:
+        spaces = []
+        meta['functions'] = {}
+        for name, f in functions.items():
+            space = f.space
+            assert (mesh is None) or (space.mesh is mesh)
+            for i, s in enumerate(spaces):
+                if s is space:
+                    break
+            else:
+                i = len(spaces)
+                spaces.append(space)
+            meta['functions'][name] = {
+                    'space': i,
+                    'coordtype': f.coordtype,
+                    'array': saver.value(np.asarray(f), 'function.' + name)}
+        meta['spaces'] = [space_parameters(space) for space in spaces]
+
+    fname = os.path.join(path, 'checkpoint.json')
+    with open(fname + '.tmp', 'w') as f:
+        json.dump(meta, f, indent=1)
+    os.replace(fname + '.tmp', fname)
+
+    # 旧的数组只在新的描述文件生效以后删除, 删除不影响已经打开的映射
+    for name in os.listdir(path):
+        if name.startswith('arrays.') and name != meta['directory']:
+            shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+
+
+def load_checkpoint(path, mmap=True):
+    """
+    @brief 恢复检查点
+
+    Parameters
+    ----------
+    path : 检查点目录
+    mmap : 是否把数组映射到内存 (写时复制), 否则一次读入
+
+    Returns
+    -------
+    字典, 键为 'mesh', 'timeline', 'data', 'spaces' 和 'functions' 中检查点里
+    保存了的部分
+    """
+    with open(os.path.join(path, 'checkpoint.json')) as f:
+        meta = json.load(f)
+    loader = CheckpointLoader(os.path.join(path, meta.get('directory', '')),
+            mmap=mmap)
+
+    result = {}
+    for key in ('mesh', 'timeline', 'data'):
+        if key in meta:
+            result[key] = loader.value(meta[key])
+
+    if 'functions' in meta:
+        mesh = result.get('mesh')
+        spaces = []
+        for s in meta['spaces']:
+            cls = import_class(s['class'])
+            spaces.append(cls(mesh, **s['parameters']))
+        result['spaces'] = spaces
+        result['functions'] = {}
+        for name, f in meta['functions'].items():
+            array = loader.value(f['array'])
+            result['functions'][name] = Function(spaces[f['space']],
+                    array=array, coordtype=f['coordtype'])
+    return result
+
+
+def space_parameters(space):
+    """
+    @brief 空间构造函数中除网格以外的, 可以从空间的属性中得到的参数
+    """
+    cls = type(space)
+    params = {}
+    for name in inspect.signature(cls.__init__).parameters:
+        if name in {'self', 'mesh'}:
+            continue
+        val = getattr(space, name, None)
+        if isinstance(val, (bool, int, float, str)):
+            params[name] = val
+    return {'class': class_name(cls), 'parameters': params}
+
+
+def class_name(cls):
+    return cls.__module__ + ':' + cls.__qualname__
+
+
+def import_class(name):
+    module, qualname = name.split(':')
+    obj = importlib.import_module(module)
+    for attr in qualname.split('.'):
+        obj = getattr(obj, attr)
+    return obj
+
+
+class CheckpointSaver():
+    def __init__(self, path):
+        self.path = path
+        self.stack = [] # 正在保存的对象, 用于检查循环引用
+
+    def value(self, val, name):
+        """
+        @brief 保存 val, 返回它在描述文件中的条目, 不能保存的返回 None
+        """
+        if isinstance(val, np.ndarray):
+            if val.dtype.hasobject:
+                return self.skip(val, name)
+            fname = name + '.npy'
+            np.save(os.path.join(self.path, fname), np.asarray(val))
+            return {'type': 'array', 'file': fname}
+        elif isinstance(val, np.generic):
+            return {'type': 'scalar', 'dtype': val.dtype.str, 'value': val.item()}
+        elif isinstance(val, np.dtype) or \
+                (isinstance(val, type) and issubclass(val, np.generic)):
+            return {'type': 'dtype', 'value': np.dtype(val).str}
+        elif (val is None) or isinstance(val, (bool, int, float, str)):
+            return {'type': 'value', 'value': val}
+        elif isinstance(val, (tuple, list)):
+            items = [self.value(v, '{}.{}'.format(name, i)) for i, v in enumerate(val)]
+            if any(item is None for item in items):
+                return self.skip(val, name)
+            return {'type': type(val).__name__, 'items': items}
+        elif isinstance(val, dict):
+            items = {}
+            for k, v in val.items():
+                if isinstance(k, str):
+                    item = self.value(v, '{}.{}'.format(name, k))
+                    if item is not None:
+                        items[k] = item
+                else:
+                    self.skip(v, '{}[{!r}]'.format(name, k))
+            return {'type': 'dict', 'items': items}
+        elif hasattr(val, '__dict__') and type(val).__module__.startswith('fealpy') \
+                and not callable(val):
+            if any(val is v for v in self.stack):
+                return self.skip(val, name)
+            self.stack.append(val)
+            state = {}
+            for k, v in val.__dict__.items():
+                if k.startswith('_'):
+                    continue
+                item = self.value(v, '{}.{}'.format(name, k))
+                if item is not None:
+                    state[k] = item
+            self.stack.pop()
+            return {'type': 'object', 'class': class_name(type(val)), 'state': state}
+        else:
+            return self.skip(val, name)
+
+    def skip(self, val, name):
+        warnings.warn("The checkpoint skips {} of type {}.".format(name, type(val)))
+        return None
+
+
+class CheckpointLoader():
+    def __init__(self, path, mmap=True):
+        self.path = path
+        self.mode = 'c' if mmap else None
+
+    def value(self, item):
+        t = item['type']
+        if t == 'array':
+            return np.load(os.path.join(self.path, item['file']), mmap_mode=self.mode)
+        elif t == 'scalar':
+            return np.dtype(item['dtype']).type(item['value'])
+        elif t == 'dtype':
+            return np.dtype(item['value'])
+        elif t == 'value':
+            return item['value']
+        elif t == 'tuple':
+            return tuple(self.value(v) for v in item['items'])
+        elif t == 'list':
+            return [self.value(v) for v in item['items']]
+        elif t == 'dict':
+            return {k: self.value(v) for k, v in item['items'].items()}
+        elif t == 'object':
+            cls = import_class(item['class'])
+            obj = cls.__new__(cls)
+            obj.__dict__.update({k: self.value(v) for k, v in item['state'].items()})
+            return obj
+        else:
+            raise ValueError("Unknown checkpoint entry type {}!".format(t))
@@ -5,15 +5,23 @@ import vtk.util.numpy_support as vnp
 import multiprocessing
 import time
 
+from .SharedMemoryChannel import SharedMemoryChannel
+
 class MeshWriter:
     """
 
     Notes
     -----
     用于在数值模拟过程中输出网格和数据到 vtk 文件中
+
+    模拟程序 simulation 在子进程中运行, 它的最后一个参数是一个队列, 依次放入
+    总的时间层数, 每个时间层的数据字典 {name: (datatype, array)} 和结束信号
+    -1. shared 为 True 时, 传给模拟程序的是一个 `SharedMemoryChannel`, 接口和
+    队列相同, 其中与 mesh.nodedata 和 mesh.celldata 中形状, 类型都相同的数组
+    通过共享内存的环形缓冲区传递, 不经过 pickle.
     """
     def __init__(self, mesh, simulation=None, args=None, etype='cell',
-            index=np.s_[:]):
+            index=np.s_[:], shared=True, nslot=2):
 
         GD = mesh.geo_dimension()
         TD = mesh.top_dimension()
@@ -49,7 +57,10 @@ class MeshWriter:
 
         self.simulation = simulation
         if self.simulation is not None:
-            self.queue = multiprocessing.Queue()
+            if shared:
+                self.queue = SharedMemoryChannel.from_mesh(mesh, nslot=nslot)
+            else:
+                self.queue = multiprocessing.Queue()
             self.process = multiprocessing.Process(None, simulation,
                     args= args + (self.queue, ))
         else:
@@ -78,25 +89,28 @@ class MeshWriter:
         pdata = self.mesh.GetPointData()
         i = 0
         while True:
-            if not self.queue.empty():
-                data = self.queue.get()
-                if isinstance(data, dict):
-                    for key, val in data.items():
-                        datatype, data = val
-                        d = vnp.numpy_to_vtk(data)
-                        d.SetName(key)
-                        if datatype == 'celldata':
-                            cdata.AddArray(d)
-                        elif datatype == 'pointdata':
-                            pdata.AddArray(d)
-                    writer.WriteNextTime(i)    
-                    i += 1
-                elif isinstance(data, int):
-                    if data > 0: # 这里是总的时间层
-                        writer.SetNumberOfTimeSteps(data)
-                        writer.Start()
-                    elif data == -1:
-                        self.process.join()
-                        print('Simulation stop!')
-                        writer.Stop()
-                        break
+            data = self.queue.get()
+            if isinstance(data, dict):
+                for key, val in data.items():
+                    datatype, val = val
+                    d = vnp.numpy_to_vtk(val, deep=True)
+                    d.SetName(key)
+                    if datatype == 'celldata':
+                        cdata.AddArray(d)
+                    elif datatype == 'pointdata':
+                        pdata.AddArray(d)
+                data = val = None # 释放共享内存的视图
+                writer.WriteNextTime(i)
+                i += 1
+            elif isinstance(data, int):
+                if data > 0: # 这里是总的时间层
+                    writer.SetNumberOfTimeSteps(data)
+                    writer.Start()
+                elif data == -1:
+                    self.process.join()
+                    print('Simulation stop!')
+                    writer.Stop()
+                    break
+        if isinstance(self.queue, SharedMemoryChannel):
+            self.queue.release()
+            self.queue.close()
@@ -0,0 +1,167 @@
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class SharedMemoryChannel:
+    """
+
+    Notes
+    -----
+    模拟进程和输出进程之间通过共享内存交换场数据的通道.
+
+    通道中有 `nslot` 个槽 (slot), 每个槽是一块共享内存, 按 `layout` 依次存放
+    所有的场数据, 构成一个环形缓冲区. 模拟进程把数据写入下一个空闲的槽, 再通过
+    一个普通的队列发送只包含槽编号和数据名字的小消息; 输出进程收到消息后直接
+    用指向共享内存的数组视图, 处理完以后释放这个槽. 数组本身不经过 pickle.
+
+    为了和 `multiprocessing.Queue` 兼容, 通道提供同样的 `put` 和 `get` 接口:
+
+    * `put` 字典 `{name: (datatype, array)}` 时, 在 layout 中且形状和类型都匹配
+      的数组通过共享内存传递, 其余的数据和非字典的控制消息 (如总时间层数, -1)
+      仍然通过队列传递;
+    * `get` 返回同样格式的字典, 其中的数组是共享内存的视图, 在下一次 `get` 时
+      失效 (对应的槽被释放).
+
+    模拟进程也可以用 `acquire` 直接得到下一个槽中的数组视图, 把结果原地算到
+    其中, 再用 `commit` 发送, 这样连一次拷贝也不需要.
+    """
+    def __init__(self, layout, nslot=2):
+        """
+        Parameters
+        ----------
+        layout : 字典 {name: (datatype, shape, dtype)}, datatype 为 'pointdata'
+            或者 'celldata'
+        nslot : 环形缓冲区中槽的个数
+        """
+        self.layout = {}
+        offset = 0
+        for name, (datatype, shape, dtype) in layout.items():
+            dtype = np.dtype(dtype)
+            shape = tuple(shape)
+            self.layout[name] = (datatype, shape, dtype, offset)
+            nbytes = int(np.prod(shape))*dtype.itemsize
+            offset += (nbytes + 63)//64*64 # 按 64 字节对齐
+        self.nbytes = max(offset, 1)
+        self.nslot = nslot
+
+        self.shm = [shared_memory.SharedMemory(create=True, size=self.nbytes)
+                for i in range(nslot)]
+        self.names = [shm.name for shm in self.shm]
+        self.queue = multiprocessing.Queue()
+        self.free = multiprocessing.Semaphore(nslot)
+        self.head = 0 # 发送端下一个要写的槽
+        self.current = None # 接收端正在使用的槽
+
+    @classmethod
+    def from_mesh(cls, mesh, nslot=2):
+        """
+        @brief 由 mesh.nodedata 和 mesh.celldata 中的数组确定通道的布局
+        """
+        layout = {}
+        for datatype, data in (('pointdata', mesh.nodedata), ('celldata', mesh.celldata)):
+            for name, val in data.items():
+                if isinstance(val, np.ndarray):
+                    layout[name] = (datatype, val.shape, val.dtype)
+        return cls(layout, nslot=nslot)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['shm'] = None # 子进程按名字重新连接共享内存
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+    def memory(self, slot):
+        if self.shm is None:
+            self.shm = [shared_memory.SharedMemory(name=name) for name in self.names]
+        return self.shm[slot]
+
+    def view(self, slot, name):
+        datatype, shape, dtype, offset = self.layout[name]
+        buf = self.memory(slot).buf
+        return np.ndarray(shape, dtype=dtype, buffer=buf, offset=offset)
+
+    def acquire(self):
+        """
+        @brief 等待下一个空闲的槽, 返回其中所有数组的视图 {name: array}
+        """
+        self.free.acquire()
+        slot = self.head
+        return {name: self.view(slot, name) for name in self.layout}
+
+    def commit(self, names=None, data=None):
+        """
+        @brief 发送 acquire 得到的槽
+
+        Parameters
+        ----------
+        names : 这一步要输出的数据名字, 默认是全部
+        data : 其它通过队列传递的数据, 字典
+        """
+        if names is None:
+            names = list(self.layout)
+        self.queue.put((self.head, names, data))
+        self.head = (self.head + 1)%self.nslot
+
+    def match(self, name, val):
+        if (name not in self.layout) or (not isinstance(val, tuple)) or (len(val) != 2):
+            return False
+        datatype, array = val
+        l = self.layout[name]
+        return isinstance(array, np.ndarray) and (datatype == l[0]) \
+                and (array.shape == l[1]) and (array.dtype == l[2])
+
+    def put(self, data):
+        if not isinstance(data, dict):
+            self.queue.put(data)
+            return
+
+        names = [name for name, val in data.items() if self.match(name, val)]
+        if len(names) == 0:
+            self.queue.put(data)
+            return
+
+        buf = self.acquire()
+        for name in names:
+            buf[name][:] = data[name][1]
+        rest = {name: val for name, val in data.items() if name not in names}
+        self.commit(names, rest)
+
+    def get(self):
+        self.release()
+        msg = self.queue.get()
+        if not (isinstance(msg, tuple) and (len(msg) == 3)):
+            return msg
+
+        slot, names, rest = msg
+        self.current = slot
+        data = {name: (self.layout[name][0], self.view(slot, name)) for name in names}
+        if rest:
+            data.update(rest)
+        return data
+
+    def release(self):
+        """
+        @brief 释放接收端正在使用的槽
+        """
+        if self.current is not None:
+            self.current = None
+            self.free.release()
+
+    def close(self, unlink=True):
+        """
+        @brief 关闭共享内存, 创建通道的进程负责 unlink
+
+        Notes
+        -----
+        关闭前要保证已经没有指向共享内存的数组视图.
+        """
+        if self.shm is not None:
+            for shm in self.shm:
+                shm.close()
+                if unlink:
+                    shm.unlink()
+            self.shm = None
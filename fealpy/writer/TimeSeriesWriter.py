@@ -0,0 +1,250 @@
+import os
+import queue
+import threading
+
+import numpy as np
+
+
+class TimeSeriesWriter:
+    """
+
+    Notes
+    -----
+    用于在长时间的数值模拟过程中输出时间序列数据到 XDMF 文件中.
+
+    输出由两个文件组成:
+
+    * `<name>.bin`: 二进制的重数据 (heavy data), 网格的节点和单元只在构造时
+      写入一次, 以后每个时间步只追加新给出的节点或单元数据;
+    * `<name>.xmf`: XDMF 描述文件, 每个时间步是一个 Grid, 通过 Seek 偏移引用
+      `.bin` 中共享的网格和该时间步的数据. 某个数据这一步没有给出时, 继续引用
+      它上一次写入的值.
+
+    ParaView 和 VTK 的 `vtkXdmfReader` 可以直接读入.
+
+    数据的拷贝在调用 `write` 的线程中完成, 写盘在一个后台线程中进行, 两者之间
+    是长度为 `maxsize` 的有界队列: 写盘跟不上时 `write` 阻塞, 内存占用不会无限
+    增长. 描述文件每一步只在末尾追加一个 Grid 并重写结尾标记, 代价与已写的时间
+    步数无关, 模拟中途停止时已写的时间步仍然可以读入.
+
+    Examples
+    --------
+    >>> with TimeSeriesWriter(mesh, 'heat.xmf') as writer:
+    ...     for i in range(NT):
+    ...         ...
+    ...         writer.write(t, nodedata={'uh': uh})
+    """
+
+    # VTK 单元类型到 XDMF 拓扑类型的对应
+    topology_type = {
+            1: ('Polyvertex', 1),
+            3: ('Polyline', 2),
+            7: ('Polygon', 3),
+            5: ('Triangle', 4),
+            9: ('Quadrilateral', 5),
+            10: ('Tetrahedron', 6),
+            14: ('Pyramid', 7),
+            13: ('Wedge', 8),
+            12: ('Hexahedron', 9),
+            }
+
+    number_type = {'f': 'Float', 'i': 'Int', 'u': 'UInt'}
+
+    def __init__(self, mesh, fname='test.xmf', etype='cell', index=np.s_[:],
+            precision=None, maxsize=8):
+        """
+        Parameters
+        ----------
+        mesh : 网格对象, 需要提供 `to_vtk(etype, index)` 接口
+        fname : XDMF 描述文件名
+        etype : 输出的网格实体类型
+        index : 输出的实体编号
+        precision : 浮点数据的存储类型, 如 np.float32, 默认保持原类型
+        maxsize : 等待写盘的时间步个数的上限
+        """
+        self.index = index
+        self.precision = precision
+
+        root, _ = os.path.splitext(fname)
+        self.fname = root + '.xmf'
+        self.bname = root + '.bin'
+        self.bfile = open(self.bname, 'wb')
+        self.xfile = open(self.fname, 'w')
+        self.xfile.write('<?xml version="1.0" ?>\n'
+                '<Xdmf Version="2.0">\n'
+                '<Domain>\n'
+                '<Grid Name="TimeSeries" GridType="Collection" CollectionType="Temporal">\n')
+        self.footer = '</Grid>\n</Domain>\n</Xdmf>\n'
+        self.flush_xdmf()
+
+        self.items = {} # 每个数据最近一次写入的 (Center, AttributeType, DataItem)
+        self.nstep = 0
+
+        node, cell, cellType, NC = mesh.to_vtk(etype=etype, index=index)
+        self.NN = node.shape[0]
+        self.NC = NC
+        self.geometry = self.add_item(node, 'geometry')
+        self.topology = self.topology_item(cell, cellType, NC)
+
+        for key, val in mesh.nodedata.items():
+            if val is not None:
+                self.add_data(key, val, 'Node')
+        for key, val in mesh.celldata.items():
+            if val is not None:
+                self.add_data(key, val, 'Cell')
+
+        self.error = None
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def flush_xdmf(self):
+        """
+        @brief 写入结尾标记, 再把文件指针移回结尾标记之前
+        """
+        pos = self.xfile.tell()
+        self.xfile.write(self.footer)
+        self.xfile.flush()
+        self.xfile.seek(pos)
+
+    def add_item(self, val, name):
+        """
+        @brief 把数组 val 追加到二进制文件中, 返回引用它的 DataItem
+        """
+        val = np.ascontiguousarray(val)
+        if val.dtype == np.bool_:
+            val = val.astype(np.uint8)
+        elif (val.dtype.kind == 'f') and (self.precision is not None):
+            val = val.astype(self.precision)
+        ntype = self.number_type.get(val.dtype.kind)
+        if ntype is None:
+            raise ValueError("The data type {} of {} is not supported!".format(
+                val.dtype, name))
+        if val.dtype.itemsize == 1:
+            ntype = 'UChar' if ntype == 'UInt' else 'Char'
+
+        seek = self.bfile.tell()
+        self.bfile.write(val.astype(val.dtype.newbyteorder('<'), copy=False).tobytes())
+        dims = ' '.join(str(n) for n in val.shape)
+        return ('<DataItem Format="Binary" Endian="Little" Seek="{}" '
+                'NumberType="{}" Precision="{}" Dimensions="{}">{}</DataItem>').format(
+                        seek, ntype, val.dtype.itemsize, dims,
+                        os.path.basename(self.bname))
+
+    def topology_item(self, cell, cellType, NC):
+        """
+        @brief 把 VTK 格式的单元数组转化为 XDMF 的拓扑
+        """
+        cellType = np.broadcast_to(cellType, (NC, ))
+        if (len(cell) % NC == 0) and np.all(cellType == cellType[0]):
+            cell = cell.reshape(NC, -1)
+            if np.all(cell[:, 0] == cell.shape[1] - 1):
+                name, _ = self.topology_type[int(cellType[0])]
+                NV = cell.shape[1] - 1
+                return ('<Topology TopologyType="{}" NumberOfElements="{}" '
+                        'NodesPerElement="{}">{}</Topology>').format(
+                                name, NC, NV, self.add_item(cell[:, 1:], 'topology'))
+
+        # 单元大小或类型不同时用混合拓扑, 每个单元是 [类型, (顶点个数), 顶点...]
+        mixed = []
+        start = 0
+        for i in range(NC):
+            NV = cell[start]
+            _, tid = self.topology_type[int(cellType[i])]
+            head = [tid, NV] if tid in {1, 2, 3} else [tid]
+            mixed.append(np.r_[head, cell[start+1:start+1+NV]])
+            start += NV + 1
+        mixed = np.concatenate(mixed).astype(cell.dtype)
+        return ('<Topology TopologyType="Mixed" NumberOfElements="{}">{}'
+                '</Topology>').format(NC, self.add_item(mixed, 'topology'))
+
+    def add_data(self, name, val, center):
+        val = np.asarray(val)
+        if center == 'Cell':
+            val = val[self.index]
+        if val.ndim == 1:
+            atype = 'Scalar'
+        elif (val.ndim == 2) and (val.shape[1] in {2, 3}):
+            atype = 'Vector'
+            if val.shape[1] == 2:
+                val = np.c_[val, np.zeros(len(val), dtype=val.dtype)]
+        else:
+            atype = 'Matrix'
+            val = val.reshape(len(val), -1)
+        self.items[name] = (center, atype, self.add_item(val, name))
+
+    def write(self, t, nodedata=None, celldata=None):
+        """
+        @brief 输出时间 t 的数据
+
+        Parameters
+        ----------
+        t : 当前时间
+        nodedata : 这一步改变了的节点数据, 字典
+        celldata : 这一步改变了的单元数据, 字典
+
+        Notes
+        -----
+        数组在这里拷贝以后才放入队列, 调用者可以马上修改它们.
+        """
+        if self.error is not None:
+            raise self.error
+        data = []
+        for center, d in (('Node', nodedata), ('Cell', celldata)):
+            if d is not None:
+                data += [(key, np.array(val), center) for key, val in d.items()]
+        self.queue.put((t, data))
+
+    def run(self):
+        """
+        @brief 后台写盘线程
+        """
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            if self.error is not None:
+                continue
+            try:
+                t, data = item
+                for name, val, center in data:
+                    self.add_data(name, val, center)
+                self.write_step(t)
+            except Exception as e:
+                self.error = e
+
+    def write_step(self, t):
+        attrs = ''.join(
+                '<Attribute Name="{}" AttributeType="{}" Center="{}">{}</Attribute>\n'.format(
+                    name, atype, center, item)
+                for name, (center, atype, item) in self.items.items())
+        self.bfile.flush()
+        self.xfile.write(
+                '<Grid Name="step{}" GridType="Uniform">\n'
+                '<Time Value="{!r}"/>\n'
+                '{}\n'
+                '<Geometry GeometryType="XYZ">{}</Geometry>\n'
+                '{}'
+                '</Grid>\n'.format(self.nstep, float(t), self.topology,
+                    self.geometry, attrs))
+        self.flush_xdmf()
+        self.nstep += 1
+
+    def close(self):
+        """
+        @brief 等待所有时间步写完, 关闭文件
+        """
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+            self.bfile.close()
+            self.xfile.close()
+        if self.error is not None:
+            raise self.error
@@ -1,2 +1,5 @@
 from .MeshWriter import MeshWriter
 from .VTKMeshWriter import VTKMeshWriter
+from .TimeSeriesWriter import TimeSeriesWriter
+from .SharedMemoryChannel import SharedMemoryChannel
+from .Checkpoint import save_checkpoint, load_checkpoint
@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+from scipy.sparse.linalg import spsolve
+
+from fealpy.mesh import MeshFactory as MF
+from fealpy.functionspace import LagrangeFiniteElementSpace
+from fealpy.boundarycondition import DirichletBC
+from fealpy.solver import AMGSolver
+from fealpy.decorator import cartesian
+
+
+@cartesian
+def one(p):
+    return np.ones(p.shape[:-1], dtype=np.float64)
+
+
+@cartesian
+def zero(p):
+    return np.zeros(p.shape[:-1], dtype=np.float64)
+
+
+def poisson_system(dim=2):
+    if dim == 2:
+        mesh = MF.boxmesh2d([0, 1, 0, 1], nx=32, ny=32, meshtype='tri')
+    else:
+        mesh = MF.boxmesh3d([0, 1, 0, 1, 0, 1], nx=8, ny=8, nz=8, meshtype='tet')
+    space = LagrangeFiniteElementSpace(mesh, p=1)
+    A = space.stiff_matrix()
+    F = space.source_vector(one)
+    bc = DirichletBC(space, zero)
+    return bc.apply(A, F)
+
+
+@pytest.mark.parametrize("ctype", ['RS', 'SA'])
+@pytest.mark.parametrize("cycle", ['V', 'W', 'F'])
+def test_amg_pcg(ctype, cycle):
+    A, F = poisson_system()
+    x0 = spsolve(A, F)
+
+    solver = AMGSolver(ctype=ctype, cycle=cycle)
+    solver.setup(A)
+    assert len(solver.A) > 2
+
+    x = solver.solve(F, tol=1e-10)
+    assert solver.niter < 30
+    assert np.abs(x - x0).max() < 1e-8
+
+
+def test_amg_mg_jacobi():
+    A, F = poisson_system(dim=3)
+    x0 = spsolve(A, F)
+
+    solver = AMGSolver(smoother='Jacobi')
+    solver.setup(A)
+    x = solver.solve(F, tol=1e-10, method='mg')
+    assert np.abs(x - x0).max() < 1e-8
+
+
+def test_amg_update():
+    A, F = poisson_system()
+    solver = AMGSolver()
+    solver.setup(A)
+
+    solver.update(2*A)
+    x = solver.solve(F, tol=1e-10)
+    assert np.abs(2*A@x - F).max() < 1e-8
+
+
+@pytest.mark.parametrize("method", ['cg', 'mg'])
+def test_amg_converged_initial_guess(method):
+    A, F = poisson_system()
+    solver = AMGSolver()
+    solver.setup(A)
+
+    x = solver.solve(np.zeros_like(F), method=method)
+    assert solver.niter == 0
+    assert np.all(x == 0)
+
+    x0 = spsolve(A, F)
+    x = solver.solve(F, x0=x0, method=method)
+    assert solver.niter == 0
+    assert np.all(np.isfinite(x))
+
+    x = solver.solve(F, maxit=0, method=method)
+    assert solver.niter == 0
+
+
+def test_amg_rs_rounds():
+    # 选点的轮数有界, 不随网格加密增长, 所以 setup 的时间与规模近似成正比
+    rounds = []
+    for n in [32, 128]:
+        mesh = MF.boxmesh2d([0, 1, 0, 1], nx=n, ny=n, meshtype='tri')
+        space = LagrangeFiniteElementSpace(mesh, p=1)
+        A, F = DirichletBC(space, zero).apply(space.stiff_matrix(),
+                space.source_vector(one))
+        solver = AMGSolver(maxround=10)
+        solver.setup(A)
+        solver.solve(F, tol=1e-10)
+        assert solver.niter < 15
+        rounds.append(max(solver.rounds))
+    assert rounds[1] <= rounds[0] + 5
+    assert rounds[1] <= 3*10
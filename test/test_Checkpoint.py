@@ -0,0 +1,93 @@
+import numpy as np
+
+from fealpy.mesh import MeshFactory as MF
+from fealpy.mesh import Quadtree, HalfEdgeMesh2d
+from fealpy.functionspace import LagrangeFiniteElementSpace
+from fealpy.timeintegratoralg import UniformTimeLine
+from fealpy.writer import save_checkpoint, load_checkpoint
+
+
+def test_checkpoint_triangle(tmp_path):
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=4, ny=4, meshtype='tri')
+    mesh.celldata['level'] = np.arange(mesh.number_of_cells())
+    space = LagrangeFiniteElementSpace(mesh, p=2)
+    uh = space.function()
+    uh[:] = np.arange(len(uh))
+    vh = space.function(dim=2)
+    vh[:] = 1
+    timeline = UniformTimeLine(0, 1, 100)
+    timeline.current = 42
+
+    path = str(tmp_path / 'ckpt')
+    save_checkpoint(path, mesh=mesh, functions={'uh': uh, 'vh': vh},
+            timeline=timeline, data={'step': 42, 'dt': np.float64(0.01)})
+    result = load_checkpoint(path)
+
+    m = result['mesh']
+    assert type(m) is type(mesh)
+    assert np.all(m.entity('edge') == mesh.entity('edge'))
+    assert np.all(m.ds.edge2cell == mesh.ds.edge2cell)
+    assert np.all(m.celldata['level'] == mesh.celldata['level'])
+    assert np.all(m.ds.cell_to_cell() == mesh.ds.cell_to_cell())
+
+    s = result['spaces'][0]
+    assert s.p == 2
+    assert result['functions']['uh'].space is s
+    assert result['functions']['vh'].space is s
+    assert np.all(result['functions']['uh'] == uh)
+    assert result['functions']['vh'].shape == vh.shape
+
+    # 恢复的数组是写时复制的, 修改不会影响检查点
+    result['functions']['uh'][:] = 0
+    assert np.all(load_checkpoint(path)['functions']['uh'] == uh)
+
+    t = result['timeline']
+    assert t.current == 42
+    assert t.current_time_level() == timeline.current_time_level()
+    assert result['data'] == {'step': 42, 'dt': 0.01}
+
+    m.uniform_refine()
+    assert m.number_of_cells() == 4*mesh.number_of_cells()
+
+
+def test_checkpoint_quadtree_halfedge(tmp_path):
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=2, ny=2, meshtype='quad')
+    tree = Quadtree(mesh.entity('node'), mesh.entity('cell'))
+    tree.uniform_refine()
+    save_checkpoint(str(tmp_path / 'tree'), mesh=tree)
+    t = load_checkpoint(str(tmp_path / 'tree'), mmap=False)['mesh']
+    assert np.all(t.parent == tree.parent)
+    assert np.all(t.child == tree.child)
+    isMarkedCell = np.zeros(t.number_of_cells(), dtype=np.bool_)
+    isMarkedCell[t.leaf_cell_index()[0]] = True
+    t.refine(isMarkedCell=isMarkedCell)
+
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=2, ny=2, meshtype='tri')
+    mesh = HalfEdgeMesh2d.from_mesh(mesh)
+    save_checkpoint(str(tmp_path / 'halfedge'), mesh=mesh)
+    m = load_checkpoint(str(tmp_path / 'halfedge'))['mesh']
+    assert np.all(m.ds.halfedge[:] == mesh.ds.halfedge[:])
+    assert m.number_of_cells() == mesh.number_of_cells()
+    assert np.all(m.entity('edge') == mesh.entity('edge'))
+
+
+def test_checkpoint_resave(tmp_path):
+    path = str(tmp_path / 'ckpt')
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=4, ny=4, meshtype='tri')
+    save_checkpoint(path, mesh=mesh)
+    m = load_checkpoint(path, mmap=True)['mesh']
+    node = np.array(m.entity('node'))
+    cell = np.array(m.entity('cell'))
+
+    # 从映射的检查点继续计算, 再保存到同一个目录
+    mesh = MF.boxmesh2d([0, 2, 0, 2], nx=2, ny=2, meshtype='tri')
+    save_checkpoint(path, mesh=mesh)
+    assert np.all(m.entity('node') == node)
+    assert np.all(m.entity('cell') == cell)
+    assert np.all(m.node[-1] == [1, 1])
+
+    m2 = load_checkpoint(path)['mesh']
+    assert np.all(m2.entity('node') == mesh.entity('node'))
+    assert np.all(m2.node[-1] == [2, 2])
+    assert len([d for d in tmp_path.joinpath('ckpt').iterdir()
+        if d.name.startswith('arrays.')]) == 1
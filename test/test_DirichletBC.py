@@ -0,0 +1,120 @@
+import numpy as np
+from scipy.sparse import spdiags, bmat
+
+from fealpy.mesh import MeshFactory as MF
+from fealpy.functionspace import LagrangeFiniteElementSpace
+from fealpy.boundarycondition import DirichletBC, DirichletElimination
+from fealpy.decorator import cartesian
+
+
+def eliminate(A, F, isDDof, x):
+    """
+    原来用两次稀疏矩阵乘法的实现
+    """
+    F = F - A@x
+    bdIdx = np.zeros(A.shape[0], dtype=np.int_)
+    bdIdx[isDDof] = 1
+    Tbd = spdiags(bdIdx, 0, A.shape[0], A.shape[0])
+    T = spdiags(1-bdIdx, 0, A.shape[0], A.shape[0])
+    A = T@A@T + Tbd
+    F[isDDof] = x[isDDof]
+    return A, F
+
+
+def dirichlet(t):
+    @cartesian
+    def gD(p):
+        return np.sin(t + p[..., 0])*p[..., 1]
+    return gD
+
+
+def test_dirichlet_bc():
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=4, ny=4, meshtype='tri')
+    space = LagrangeFiniteElementSpace(mesh, p=2)
+    A = space.stiff_matrix() + space.mass_matrix()
+    A.sort_indices()
+    gdof = space.number_of_global_dofs()
+    F0 = np.random.rand(gdof)
+
+    bc = DirichletBC(space, dirichlet(0.0))
+    for t in [0.0, 0.5, 1.0]:
+        uh = space.function()
+        isDDof = space.set_dirichlet_bc(dirichlet(t), uh)
+        A0, F1 = eliminate(A, F0, isDDof, uh)
+        A1, F2 = bc.apply(A, F0.copy(), gD=dirichlet(t))
+        assert np.abs(A0 - A1).max() < 1e-14
+        assert np.abs(F1 - F2).max() < 1e-14
+        if t == 0.0:
+            E = bc._elimination
+        assert bc._elimination is E # 只分析一次稀疏结构
+
+        F3 = bc.apply_on_vector(A, F0.copy(), gD=dirichlet(t))
+        assert np.abs(F1 - F3).max() < 1e-14
+
+    A2 = bc.apply_on_matrix(A)
+    assert np.abs(A0 - A2).max() < 1e-14
+    A3 = space.stiff_matrix(isDDof=isDDof)
+    A4, _ = eliminate(space.stiff_matrix(), F0, isDDof, uh)
+    assert np.abs(A3 - A4).max() < 1e-14
+
+
+def test_dirichlet_bc_vector():
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=3, ny=3, meshtype='tri')
+    space = LagrangeFiniteElementSpace(mesh, p=1)
+    A = space.stiff_matrix()
+    A = bmat([[A, 0.5*A], [0.5*A, A]], format='csr')
+    gdof = space.number_of_global_dofs()
+    F = np.random.rand(gdof, 2)
+
+    @cartesian
+    def gD(p):
+        return np.stack([p[..., 0], p[..., 1]**2], axis=-1)
+
+    uh = space.function(dim=2)
+    isDDof = space.set_dirichlet_bc(gD, uh)
+    A0, F0 = eliminate(A, F.T.reshape(-1), np.tile(isDDof, 2), uh.T.reshape(-1))
+    A1, F1 = DirichletBC(space, gD).apply(A, F)
+    assert np.abs(A0 - A1).max() < 1e-14
+    assert np.abs(F0 - F1).max() < 1e-14
+
+
+def test_dirichlet_elimination():
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=3, ny=3, meshtype='tri')
+    space = LagrangeFiniteElementSpace(mesh, p=1)
+    A = space.stiff_matrix().tolil()
+    A[0, 0] = 0 # 边界行上没有对角元
+    A = A.tocsr()
+    A.eliminate_zeros()
+    gdof = space.number_of_global_dofs()
+    isDDof = space.boundary_dof()
+    x = np.zeros((gdof, 3))
+    x[isDDof] = np.random.rand(isDDof.sum(), 3)
+    F = np.random.rand(gdof, 3)
+
+    E = DirichletElimination(A, isDDof)
+    A1 = E.apply_on_matrix(A)
+    F1 = E.apply_on_vector(F.copy(), x[isDDof])
+    A0, F0 = eliminate(A, F, isDDof, x)
+    assert A1[0, 0] == 1
+    assert np.abs(A0 - A1).max() < 1e-14
+    assert np.abs(F0 - F1).max() < 1e-14
+
+
+def test_dirichlet_bc_eliminate_zeros():
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=4, ny=4, meshtype='tri')
+    space = LagrangeFiniteElementSpace(mesh, p=2)
+    K = space.stiff_matrix()
+    K0 = K.copy()
+    gdof = space.number_of_global_dofs()
+    F = np.random.rand(gdof)
+
+    # 消去后的矩阵含有显式的零, 去掉它们不能影响 K 和缓存的消去对象
+    bc = DirichletBC(space, dirichlet(0.0))
+    A0, F0 = bc.apply(K, F.copy())
+    A0.eliminate_zeros()
+    assert np.abs(K - K0).max() == 0
+    assert not np.shares_memory(A0.indices, K.indices)
+
+    A1, F1 = bc.apply(K, F.copy())
+    assert np.abs(A0 - A1).max() < 1e-14
+    assert np.abs(F0 - F1).max() < 1e-14
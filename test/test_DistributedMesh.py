@@ -0,0 +1,142 @@
+import numpy as np
+import pytest
+from scipy.sparse import csr_matrix
+
+from fealpy.mesh import MeshFactory as MF
+from fealpy.decorator import cartesian
+from fealpy.functionspace import LagrangeFiniteElementSpace
+from fealpy.parallel import MeshPartition, DistributedMesh
+from fealpy.parallel import DistributedLagrangeFiniteElementSpace
+
+
+def quadrant_parts(mesh):
+    bc = mesh.entity_barycenter('cell')
+    return (bc[:, 0] > 0.5) + 2*(bc[:, 1] > 0.5)
+
+
+@pytest.mark.parametrize("meshtype", ['tri', 'tet'])
+def test_mesh_partition(meshtype):
+    if meshtype == 'tri':
+        mesh = MF.boxmesh2d([0, 1, 0, 1], nx=8, ny=8, meshtype='tri')
+    else:
+        mesh = MF.boxmesh3d([0, 1, 0, 1, 0, 1], nx=3, ny=3, nz=3, meshtype='tet')
+    NC = mesh.number_of_cells()
+    parts = quadrant_parts(mesh)
+    data = MeshPartition(mesh, 4, parts=parts).split()
+
+    isOwned = np.zeros(NC, dtype=np.int_)
+    cell = mesh.entity('cell')
+    for i, d in enumerate(data):
+        dmesh = DistributedMesh(d)
+        cells = d['cellglobal']
+        isOwned[cells[dmesh.isOwnedCell]] += 1
+        # 子网格保持单元的顶点顺序和坐标
+        node = dmesh.mesh.entity('node')
+        assert np.all(d['nodedata']['index'][dmesh.mesh.entity('cell')] == cell[cells])
+        assert np.allclose(node, mesh.entity('node')[d['nodedata']['index']])
+        # ghost 单元与 owned 单元有公共顶点, 且包含了所有这样的单元
+        isOwnedNode = np.zeros(mesh.number_of_nodes(), dtype=np.bool_)
+        isOwnedNode[cell[parts == i]] = True
+        isLocal = np.any(isOwnedNode[cell], axis=-1)
+        assert set(cells) == set(np.nonzero(isLocal)[0])
+        # 通信信息在两个进程之间是一致的
+        for q, g in d['nodedata']['recv'].items():
+            assert np.all(data[q]['nodedata']['send'][i] == g)
+            assert np.all(data[q]['nodedata']['owner'][np.searchsorted(
+                data[q]['nodedata']['index'], g)] == q)
+    assert np.all(isOwned == 1)
+
+
+@pytest.mark.parametrize("p", [1, 2, 3])
+def test_distributed_assembly(p):
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=6, ny=6, meshtype='tri')
+    space = LagrangeFiniteElementSpace(mesh, p=p)
+    gdof = space.number_of_global_dofs()
+    A = space.stiff_matrix()
+    M = space.mass_matrix()
+
+    @cartesian
+    def f(x):
+        return np.sin(x[..., 0])*np.cos(x[..., 1])
+
+    F = space.source_vector(f)
+    isBdDof = space.boundary_dof()
+
+    data = MeshPartition(mesh, 4, parts=quadrant_parts(mesh)).split(p=p)
+    count = np.zeros(gdof, dtype=np.int_)
+    for d in data:
+        dspace = DistributedLagrangeFiniteElementSpace(DistributedMesh(d), p=p)
+        l2g = dspace.local_to_global()
+        owned = l2g[dspace.owned_dof_index()]
+        count[owned] += 1
+
+        assert dspace.number_of_global_dofs() == gdof
+        assert np.all(dspace.isBdDof == isBdDof[l2g])
+        assert np.allclose(dspace.interpolation_points(), space.interpolation_points()[l2g])
+
+        # 本进程拥有的自由度所在的行是完整的
+        for B0, B1 in [(A, dspace.stiff_matrix()), (M, dspace.mass_matrix())]:
+            B1 = csr_matrix(B1)
+            B1 = csr_matrix((B1.data, l2g[B1.indices], B1.indptr), shape=(len(owned), gdof))
+            assert np.allclose(B1.toarray(), B0[owned].toarray())
+        assert np.allclose(dspace.source_vector(f), F[owned])
+
+        # 消去边界条件以后的局部矩阵与整体矩阵的对应行相同
+        u = lambda x: x[..., 0]**2 + x[..., 1]
+        B1, F1, uh = dspace.set_dirichlet_bc(u, dspace.stiff_matrix(), dspace.source_vector(f))
+        assert np.allclose(uh[dspace.isBdDof], u(dspace.interpolation_points()[dspace.isBdDof]))
+        B1 = csr_matrix((B1.data, l2g[B1.indices], B1.indptr), shape=(len(owned), gdof))
+        B0 = A.toarray()
+        B0[:, isBdDof] = 0
+        B0[isBdDof, :] = 0
+        B0[isBdDof, isBdDof] = 1
+        assert np.allclose(B1.toarray(), B0[owned])
+    assert np.all(count == 1)
+
+
+def test_cg_converged_initial_guess():
+    MPI = pytest.importorskip('mpi4py.MPI')
+    from fealpy.parallel import cg
+
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=4, ny=4, meshtype='tri')
+    dmesh = DistributedMesh.from_mesh(MPI.COMM_SELF, mesh, p=1)
+    dspace = DistributedLagrangeFiniteElementSpace(dmesh, p=1)
+    u = lambda x: x[..., 0] + x[..., 1]
+    A, F, uh = dspace.set_dirichlet_bc(u, dspace.stiff_matrix(),
+            np.zeros(dspace.number_of_owned_dofs()))
+
+    x, niter = cg(A, np.zeros_like(F), dspace.component)
+    assert niter == 0
+    assert np.all(x == 0)
+
+    x, niter = cg(A, F, dspace.component, x=uh)
+    x, niter = cg(A, F, dspace.component, x=x)
+    assert niter == 0
+    assert np.all(np.isfinite(x))
+
+
+def test_send_part():
+    MPI = pytest.importorskip('mpi4py.MPI')
+    from fealpy.parallel.DistributedMesh import _send_part, _recv_part
+
+    comm = MPI.COMM_SELF
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=4, ny=4, meshtype='tri')
+    data = MeshPartition(mesh, 4, parts=quadrant_parts(mesh)).split(p=2)[1]
+
+    # 数组按字节分块发送, 块的大小不必是元素大小的整数倍
+    reqs = _send_part(comm, data, 0, chunk=100)
+    recv = _recv_part(comm, 0, chunk=100)
+    MPI.Request.Waitall(reqs)
+
+    def check(a, b):
+        if isinstance(a, np.ndarray):
+            assert a.dtype == b.dtype
+            assert np.all(a == b)
+        elif isinstance(a, dict):
+            assert list(a) == list(b)
+            for k in a:
+                check(a[k], b[k])
+        else:
+            assert a == b
+    check(data, recv)
+    assert recv['dofdata'][2]['isBdDof'].dtype == np.bool_
@@ -0,0 +1,238 @@
+import numpy as np
+
+from fealpy.mesh import MeshFactory as MF
+from fealpy.functionspace import LagrangeFiniteElementSpace
+from fealpy.decorator import cartesian
+
+
+@cartesian
+def c(p):
+    return 1 + p[..., 0]**2
+
+
+def test_chunk_construct_matrix():
+    mesh = MF.boxmesh3d([0, 1, 0, 1, 0, 1], nx=3, ny=3, nz=3, meshtype='tet')
+    space = LagrangeFiniteElementSpace(mesh, p=2)
+
+    A0 = space.stiff_matrix(c=c)
+    A1 = space.stiff_matrix(c=c, memory=0.1)
+    assert np.abs(A0 - A1).max() < 1e-12
+
+    M0 = space.mass_matrix()
+    M1 = space.mass_matrix(memory=0.1)
+    assert np.abs(M0 - M1).max() < 1e-12
+
+
+def test_chunk_construct_matrix_plan():
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=8, ny=8, meshtype='tri')
+    space = LagrangeFiniteElementSpace(mesh, p=2)
+    plan = space.assembly_plan()
+
+    # 同时给定 memory 和 plan 时, 分块组装用这个计划累加, 且不重新计算位置
+    add, position = plan.add, plan.position
+    nadd, nposition = [], []
+    def counted_add(data, M, index=np.s_[:]):
+        nadd.append(1)
+        return add(data, M, index=index)
+    def counted_position(index=np.s_[:]):
+        nposition.append(1)
+        return position(index=index)
+    plan.add, plan.position = counted_add, counted_position
+
+    A0 = space.stiff_matrix(c=c)
+    A1 = space.stiff_matrix(c=c, memory=0.01, plan=plan)
+    M0 = space.mass_matrix()
+    M1 = space.mass_matrix(memory=0.01, plan=True)
+    assert len(nadd) > 4
+    assert len(nposition) == 0
+    assert np.all(A1.indices == plan.indices)
+    assert np.abs(A0 - A1).max() < 1e-12
+    assert np.abs(M0 - M1).max() < 1e-12
+
+
+def test_chunk_grad_lambda():
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=20, ny=20, meshtype='tri')
+    space = LagrangeFiniteElementSpace(mesh, p=1)
+    NC = mesh.number_of_cells()
+
+    ncell = []
+    grad_lambda = mesh.grad_lambda
+    def counted_grad_lambda(index=np.s_[:]):
+        Dlambda = grad_lambda(index=index)
+        ncell.append(len(Dlambda))
+        return Dlambda
+    mesh.grad_lambda = counted_grad_lambda
+
+    # 每一块只计算自己单元上的 grad_lambda, 总的工作量与块数无关
+    A0 = space.stiff_matrix()
+    A1 = space.stiff_matrix(memory=0.01)
+    assert len(ncell) > 2
+    assert sum(ncell[1:]) == NC
+    assert np.abs(A0 - A1).max() < 1e-12
+
+
+def test_assembly_plan():
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=4, ny=4, meshtype='tri')
+    space = LagrangeFiniteElementSpace(mesh, p=3)
+
+    plan = space.assembly_plan()
+    A0 = space.stiff_matrix(c=c)
+    A1 = space.stiff_matrix(c=c, plan=plan)
+    assert np.abs(A0 - A1).max() < 1e-12
+    assert np.all(A1.indices == plan.indices)
+
+    M0 = space.mass_matrix()
+    M1 = space.mass_matrix(plan=True)
+    assert np.abs(M0 - M1).max() < 1e-12
+    assert space.assembly_plan() is plan
+
+    # 原地修改组装出的矩阵的稀疏结构不影响缓存的计划
+    A1.eliminate_zeros()
+    A2 = space.stiff_matrix(c=c, plan=True)
+    assert np.all(A2.indices == plan.indices)
+    assert np.abs(A0 - A2).max() < 1e-12
+    assert np.abs(A0 - A1).max() < 1e-12
+
+    # 分块累加与一次组装的结果相同
+    NC = mesh.number_of_cells()
+    K = np.random.default_rng(0).random((NC, ) + plan.cell2dof0.shape[1:]*2)
+    data = np.zeros(plan.number_of_nonzeros())
+    plan.add(data, K[NC//3:], index=np.s_[NC//3:])
+    plan.add(data, K[[0, 5]], index=np.array([0, 5]))
+    K[np.r_[1:5, 6:NC//3]] = 0
+    assert np.abs(data - plan.assemble(K).data).max() < 1e-12
+
+
+def test_assembly_plan_refine():
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=2, ny=2, meshtype='tri')
+    space = LagrangeFiniteElementSpace(mesh, p=2)
+    plan0 = space.assembly_plan()
+
+    mesh.uniform_refine()
+    plan1 = space.assembly_plan()
+    assert plan1 is not plan0
+    assert space.assembly_plan() is plan1
+
+    space = LagrangeFiniteElementSpace(mesh, p=2)
+    A0 = space.stiff_matrix(c=c)
+    A1 = space.stiff_matrix(c=c, plan=plan1)
+    assert plan1.shape == A0.shape
+    assert np.abs(A0 - A1).max() < 1e-12
+
+
+def test_assembly_plan_shared_dof():
+    from fealpy.quadrature import AssemblyPlan
+    from fealpy.functionspace.VEMCellGroups import VEMCellGroups
+
+    # 节点 0 被 256 个三角形共享
+    n = 256
+    cell2dof = np.zeros((n, 3), dtype=np.int_)
+    cell2dof[:, 1] = np.arange(1, n+1)
+    cell2dof[:, 2] = np.roll(np.arange(1, n+1), -1)
+    M = np.ones((n, 3, 3), dtype=np.float64)
+
+    A = AssemblyPlan(cell2dof, n+1).assemble(M)
+    assert A[0, 0] == n
+    assert np.all(A.diagonal()[1:] == 2)
+
+    groups = VEMCellGroups(cell2dof.reshape(-1), np.arange(0, 3*n+1, 3), n+1)
+    B = groups.assemble([M])
+    assert np.abs(A - B).max() == 0
+
+
+def test_parallel_construct_matrix():
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=6, ny=6, meshtype='tri')
+    space = LagrangeFiniteElementSpace(mesh, p=2)
+
+    A0 = space.stiff_matrix(c=c)
+    A1 = space.parallel_stiff_matrix(c=c, nproc=2)
+    assert np.abs(A0 - A1).max() < 1e-12
+
+    partition = np.arange(mesh.number_of_cells())%3
+    M0 = space.mass_matrix()
+    M1 = space.parallel_mass_matrix(nproc=3, partition=partition)
+    assert np.abs(M0 - M1).max() < 1e-12
+
+
+def test_basis_cache():
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=2, ny=2, meshtype='tri')
+    space = LagrangeFiniteElementSpace(mesh, p=3)
+    bcs, ws = space.integrator.get_quadrature_points_and_weights()
+
+    phi0 = space.basis(bcs)
+    phi0[:] = 0.0 # the cached table should not be changed
+    phi1 = space.basis(bcs)
+    assert np.abs(np.sum(phi1, axis=-1) - 1).max() < 1e-12
+
+    gphi = space.grad_basis(bcs)
+    assert np.abs(np.sum(gphi, axis=-2)).max() < 1e-12
+    assert len(space.cache) == 2
+
+
+def test_source_vector_batch():
+    from fealpy.decorator import barycentric
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=4, ny=4, meshtype='tri')
+    space = LagrangeFiniteElementSpace(mesh, p=2)
+    k = np.arange(1, 6)
+
+    @cartesian
+    def sources(p):
+        x = p[..., 0]
+        return np.sin(k[:, None, None]*x)
+
+    def source(i):
+        @cartesian
+        def f(p):
+            return np.sin(k[i]*p[..., 0])
+        return f
+
+    fs = [source(i) for i in range(len(k))]
+    b0 = np.stack([space.source_vector(f) for f in fs], axis=-1)
+    b1 = space.source_vector_batch(sources)
+    b2 = space.source_vector_batch(fs)
+    assert b1.shape == (space.number_of_global_dofs(), len(k))
+    assert np.abs(b0 - b1).max() < 1e-12
+    assert np.abs(b0 - b2).max() < 1e-12
+
+    @barycentric
+    def basis(bc):
+        return space.basis(bc)
+
+    cell2dof = space.cell_to_dof()
+    gdof = space.number_of_global_dofs()
+    b3 = space.integralalg.construct_vector_batch(sources, basis, cell2dof, gdof=gdof)
+    b4 = space.integralalg.construct_vector_s_s(fs[0], basis, cell2dof, gdof=gdof)
+    assert np.abs(b0 - b3).max() < 1e-12
+    assert np.abs(b0[:, 0] - b4).max() < 1e-12
+
+    @cartesian
+    def vsource(p):
+        return np.stack([p[..., 0], p[..., 1]**2], axis=-1)
+    b5 = space.source_vector(vsource, dim=2)
+    b6 = np.stack([space.source_vector(cartesian(lambda p: p[..., 0])),
+        space.source_vector(cartesian(lambda p: p[..., 1]**2))], axis=-1)
+    assert np.abs(b5 - b6).max() < 1e-12
+
+    @cartesian
+    def vsources(p):
+        return np.stack([vsource(p), 2*vsource(p)], axis=0)
+    b7 = space.source_vector_batch(vsources)
+    assert b7.shape == (space.number_of_global_dofs(), 2, 2)
+    assert np.abs(b7[..., 0] - b5).max() < 1e-12
+    assert np.abs(b7[..., 1] - 2*b5).max() < 1e-12
+
+
+def test_complex_construct_matrix():
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=6, ny=6, meshtype='tri')
+    space = LagrangeFiniteElementSpace(mesh, p=2)
+
+    @cartesian
+    def cc(p):
+        return 1 + 1j*p[..., 0]
+
+    A0 = space.stiff_matrix(c=cc)
+    A1 = space.stiff_matrix(c=cc, memory=0.01)
+    A2 = space.parallel_stiff_matrix(c=cc, nproc=2)
+    assert np.iscomplexobj(A1.data) and np.iscomplexobj(A2.data)
+    assert np.abs(A0 - A1).max() < 1e-12
+    assert np.abs(A0 - A2).max() < 1e-12
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from fealpy.mesh import MeshFactory as MF
+from fealpy.mesh import Quadtree
+from fealpy.functionspace import LagrangeFiniteElementSpace
+from fealpy.boundarycondition import DirichletBC
+from fealpy.solver import GMGSolver
+from fealpy.pde.poisson_2d import CosCosData
+
+
+@pytest.mark.parametrize("p", [1, 2])
+@pytest.mark.parametrize("method", ['uniform', 'bisect'])
+def test_gmg_mesh_independent(p, method):
+    pde = CosCosData()
+    niter = []
+    for n in [4, 6]:
+        mesh = MF.boxmesh2d(pde.domain(), nx=2, ny=2, meshtype='tri')
+        solver = GMGSolver()
+        for i in range(n if method == 'uniform' else 2*n):
+            solver.refine(mesh, method=method)
+        space = LagrangeFiniteElementSpace(mesh, p=p)
+        solver.add_space(space)
+
+        A = space.stiff_matrix()
+        F = space.source_vector(pde.source)
+        A, F = DirichletBC(space, pde.dirichlet).apply(A, F)
+        solver.setup(A)
+        x = solver.solve(F, tol=1e-10)
+        assert np.abs(A@x - F).max() < 1e-8
+        niter.append(solver.niter)
+    assert niter[1] <= niter[0] + 2
+
+
+def test_gmg_tet_uniform():
+    mesh = MF.boxmesh3d([0, 1, 0, 1, 0, 1], nx=2, ny=2, nz=2, meshtype='tet')
+    solver = GMGSolver(cycle='F')
+    solver.refine(mesh, method='uniform')
+    solver.refine(mesh, isMarkedCell=np.ones(mesh.number_of_cells(), dtype=np.bool_),
+            method='bisect')
+    space = LagrangeFiniteElementSpace(mesh, p=1)
+    A = space.stiff_matrix() + space.mass_matrix()
+    F = np.ones(A.shape[0])
+    solver.setup(A)
+    x = solver.solve(F, tol=1e-10)
+    assert np.abs(A@x - F).max() < 1e-8
+
+
+def test_quadtree_refine_returnim():
+    node = np.array([[0, 0], [1, 0], [1, 1], [0, 1]], dtype=np.float64)
+    cell = np.array([[0, 1, 2, 3]], dtype=np.int_)
+    mesh = Quadtree(node, cell)
+    solver = GMGSolver()
+    solver.refine(mesh)
+    solver.refine(mesh)
+    isMarkedCell = np.zeros(mesh.number_of_cells(), dtype=np.bool_)
+    isMarkedCell[mesh.leaf_cell_index()[:2]] = True
+    solver.refine(mesh, isMarkedCell=isMarkedCell)
+
+    u = lambda p: 1 + 2*p[..., 0] - 3*p[..., 1]
+    val = u(node)
+    for P in solver.IM:
+        val = P@val
+    assert np.abs(val - u(mesh.node)).max() < 1e-12
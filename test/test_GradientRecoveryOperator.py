@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from fealpy.mesh import MeshFactory as MF
+from fealpy.functionspace import LagrangeFiniteElementSpace
+from fealpy.recovery import GradientRecoveryOperator, FEMFunctionRecoveryAlg
+
+
+def u(p):
+    x = p[..., 0]
+    y = p[..., 1]
+    return x**2 + 3*x*y - y**2 + x
+
+
+def grad_u(p):
+    x = p[..., 0]
+    y = p[..., 1]
+    return np.stack([2*x + 3*y + 1, 3*x - 2*y], axis=-1)
+
+
+@pytest.mark.parametrize("p", [1, 2])
+def test_average(p):
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=4, ny=4, meshtype='tri')
+    space = LagrangeFiniteElementSpace(mesh, p=p)
+    uh = space.interpolation(u)
+
+    # 逐单元累加的实现
+    cell2dof = space.cell_to_dof()
+    bc = space.dof.multiIndex/p
+    guh = uh.grad_value(bc).swapaxes(0, 1)
+    measure = mesh.entity_measure('cell')
+    rguh = np.zeros((space.number_of_global_dofs(), 2))
+    deg = np.zeros(space.number_of_global_dofs())
+    np.add.at(rguh, cell2dof, guh*measure[:, None, None])
+    np.add.at(deg, cell2dof, np.broadcast_to(measure[:, None], cell2dof.shape))
+
+    assert np.allclose(space.grad_recovery(uh, method='area'), rguh/deg[:, None])
+    assert space.recovery_operator('area') is space.recovery_operator('area')
+
+    # 节点原地移动以后重新构造恢复算子
+    node = mesh.entity('node')
+    node[:] *= 2
+    space0 = LagrangeFiniteElementSpace(mesh, p=p)
+    for method in ['simple', 'area', 'distance']:
+        assert np.allclose(space.grad_recovery(uh, method=method),
+                space0.grad_recovery(uh, method=method))
+
+    # 向量值函数
+    op = GradientRecoveryOperator(space, method='simple')
+    vh = np.c_[uh, 2*uh]
+    rvh = op(vh)
+    assert rvh.shape == (space.number_of_global_dofs(), 2, 2)
+    assert np.allclose(rvh[:, 1], 2*op(uh))
+
+
+def test_patch_recovery():
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=6, ny=6, meshtype='tri')
+    node = mesh.entity('node')
+    space = LagrangeFiniteElementSpace(mesh, p=1)
+
+    # PPR 对二次多项式是精确的
+    uh = space.interpolation(u)
+    assert np.allclose(space.grad_recovery(uh, method='PPR'), grad_u(node))
+
+    # 节点原地移动以后, 缓存的局部拟合也要重新计算
+    node[:] *= 2
+    uh = space.interpolation(u)
+    assert np.allclose(space.grad_recovery(uh, method='PPR'), grad_u(node))
+
+    # SPR 对线性函数是精确的
+    vh = space.interpolation(lambda p: 2*p[..., 0] - p[..., 1])
+    alg = FEMFunctionRecoveryAlg()
+    assert np.allclose(alg.ZZ(vh), [2, -1])
+    assert np.allclose(alg.PPR(vh), [2, -1])
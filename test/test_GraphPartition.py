@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from fealpy.mesh import MeshFactory as MF
+from fealpy.graph import metis
+from fealpy.graph import partition
+
+
+@pytest.mark.parametrize("method", ['rcb', 'inertial', 'greedy', 'spectral'])
+@pytest.mark.parametrize("nparts", [2, 3, 8])
+def test_part_mesh(method, nparts):
+    mesh = MF.boxmesh2d([0, 2, 0, 1], nx=20, ny=10, meshtype='tri')
+    NC = mesh.number_of_cells()
+    adj, adjLocation = mesh.ds.cell_to_cell(return_array=True)
+
+    edgecut, parts = partition.part_mesh(mesh, nparts=nparts, method=method)
+    assert parts.shape == (NC, )
+    assert np.all(np.bincount(parts, minlength=nparts) > 0)
+    assert partition.imbalance(parts, nparts) <= 1.03
+
+    # 切边数与逐边统计的结果一致
+    edge2cell = mesh.ds.edge_to_cell()
+    isInEdge = edge2cell[:, 0] != edge2cell[:, 1]
+    assert edgecut == np.sum(parts[edge2cell[isInEdge, 0]] != parts[edge2cell[isInEdge, 1]])
+
+    # 细化不会增加切边数
+    edgecut0, _ = partition.part_mesh(mesh, nparts=nparts, method=method, maxit=0)
+    assert edgecut <= edgecut0
+
+
+def test_refine_bisection():
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=10, ny=10, meshtype='tri')
+    adj, adjLocation = mesh.ds.cell_to_cell(return_array=True)
+    G = partition.adjacency_matrix(adj, adjLocation)
+    NC = mesh.number_of_cells()
+
+    # 随机的初始二分经过细化以后切边数明显下降, 且满足平衡条件
+    side = np.zeros(NC, dtype=np.bool_)
+    side[np.random.default_rng(0).permutation(NC)[:NC//2]] = True
+    cut0 = partition.edge_cut(adj, adjLocation, side.astype(np.int_))
+    side = partition.refine_bisection(G, side, NC//2, ubfactor=1.05, maxit=100)
+    cut1 = partition.edge_cut(adj, adjLocation, side.astype(np.int_))
+    assert cut1 < cut0/2
+    assert max(np.sum(side), NC - np.sum(side)) <= np.floor(NC//2*1.05)
+
+
+@pytest.mark.parametrize("method", ['greedy', 'spectral'])
+def test_part_graph_small(method):
+    # 两个相连的顶点分成两组
+    adj = np.array([1, 0])
+    adjLocation = np.array([0, 1, 2])
+    edgecut, parts = partition.part_graph(adj, adjLocation, nparts=2, method=method)
+    assert np.all(np.sort(parts) == [0, 1])
+    assert edgecut == 1
+
+    # 顶点个数不超过组数时每个顶点单独一组
+    edgecut, parts = partition.part_graph(adj, adjLocation, nparts=3, method=method)
+    assert np.all(np.sort(parts) == [0, 1])
+
+    # 一条路径上的 7 个顶点分成 3 组, 没有空组
+    N = 7
+    adj = np.r_[1, np.repeat(np.arange(1, N-1), 2) + np.tile([-1, 1], N-2), N-2]
+    adjLocation = np.r_[0, np.cumsum([1] + [2]*(N-2) + [1])]
+    for nparts in range(2, N+1):
+        edgecut, parts = partition.part_graph(adj, adjLocation, nparts=nparts,
+                method=method, ubfactor=1.5)
+        num = np.bincount(parts, minlength=nparts)
+        assert np.all(num > 0)
+        assert num.max() <= max(np.floor(N/nparts*1.5), np.ceil(N/nparts))
+
+
+def test_refine_bisection_bounds():
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=10, ny=10, meshtype='tri')
+    adj, adjLocation = mesh.ds.cell_to_cell(return_array=True)
+    G = partition.adjacency_matrix(adj, adjLocation)
+    NC = mesh.number_of_cells()
+
+    # 从很不平衡的初始二分出发, 两边都回到 [nmin, nmax] 中
+    for n0 in [1, 10, 150]:
+        side = np.ones(NC, dtype=np.bool_)
+        side[:NC//2] = False
+        side = partition.refine_bisection(G, side, n0, ubfactor=1.1, maxit=100)
+        n1 = np.sum(side)
+        assert 0 < NC - n1 <= np.floor(n0*1.1)
+        assert n1 <= np.floor((NC - n0)*1.1)
+
+
+@pytest.mark.skipif(metis._dll is not None, reason="METIS dll is available")
+def test_metis_fallback():
+    mesh = MF.boxmesh3d([0, 1, 0, 1, 0, 1], nx=4, ny=4, nz=4, meshtype='tet')
+    edgecut, parts = metis.part_mesh(mesh, nparts=4)
+    edgecut1, parts1 = partition.part_mesh(mesh, nparts=4)
+    assert edgecut == edgecut1
+    assert np.all(parts == parts1)
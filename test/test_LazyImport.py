@@ -0,0 +1,50 @@
+import os
+import sys
+import subprocess
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run(code):
+    """
+    @brief 在新的 Python 进程中运行 code, 避免受测试进程中已导入模块的影响
+    """
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    out = subprocess.run([sys.executable, '-c', code], env=env, cwd=ROOT,
+            capture_output=True, text=True, check=True)
+    return out.stdout.split()
+
+
+@pytest.mark.parametrize("pkg", ['mesh', 'functionspace', 'solver', 'plotter'])
+def test_import_is_lazy(pkg):
+    code = (
+        "import sys\n"
+        "import fealpy.{}\n"
+        "print(*[m in sys.modules for m in ('matplotlib', 'vtk', 'scipy')])\n"
+        ).format(pkg)
+    assert run(code) == ['False']*3
+
+
+def test_lazy_attribute():
+    code = (
+        "import sys\n"
+        "import fealpy.mesh.QuadrangleMesh\n" # 先直接导入子模块
+        "from fealpy.mesh import TriangleMesh, QuadrangleMesh, MeshFactory\n"
+        "from fealpy.functionspace import LagrangeFiniteElementSpace\n"
+        "print(isinstance(TriangleMesh, type), isinstance(QuadrangleMesh, type))\n"
+        "print(isinstance(LagrangeFiniteElementSpace, type), MeshFactory.__name__)\n"
+        "mesh = MeshFactory.boxmesh2d([0, 1, 0, 1], nx=2, ny=2, meshtype='tri')\n"
+        "print(type(mesh) is TriangleMesh, 'matplotlib' in sys.modules)\n"
+        )
+    assert run(code) == [
+            'True', 'True', 'True', 'fealpy.mesh.MeshFactory', 'True', 'False']
+
+
+def test_lazy_dir():
+    import fealpy.mesh
+    assert 'TriangleMesh' in dir(fealpy.mesh)
+    assert 'unique_row' in fealpy.mesh.__all__
+    with pytest.raises(AttributeError):
+        fealpy.mesh.NoSuchMesh
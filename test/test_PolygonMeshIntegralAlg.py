@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from fealpy.mesh import MeshFactory as MF
+from fealpy.mesh import HalfEdgeMesh2d
+from fealpy.functionspace import ScaledMonomialSpace2d
+
+
+@pytest.mark.parametrize("meshtype", ['poly', 'halfedge'])
+def test_polygon_quadrature(meshtype):
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=4, ny=4, meshtype='poly')
+    if meshtype == 'halfedge':
+        mesh = HalfEdgeMesh2d.from_mesh(mesh)
+    space = ScaledMonomialSpace2d(mesh, 2)
+    integralalg = space.integralalg
+
+    qf = integralalg.quadrature()
+    assert qf is integralalg.quadrature()
+    assert np.all(np.diff(qf.index) >= 0)
+    NV = mesh.number_of_vertices_of_cells()
+    assert len(qf.index) == NV.sum()
+    assert np.allclose(qf.reduce(qf.measure), space.cellmeasure)
+
+    # 每个单元上的积分都只需一次函数调用
+    ncall = []
+    def u(x, index):
+        ncall.append(len(index))
+        return x[..., 0]**2*x[..., 1]
+    assert np.isclose(integralalg.integral(u), 1/6)
+    assert ncall == [NV.sum()]
+
+    # 散度定理得到的 H 与直接的数值积分一致
+    def f(x, index):
+        phi = space.basis(x, index=index)
+        return np.einsum('ijk, ijm->ijkm', phi, phi)
+    H = integralalg.integral(f, celltype=True)
+    assert np.allclose(space.matrix_H(), H)
@@ -0,0 +1,72 @@
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from fealpy.writer.SharedMemoryChannel import SharedMemoryChannel
+
+
+def simulation(NN, NC, queue):
+    queue.put(4)
+    for i in range(3):
+        queue.put({'u': ('pointdata', np.full(NN, i, dtype=np.float64)),
+            'flag': ('celldata', np.arange(NC) % (i + 2))})
+    buf = queue.acquire() # 直接在共享内存中计算
+    buf['u'][:] = 10
+    queue.commit(['u'], {'p': ('celldata', np.ones(NC))})
+    queue.put(-1)
+
+
+def simulation_u(NN, queue):
+    queue.put(3)
+    for i in range(3):
+        queue.put({'u': ('pointdata', np.full(NN, i, dtype=np.float64))})
+    queue.put(-1)
+
+
+def test_shared_memory_channel():
+    NN, NC = 100, 50
+    layout = {'u': ('pointdata', (NN, ), np.float64),
+            'flag': ('celldata', (NC, ), np.int_)}
+    channel = SharedMemoryChannel(layout, nslot=2)
+    process = multiprocessing.Process(target=simulation, args=(NN, NC, channel))
+    process.start()
+
+    assert channel.get() == 4
+    for i in range(3):
+        data = channel.get()
+        assert data['u'][0] == 'pointdata'
+        assert np.all(data['u'][1] == i)
+        assert np.all(data['flag'][1] == np.arange(NC) % (i + 2))
+    data = channel.get()
+    assert set(data) == {'u', 'p'}
+    assert np.all(data['u'][1] == 10)
+    assert np.all(data['p'][1] == 1)
+    data = None
+    assert channel.get() == -1
+    process.join()
+    channel.close()
+
+
+def test_mesh_writer_shared(tmp_path):
+    vtk = pytest.importorskip('vtk')
+    from fealpy.mesh import MeshFactory as MF
+    from fealpy.writer import MeshWriter
+
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=5, ny=5, meshtype='tri')
+    NN = mesh.number_of_nodes()
+    NC = mesh.number_of_cells()
+    mesh.nodedata['u'] = np.zeros(NN, dtype=np.float64)
+    mesh.celldata['flag'] = np.zeros(NC, dtype=np.int_)
+
+    fname = str(tmp_path / 'test.vtu')
+    writer = MeshWriter(mesh, simulation=simulation_u, args=(NN, ))
+    assert isinstance(writer.queue, SharedMemoryChannel)
+    writer.run(fname)
+
+    reader = vtk.vtkXMLUnstructuredGridReader()
+    reader.SetFileName(fname)
+    reader.UpdateInformation()
+    info = reader.GetOutputInformation(0)
+    ts = info.Get(vtk.vtkStreamingDemandDrivenPipeline.TIME_STEPS())
+    assert len(ts) == 3
@@ -0,0 +1,69 @@
+import numpy as np
+from scipy.sparse.linalg import cg, LinearOperator
+
+from fealpy.mesh import MeshFactory as MF
+from fealpy.mesh.core import multi_index_matrix, lagrange_shape_function
+from fealpy.functionspace import TensorProductLagrangeOperator
+
+
+def solution(p):
+    return np.prod(np.sin(np.pi*p), axis=-1)
+
+
+def source(p):
+    return p.shape[-1]*np.pi**2*solution(p)
+
+
+def test_poisson():
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=4, ny=4, meshtype='quad')
+    for p, tol in [(2, 1e-2), (4, 1e-4)]:
+        isDDof = TensorProductLagrangeOperator(mesh, p).is_boundary_dof()
+        A = TensorProductLagrangeOperator(mesh, p, isDDof=isDDof)
+        F = A.source_vector(source)
+        F[isDDof] = 0.0
+
+        d = A.diagonal()
+        P = LinearOperator(A.shape, matvec=lambda x: x/d)
+        uh, info = cg(A, F, M=P, tol=1e-12)
+        assert info == 0
+        assert np.abs(uh - solution(A.interpolation_points())).max() < tol
+
+
+def test_diagonal():
+    mesh = MF.boxmesh3d([0, 1, 0, 1, 0, 1], nx=1, ny=2, nz=1, meshtype='hex')
+    mesh.node += 0.05*np.sin(7*mesh.node[:, ::-1])
+    for operator in ['stiff', 'mass', 'elasticity']:
+        A = TensorProductLagrangeOperator(mesh, 2, operator=operator, lam=2.0, mu=0.5)
+        I = np.eye(A.shape[0])
+        M = np.array([A@I[:, i] for i in range(A.shape[0])])
+        assert np.abs(M - M.T).max() < 1e-12
+        assert np.abs(np.diag(M) - A.diagonal()).max() < 1e-12
+
+
+def test_cell_to_dof():
+    # 强烈分级并扰动的网格, 最小的边远小于一般的边
+    for mesh in [MF.boxmesh2d([0, 1, 0, 1], nx=5, ny=4, meshtype='quad'),
+            MF.boxmesh3d([0, 1, 0, 1, 0, 1], nx=3, ny=2, nz=2, meshtype='hex')]:
+        node = mesh.node
+        node[:] = node**6 + 0.01*np.sin(5*node[:, ::-1])
+        x = np.unique(node[:, 0])
+        node[node[:, 0] == x[1], 0] = x[0] + 1e-12
+        NN = mesh.number_of_nodes()
+        NE = mesh.number_of_edges()
+        NC = mesh.number_of_cells()
+        TD = mesh.top_dimension()
+        for p in [1, 2, 3]:
+            A = TensorProductLagrangeOperator(mesh, p)
+            gdof = NN + (p-1)*NE + (p-1)**TD*NC
+            if TD == 3:
+                gdof += (p-1)**2*mesh.number_of_faces()
+            assert A.number_of_global_dofs() == gdof
+            assert np.all(np.bincount(A.cell2dof.flat, minlength=gdof) > 0)
+
+            # 共享的自由度在每个单元中的插值点相同
+            cell, pm = A.tensor_node()
+            node = mesh.entity('node')
+            B = lagrange_shape_function(multi_index_matrix[1](p)/p, pm)
+            shape = (NC, ) + TD*(pm+1, ) + (TD, )
+            ips = A.interpolate(node[cell].reshape(shape), TD*[B]).reshape(-1, TD)
+            assert np.abs(A.interpolation_points()[A.cell2dof.flat] - ips).max() < 1e-12
@@ -20,3 +20,40 @@ print(np.sum(np.abs(c2p-c2p1)))
 
 
 
+
+
+def test_bisect_update():
+    from fealpy.mesh import MeshFactory as MF
+    mesh = MF.boxmesh3d([0, 1, 0, 1, 0, 1], nx=2, ny=2, nz=2, meshtype='tet')
+    for i in range(3):
+        NC = mesh.number_of_cells()
+        isMarkedCell = np.zeros(NC, dtype=np.bool_)
+        isMarkedCell[:NC//4] = True
+        data = {'u': mesh.entity('node').copy()}
+        mesh.bisect(isMarkedCell, data=data)
+        assert np.allclose(data['u'], mesh.entity('node'))
+
+        ds = mesh.ds
+        ref = type(ds)(mesh.number_of_nodes(), ds.cell)
+        assert (ds.NF == ref.NF) and (ds.NE == ref.NE)
+        face = np.sort(ds.face, axis=-1)
+        assert np.all(face[np.lexsort(face.T[::-1])]
+                == np.unique(np.sort(ref.face, axis=-1), axis=0))
+        f2c = ds.face2cell
+        assert np.all(ds.cell[f2c[:, [0]], ds.localFace[f2c[:, 2]]] == ds.face)
+        assert np.all(ds.edge[np.lexsort(ds.edge.T[::-1])] == np.unique(ref.edge, axis=0))
+        assert np.all(np.sort(ds.cell[:, ds.localEdge], axis=-1) == ds.edge[ds.cell2edge])
+
+
+def test_bisect_order():
+    from fealpy.mesh import MeshFactory as MF
+    mesh = MF.boxmesh3d([0, 1, 0, 1, 0, 1], nx=2, ny=2, nz=2, meshtype='tet')
+    isMarkedCell = np.zeros(48, dtype=np.bool_)
+    isMarkedCell[1] = True
+    mesh.bisect(isMarkedCell)
+    # 标记单元和它的协调闭包在第一轮中按编号一起二分
+    cell = np.array([
+        [ 9, 13, 12, 27], [10, 13,  9, 27], [ 1, 13, 10, 27],
+        [ 4, 13,  1, 27], [ 3, 13,  4, 27], [12, 13,  3, 27]])
+    assert mesh.number_of_cells() == 54
+    assert np.all(mesh.entity('cell')[48:] == cell)
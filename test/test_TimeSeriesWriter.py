@@ -0,0 +1,55 @@
+import os
+
+import numpy as np
+import pytest
+
+from fealpy.mesh import MeshFactory as MF
+from fealpy.writer import TimeSeriesWriter
+
+vtk = pytest.importorskip('vtk')
+from vtk.util.numpy_support import vtk_to_numpy
+
+
+def read_xdmf(fname):
+    reader = vtk.vtkXdmfReader()
+    reader.SetFileName(fname)
+    reader.UpdateInformation()
+    info = reader.GetOutputInformation(0)
+    ts = info.Get(vtk.vtkStreamingDemandDrivenPipeline.TIME_STEPS())
+    for t in ts:
+        reader.UpdateTimeStep(t)
+        yield t, reader.GetOutputDataObject(0)
+
+
+@pytest.mark.parametrize("meshtype", ['tri', 'quad', 'tet'])
+def test_time_series_writer(tmp_path, meshtype):
+    if meshtype == 'tet':
+        mesh = MF.boxmesh3d([0, 1, 0, 1, 0, 1], nx=2, ny=2, nz=2, meshtype=meshtype)
+    else:
+        mesh = MF.boxmesh2d([0, 1, 0, 1], nx=3, ny=2, meshtype=meshtype)
+    NN = mesh.number_of_nodes()
+    NC = mesh.number_of_cells()
+    GD = mesh.geo_dimension()
+    mesh.celldata['flag'] = np.arange(NC) % 2 == 0
+
+    fname = os.path.join(str(tmp_path), 'u.xmf')
+    uh = np.zeros(NN)
+    with TimeSeriesWriter(mesh, fname, maxsize=2) as writer:
+        for i in range(5):
+            uh[:] = i # 拷贝后可以马上修改
+            nodedata = {'uh': uh}
+            if i % 2 == 0:
+                nodedata['grad'] = np.full((NN, GD), i, dtype=np.float64)
+            writer.write(0.1*i, nodedata=nodedata)
+
+    for i, (t, data) in enumerate(read_xdmf(fname)):
+        assert abs(t - 0.1*i) < 1e-12
+        assert data.GetNumberOfCells() == NC
+        u = vtk_to_numpy(data.GetPointData().GetArray('uh'))
+        assert np.all(u == i)
+        grad = vtk_to_numpy(data.GetPointData().GetArray('grad'))
+        assert grad.shape == (NN, 3)
+        assert np.all(grad[:, :GD] == i - i % 2)
+        flag = vtk_to_numpy(data.GetCellData().GetArray('flag'))
+        assert np.all(flag == (np.arange(NC) % 2 == 0))
+    assert i == 4
@@ -0,0 +1,314 @@
+import numpy as np
+import pytest
+
+from fealpy.mesh import MeshFactory as MF
+from fealpy.mesh import TriangleMesh
+
+
+def test_location_with_hole():
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=20, ny=20, meshtype='tri')
+    bc = mesh.entity_barycenter('cell')
+    isHole = (bc[:, 0] > 0.3) & (bc[:, 0] < 0.6) & (bc[:, 1] > 0.3) & (bc[:, 1] < 0.6)
+    isHole |= (bc[:, 0] > 0.7) & (bc[:, 1] > 0.7) # 非凸区域
+    mesh = TriangleMesh(mesh.entity('node').copy(), mesh.entity('cell')[~isHole].copy())
+
+    p = np.random.rand(1000, 2)
+    cidx, bcs = mesh.location(p, returnbc=True)
+
+    isOut = ((p[:, 0] > 0.3) & (p[:, 0] < 0.6) & (p[:, 1] > 0.3) & (p[:, 1] < 0.6)) | \
+            ((p[:, 0] > 0.7) & (p[:, 1] > 0.7))
+    assert np.all((cidx < 0) == isOut)
+
+    flag = cidx >= 0
+    node = mesh.entity('node')
+    cell = mesh.entity('cell')
+    q = np.einsum('ij, ijk->ik', bcs[flag], node[cell[cidx[flag]]])
+    assert np.abs(q - p[flag]).max() < 1e-12
+    assert np.all(bcs[flag] > -1e-10)
+
+
+def test_locator_update():
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=4, ny=4, meshtype='tri')
+    locator = mesh.locator()
+    assert mesh.locator() is locator
+
+    # 原地移动一个内部节点
+    node = mesh.entity('node')
+    cell = mesh.entity('cell')
+    i = 6
+    node[i] += 0.05
+    index, = np.nonzero(np.any(cell == i, axis=-1))
+    locator.update(index)
+
+    p = node[cell].mean(axis=1)
+    assert np.all(mesh.location(p) == np.arange(mesh.number_of_cells()))
+
+    mesh.uniform_refine()
+    assert mesh.locator() is not locator
+    p = mesh.entity_barycenter('cell')
+    assert np.all(mesh.location(p) == np.arange(mesh.number_of_cells()))
+
+
+def test_topology_cache():
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=4, ny=4, meshtype='tri')
+    node2cell = mesh.ds.node_to_cell()
+    assert np.shares_memory(mesh.ds.node_to_cell().indices, node2cell.indices)
+    assert not np.shares_memory(mesh.ds.node_to_cell(return_localidx=True).indices,
+            node2cell.indices)
+    assert node2cell.indices.dtype == np.int32
+    assert node2cell.indptr.dtype == np.int32
+    assert mesh.ds.cache_nbytes() > 0
+
+    # 返回的是只读视图, 原地修改会报错, 不会破坏缓存
+    cell2cell = mesh.ds.cell_to_cell()
+    with pytest.raises(ValueError):
+        cell2cell[0, 0] = -1
+    with pytest.raises(ValueError):
+        node2cell.data[:] = False
+    assert mesh.ds.edge2cell.flags.writeable # 只有视图是只读的
+    c2c = cell2cell.copy()
+    c2c[0, 0] = -1
+    assert mesh.ds.cell_to_cell()[0, 0] != -1
+
+    mesh.uniform_refine()
+    assert not np.shares_memory(mesh.ds.cell_to_cell(), cell2cell)
+    assert mesh.ds.node_to_cell().shape == (mesh.number_of_nodes(), mesh.number_of_cells())
+
+    mesh.ds.clear_cache()
+    assert mesh.ds.cache_nbytes() == 0
+
+
+def test_unique_row_index():
+    from fealpy.mesh.mesh_tools import unique_row_index
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=5, ny=3, meshtype='tri')
+    totalEdge = np.sort(mesh.ds.total_edge(), axis=-1)
+    _, i0, j = np.unique(totalEdge, return_index=True, return_inverse=True, axis=0)
+    k0, k = unique_row_index(totalEdge)
+    assert np.all(i0 == k0) and np.all(j == k)
+
+    # 整行编码溢出时分段编码再用 np.lexsort: 每列一个键, 或三列和一列两个键
+    rng = np.random.default_rng(0)
+    for N, m in [(2**40, 3), (2**20, 4), (3*10**6, 3), (60000, 4)]:
+        a = rng.integers(0, N, size=(200, m))
+        a = np.r_[a, a[::2], a[:3]]
+        a[0] = N - 1
+        _, i0, j = np.unique(a, return_index=True, return_inverse=True, axis=0)
+        k0, k = unique_row_index(a)
+        assert np.all(i0 == k0) and np.all(j.reshape(-1) == k)
+
+    # 节点编号超过 2^21 的四面体网格的面
+    tmesh = MF.boxmesh3d([0, 1, 0, 1, 0, 1], nx=2, ny=2, nz=2, meshtype='tet')
+    totalFace = np.sort(tmesh.ds.total_face(), axis=-1) + 3*10**6
+    _, i0, j = np.unique(totalFace, return_index=True, return_inverse=True, axis=0)
+    k0, k = unique_row_index(totalFace)
+    assert np.all(i0 == k0) and np.all(j.reshape(-1) == k)
+
+
+def check_edge(mesh):
+    """
+    增量更新的边和 edge2cell 与重新生成的一致
+    """
+    ds = mesh.ds
+    ref = type(ds)(mesh.number_of_nodes(), ds.cell)
+    assert ds.NE == ref.NE
+    edge = np.sort(ds.edge, axis=-1)
+    assert np.all(edge[np.lexsort(edge.T[::-1])]
+            == np.unique(np.sort(ref.edge, axis=-1), axis=0))
+
+    cell = ds.cell
+    edge2cell = ds.edge2cell
+    localEdge = ds.local_edge()
+    assert np.all(cell[edge2cell[:, [0]], localEdge[edge2cell[:, 2]]] == ds.edge)
+    e = cell[edge2cell[:, [1]], localEdge[edge2cell[:, 3]]]
+    assert np.all(np.sort(e, axis=-1) == edge)
+    assert np.sum(edge2cell[:, 0] == edge2cell[:, 1]) == \
+            np.sum(ref.edge2cell[:, 0] == ref.edge2cell[:, 1])
+
+
+def test_bisect_coarsen_update():
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=4, ny=4, meshtype='tri')
+    for i in range(4):
+        NC = mesh.number_of_cells()
+        isMarkedCell = np.zeros(NC, dtype=np.bool_)
+        isMarkedCell[:NC//5] = True
+        u = mesh.entity('node')[:, 0].copy()
+        options = mesh.bisect_options(data={'c': np.arange(NC, dtype=np.float_)},
+                nodedata={'u': u}, disp=False)
+        mesh.bisect(isMarkedCell, options=options)
+        assert np.allclose(options['nodedata']['u'], mesh.entity('node')[:, 0])
+        assert len(options['data']['c']) == mesh.number_of_cells()
+        check_edge(mesh)
+
+    for i in range(3):
+        NC = mesh.number_of_cells()
+        u = mesh.entity('node')[:, 0].copy()
+        options = mesh.bisect_options(nodedata={'u': u}, disp=False)
+        mesh.coarsen(np.ones(NC, dtype=np.bool_), options=options)
+        assert np.allclose(options['nodedata']['u'], mesh.entity('node')[:, 0])
+        # 粗化也返回节点的限制矩阵
+        IM = options['IM']
+        assert IM.shape == (mesh.number_of_nodes(), len(u))
+        assert np.allclose(IM@u, mesh.entity('node')[:, 0])
+        check_edge(mesh)
+
+
+def test_changed_cell_flag():
+    from fealpy.mesh.mesh_tools import changed_cell_flag
+    cell0 = np.array([[0, 1, 2], [1, 3, 2], [3, 4, 2]])
+    cell = np.array([[0, 1, 2], [5, 3, 2], [3, 4, 2], [5, 2, 1]])
+    isKeepCell0, isKeepCell = changed_cell_flag(cell0, cell, None, None)
+    assert np.all(isKeepCell0 == [True, False, True])
+    assert np.all(isKeepCell == [True, False, True, False])
+    # 只比较给出的可能改变了的单元
+    flag = changed_cell_flag(cell0, cell, None, None, changed=np.array([1]))
+    assert np.all(flag[0] == isKeepCell0) and np.all(flag[1] == isKeepCell)
+
+    cellmap = np.array([-1, 0, 1])
+    cell = np.array([[1, 3, 2], [3, 9, 2]])
+    isKeepCell0, isKeepCell = changed_cell_flag(cell0, cell, cellmap, None,
+            changed=np.array([0, 2]))
+    assert np.all(isKeepCell0 == [False, True, False])
+    assert np.all(isKeepCell == [True, False])
+
+
+def test_quadtree_update():
+    from fealpy.mesh import Quadtree
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=2, ny=2, meshtype='quad')
+    mesh = Quadtree(mesh.entity('node'), mesh.entity('cell'))
+    for i in range(3):
+        NC = mesh.number_of_cells()
+        isMarkedCell = mesh.is_leaf_cell()
+        isMarkedCell[NC//2:] = False
+        mesh.refine(isMarkedCell)
+        check_edge(mesh)
+    mesh.coarsen(mesh.is_leaf_cell())
+    check_edge(mesh)
+
+
+def test_refine_closure():
+    from fealpy.mesh.adaptive_tools import refine_closure
+    from scipy.sparse import csr_matrix
+    # 0 -> 1 -> 2 -> 3, 4 -> 4
+    J = np.array([1, 2, 3, 3, 4])
+    dependency = csr_matrix((np.ones(5), (np.arange(5), J)), shape=(5, 5))
+    isMarkedCell = np.array([False, True, False, False, False])
+    assert np.all(refine_closure(dependency, isMarkedCell) == [0, 1, 1, 1, 0])
+
+
+def test_bisect_closure():
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=8, ny=8, meshtype='tri')
+    rng = np.random.default_rng(0)
+    for i in range(5):
+        NN = mesh.number_of_nodes()
+        NC = mesh.number_of_cells()
+        isMarkedCell = rng.random(NC) < 0.05
+
+        # 按层扩展的协调闭包
+        edge = mesh.entity('edge')
+        cell2edge = mesh.ds.cell_to_edge()
+        cell2cell = mesh.ds.cell_to_cell()
+        isCutEdge = np.zeros(mesh.number_of_edges(), dtype=np.bool_)
+        markedCell, = np.nonzero(isMarkedCell)
+        while len(markedCell) > 0:
+            isCutEdge[cell2edge[markedCell, 0]] = True
+            refineNeighbor = cell2cell[markedCell, 0]
+            markedCell = refineNeighbor[~isCutEdge[cell2edge[refineNeighbor, 0]]]
+        node = mesh.entity('node')
+        newNode = (node[edge[isCutEdge, 0]] + node[edge[isCutEdge, 1]])/2
+
+        mesh.bisect(isMarkedCell, options={'disp': False})
+        assert np.allclose(mesh.entity('node')[NN:], newNode)
+        assert np.isclose(np.sum(mesh.entity_measure('cell')), 1)
+
+
+def test_mark():
+    from fealpy.mesh.adaptive_tools import mark
+    rng = np.random.default_rng(0)
+    for N in [1, 100, 5000]:
+        eta = rng.random(N)**4
+        for theta in [0.0, 0.3, 0.8]:
+            # 按排序实现的 Dörfler 标记
+            e = eta**2
+            idx = np.argsort(e)[-1::-1]
+            x = np.cumsum(e[idx])
+            isMarked = np.zeros(N, dtype=np.bool_)
+            isMarked[idx[x < theta*x[-1]]] = True
+            isMarked[idx[0]] = True
+            assert np.all(mark(eta, theta) == isMarked)
+
+    # theta >= 1 时标记所有误差非零的单元, 不受部分和舍入误差的影响
+    eta = rng.random(100000)
+    assert np.all(mark(eta, 1.0))
+    eta[::7] = 0
+    assert np.all(mark(eta, 1.0) == (eta != 0))
+    assert np.sum(mark(np.zeros(10), 1.0)) == 1
+
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=4, ny=4, meshtype='tri')
+    eta = np.arange(mesh.number_of_cells(), dtype=np.float_)
+    isMarkedCell = mesh.refine_marker(eta, 0.5, method='MAX')
+    assert np.all(isMarkedCell == (eta > 0.5*eta.max()))
+    isMarkedCell = mesh.refine_marker(eta, 1.0, method='EQUI')
+    assert np.all(isMarkedCell == (eta**2 > np.mean(eta**2)))
+
+
+def test_boundary_marker(tmp_path):
+    from fealpy.mesh import InpFileReader
+    from fealpy.functionspace import LagrangeFiniteElementSpace
+
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=4, ny=4, meshtype='tri')
+    left = lambda p: np.abs(p[..., 0]) < 1e-12
+    mesh.set_boundary_marker('left', left)
+    mesh.set_boundary_marker('all')
+    edge = mesh.entity('edge')
+    node = mesh.entity('node')
+    index = mesh.boundary_marker('left')
+    assert len(index) == 4
+    assert np.all(node[edge[index], 0] == 0)
+    assert np.shares_memory(mesh.boundary_marker('left'), index) # 只计算一次
+    assert np.all(mesh.boundary_marker('all') == mesh.ds.boundary_edge_index())
+
+    # 用顶点给出的边 (如 gmsh 的边界单元)
+    mesh.set_boundary_marker('left1', edge[index][:, ::-1])
+    assert np.all(np.sort(mesh.boundary_marker('left1')) == np.sort(index))
+
+    space = LagrangeFiniteElementSpace(mesh, p=2)
+    assert np.all(space.boundary_dof(threshold='left') == space.boundary_dof(threshold=left))
+
+    # 加密以后由函数给出的标记重新计算
+    mesh.uniform_refine()
+    index = mesh.boundary_marker('left')
+    assert len(index) == 8
+    assert np.all(mesh.entity('node')[mesh.entity('edge')[index], 0] == 0)
+    assert np.all(mesh.boundary_marker('all') == mesh.ds.boundary_edge_index())
+
+    # 由编号给出的标记在加密以后已经失效
+    with pytest.raises(ValueError):
+        mesh.boundary_marker('left1')
+    mesh.set_boundary_marker('left1', index)
+    assert np.all(mesh.boundary_marker('left1') == index)
+    mesh.bisect(np.ones(mesh.number_of_cells(), dtype=np.bool_))
+    with pytest.raises(ValueError):
+        mesh.boundary_marker('left1')
+
+    fname = tmp_path / 'square.inp'
+    fname.write_text("""*Heading
+** 两个三角形
+*Node
+1, 0.0, 0.0
+2, 1.0, 0.0
+3, 1.0, 1.0
+4, 0.0, 1.0
+*Element, type=CPS3
+1, 1, 2, 3
+2, 1, 3, 4
+*Nset, nset=Bottom
+1, 2
+*Nset, nset=Right, generate
+2, 3, 1
+""")
+    reader = InpFileReader(str(fname))
+    reader.read()
+    mesh = reader.mesh()
+    edge = mesh.entity('edge')
+    assert np.all(np.sort(edge[mesh.boundary_marker('Bottom')], axis=-1) == [[0, 1]])
+    assert np.all(np.sort(edge[mesh.boundary_marker('Right')], axis=-1) == [[1, 2]])
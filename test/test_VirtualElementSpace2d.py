@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+from numpy.linalg import inv
+from scipy.sparse import csr_matrix
+
+from fealpy.mesh import MeshFactory as MF
+from fealpy.functionspace import ConformingVirtualElementSpace2d
+from fealpy.functionspace import NonConformingVirtualElementSpace2d
+
+
+def u(p):
+    x = p[..., 0]
+    y = p[..., 1]
+    return x**2 + 3*x*y - y**2 + x
+
+
+@pytest.mark.parametrize("p", [1, 2, 3])
+def test_cvem_batched_matrix(p):
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=4, ny=4, meshtype='poly')
+    space = ConformingVirtualElementSpace2d(mesh, p=p)
+    assert len(space.cellgroups) > 1
+
+    # 逐单元计算的实现
+    cell2dof, cell2dofLocation = space.cell_to_dof()
+    cd = np.hsplit(cell2dof, cell2dofLocation[1:-1])
+    DD = np.vsplit(space.D, cell2dofLocation[1:-1])
+    BB = np.hsplit(space.B, cell2dofLocation[1:-1])
+    area = space.smspace.cellmeasure
+    I = []
+    J = []
+    A = []
+    M = []
+    for i in range(mesh.number_of_cells()):
+        D = DD[i]
+        G = BB[i]@D
+        PI1 = BB[i] if p == 1 else inv(G)@BB[i]
+        assert np.allclose(space.PI1[i], PI1)
+        tG = np.eye(G.shape[0]) if p == 1 else G.copy()
+        tG[0, :] = 0
+        S = np.eye(len(cd[i])) - D@PI1
+        if p == 1:
+            n = len(cd[i])
+            E = 2*np.eye(n) - np.roll(np.eye(n), 1, axis=1) - np.roll(np.eye(n), -1, axis=1)
+            A.append(PI1.T@tG@PI1 + S.T@E@S)
+        else:
+            A.append(PI1.T@tG@PI1 + S.T@S)
+        PI0 = space.PI0[i]
+        S = np.eye(len(cd[i])) - D@PI0
+        M.append(PI0.T@space.H[i]@PI0 + area[i]*S.T@S)
+        I.append(np.repeat(cd[i], len(cd[i])))
+        J.append(np.tile(cd[i], len(cd[i])))
+    I = np.concatenate(I)
+    J = np.concatenate(J)
+    gdof = space.number_of_global_dofs()
+    A0 = csr_matrix((np.concatenate([a.flat for a in A]), (I, J)), shape=(gdof, gdof))
+    M0 = csr_matrix((np.concatenate([m.flat for m in M]), (I, J)), shape=(gdof, gdof))
+
+    assert np.allclose(space.stiff_matrix().toarray(), A0.toarray())
+    assert np.allclose(space.mass_matrix().toarray(), M0.toarray())
+
+    uI = space.interpolation(u)
+    if p > 1:
+        # 二次多项式的投影是精确的
+        S = space.project_to_smspace(uI)
+        bc = space.smspace.cellbarycenter
+        assert np.allclose(S.value(bc, np.arange(len(bc))), u(bc))
+        assert np.allclose(space.integral(uI), 5/4)
+
+
+@pytest.mark.parametrize("p", [2, 3])
+def test_ncvem_batched_matrix(p):
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=4, ny=4, meshtype='poly')
+    space = NonConformingVirtualElementSpace2d(mesh, p=p)
+
+    A = space.stiff_matrix()
+    M = space.mass_matrix()
+    assert np.allclose((A - A.T).data, 0)
+    assert np.allclose((M - M.T).data, 0)
+
+    # 常数在刚度矩阵的核中, 质量矩阵给出区域的面积
+    one = space.interpolation(lambda p: np.ones(p.shape[:-1]))
+    assert np.allclose(A@one, 0)
+    assert np.isclose(one@M@one, 1)
+
+    uI = space.interpolation(u)
+    S = space.project_to_smspace(uI)
+    bc = space.smspace.cellbarycenter
+    assert np.allclose(S.value(bc, np.arange(len(bc))), u(bc))
+
+
+def test_vem_matrix_index_arrays():
+    mesh = MF.boxmesh2d([0, 1, 0, 1], nx=4, ny=4, meshtype='poly')
+    space = ConformingVirtualElementSpace2d(mesh, p=2)
+    A0 = space.stiff_matrix()
+    M0 = space.mass_matrix()
+    M1 = M0.copy()
+
+    # 原地修改一个矩阵的稀疏结构不影响其它矩阵和以后的组装
+    A0.data[::2] = 0
+    A0.eliminate_zeros()
+    assert np.abs(M0 - M1).max() == 0
+    assert np.abs(space.mass_matrix() - M1).max() == 0